@@ -8,6 +8,7 @@ from .registry import CaptchaRecognizer, get_recognizer
 from .online import BaiduOCRRecognizer
 from .gemini import GeminiVLMRecognizer
 from .openai_api import OpenAICompatRecognizer
+from .service import RemoteRecognizer
 
 __all__ = [
     "Captcha",
@@ -16,4 +17,5 @@ __all__ = [
     "BaiduOCRRecognizer",
     "GeminiVLMRecognizer",
     "OpenAICompatRecognizer",
+    "RemoteRecognizer",
 ]
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import math
+import random
 import threading
 import time
 
+ADAPTIVE_POLICIES = ("score", "ttv", "ucb", "thompson")
+
 
 class _EWMA(object):
     def __init__(self, alpha, value=None):
@@ -25,7 +29,7 @@ class _EWMA(object):
 
 
 class _Stats(object):
-    def __init__(self, latency_alpha, h_alpha):
+    def __init__(self, latency_alpha, h_alpha, half_life=0.0, clock=time.time):
         self.count = 0
         self.success = 0
         self.failure = 0
@@ -33,26 +37,60 @@ class _Stats(object):
         self.latency = _EWMA(latency_alpha, None)
         self.h_latency = _EWMA(h_alpha, None)
         self.last_update = 0.0
-
-    def update(self, success, latency=None, h_latency=None):
+        # Exponentially time-decayed success/failure weights (== counts when half_life <= 0).
+        self.w_success = 0.0
+        self.w_failure = 0.0
+        self.decay_at = None
+        self._half_life = float(half_life or 0.0)
+        self._clock = clock
+
+    def _decay(self, now):
+        if self._half_life <= 0:
+            return
+        if self.decay_at is not None:
+            if now <= self.decay_at:
+                return  # out-of-order (replayed) record: never decay backwards
+            f = 0.5 ** ((now - self.decay_at) / self._half_life)
+            self.w_success *= f
+            self.w_failure *= f
+        self.decay_at = now
+
+    def update(self, success, latency=None, h_latency=None, now=None):
         if success is None:
             return
+        if now is None:
+            now = self._clock()
+        self._decay(now)
         self.count += 1
         if success:
             self.success += 1
+            self.w_success += 1.0
             self.fail_streak = 0
         else:
             self.failure += 1
+            self.w_failure += 1.0
             self.fail_streak += 1
         if latency is not None:
             self.latency.update(latency)
         if h_latency is not None:
             self.h_latency.update(h_latency)
-        self.last_update = time.time()
+        self.last_update = max(self.last_update, now)
+
+    def weights(self):
+        """
+        (success, failure) weights as of now; decayed when a half-life is set.
+        """
+        if self._half_life <= 0:
+            return float(self.success), float(self.failure)
+        if self.decay_at is None:
+            return 0.0, 0.0
+        f = 0.5 ** (max(0.0, self._clock() - self.decay_at) / self._half_life)
+        return self.w_success * f, self.w_failure * f
 
     def p_hat(self):
         # Laplace smoothing to avoid 0/1 extremes with few samples.
-        return (self.success + 1.0) / (self.count + 2.0)
+        ws, wf = self.weights()
+        return (ws + 1.0) / (ws + wf + 2.0)
 
 
 class CaptchaAdaptiveManager(object):
@@ -69,7 +107,28 @@ class CaptchaAdaptiveManager(object):
         fail_streak_degrade=3,
         score_alpha=0.4,
         score_beta=0.6,
+        policy="score",
+        decay_half_life=0.0,
+        ucb_c=1.0,
+        clock=None,
+        rng=None,
     ):
+        """
+        policy:
+          - score:    p_hat - score_alpha * t - score_beta * h (historical default)
+          - ttv:      minimize expected time-to-validated-captcha (t + h) / p_hat
+          - ucb:      ttv with an optimistic (upper confidence bound) p
+          - thompson: ttv with p sampled from Beta(success + 1, failure + 1)
+        decay_half_life: seconds; > 0 makes success/failure counts decay exponentially.
+        """
+        policy = (policy or "score").strip().lower()
+        if policy not in ADAPTIVE_POLICIES:
+            raise ValueError("Unknown adaptive policy %r. Allowed: %s" % (policy, ", ".join(ADAPTIVE_POLICIES)))
+        self._policy = policy
+        self._half_life = max(0.0, float(decay_half_life or 0.0))
+        self._ucb_c = max(0.0, float(ucb_c))
+        self._clock = clock or time.time
+        self._rng = rng or random.Random()
         self._lock = threading.Lock()
         self._enabled = bool(enabled)
         self._min_samples = max(1, int(min_samples))
@@ -82,16 +141,25 @@ class CaptchaAdaptiveManager(object):
         self._score_alpha = max(0.0, float(score_alpha))
         self._score_beta = max(0.0, float(score_beta))
         self._providers = list(providers)
-        self._stats = {p: _Stats(self._latency_alpha, self._h_alpha) for p in self._providers}
+        self._stats = {p: self._new_stats() for p in self._providers}
         self._frozen = False
         self._last_order = list(self._providers)
         self._base_order = list(self._providers)
         self._last_update_loop = None
+        self._journal = None
+        self._listeners = []
+
+    def _new_stats(self):
+        return _Stats(self._latency_alpha, self._h_alpha, half_life=self._half_life, clock=self._clock)
 
     @property
     def enabled(self):
         return self._enabled
 
+    @property
+    def policy(self):
+        return self._policy
+
     def set_enabled(self, enabled):
         self._enabled = bool(enabled)
 
@@ -108,7 +176,7 @@ class CaptchaAdaptiveManager(object):
             self._providers = list(order)
             for p in order:
                 if p not in self._stats:
-                    self._stats[p] = _Stats(self._latency_alpha, self._h_alpha)
+                    self._stats[p] = self._new_stats()
                     self._base_order.append(p)
             self._last_order = list(order)
 
@@ -120,21 +188,88 @@ class CaptchaAdaptiveManager(object):
         with self._lock:
             return self._h.value
 
+    def set_journal(self, journal):
+        """
+        Attach an `AttemptJournal` (or None); every recorded attempt is appended to it.
+        """
+        with self._lock:
+            self._journal = journal
+
+    def add_listener(self, listener):
+        """
+        Like the journal, `listener.append(ts, provider, success, latency=, h_latency=)`
+        is called for every recorded attempt (e.g. a shared recognition service).
+        """
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def _record_locked(self, provider, success, latency, h_latency, now):
+        st = self._stats.get(provider)
+        if st is None:
+            st = self._new_stats()
+            self._stats[provider] = st
+            if provider not in self._base_order:
+                self._base_order.append(provider)
+        st.update(success, latency=latency, h_latency=h_latency, now=now)
+        if h_latency is not None:
+            self._h.update(h_latency)
+
     def record_attempt(self, provider, success, latency=None, h_latency=None):
         if provider is None:
             return
         with self._lock:
-            st = self._stats.get(provider)
-            if st is None:
-                st = _Stats(self._latency_alpha, self._h_alpha)
-                self._stats[provider] = st
-                if provider not in self._base_order:
-                    self._base_order.append(provider)
-            st.update(success, latency=latency, h_latency=h_latency)
-            if h_latency is not None:
-                self._h.update(h_latency)
+            now = self._clock()
+            self._record_locked(provider, success, latency, h_latency, now)
+            sinks = [self._journal] + self._listeners
+        if success is None:
+            return
+        for sink in sinks:
+            if sink is None:
+                continue
+            try:
+                sink.append(now, provider, success, latency=latency, h_latency=h_latency)
+            except Exception:
+                pass  # persistence/reporting must never break the elective loop
+
+    def replay(self, records):
+        """
+        Apply (ts, provider, success, latency, h_latency) records, e.g. from
+        `journal.iter_records`, without journaling them again.
+        :return: number of records applied
+        """
+        n = 0
+        with self._lock:
+            for ts, provider, success, latency, h_latency in records:
+                if provider is None or success is None:
+                    continue
+                self._record_locked(provider, success, latency, h_latency, ts)
+                n += 1
+        return n
 
     def _eligible_scores(self, order):
+        """
+        [(provider, score)] for ranked providers; higher is better for every policy
+        (ttv-based policies use -expected_seconds).
+        """
+        if self._policy == "score":
+            return self._linear_scores(order)
+        scores = []
+        total = 0.0
+        for p in order:
+            st = self._stats.get(p)
+            if st is not None:
+                total += sum(st.weights())
+        for p in order:
+            st = self._stats.get(p)
+            if self._policy == "ttv" and (st is None or st.count < self._min_samples):
+                continue
+            if st is None:
+                st = self._new_stats()
+            scores.append((p, -self._expected_ttv(st, total)))
+        return scores
+
+    def _linear_scores(self, order):
         scores = []
         for p in order:
             st = self._stats.get(p)
@@ -151,7 +286,33 @@ class CaptchaAdaptiveManager(object):
             scores.append((p, score))
         return scores
 
+    def _attempt_seconds(self, st):
+        t = st.latency.value
+        h_t = st.h_latency.value
+        if h_t is None:
+            h_t = self._h.value
+        if t is None:
+            # unseen provider: assume the mean latency of the others (optimistic enough to try)
+            known = [x.latency.value for x in self._stats.values() if x.latency.value is not None]
+            t = sum(known) / len(known) if known else 0.0
+        return max(1e-3, t + (h_t or 0.0))
+
+    def _expected_ttv(self, st, total_weight=0.0):
+        ws, wf = st.weights()
+        if self._policy == "thompson":
+            p = self._rng.betavariate(ws + 1.0, wf + 1.0)
+        elif self._policy == "ucb":
+            n = ws + wf
+            bonus = self._ucb_c * math.sqrt(math.log(max(total_weight, 1.0) + 1.0) / (n + 1.0))
+            p = min(1.0, (ws + 1.0) / (n + 2.0) + bonus)
+        else:
+            p = st.p_hat()
+        # Each attempt costs recognize + draw/validate; attempts until success ~ Geometric(p).
+        return self._attempt_seconds(st) / max(p, 1e-3)
+
     def _cold_start_active(self, order):
+        if self._policy in ("ucb", "thompson"):
+            return False
         for p in order:
             st = self._stats.get(p)
             if st is not None and st.count >= self._min_samples:
@@ -168,7 +329,11 @@ class CaptchaAdaptiveManager(object):
         new_order = list(order[1:]) + [head]
         return new_order, True
 
-    def maybe_reorder(self, current_order, loop_count=None):
+    def maybe_reorder(self, current_order, loop_count=None, current=None):
+        """
+        `current` is the provider actually in use (defaults to the head of `current_order`);
+        `switch_primary` compares the best candidate against it.
+        """
         if not self._enabled:
             return current_order, False, False
         with self._lock:
@@ -195,19 +360,26 @@ class CaptchaAdaptiveManager(object):
             rest = [p for p in order if p not in score_map]
             new_order = scored_names + rest
 
-            current = order[0] if order else None
+            if current is None or current not in order:
+                current = order[0] if order else None
             best = scored_sorted[0][0]
             switch_primary = False
             if current in score_map:
                 cur_score = score_map[current]
                 best_score = score_map[best]
-                if best != current and best_score >= cur_score * (1.0 + self._epsilon):
+                if best != current and self.better_enough(best_score, cur_score):
                     switch_primary = True
             changed = new_order != order
-            if changed and loop_count is not None:
+            if (changed or switch_primary) and loop_count is not None:
                 self._last_update_loop = loop_count
             return new_order, switch_primary, changed
 
+    def better_enough(self, best_score, cur_score):
+        if self._policy == "score":
+            return best_score >= cur_score * (1.0 + self._epsilon)
+        # ttv scores are -seconds: require best to be faster by a factor (1 + epsilon)
+        return -best_score * (1.0 + self._epsilon) <= -cur_score
+
     def select_probe_provider(self, current_order):
         with self._lock:
             order = list(current_order)
@@ -234,10 +406,17 @@ class CaptchaAdaptiveManager(object):
                 if h_t is None:
                     h_t = self._h.value
                 score = None
-                if st.count >= self._min_samples:
-                    t = st.latency.value or 0.0
-                    h_val = h_t or 0.0
-                    score = st.p_hat() - self._score_alpha * t - self._score_beta * h_val
+                ttv = None
+                if self._policy in ("ucb", "thompson") or st.count >= self._min_samples:
+                    if self._policy == "score":
+                        t = st.latency.value or 0.0
+                        h_val = h_t or 0.0
+                        score = st.p_hat() - self._score_alpha * t - self._score_beta * h_val
+                    else:
+                        # report the mean estimate, not an exploration sample
+                        ttv = self._attempt_seconds(st) / max(st.p_hat(), 1e-3)
+                        score = -ttv
+                ws, wf = st.weights()
                 data[p] = {
                     "count": st.count,
                     "success": st.success,
@@ -247,11 +426,18 @@ class CaptchaAdaptiveManager(object):
                     "h_latency": h_t,
                     "p_hat": st.p_hat(),
                     "score": score,
+                    "ttv": ttv,
+                    "w_success": ws,
+                    "w_failure": wf,
                 }
             return {
                 "providers": list(self._providers),
                 "h": self._h.value,
+                "policy": self._policy,
+                "decay_half_life": self._half_life,
                 "stats": data,
+                # attempts recorded at or before this clock value are included
+                "taken_at": self._clock(),
             }
 
     def load_snapshot(self, snapshot):
@@ -290,7 +476,7 @@ class CaptchaAdaptiveManager(object):
             providers = snapshot.get("providers") or []
             for p in providers:
                 if p not in self._stats:
-                    self._stats[p] = _Stats(self._latency_alpha, self._h_alpha)
+                    self._stats[p] = self._new_stats()
                 if p not in self._base_order:
                     self._base_order.append(p)
 
@@ -301,7 +487,7 @@ class CaptchaAdaptiveManager(object):
                         continue
                     st = self._stats.get(p)
                     if st is None:
-                        st = _Stats(self._latency_alpha, self._h_alpha)
+                        st = self._new_stats()
                         self._stats[p] = st
                         if p not in self._base_order:
                             self._base_order.append(p)
@@ -311,5 +497,10 @@ class CaptchaAdaptiveManager(object):
                     st.fail_streak = max(0, _to_int(st_data.get("fail_streak"), 0))
                     st.latency._value = _to_float(st_data.get("latency"))
                     st.h_latency._value = _to_float(st_data.get("h_latency"))
+                    ws = _to_float(st_data.get("w_success"))
+                    wf = _to_float(st_data.get("w_failure"))
+                    st.w_success = float(st.success) if ws is None else ws
+                    st.w_failure = float(st.failure) if wf is None else wf
+                    st.decay_at = self._clock()
 
             return True
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: captcha/benchmark.py
+
+"""
+Shared engine for the offline recognizer benchmarks.
+
+Each `BenchTask` is one recognition of one image by one target. Tasks run in a
+thread pool per limit group (by default the provider, so two models on the same
+API share its quota), each with its own concurrency and requests-per-second
+bucket; different groups run side by side.
+
+Results are streamed to a JSONL file from the calling thread as they complete,
+one record per task. With `resume=True` the file doubles as a checkpoint:
+successful records already in it are returned again instead of re-running their
+tasks, errors are retried. `on_result` also runs on the calling thread, so it may
+use objects that are not thread-safe (e.g. a sqlite connection). When the run is
+interrupted (Ctrl-C, an error in `on_result`), queued tasks are cancelled and
+only the calls already in flight finish; their results still go to the file.
+
+`summarize` groups records and reports latency p50/p90/p99, throughput, exact
+accuracy with a Wilson interval and mean character accuracy with a normal one.
+"""
+
+import json
+import math
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from queue import Empty, Queue
+
+from ..rate_limit import TokenBucket
+from .evaldb import normalize_code
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+
+
+def list_images(images_dir, max_images=None, exts=IMAGE_EXTS):
+    files = []
+    for name in sorted(os.listdir(images_dir)):
+        path = os.path.join(images_dir, name)
+        if os.path.isfile(path) and os.path.splitext(name)[1].lower() in exts:
+            files.append(path)
+    if max_images:
+        files = files[:max_images]
+    return files
+
+
+def parse_label_from_filename(path):
+    stem, _ = os.path.splitext(os.path.basename(path))
+    if "_" not in stem:
+        return None
+    return stem.split("_")[-1] or None
+
+
+def read_file(path):
+    with open(path, "rb") as fp:
+        return fp.read()
+
+
+def char_accuracy(gt, pred):
+    """
+    Position-aligned character accuracy; a length mismatch counts as misses.
+    """
+    gt = normalize_code(gt)
+    pred = normalize_code(pred)
+    if not gt and not pred:
+        return 1.0
+    if not gt:
+        return 0.0
+    max_len = max(len(gt), len(pred))
+    correct = sum(1 for g, p in zip(gt, pred) if g == p)
+    return correct / max_len
+
+
+def wilson_interval(hits, n, z=1.96):
+    if n <= 0:
+        return None
+    p = hits / float(n)
+    denom = 1.0 + z * z / n
+    center = (p + z * z / (2.0 * n)) / denom
+    half = z * math.sqrt(p * (1.0 - p) / n + z * z / (4.0 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def mean_interval(values, z=1.96):
+    if not values:
+        return None
+    m = statistics.mean(values)
+    if len(values) < 2:
+        return m, m
+    half = z * statistics.stdev(values) / math.sqrt(len(values))
+    return max(0.0, m - half), min(1.0, m + half)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = int(round((p / 100.0) * (len(values) - 1)))
+    return values[max(0, min(k, len(values) - 1))]
+
+
+class BenchTask(object):
+    """
+    `load()` returns the image bytes. `cached` = (pred, latency_ms) reports a known
+    result without calling the recognizer (and without using rate budget).
+    """
+
+    __slots__ = ("target", "image", "load", "label", "variant", "repeat", "group", "cached", "extra")
+
+    def __init__(self, target, image, load, label=None, variant="", repeat=0, group=None, cached=None, extra=None):
+        self.target = target
+        self.image = image
+        self.load = load
+        self.label = label
+        self.variant = variant or ""
+        self.repeat = int(repeat)
+        self.group = group or str(target).split(":", 1)[0]
+        self.cached = cached
+        self.extra = extra
+
+    @property
+    def key(self):
+        return "%s|%s|%s|%d" % (self.target, self.variant, self.image, self.repeat)
+
+
+def load_checkpoint(path):
+    """
+    {key: record} of successful records in a JSONL results file; a torn last
+    line and error records are skipped (errors are retried on resume).
+    """
+    done = {}
+    try:
+        fp = open(path, "r", encoding="utf-8")
+    except OSError:
+        return done
+    with fp:
+        for line in fp:
+            if not line.endswith("\n"):
+                break
+            try:
+                rec = json.loads(line)
+            except Exception:
+                continue
+            if isinstance(rec, dict) and rec.get("key") and rec.get("error") is None:
+                done[rec["key"]] = rec
+    return done
+
+
+class BenchmarkEngine(object):
+
+    def __init__(self, concurrency=1, rps=0.0, limits=None, out_path=None, resume=False):
+        """
+        concurrency / rps: defaults for every group; rps <= 0 means unlimited.
+        limits: {group: (concurrency, rps)} overrides.
+        """
+        self._concurrency = max(1, int(concurrency))
+        self._rps = max(0.0, float(rps or 0.0))
+        self._limits = dict(limits or {})
+        self._out_path = out_path
+        self._resume = bool(resume)
+
+    def _group_limits(self, group):
+        concurrency, rps = self._limits.get(group, (self._concurrency, self._rps))
+        return max(1, int(concurrency)), max(0.0, float(rps or 0.0))
+
+    def run(self, tasks, call, on_result=None):
+        """
+        call(task, raw) -> predicted code; exceptions are recorded as errors.
+        Returns the records of all tasks (resumed ones marked "resumed": true),
+        in completion order.
+        """
+        tasks = list(tasks)
+        done = {}
+        if self._out_path and self._resume:
+            done = load_checkpoint(self._out_path)
+        out = None
+        if self._out_path:
+            d = os.path.dirname(os.path.abspath(self._out_path))
+            os.makedirs(d, exist_ok=True)
+            out = open(self._out_path, "a" if self._resume else "w", encoding="utf-8")
+
+        records = []
+        pending = {}
+        for task in tasks:
+            rec = done.get(task.key)
+            if rec is not None:
+                rec = dict(rec, resumed=True)
+                records.append(rec)
+                continue
+            pending.setdefault(task.group, []).append(task)
+
+        results = Queue()
+        stop = threading.Event()
+        executors = []
+        futures = []
+        finished = False
+        try:
+            for group, group_tasks in pending.items():
+                concurrency, rps = self._group_limits(group)
+                bucket = TokenBucket(rps, 1) if rps > 0 else None
+                ex = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench-%s" % group)
+                executors.append(ex)
+                for task in group_tasks:
+                    futures.append(ex.submit(self._run_one, task, call, bucket, results, stop))
+            for _ in range(len(futures)):
+                rec = results.get()
+                records.append(rec)
+                self._write(out, rec)
+                if on_result is not None:
+                    on_result(rec)
+            finished = True
+        finally:
+            if finished:
+                for ex in executors:
+                    ex.shutdown(wait=True)
+            else:
+                # interrupted: never start queued calls, but checkpoint the ones
+                # already paid for so --resume does not repeat them
+                stop.set()
+                for ex in executors:
+                    ex.shutdown(wait=False, cancel_futures=True)
+                wait_futures([f for f in futures if not f.cancelled()])
+                while True:
+                    try:
+                        rec = results.get_nowait()
+                    except Empty:
+                        break
+                    if rec is not None:
+                        self._write(out, rec)
+            if out is not None:
+                out.close()
+        return records
+
+    @staticmethod
+    def _write(out, rec):
+        if out is not None:
+            out.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+            out.flush()
+
+    @staticmethod
+    def _run_one(task, call, bucket, results, stop):
+        rec = {
+            "key": task.key,
+            "target": task.target,
+            "variant": task.variant,
+            "image": task.image,
+            "repeat": task.repeat,
+            "label": task.label,
+            "pred": None,
+            "latency_ms": None,
+            "error": None,
+            "cached": False,
+            "started_at": None,
+            "finished_at": None,
+        }
+        if task.extra:
+            rec.update(task.extra)
+        try:
+            if task.cached is not None:
+                rec["pred"], rec["latency_ms"] = task.cached
+                rec["cached"] = True
+                return
+            raw = task.load()
+            if bucket is not None:
+                bucket.consume()
+            if stop.is_set():
+                rec = None  # interrupted while waiting for rate budget: not run
+                return
+            t0 = time.time()
+            rec["started_at"] = t0
+            try:
+                rec["pred"] = call(task, raw)
+            finally:
+                rec["finished_at"] = time.time()
+                rec["latency_ms"] = (rec["finished_at"] - t0) * 1000.0
+        except Exception as e:
+            rec["error"] = "%s: %s" % (type(e).__name__, e)
+        finally:
+            results.put(rec)
+
+
+def summarize(records, by=("target", "variant")):
+    """
+    [{"key": (...), "n", "ok", "errors", "cached", "labeled", "exact", "exact_ci",
+      "char", "char_ci", "latency_avg", "latency_p50", "latency_p90", "latency_p99",
+      "latency_min", "latency_max", "throughput"}], latencies in ms, throughput in
+    fresh successful calls per second of wall time. Keeps first-seen group order.
+    """
+    groups = {}
+    for rec in records:
+        key = tuple(rec.get(k) for k in by)
+        groups.setdefault(key, []).append(rec)
+    out = []
+    for key, recs in groups.items():
+        ok = [r for r in recs if r.get("error") is None]
+        lat = [r["latency_ms"] for r in ok if r.get("latency_ms") is not None]
+        labeled = [r for r in ok if r.get("label")]
+        hits = sum(1 for r in labeled if normalize_code(r.get("pred")) == normalize_code(r["label"]))
+        chars = [char_accuracy(r["label"], r.get("pred")) for r in labeled]
+        fresh = [r for r in ok if r.get("started_at") and r.get("finished_at")]
+        throughput = None
+        if fresh:
+            span = max(r["finished_at"] for r in fresh) - min(r["started_at"] for r in fresh)
+            if span > 0:
+                throughput = len(fresh) / span
+        out.append(
+            {
+                "key": key,
+                "n": len(recs),
+                "ok": len(ok),
+                "errors": len(recs) - len(ok),
+                "cached": sum(1 for r in recs if r.get("cached")),
+                "labeled": len(labeled),
+                "exact": (hits / len(labeled)) if labeled else None,
+                "exact_ci": wilson_interval(hits, len(labeled)),
+                "char": statistics.mean(chars) if chars else None,
+                "char_ci": mean_interval(chars),
+                "latency_avg": statistics.mean(lat) if lat else None,
+                "latency_p50": percentile(lat, 50),
+                "latency_p90": percentile(lat, 90),
+                "latency_p99": percentile(lat, 99),
+                "latency_min": min(lat) if lat else None,
+                "latency_max": max(lat) if lat else None,
+                "throughput": throughput,
+            }
+        )
+    return out
+
+
+def _fmt(x, spec="%.1f"):
+    return "--" if x is None else spec % x
+
+
+def format_summary(row):
+    """
+    Two lines: accuracy with 95% intervals, then latency/throughput.
+    """
+    exact = "--"
+    if row["exact"] is not None:
+        lo, hi = row["exact_ci"]
+        exact = "%.3f [%.3f, %.3f]" % (row["exact"], lo, hi)
+    char = "--"
+    if row["char"] is not None:
+        lo, hi = row["char_ci"]
+        char = "%.3f [%.3f, %.3f]" % (row["char"], lo, hi)
+    return (
+        "n=%d ok=%d errors=%d cached=%d labeled=%d exact=%s char=%s\n"
+        "latency_ms: avg=%s p50=%s p90=%s p99=%s max=%s throughput=%s/s"
+        % (
+            row["n"],
+            row["ok"],
+            row["errors"],
+            row["cached"],
+            row["labeled"],
+            exact,
+            char,
+            _fmt(row["latency_avg"]),
+            _fmt(row["latency_p50"]),
+            _fmt(row["latency_p90"]),
+            _fmt(row["latency_p99"]),
+            _fmt(row["latency_max"]),
+            _fmt(row["throughput"], "%.2f"),
+        )
+    )
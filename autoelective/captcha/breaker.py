@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: captcha/breaker.py
+
+"""
+Per-target circuit breakers for captcha recognizers.
+
+Only availability failures trip a breaker: timeouts, HTTP 429 and HTTP 5xx /
+connection errors, each with its own consecutive-failure threshold. A wrong or
+unparsable answer still means the provider is up and counts as a success here;
+answer quality is the adaptive manager's job.
+
+closed  -> every call allowed
+open    -> calls rejected until the cool-down ends (429 honors Retry-After)
+half    -> up to `half_open_max_calls` trial calls; a success closes the breaker,
+           a failure re-opens it with a doubled cool-down (capped)
+"""
+
+import threading
+import time
+
+from .budget import BudgetDeadlineError
+from ..exceptions import OperationFailedError, OperationTimeoutError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURE_TIMEOUT = "timeout"
+FAILURE_RATE_LIMIT = "rate_limit"
+FAILURE_SERVER = "server"
+
+_STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def classify_failure(exc):
+    """
+    Map a recognizer exception to a breaker failure kind, or None if the provider
+    answered (e.g. empty result / bad length / 4xx other than 429) or the caller's
+    own budget deadline cut the request short.
+    """
+    if exc is None or isinstance(exc, BudgetDeadlineError):
+        return None
+    if isinstance(exc, OperationTimeoutError):
+        return FAILURE_TIMEOUT
+    resp = getattr(exc, "response", None)
+    status = getattr(resp, "status_code", None)
+    if status == 429:
+        return FAILURE_RATE_LIMIT
+    if isinstance(status, int) and status >= 500:
+        return FAILURE_SERVER
+    if isinstance(exc, OperationFailedError):
+        return FAILURE_SERVER
+    return None
+
+
+def _retry_after_seconds(exc):
+    resp = getattr(exc, "response", None)
+    headers = getattr(resp, "headers", None) or {}
+    try:
+        v = headers.get("Retry-After")
+    except Exception:
+        return None
+    if not v:
+        return None
+    try:
+        return max(0.0, float(v))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker(object):
+
+    def __init__(
+        self,
+        name,
+        timeout_threshold=2,
+        rate_limit_threshold=1,
+        server_threshold=3,
+        open_seconds=30.0,
+        max_open_seconds=600.0,
+        half_open_max_calls=1,
+    ):
+        self.name = name
+        self._thresholds = {
+            FAILURE_TIMEOUT: max(1, int(timeout_threshold)),
+            FAILURE_RATE_LIMIT: max(1, int(rate_limit_threshold)),
+            FAILURE_SERVER: max(1, int(server_threshold)),
+        }
+        self._open_seconds = max(0.0, float(open_seconds))
+        self._max_open_seconds = max(self._open_seconds, float(max_open_seconds))
+        self._half_open_max_calls = max(1, int(half_open_max_calls))
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._streaks = {k: 0 for k in self._thresholds}
+        self._open_until = 0.0
+        self._cooldown = self._open_seconds
+        self._trials = []  # start times of in-flight half-open calls
+        self._last_failure = None
+        self._opened_count = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._advance(time.time())
+            return self._state
+
+    def _advance(self, now):
+        if self._state == OPEN and now >= self._open_until:
+            self._state = HALF_OPEN
+            self._trials = []
+
+    def allow(self, now=None):
+        """
+        Whether a call may go through now. In half-open state this takes a trial
+        slot, which is released by the next `record_success` / `record_failure`.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._advance(now)
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                return False
+            # A trial whose result never got recorded (e.g. the draw failed) expires.
+            ttl = max(10.0, self._open_seconds)
+            self._trials = [t for t in self._trials if now - t < ttl]
+            if len(self._trials) >= self._half_open_max_calls:
+                return False
+            self._trials.append(now)
+            return True
+
+    def retry_at(self):
+        with self._lock:
+            return self._open_until if self._state == OPEN else 0.0
+
+    def record_success(self):
+        """
+        :return: True if this closed a half-open breaker
+        """
+        with self._lock:
+            for k in self._streaks:
+                self._streaks[k] = 0
+            if self._state == CLOSED:
+                return False
+            self._state = CLOSED
+            self._trials = []
+            self._cooldown = self._open_seconds
+            return True
+
+    def record_failure(self, kind, retry_after=None, now=None):
+        """
+        :return: True if this call opened the breaker
+        """
+        if kind not in self._thresholds:
+            return False
+        now = time.time() if now is None else now
+        with self._lock:
+            self._advance(now)
+            self._last_failure = kind
+            self._streaks[kind] += 1
+            if self._state == HALF_OPEN:
+                self._cooldown = min(self._max_open_seconds, max(self._cooldown, 1.0) * 2.0)
+                return self._open(now, retry_after)
+            if self._state == OPEN:
+                return False
+            if self._streaks[kind] >= self._thresholds[kind]:
+                self._cooldown = self._open_seconds
+                return self._open(now, retry_after)
+            return False
+
+    def _open(self, now, retry_after):
+        cooldown = self._cooldown
+        if retry_after is not None:
+            cooldown = min(self._max_open_seconds, max(cooldown, retry_after))
+        self._state = OPEN
+        self._open_until = now + cooldown
+        self._trials = []
+        self._opened_count += 1
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            self._advance(time.time())
+            return {
+                "state": self._state,
+                "open_until": self._open_until if self._state == OPEN else None,
+                "cooldown": self._cooldown,
+                "streaks": dict(self._streaks),
+                "last_failure": self._last_failure,
+                "opened": self._opened_count,
+            }
+
+
+class CaptchaBreakerRegistry(object):
+    """
+    One `CircuitBreaker` per recognizer target name. When disabled every call is
+    allowed and nothing is recorded.
+    """
+
+    def __init__(self, enabled=False, **breaker_kwargs):
+        self._enabled = bool(enabled)
+        self._kwargs = breaker_kwargs
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def get(self, name):
+        with self._lock:
+            b = self._breakers.get(name)
+            if b is None:
+                b = CircuitBreaker(name, **self._kwargs)
+                self._breakers[name] = b
+            return b
+
+    def allow(self, name):
+        if not self._enabled:
+            return True
+        return self.get(name).allow()
+
+    def is_open(self, name):
+        if not self._enabled:
+            return False
+        return self.get(name).state == OPEN
+
+    def record(self, name, exc=None):
+        """
+        Record one recognize outcome (`exc` is None on success).
+        :return: "opened" / "closed" on a state change, else None
+        """
+        if not self._enabled:
+            return None
+        b = self.get(name)
+        kind = classify_failure(exc)
+        if kind is None:
+            return "closed" if b.record_success() else None
+        return "opened" if b.record_failure(kind, retry_after=_retry_after_seconds(exc)) else None
+
+    def partition(self, names):
+        """
+        Split `names` (keeping order) into (usable, open).
+        """
+        if not self._enabled:
+            return list(names), []
+        usable = []
+        opened = []
+        for n in names:
+            (opened if self.is_open(n) else usable).append(n)
+        return usable, opened
+
+    def state_gauges(self):
+        with self._lock:
+            items = list(self._breakers.items())
+        return {name: _STATE_GAUGE[b.state] for name, b in items}
+
+    def snapshot(self):
+        with self._lock:
+            items = list(self._breakers.items())
+        return {name: b.snapshot() for name, b in items}
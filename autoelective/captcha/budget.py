@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: captcha/budget.py
+
+"""
+Deadline-aware retry budget for remote recognizers.
+
+The caller (the captcha round in the main loop) opens a budget around
+`recognizer.recognize(raw)`:
+
+    with recognize_budget(deadline=round_begin + round_timeout, fail_fast=True) as budget:
+        captcha = recognizer.recognize(raw)
+
+and recognizers consult `current_budget()` instead of sleeping blindly:
+`budget.timeout(self._timeout)` caps each request at the time left and
+`budget.retry(sleep_s, t_attempt)` sleeps and returns True only when
+another attempt still fits before the deadline (never with fail_fast, where the
+caller hedges to another provider instead). Without an open budget the old
+behaviour is kept: no deadline, retries allowed.
+
+Running out of budget raises `BudgetDeadlineError` (an OperationTimeoutError,
+so callers handle it as before), which circuit breakers do not count against
+the provider: the request was cut short by the caller, not by the provider.
+
+The budget counts retries, denied retries and the time lost to retries (failed
+attempts that were retried plus backoff sleeps), so the caller can report them
+per provider.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from ..exceptions import OperationTimeoutError
+
+_local = threading.local()
+
+
+class BudgetDeadlineError(OperationTimeoutError):
+    pass
+
+
+class RetryBudget(object):
+
+    def __init__(self, deadline=None, fail_fast=False, min_attempt=1.0, clock=None, sleep=None):
+        self.deadline = deadline
+        self.fail_fast = bool(fail_fast)
+        self.min_attempt = max(0.0, float(min_attempt))
+        self.retries = 0
+        self.denied = 0
+        self.lost = 0.0
+        self._clock = clock or time.time
+        self._sleep = sleep
+
+    def remaining(self):
+        """
+        Seconds left before the deadline (None: unbounded).
+        """
+        if self.deadline is None:
+            return None
+        return self.deadline - self._clock()
+
+    def timeout(self, default):
+        """
+        Request timeout for the next attempt: `default` capped at the time left.
+        Raises BudgetDeadlineError when the deadline has already passed.
+        """
+        left = self.remaining()
+        if left is None:
+            return default
+        if left <= 0:
+            raise BudgetDeadlineError(msg="Recognizer deadline exceeded")
+        return min(default, left)
+
+    def timeout_error(self, msg):
+        """
+        Exception for a request that timed out: BudgetDeadlineError when the
+        deadline has passed (the timeout was capped by it), else OperationTimeoutError.
+        """
+        left = self.remaining()
+        if left is not None and left <= 0:
+            return BudgetDeadlineError(msg=msg)
+        return OperationTimeoutError(msg=msg)
+
+    def retry(self, sleep_s, t_attempt=None):
+        """
+        Sleep `sleep_s` and return True if another attempt fits in the budget;
+        otherwise return False right away. `t_attempt` is when the failed attempt
+        started (its duration counts as time lost to the retry).
+        """
+        sleep_s = max(0.0, float(sleep_s))
+        left = self.remaining()
+        if self.fail_fast or (left is not None and left - sleep_s < self.min_attempt):
+            self.denied += 1
+            return False
+        if t_attempt is not None:
+            self.lost += max(0.0, self._clock() - t_attempt)
+        self.lost += sleep_s
+        self.retries += 1
+        if sleep_s > 0:
+            (self._sleep or time.sleep)(sleep_s)
+        return True
+
+
+def current_budget():
+    """
+    The budget opened by the caller on this thread, or an unbounded one.
+    """
+    budget = getattr(_local, "budget", None)
+    return budget if budget is not None else RetryBudget()
+
+
+@contextmanager
+def recognize_budget(deadline=None, fail_fast=False, min_attempt=1.0):
+    budget = RetryBudget(deadline=deadline, fail_fast=fail_fast, min_attempt=min_attempt)
+    prev = getattr(_local, "budget", None)
+    _local.budget = budget
+    try:
+        yield budget
+    finally:
+        _local.budget = prev
+
+
+def parse_retry_after(value, default):
+    try:
+        return float(value) if value else default
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: captcha/evaldb.py
+
+"""
+Captcha evaluation database (SQLite), keyed by image SHA1.
+
+Tables:
+  - samples:     one row per image: sample id, capture day, context (main/probe/...),
+                 provider that handled it live, label.
+  - predictions: every recognizer output: target (provider[:model]), variant
+                 (transform/stream spec), prediction or error, latency.
+  - validations: server-side Validate outcomes ("2" pass, "0" fail); latency_ms is
+                 the Validate round trip (NULL when unknown), never recognition time.
+
+The evaluation scripts look up `cached_prediction` before calling a recognizer,
+so paid APIs are only called for images a target has not seen yet, and
+`known_sample` lets them skip loading samples that are already indexed.
+"""
+
+import hashlib
+import os
+import sqlite3
+import statistics
+import time
+
+GROUP_KEYS = ("target", "day", "context")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    sha1 TEXT PRIMARY KEY,
+    sample_id TEXT,
+    day TEXT,
+    context TEXT,
+    provider TEXT,
+    label TEXT,
+    size INTEGER,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_sample_id ON samples(sample_id);
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha1 TEXT NOT NULL,
+    target TEXT NOT NULL,
+    variant TEXT NOT NULL DEFAULT '',
+    pred TEXT,
+    latency_ms REAL,
+    error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS predictions_key ON predictions(sha1, target, variant);
+CREATE TABLE IF NOT EXISTS validations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha1 TEXT NOT NULL,
+    target TEXT,
+    code TEXT,
+    valid TEXT,
+    latency_ms REAL,
+    context TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS validations_sha1 ON validations(sha1);
+"""
+
+
+def normalize_code(text):
+    if text is None:
+        return ""
+    return "".join(ch for ch in str(text) if ch.isalnum()).upper()
+
+
+def image_sha1(raw):
+    return hashlib.sha1(raw).hexdigest()
+
+
+def _day_from_meta(meta, now):
+    ts = meta.get("ts") if isinstance(meta, dict) else None
+    # SampleWriter stamps "%Y%m%dT%H%M%SZ"
+    if isinstance(ts, str) and len(ts) >= 8 and ts[:8].isdigit():
+        return "%s-%s-%s" % (ts[:4], ts[4:6], ts[6:8])
+    return time.strftime("%Y-%m-%d", time.gmtime(now))
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = int(round((p / 100.0) * (len(values) - 1)))
+    return values[max(0, min(k, len(values) - 1))]
+
+
+class EvalDB(object):
+
+    def __init__(self, path):
+        d = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(d):
+            os.makedirs(d, exist_ok=True)
+        self._path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    @property
+    def path(self):
+        return self._path
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- samples ---
+
+    def known_sample(self, sample_id):
+        """
+        sha1 of an already indexed sample id, or None.
+        """
+        row = self._conn.execute(
+            "SELECT sha1 FROM samples WHERE sample_id = ? LIMIT 1", (sample_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def add_sample(self, raw, sample_id=None, meta=None, label=None, context=None):
+        """
+        Index one image. Returns (sha1, is_new). A sample's live outcome (meta
+        "pred"/"recog_dt" as a prediction of its provider, "valid"/"val_dt" as a
+        validation; written by the live loop) is stored the first time the image
+        is seen. An existing label is only replaced by a non-empty one.
+        """
+        meta = meta if isinstance(meta, dict) else {}
+        digest = image_sha1(raw)
+        if label is None:
+            label = meta.get("label") or meta.get("code")
+        context = context or meta.get("context")
+        now = time.time()
+        cur = self._conn.execute(
+            "INSERT OR IGNORE INTO samples (sha1, sample_id, day, context, provider, label, size, added_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                digest,
+                sample_id,
+                _day_from_meta(meta, now),
+                context,
+                meta.get("provider"),
+                label,
+                len(raw),
+                now,
+            ),
+        )
+        is_new = cur.rowcount == 1
+        if is_new:
+            recog_dt = meta.get("recog_dt")
+            if meta.get("pred") is not None and meta.get("provider"):
+                self._conn.execute(
+                    "INSERT INTO predictions (sha1, target, variant, pred, latency_ms, error, created_at)"
+                    " VALUES (?, ?, '', ?, ?, NULL, ?)",
+                    (
+                        digest,
+                        meta.get("provider"),
+                        meta.get("pred"),
+                        recog_dt * 1000.0 if isinstance(recog_dt, (int, float)) else None,
+                        now,
+                    ),
+                )
+            if meta.get("valid") is not None:
+                val_dt = meta.get("val_dt")
+                self._conn.execute(
+                    "INSERT INTO validations (sha1, target, code, valid, latency_ms, context, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        digest,
+                        meta.get("provider"),
+                        meta.get("pred"),
+                        str(meta.get("valid")),
+                        val_dt * 1000.0 if isinstance(val_dt, (int, float)) else None,
+                        context,
+                        now,
+                    ),
+                )
+        elif label:
+            self._conn.execute("UPDATE samples SET label = ? WHERE sha1 = ?", (label, digest))
+        self._conn.commit()
+        return digest, is_new
+
+    def set_label(self, sha1, label):
+        self._conn.execute("UPDATE samples SET label = ? WHERE sha1 = ?", (label, sha1))
+        self._conn.commit()
+
+    def label(self, sha1):
+        row = self._conn.execute("SELECT label FROM samples WHERE sha1 = ?", (sha1,)).fetchone()
+        return row[0] if row else None
+
+    # --- predictions / validations ---
+
+    def cached_prediction(self, sha1, target, variant=""):
+        """
+        Latest successful (pred, latency_ms) for this image and target, or None.
+        Errors are not cached, so a failed call is retried on the next run.
+        """
+        row = self._conn.execute(
+            "SELECT pred, latency_ms FROM predictions"
+            " WHERE sha1 = ? AND target = ? AND variant = ? AND error IS NULL"
+            " ORDER BY id DESC LIMIT 1",
+            (sha1, target, variant or ""),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def add_prediction(self, sha1, target, pred=None, latency_ms=None, error=None, variant=""):
+        self._conn.execute(
+            "INSERT INTO predictions (sha1, target, variant, pred, latency_ms, error, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (sha1, target, variant or "", pred, latency_ms, None if error is None else str(error), time.time()),
+        )
+        self._conn.commit()
+
+    def add_validation(self, sha1, target, code, valid, latency_ms=None, context=None):
+        self._conn.execute(
+            "INSERT INTO validations (sha1, target, code, valid, latency_ms, context, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (sha1, target, code, None if valid is None else str(valid), latency_ms, context, time.time()),
+        )
+        self._conn.commit()
+
+    # --- queries ---
+
+    def _where(self, prefix, target=None, context=None, since=None, until=None, variant=None):
+        clauses = []
+        params = []
+        if isinstance(target, (list, tuple)):
+            clauses.append("%s.target IN (%s)" % (prefix, ",".join("?" * len(target))))
+            params.extend(target)
+        elif target is not None:
+            clauses.append("%s.target = ?" % prefix)
+            params.append(target)
+        if variant is not None:
+            clauses.append("%s.variant = ?" % prefix)
+            params.append(variant)
+        if context is not None:
+            clauses.append("s.context = ?")
+            params.append(context)
+        if since is not None:
+            clauses.append("s.day >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("s.day <= ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @staticmethod
+    def _group_cols(group_by):
+        if isinstance(group_by, str):
+            group_by = (group_by,)
+        for key in group_by:
+            if key not in GROUP_KEYS:
+                raise ValueError("Unknown group key %r. Allowed: %s" % (key, ", ".join(GROUP_KEYS)))
+        return tuple(group_by)
+
+    def prediction_summary(self, group_by="target", target=None, context=None, since=None, until=None, variant=None):
+        """
+        [{"key": (...), "n", "errors", "labeled", "exact", "latency_avg", "latency_p50", "latency_p90"}]
+        grouped by any of "target", "day" (sample capture day) and "context".
+        Exact accuracy compares alphanumerics case-insensitively. `target` filters on
+        one target or a list of them.
+        """
+        group_by = self._group_cols(group_by)
+        where, params = self._where("p", target, context, since, until, variant)
+        rows = self._conn.execute(
+            "SELECT p.target, s.day, s.context, p.pred, p.latency_ms, p.error, s.label"
+            " FROM predictions p JOIN samples s ON s.sha1 = p.sha1" + where,
+            params,
+        ).fetchall()
+        groups = {}
+        for target_, day, context_, pred, latency_ms, error, label in rows:
+            values = {"target": target_, "day": day, "context": context_}
+            key = tuple(values[k] for k in group_by)
+            g = groups.setdefault(key, {"n": 0, "errors": 0, "labeled": 0, "hits": 0, "lat": []})
+            g["n"] += 1
+            if error is not None:
+                g["errors"] += 1
+                continue
+            if latency_ms is not None:
+                g["lat"].append(latency_ms)
+            if label:
+                g["labeled"] += 1
+                if normalize_code(pred) == normalize_code(label):
+                    g["hits"] += 1
+        out = []
+        for key in sorted(groups, key=lambda k: tuple("" if x is None else str(x) for x in k)):
+            g = groups[key]
+            lat = g["lat"]
+            out.append(
+                {
+                    "key": key,
+                    "n": g["n"],
+                    "errors": g["errors"],
+                    "labeled": g["labeled"],
+                    "exact": (g["hits"] / g["labeled"]) if g["labeled"] else None,
+                    "latency_avg": statistics.mean(lat) if lat else None,
+                    "latency_p50": _percentile(lat, 50),
+                    "latency_p90": _percentile(lat, 90),
+                }
+            )
+        return out
+
+    def validation_summary(self, group_by="target", target=None, context=None, since=None, until=None):
+        """
+        [{"key": (...), "n", "passed", "failed", "pass_rate"}]; context falls back
+        to the sample's context when the validation row has none.
+        """
+        group_by = self._group_cols(group_by)
+        where, params = self._where("v", target, None, since, until)
+        rows = self._conn.execute(
+            "SELECT v.target, s.day, COALESCE(v.context, s.context), v.valid"
+            " FROM validations v LEFT JOIN samples s ON s.sha1 = v.sha1" + where,
+            params,
+        ).fetchall()
+        groups = {}
+        for target_, day, context_, valid in rows:
+            if context is not None and context_ != context:
+                continue
+            values = {"target": target_, "day": day, "context": context_}
+            key = tuple(values[k] for k in group_by)
+            g = groups.setdefault(key, {"n": 0, "passed": 0, "failed": 0})
+            g["n"] += 1
+            if valid == "2":
+                g["passed"] += 1
+            elif valid == "0":
+                g["failed"] += 1
+        out = []
+        for key in sorted(groups, key=lambda k: tuple("" if x is None else str(x) for x in k)):
+            g = groups[key]
+            decided = g["passed"] + g["failed"]
+            out.append(dict(g, key=key, pass_rate=(g["passed"] / decided) if decided else None))
+        return out
@@ -6,15 +6,15 @@ import json
 import os
 import re
 import time
-from io import BytesIO
 
 import requests
-from PIL import Image
 
+from .budget import current_budget, parse_retry_after
 from .captcha import Captcha
 from .registry import CaptchaRecognizer, register_recognizer
+from .warmup import warm_http_session
 from ..config import AutoElectiveConfig
-from ..exceptions import OperationFailedError, OperationTimeoutError, RecognizerError
+from ..exceptions import OperationFailedError, RecognizerError
 
 
 def _normalize_code(text):
@@ -23,19 +23,6 @@ def _normalize_code(text):
     return "".join(ch for ch in str(text) if ch.isalnum()).upper()
 
 
-def _to_jpeg_bytes(raw):
-    # Normalize to a small JPEG payload so the API sees a stable format.
-    im = Image.open(BytesIO(raw))
-    try:
-        if getattr(im, "is_animated", False):
-            im.seek(getattr(im, "n_frames", 1) - 1)
-    except Exception:
-        pass
-    buf = BytesIO()
-    im.convert("RGB").save(buf, format="JPEG")
-    return buf.getvalue()
-
-
 def _extract_text_from_gemini_response(data):
     # Response shape is typically: candidates[0].content.parts[*].text
     candidates = data.get("candidates") or []
@@ -114,14 +101,21 @@ class GeminiVLMRecognizer(CaptchaRecognizer):
         if self._min_len > self._max_len:
             self._min_len, self._max_len = self._max_len, self._min_len
         self._session = requests.Session()
+        self.set_image_transform(cfg.gemini_image_transform)
 
         if not self._api_key:
             raise RecognizerError(
                 msg="Gemini API key not configured. Set [captcha] gemini_api_key or env GEMINI_API_KEY/GOOGLE_API_KEY."
             )
 
+    def warmup(self):
+        warm_http_session(
+            self._session, "https://generativelanguage.googleapis.com/v1beta/models", self._timeout
+        )
+
     def recognize(self, raw):
-        img = _to_jpeg_bytes(raw)
+        # Normalize to a small payload so the API sees a stable format.
+        img, mime = self.image_transform.apply(raw)
         if self._min_len == self._max_len:
             len_rule = f"exactly {self._min_len} characters"
         else:
@@ -144,7 +138,7 @@ class GeminiVLMRecognizer(CaptchaRecognizer):
                         {"text": prompt},
                         {
                             "inline_data": {
-                                "mime_type": "image/jpeg",
+                                "mime_type": mime,
                                 "data": base64.b64encode(img).decode("utf-8"),
                             }
                         },
@@ -161,22 +155,21 @@ class GeminiVLMRecognizer(CaptchaRecognizer):
             "X-goog-api-key": self._api_key,
         }
 
-        # Retry on rate-limit / transient network errors.
+        # Retry on rate-limit / transient network errors while the caller's budget allows.
+        budget = current_budget()
         backoff = 1.0
-        last_exc = None
         resp = None
         data = None
         for attempt in range(3):
+            t_attempt = time.time()
             try:
-                resp = self._session.post(url, headers=headers, json=payload, timeout=self._timeout)
+                resp = self._session.post(url, headers=headers, json=payload, timeout=budget.timeout(self._timeout))
             except (requests.Timeout, requests.ConnectionError) as e:
-                last_exc = e
-                if attempt < 2:
-                    time.sleep(backoff)
+                if attempt < 2 and budget.retry(backoff, t_attempt):
                     backoff = min(8.0, backoff * 2)
                     continue
                 if isinstance(e, requests.Timeout):
-                    raise OperationTimeoutError(msg="Recognizer connection time out")
+                    raise budget.timeout_error("Recognizer connection time out")
                 raise OperationFailedError(msg="Unable to connect to the recognizer")
             except requests.RequestException as e:
                 raise OperationFailedError(msg="Recognizer request failed: %s" % e)
@@ -188,13 +181,8 @@ class GeminiVLMRecognizer(CaptchaRecognizer):
 
             if resp.status_code in (429, 500, 503):
                 # Respect Retry-After when present; otherwise exponential backoff.
-                if attempt < 2:
-                    ra = resp.headers.get("Retry-After")
-                    try:
-                        sleep_s = float(ra) if ra else backoff
-                    except Exception:
-                        sleep_s = backoff
-                    time.sleep(sleep_s)
+                sleep_s = parse_retry_after(resp.headers.get("Retry-After"), backoff)
+                if attempt < 2 and budget.retry(sleep_s, t_attempt):
                     backoff = min(8.0, backoff * 2)
                     continue
             break
@@ -204,11 +192,11 @@ class GeminiVLMRecognizer(CaptchaRecognizer):
             raise OperationFailedError(msg="Unable to connect to the recognizer")
 
         if data is None:
-            raise RecognizerError(msg="Recognizer ERROR: Invalid JSON response")
+            raise RecognizerError(msg="Recognizer ERROR: Invalid JSON response", response=resp)
 
         if resp.status_code != 200:
             err = (data.get("error") or {}).get("message") or data
-            raise RecognizerError(msg="Recognizer ERROR: %s" % err)
+            raise RecognizerError(msg="Recognizer ERROR: %s" % err, response=resp)
 
         text = _extract_text_from_gemini_response(data)
         code_src = text
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: captcha/journal.py
+
+"""
+Append-only journal of adaptive captcha attempts.
+
+One JSON line per `CaptchaAdaptiveManager.record_attempt`:
+
+    {"t": 1718000000.1234567, "p": "gemini", "ok": 1, "l": 0.412, "h": 0.530}
+
+Appending a line is much cheaper than re-serializing the whole snapshot, and a
+crash loses at most the line being written (a torn tail line is skipped on
+read). The snapshot file becomes a compaction checkpoint: after it is written
+with `saved_at`, `compact(saved_at)` drops the journal lines it already covers,
+and startup replays only lines newer than `saved_at`.
+
+The raw journal can also be re-scored offline under a different policy, see
+`replay` and scripts/captcha_adaptive_replay.py.
+"""
+
+import json
+import os
+import threading
+
+from .._internal import mkdir
+
+
+def _encode(ts, provider, success, latency, h_latency):
+    rec = {"t": float(ts), "p": provider, "ok": 1 if success else 0}
+    if latency is not None:
+        rec["l"] = round(float(latency), 4)
+    if h_latency is not None:
+        rec["h"] = round(float(h_latency), 4)
+    return json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _decode(line):
+    try:
+        rec = json.loads(line)
+        ts = float(rec["t"])
+        provider = rec["p"]
+        success = bool(rec["ok"])
+    except Exception:
+        return None
+    if not isinstance(provider, str) or not provider:
+        return None
+
+    def _opt(k):
+        v = rec.get(k)
+        try:
+            return None if v is None else float(v)
+        except (TypeError, ValueError):
+            return None
+
+    return (ts, provider, success, _opt("l"), _opt("h"))
+
+
+def iter_records(path, since=None):
+    """
+    Yield (ts, provider, success, latency, h_latency) from a journal file, in file
+    order, skipping unparsable lines. Records with ts <= `since` are skipped.
+    """
+    try:
+        fp = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with fp:
+        for line in fp:
+            if not line.endswith("\n"):
+                break  # torn write at crash time
+            rec = _decode(line)
+            if rec is None:
+                continue
+            if since is not None and rec[0] <= since:
+                continue
+            yield rec
+
+
+class AttemptJournal(object):
+
+    def __init__(self, path, fsync=False):
+        self._path = path
+        self._fsync = bool(fsync)
+        self._lock = threading.Lock()
+        self._fp = None
+        self._size = None
+        self._records = 0
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def records_written(self):
+        return self._records
+
+    def _open(self):
+        if self._fp is None:
+            d = os.path.dirname(self._path)
+            if d:
+                mkdir(d)
+            self._fp = open(self._path, "a", encoding="utf-8")
+            self._size = self._fp.tell()
+        return self._fp
+
+    def append(self, ts, provider, success, latency=None, h_latency=None):
+        line = _encode(ts, provider, success, latency, h_latency)
+        with self._lock:
+            fp = self._open()
+            fp.write(line)
+            fp.flush()
+            if self._fsync:
+                os.fsync(fp.fileno())
+            self._size += len(line.encode("utf-8"))
+            self._records += 1
+
+    def size(self):
+        with self._lock:
+            if self._size is not None:
+                return self._size
+            try:
+                return os.path.getsize(self._path)
+            except OSError:
+                return 0
+
+    def compact(self, covered_until):
+        """
+        Drop records with ts <= `covered_until` (already folded into a snapshot).
+        :return: number of records kept
+        """
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+            kept = [_encode(*rec) for rec in iter_records(self._path, since=covered_until)]
+            tmp = self._path + ".tmp"
+            d = os.path.dirname(self._path)
+            if d:
+                mkdir(d)
+            with open(tmp, "w", encoding="utf-8") as fp:
+                fp.writelines(kept)
+            os.replace(tmp, self._path)
+            self._size = None
+            self._open()
+            return len(kept)
+
+    def replay(self, manager, since=None):
+        """
+        Feed journal records newer than `since` into `manager` without re-journaling.
+        :return: number of records applied
+        """
+        with self._lock:
+            if self._fp is not None:
+                self._fp.flush()
+        return manager.replay(iter_records(self._path, since=since))
+
+    def close(self):
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
@@ -1,10 +1,12 @@
 import base64
-from io import BytesIO
+import hashlib
+import json
 import os
+import threading
 import time
 import requests
-from PIL import Image
 import urllib
+from .budget import current_budget
 from .captcha import Captcha
 from .registry import CaptchaRecognizer, register_recognizer
 from ..config import AutoElectiveConfig
@@ -56,9 +58,99 @@ def get_file_content_as_base64(path, urlencoded=False):
             content = urllib.parse.quote_plus(content)
     return content 
 
+_OCR_URL = "https://aip.baidubce.com/rest/2.0/ocr/v1/accurate_basic?access_token="
+_TOKEN_RETRY_SECONDS = 60.0
+
+
+def _token_cache_key(api_key, secret_key):
+    raw = ("%s:%s" % (api_key or "", secret_key or "")).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def load_cached_token(path, cache_key):
+    """
+    :return: (access_token, expire_at) or (None, 0)
+    """
+    if not path:
+        return None, 0
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+        entry = (data.get("tokens") or {}).get(cache_key) or {}
+        token = entry.get("access_token")
+        expire_at = float(entry.get("expire_at") or 0)
+    except (OSError, ValueError, TypeError, AttributeError):
+        return None, 0
+    if not token or expire_at <= time.time():
+        return None, 0
+    return token, expire_at
+
+
+def save_cached_token(path, cache_key, token, expire_at):
+    if not path:
+        return False
+    try:
+        data = {}
+        try:
+            with open(path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        tokens = data.get("tokens")
+        if not isinstance(tokens, dict):
+            tokens = {}
+        now = time.time()
+        tokens = {
+            k: v for k, v in tokens.items()
+            if isinstance(v, dict) and float(v.get("expire_at") or 0) > now
+        }
+        tokens[cache_key] = {"access_token": token, "expire_at": expire_at}
+        data["tokens"] = tokens
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fp:
+            json.dump(data, fp)
+        os.replace(tmp, path)
+        return True
+    except Exception:
+        return False
+
+
+class _LatencyStat(object):
+
+    __slots__ = ["count", "errors", "total", "last"]
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.last = None
+
+    def add(self, dt, ok=True):
+        self.count += 1
+        if not ok:
+            self.errors += 1
+        self.total += dt
+        self.last = dt
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": int(self.total / self.count * 1000) if self.count else None,
+            "last_ms": int(self.last * 1000) if self.last is not None else None,
+        }
+
+
 @register_recognizer
 class BaiduOCRRecognizer(CaptchaRecognizer):
     name = "baidu"
+    # accurate_basic accepts jpg/png/bmp only
+    allowed_image_formats = ("jpeg", "png")
 
     def __init__(self):
         config = AutoElectiveConfig()
@@ -66,89 +158,168 @@ class BaiduOCRRecognizer(CaptchaRecognizer):
         self._secret_key = config.baidu_secret_key or os.getenv("BAIDU_OCR_SECRET_KEY")
         self._timeout = config.baidu_timeout
         self._session = requests.Session()
+        self.set_image_transform(config.baidu_image_transform)
+        self._token_cache_path = config.baidu_token_cache
+        self._token_cache_key = _token_cache_key(self._api_key, self._secret_key)
+        self._token_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._token_stat = _LatencyStat()
+        self._ocr_stat = _LatencyStat()
+        self._token_source = None
         self._access_token = None
         self._access_token_expire_at = 0
-        self._refresh_token()
-        self.url = (
-            "https://aip.baidubce.com/rest/2.0/ocr/v1/accurate_basic?access_token="
-            + self._access_token
-        )
+        self._refresh_at = 0
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # refresh now, e.g. after the server rejected the token
+        self._refresher = None
+
+        token, expire_at = load_cached_token(self._token_cache_path, self._token_cache_key)
+        if token:
+            self._set_token(token, expire_at, "cache")
+        if not token or time.time() >= self._refresh_at:
+            self._refresh_token()
+        self._start_refresher()
+
+    @property
+    def url(self):
+        return _OCR_URL + (self._access_token or "")
+
+    @staticmethod
+    def _refresh_margin(lifetime):
+        # refresh ahead of expiry: 10% of the token lifetime, between 5 min and 1 day
+        return min(86400.0, max(300.0, lifetime * 0.1))
+
+    def _set_token(self, token, expire_at, source):
+        lifetime = max(0.0, expire_at - time.time())
+        with self._token_lock:
+            self._access_token = token
+            self._access_token_expire_at = expire_at
+            self._refresh_at = expire_at - self._refresh_margin(lifetime)
+            self._token_source = source
 
     def _refresh_token(self):
-        token, expires_in = get_access_token(
-            self._api_key,
-            self._secret_key,
-            self._timeout,
-            session=self._session,
-        )
-        self._access_token = token
+        t0 = time.time()
+        try:
+            token, expires_in = get_access_token(
+                self._api_key,
+                self._secret_key,
+                self._timeout,
+                session=self._session,
+            )
+        except Exception:
+            with self._stats_lock:
+                self._token_stat.add(time.time() - t0, ok=False)
+            raise
+        with self._stats_lock:
+            self._token_stat.add(time.time() - t0)
         try:
             expires_in = int(expires_in)
         except Exception:
             expires_in = 0
         if expires_in > 60:
-            self._access_token_expire_at = time.time() + expires_in - 60
+            expire_at = time.time() + expires_in - 60
         else:
-            self._access_token_expire_at = time.time() + 3600
+            expire_at = time.time() + 3600
+        self._set_token(token, expire_at, "network")
+        save_cached_token(self._token_cache_path, self._token_cache_key, token, expire_at)
 
     def _ensure_token(self):
+        # Only blocks when the token is missing or already expired;
+        # the background refresher renews it ahead of time.
         if not self._access_token or time.time() >= self._access_token_expire_at:
             self._refresh_token()
-            self.url = (
-                "https://aip.baidubce.com/rest/2.0/ocr/v1/accurate_basic?access_token="
-                + self._access_token
-            )
-        
+
+    def _start_refresher(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._refresher = threading.Thread(
+            target=self._run_refresher, name="BaiduTokenRefresh", daemon=True
+        )
+        self._refresher.start()
+
+    def _run_refresher(self):
+        while not self._stop.is_set():
+            wait = self._refresh_at - time.time()
+            if wait > 0:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+            try:
+                self._refresh_token()
+            except Exception:
+                if self._stop.wait(_TOKEN_RETRY_SECONDS):
+                    return
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._session.close()
+
+    def warmup(self):
+        # the token request already went through self._session to the OCR host
+        self._ensure_token()
+
+    def latency_stats(self):
+        with self._stats_lock:
+            return {
+                "token_refresh": self._token_stat.to_dict(),
+                "ocr": self._ocr_stat.to_dict(),
+                "token_source": self._token_source,
+                "token_expire_at": int(self._access_token_expire_at),
+            }
+
     def recognize(self, raw):
         self._ensure_token()
-        
-        # image=get_file_content_as_base64(BytesIO(raw),1)
-        image=self._to_b64(raw)
-        image=urllib.parse.quote_plus(image)
-        payload='image='+image+"&detect_direction=true&paragraph=false&probability=false&multidirectional_recognize=true"
+
+        image = self._to_b64(raw)
+        image = urllib.parse.quote_plus(image)
+        payload = 'image=' + image + "&detect_direction=true&paragraph=false&probability=false&multidirectional_recognize=true"
         headers = {
-        'Content-Type': 'application/x-www-form-urlencoded',
-        'Accept': 'application/json'
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept': 'application/json'
         }
+        t0 = time.time()
         try:
-            response = requests.request(
-                "POST",
+            response = self._session.post(
                 self.url,
                 headers=headers,
                 data=payload.encode("utf-8"),
-                timeout=self._timeout,
+                timeout=current_budget().timeout(self._timeout),
             )
         except requests.Timeout:
-            raise OperationTimeoutError(msg="Recognizer connection time out")
+            self._record_ocr(t0, False)
+            raise current_budget().timeout_error("Recognizer connection time out")
         except requests.ConnectionError:
+            self._record_ocr(t0, False)
             raise OperationFailedError(msg="Unable to connect to the recognizer")
         except requests.RequestException as e:
+            self._record_ocr(t0, False)
             raise OperationFailedError(msg="Recognizer request failed: %s" % e)
         try:
             result = response.json()
         except ValueError:
+            self._record_ocr(t0, False)
             raise RecognizerError(msg="Recognizer ERROR: Invalid JSON response")
-        
+        self._record_ocr(t0, 'error_code' not in result)
+
         if 'error_code' not in result.keys():
             # 防止index error
             if len(result['words_result'])==0:
                 raise RecognizerError(msg="Recognizer ERROR: Empty result")
             return Captcha(result['words_result'][0]['words'], None, None, None, None)
         else:
+            if result.get("error_code") in (110, 111):
+                # access token invalid / expired: refresh on the next call
+                with self._token_lock:
+                    self._access_token_expire_at = 0
+                    self._refresh_at = 0
+                self._wake.set()
             raise RecognizerError(msg="Recognizer ERROR: %s" % result["error_msg"])
-    
-    @staticmethod
-    def _to_b64(raw):
-        im = Image.open(BytesIO(raw))
-        try:
-            if im.is_animated:
-                oim = im
-                oim.seek(oim.n_frames-1)
-                im = Image.new('RGB', oim.size)
-                im.paste(oim)
-        except AttributeError:
-            pass
-        buffer = BytesIO()
-        im.convert('RGB').save(buffer, format='JPEG')
-        b64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        return b64
+
+    def _record_ocr(self, t0, ok):
+        with self._stats_lock:
+            self._ocr_stat.add(time.time() - t0, ok=ok)
+
+    def _to_b64(self, raw):
+        img, _ = self.image_transform.apply(raw)
+        return base64.b64encode(img).decode('utf-8')
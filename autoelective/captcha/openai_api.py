@@ -6,15 +6,15 @@ import json
 import os
 import re
 import time
-from io import BytesIO
 
 import requests
-from PIL import Image
 
+from .budget import current_budget, parse_retry_after
 from .captcha import Captcha
 from .registry import CaptchaRecognizer, register_recognizer
+from .warmup import warm_http_session
 from ..config import AutoElectiveConfig
-from ..exceptions import OperationFailedError, OperationTimeoutError, RecognizerError
+from ..exceptions import OperationFailedError, RecognizerError
 
 
 def _normalize_code(text):
@@ -23,18 +23,6 @@ def _normalize_code(text):
     return "".join(ch for ch in str(text) if ch.isalnum()).upper()
 
 
-def _to_jpeg_bytes(raw):
-    im = Image.open(BytesIO(raw))
-    try:
-        if getattr(im, "is_animated", False):
-            im.seek(getattr(im, "n_frames", 1) - 1)
-    except Exception:
-        pass
-    buf = BytesIO()
-    im.convert("RGB").save(buf, format="JPEG")
-    return buf.getvalue()
-
-
 def _extract_text_from_response(data):
     choices = data.get("choices") or []
     if not choices:
@@ -70,6 +58,49 @@ def _extract_code_candidate(text, min_len, max_len):
     return candidates[-1] if candidates else ""
 
 
+_STREAM_TEXT_RE = re.compile(r'"text"\s*:\s*"([A-Za-z0-9]+)"')
+
+
+def _extract_text_from_delta(data):
+    choices = data.get("choices") or []
+    if not choices:
+        return ""
+    choice = choices[0] or {}
+    delta = choice.get("delta") or choice.get("message") or {}
+    content = delta.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text") or "" for part in content if isinstance(part, dict)
+        )
+    return ""
+
+
+def _is_event_stream(resp):
+    headers = getattr(resp, "headers", None) or {}
+    return "text/event-stream" in str(headers.get("Content-Type") or "").lower()
+
+
+def _iter_sse_data(resp):
+    """
+    Yield the payload of each `data:` line of a text/event-stream response as it arrives.
+    """
+    buf = b""
+    for chunk in resp.iter_content(chunk_size=None):
+        if not chunk:
+            continue
+        buf += chunk
+        while b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            line = line.strip()
+            if line.startswith(b"data:"):
+                yield line[5:].strip().decode("utf-8", "replace")
+    line = buf.strip()
+    if line.startswith(b"data:"):
+        yield line[5:].strip().decode("utf-8", "replace")
+
+
 def _repo_root_dir():
     return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -119,6 +150,7 @@ class OpenAICompatRecognizer(CaptchaRecognizer):
         ).rstrip("/")
         self._timeout = cfg.captcha_request_timeout
         self._max_output_tokens = cfg.captcha_max_output_tokens
+        self._stream = cfg.captcha_stream
         self._min_len = cfg.captcha_code_length_min
         self._max_len = cfg.captcha_code_length_max
         if self._min_len > self._max_len:
@@ -139,6 +171,7 @@ class OpenAICompatRecognizer(CaptchaRecognizer):
         else:
             self._prompt = _load_local_vlm_prompt()
         self._session = requests.Session()
+        self.set_image_transform(cfg.captcha_image_transform)
 
         if not self._api_key and "dashscope.aliyuncs.com" in self._base_url:
             raise RecognizerError(
@@ -148,14 +181,20 @@ class OpenAICompatRecognizer(CaptchaRecognizer):
                 )
             )
 
+    def warmup(self):
+        warm_http_session(self._session, self._base_url + "/models", self._timeout)
+
+    def set_stream(self, enabled):
+        self._stream = bool(enabled)
+
     def recognize(self, raw):
-        img = _to_jpeg_bytes(raw)
+        img, mime = self.image_transform.apply(raw)
         url = self._base_url + "/chat/completions"
         content = [
             {
                 "type": "image_url",
                 "image_url": {
-                    "url": "data:image/jpeg;base64,"
+                    "url": "data:%s;base64," % mime
                     + base64.b64encode(img).decode("utf-8")
                 },
             }
@@ -173,42 +212,47 @@ class OpenAICompatRecognizer(CaptchaRecognizer):
             "temperature": 0,
             "max_tokens": int(self._max_output_tokens),
         }
+        if self._stream:
+            payload["stream"] = True
         headers = {"Content-Type": "application/json"}
         if self._api_key:
             headers["Authorization"] = "Bearer " + self._api_key
 
+        budget = current_budget()
         backoff = 1.0
         resp = None
         data = None
         for attempt in range(3):
+            t_attempt = time.time()
             try:
                 resp = self._session.post(
-                    url, headers=headers, json=payload, timeout=self._timeout
+                    url,
+                    headers=headers,
+                    json=payload,
+                    timeout=budget.timeout(self._timeout),
+                    stream=self._stream,
                 )
             except (requests.Timeout, requests.ConnectionError) as e:
-                if attempt < 2:
-                    time.sleep(backoff)
+                if attempt < 2 and budget.retry(backoff, t_attempt):
                     backoff = min(8.0, backoff * 2)
                     continue
                 if isinstance(e, requests.Timeout):
-                    raise OperationTimeoutError(msg="Recognizer connection time out")
+                    raise budget.timeout_error("Recognizer connection time out")
                 raise OperationFailedError(msg="Unable to connect to the recognizer")
             except requests.RequestException as e:
                 raise OperationFailedError(msg="Recognizer request failed: %s" % e)
 
+            if self._stream and resp.status_code == 200 and _is_event_stream(resp):
+                return self._recognize_stream(resp)
+
             try:
                 data = resp.json()
             except ValueError:
                 data = None
 
             if resp.status_code in (429, 500, 503):
-                if attempt < 2:
-                    ra = resp.headers.get("Retry-After")
-                    try:
-                        sleep_s = float(ra) if ra else backoff
-                    except Exception:
-                        sleep_s = backoff
-                    time.sleep(sleep_s)
+                sleep_s = parse_retry_after(resp.headers.get("Retry-After"), backoff)
+                if attempt < 2 and budget.retry(sleep_s, t_attempt):
                     backoff = min(8.0, backoff * 2)
                     continue
             break
@@ -216,12 +260,50 @@ class OpenAICompatRecognizer(CaptchaRecognizer):
         if resp is None:
             raise OperationFailedError(msg="Unable to connect to the recognizer")
         if data is None:
-            raise RecognizerError(msg="Recognizer ERROR: Invalid JSON response")
+            raise RecognizerError(msg="Recognizer ERROR: Invalid JSON response", response=resp)
         if resp.status_code != 200:
             err = (data.get("error") or {}).get("message") or data
-            raise RecognizerError(msg="Recognizer ERROR: %s" % err)
-
-        text = _extract_text_from_response(data)
+            raise RecognizerError(msg="Recognizer ERROR: %s" % err, response=resp)
+
+        return self._code_from_text(_extract_text_from_response(data))
+
+    def _recognize_stream(self, resp):
+        """
+        Accumulate SSE deltas; stop reading once a closed `"text": "..."` of valid length
+        shows up, otherwise parse the full text like a non-stream response.
+        """
+        deadline = time.time() + self._timeout
+        left = current_budget().remaining()
+        if left is not None:
+            deadline = min(deadline, time.time() + left)
+        parts = []
+        try:
+            for item in _iter_sse_data(resp):
+                if item == "[DONE]":
+                    break
+                try:
+                    data = json.loads(item)
+                except ValueError:
+                    continue
+                if not isinstance(data, dict):
+                    continue
+                parts.append(_extract_text_from_delta(data))
+                m = _STREAM_TEXT_RE.search("".join(parts))
+                if m:
+                    code = _normalize_code(m.group(1))
+                    if self._min_len <= len(code) <= self._max_len:
+                        return Captcha(code, None, None, None, None)
+                if time.time() > deadline:
+                    raise current_budget().timeout_error("Recognizer connection time out")
+        except requests.Timeout:
+            raise current_budget().timeout_error("Recognizer connection time out")
+        except requests.RequestException as e:
+            raise OperationFailedError(msg="Recognizer stream interrupted: %s" % e)
+        finally:
+            resp.close()
+        return self._code_from_text("".join(parts).strip())
+
+    def _code_from_text(self, text):
         code_src = text
         try:
             obj = json.loads(text)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Payload-minimizing image transforms applied before a captcha is uploaded to a
+remote OCR/VLM provider.
+
+A transform spec is a comma-separated list of steps, applied in order:
+
+- ``gray``                 convert to 8-bit grayscale
+- ``binarize[:threshold]`` map pixels below threshold (default 160) to black, others to white
+- ``crop[:pad]``           crop to the bounding box of dark pixels, keeping ``pad`` px margin
+- ``max_height:N``         downscale (keeping aspect ratio) so that height <= N
+- ``scale:F``              downscale by factor F (0 < F <= 1)
+- ``jpeg[:quality]`` / ``png`` / ``webp[:quality]``  output format (default: jpeg)
+
+An empty spec (or ``none``) keeps the historical behavior: RGB JPEG of the last frame.
+"""
+
+from io import BytesIO
+
+from PIL import Image
+
+_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+    "webp": ("WEBP", "image/webp"),
+}
+_FORMAT_ALIASES = {"jpg": "jpeg"}
+_CROP_DARK_THRESHOLD = 200
+
+
+def _parse_int(op, arg, lo, hi):
+    try:
+        v = int(arg)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid argument for %r: %r" % (op, arg))
+    if v < lo or v > hi:
+        raise ValueError("Argument for %r out of range [%d, %d]: %r" % (op, lo, hi, v))
+    return v
+
+
+def _parse_float(op, arg, lo, hi):
+    try:
+        v = float(arg)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid argument for %r: %r" % (op, arg))
+    if not (lo < v <= hi):
+        raise ValueError("Argument for %r out of range (%s, %s]: %r" % (op, lo, hi, v))
+    return v
+
+
+class ImageTransform(object):
+
+    __slots__ = ["_spec", "_steps", "_format", "_quality"]
+
+    def __init__(self, spec, steps, fmt="jpeg", quality=None):
+        self._spec = spec
+        self._steps = tuple(steps)
+        self._format = fmt
+        self._quality = quality
+
+    @property
+    def spec(self):
+        return self._spec
+
+    @property
+    def format(self):
+        return self._format
+
+    @property
+    def mime_type(self):
+        return _FORMATS[self._format][1]
+
+    @property
+    def is_default(self):
+        return not self._steps and self._format == "jpeg" and self._quality is None
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self._spec)
+
+    def apply_image(self, im):
+        for op, arg in self._steps:
+            if op == "gray":
+                im = im.convert("L")
+            elif op == "binarize":
+                im = im.convert("L").point(lambda p, t=arg: 0 if p < t else 255)
+            elif op == "crop":
+                im = _crop_to_text(im, arg)
+            elif op == "max_height":
+                if im.height > arg:
+                    w = max(1, int(round(im.width * arg / float(im.height))))
+                    im = im.resize((w, arg), Image.LANCZOS)
+            elif op == "scale":
+                if arg < 1.0:
+                    w = max(1, int(round(im.width * arg)))
+                    h = max(1, int(round(im.height * arg)))
+                    im = im.resize((w, h), Image.LANCZOS)
+        return im
+
+    def apply(self, raw):
+        """
+        Returns ``(payload_bytes, mime_type)``.
+        """
+        im = _load_last_frame(raw)
+        im = self.apply_image(im)
+        pil_format, mime = _FORMATS[self._format]
+        if im.mode not in ("L", "RGB"):
+            im = im.convert("RGB")
+        if pil_format == "JPEG" and im.mode != "L":
+            im = im.convert("RGB")
+        kwargs = {}
+        if self._quality is not None:
+            kwargs["quality"] = self._quality
+        if pil_format == "PNG":
+            kwargs["optimize"] = True
+        buf = BytesIO()
+        im.save(buf, format=pil_format, **kwargs)
+        return buf.getvalue(), mime
+
+
+def _load_last_frame(raw):
+    im = Image.open(BytesIO(raw))
+    try:
+        if getattr(im, "is_animated", False):
+            im.seek(getattr(im, "n_frames", 1) - 1)
+    except Exception:
+        pass
+    return im.convert("RGB")
+
+
+def _crop_to_text(im, pad):
+    gray = im.convert("L")
+    mask = gray.point(lambda p: 255 if p < _CROP_DARK_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return im
+    left, top, right, bottom = bbox
+    left = max(0, left - pad)
+    top = max(0, top - pad)
+    right = min(im.width, right + pad)
+    bottom = min(im.height, bottom + pad)
+    return im.crop((left, top, right, bottom))
+
+
+def parse_transform_spec(spec, allowed_formats=None):
+    """
+    Parse a transform spec string. Raises ValueError on invalid input.
+    """
+    text = (spec or "").strip()
+    steps = []
+    fmt = "jpeg"
+    quality = None
+    if text.lower() in ("", "none", "default"):
+        return ImageTransform("", steps)
+
+    for token in text.split(","):
+        token = token.strip().lower()
+        if not token:
+            continue
+        if ":" in token:
+            op, arg = token.split(":", 1)
+            op = op.strip()
+            arg = arg.strip()
+        else:
+            op, arg = token, None
+        op = _FORMAT_ALIASES.get(op, op)
+
+        if op in _FORMATS:
+            fmt = op
+            if arg is not None:
+                if op == "png":
+                    raise ValueError("Format 'png' does not take a quality argument")
+                quality = _parse_int(op, arg, 1, 100)
+        elif op == "gray":
+            steps.append((op, None))
+        elif op == "binarize":
+            steps.append((op, 160 if arg is None else _parse_int(op, arg, 1, 255)))
+        elif op == "crop":
+            steps.append((op, 2 if arg is None else _parse_int(op, arg, 0, 64)))
+        elif op == "max_height":
+            if arg is None:
+                raise ValueError("'max_height' requires an argument, e.g. max_height:32")
+            steps.append((op, _parse_int(op, arg, 8, 4096)))
+        elif op == "scale":
+            if arg is None:
+                raise ValueError("'scale' requires an argument, e.g. scale:0.5")
+            steps.append((op, _parse_float(op, arg, 0.0, 1.0)))
+        else:
+            raise ValueError("Unknown image transform step %r" % op)
+
+    if allowed_formats is not None and fmt not in allowed_formats:
+        raise ValueError(
+            "Output format %r is not supported here. Allowed: %s"
+            % (fmt, ", ".join(allowed_formats))
+        )
+    return ImageTransform(text, steps, fmt=fmt, quality=quality)
+
+
+DEFAULT_TRANSFORM = parse_transform_spec("")
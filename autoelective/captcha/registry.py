@@ -5,15 +5,38 @@
 from .captcha import Captcha
 from ..config import AutoElectiveConfig
 from ..exceptions import RecognizerError
-from .targets import ALLOWED_CAPTCHA_PROVIDERS
+from .targets import ALLOWED_CAPTCHA_PROVIDERS, format_target
+from .preprocess import DEFAULT_TRANSFORM, parse_transform_spec
 
 
 class CaptchaRecognizer(object):
     name = None
+    allowed_image_formats = None
+    image_transform = DEFAULT_TRANSFORM
 
     def recognize(self, raw):
         raise NotImplementedError
 
+    def warmup(self):
+        """
+        Open connections / fetch tokens ahead of the first real captcha. Best-effort.
+        """
+        pass
+
+    def set_image_transform(self, spec):
+        """
+        Replace the upload preprocessing (see `preprocess.parse_transform_spec`).
+        """
+        try:
+            self.image_transform = parse_transform_spec(
+                spec, allowed_formats=self.allowed_image_formats
+            )
+        except ValueError as e:
+            raise RecognizerError(
+                msg="Invalid image transform for provider %r: %s" % (self.name, e)
+            )
+        return self.image_transform
+
 
 _REGISTRY = {}
 
@@ -34,6 +57,22 @@ def register_recognizer(cls):
 
 
 def get_recognizer(name=None, model_name=None):
+    """
+    With `captcha.service_url` set, targets are recognized by the shared service
+    through the recognizer registered as "remote"; otherwise built locally.
+    """
+    service_url = AutoElectiveConfig().captcha_service_url
+    remote = _REGISTRY.get("remote")
+    if service_url and remote is not None:
+        local = get_local_recognizer(name, model_name=model_name, build=False)
+        return remote(target=local, url=service_url)
+    return get_local_recognizer(name, model_name=model_name)
+
+
+def get_local_recognizer(name=None, model_name=None, build=True):
+    """
+    build=False only validates and returns the target name ("provider[:model]").
+    """
     if name is None:
         name = AutoElectiveConfig().captcha_provider
     name = (name or "").strip().lower()
@@ -51,6 +90,9 @@ def get_recognizer(name=None, model_name=None):
             % name
         )
 
+    if not build:
+        return format_target(name, model_name)
+
     if name == "openai" and model_name is not None:
         from .openai_api import build_openai_compat_recognizer
 
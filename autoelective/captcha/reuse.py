@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: captcha/reuse.py
+
+"""
+Validation reuse across electSupplement submissions in one round.
+
+After one Validate pass, further courses in the same round may be submitted on
+the same session without a new captcha. Whether the server accepts that is
+learned online: each reused submission either goes through (any outcome other
+than CaptchaError) or is rejected with CaptchaError. When the recent success
+rate drops below `min_success_rate`, reuse pauses and is retried only once
+every `retry_every` candidate submissions.
+"""
+
+import threading
+from collections import deque
+
+
+class ValidationReuseTracker(object):
+
+    def __init__(self, enabled=False, min_samples=4, min_success_rate=0.5, window=20, retry_every=20):
+        self._enabled = bool(enabled)
+        self._min_samples = max(1, int(min_samples))
+        self._min_success_rate = min(1.0, max(0.0, float(min_success_rate)))
+        self._retry_every = max(1, int(retry_every))
+        self._outcomes = deque(maxlen=max(self._min_samples, int(window)))
+        self._skipped = 0
+        self._lock = threading.Lock()
+        self.tries = 0
+        self.successes = 0
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def success_rate(self):
+        with self._lock:
+            if not self._outcomes:
+                return None
+            return sum(self._outcomes) / float(len(self._outcomes))
+
+    def paused(self):
+        rate = self.success_rate()
+        with self._lock:
+            return len(self._outcomes) >= self._min_samples and rate < self._min_success_rate
+
+    def should_reuse(self):
+        if not self._enabled:
+            return False
+        if not self.paused():
+            return True
+        with self._lock:
+            self._skipped += 1
+            if self._skipped >= self._retry_every:
+                self._skipped = 0
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            self._outcomes.append(1 if ok else 0)
+            self.tries += 1
+            if ok:
+                self.successes += 1
+
+    def snapshot(self):
+        return {
+            "enabled": self._enabled,
+            "tries": self.tries,
+            "successes": self.successes,
+            "success_rate": self.success_rate(),
+            "paused": self.paused(),
+        }
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: captcha/samples.py
+
+"""
+Captcha sample store.
+
+`SampleWriter` takes samples from the elective thread through a bounded queue
+(a full queue drops the sample) and writes them from a daemon thread, skipping
+images already stored (content-addressed by SHA1). The seen set is rebuilt from
+the directory when the writer thread starts, so dedup also holds across restarts.
+
+Stores:
+  - pack:  append-only `pack-NNNNN.pack` files holding raw image bytes, plus a
+           `pack-NNNNN.idx` JSONL index, one record per image:
+           {"id": sha1, "off": offset, "len": size, "ext": "jpg", "meta": {...}}
+           The index line is written after the image bytes are flushed, so an
+           entry never points at missing data. Packs rotate at `pack_max_bytes`.
+  - files: the historical layout (default), `<base>.<ext>` + `<base>.json` per
+           sample, which the `--images-dir` benchmark scripts read directly.
+
+`annotate` attaches fields known only later (recognized code, Validate outcome)
+to an image stored earlier in this process. In packs it appends an index line
+{"id": sha1, "ann": {...}}; in the files layout it rewrites the `.json` meta.
+
+`list_samples` reads both layouts, merging annotations into meta; pack images
+are served from mmap.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import time
+from queue import Empty, Full, Queue
+
+SAMPLE_STORES = ("pack", "files")
+
+_PACK_RE = re.compile(r"^pack-(\d{5})\.pack$")
+
+
+def guess_image_ext(raw):
+    if not raw:
+        return "bin"
+    if raw.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if raw.startswith(b"\xff\xd8"):
+        return "jpg"
+    if raw.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if raw.startswith(b"BM"):
+        return "bmp"
+    return "bin"
+
+
+def _pack_paths(sample_dir, n):
+    base = os.path.join(sample_dir, "pack-%05d" % n)
+    return base + ".pack", base + ".idx"
+
+
+def _pack_numbers(sample_dir):
+    try:
+        names = os.listdir(sample_dir)
+    except OSError:
+        return []
+    out = []
+    for name in names:
+        m = _PACK_RE.match(name)
+        if m:
+            out.append(int(m.group(1)))
+    return sorted(out)
+
+
+def _iter_index(idx_path):
+    try:
+        fp = open(idx_path, "r", encoding="utf-8")
+    except OSError:
+        return
+    with fp:
+        for line in fp:
+            if not line.endswith("\n"):
+                break  # torn write
+            try:
+                rec = json.loads(line)
+                if "ann" in rec:
+                    if isinstance(rec["ann"], dict):
+                        yield rec
+                    continue
+                rec["off"] = int(rec["off"])
+                rec["len"] = int(rec["len"])
+            except Exception:
+                continue
+            yield rec
+
+
+class SampleWriter(object):
+
+    def __init__(self, sample_dir, store="files", max_queue=256, pack_max_bytes=64 * 1024 * 1024, on_stat=None):
+        if store not in SAMPLE_STORES:
+            raise ValueError("Unknown sample store %r. Allowed: %s" % (store, ", ".join(SAMPLE_STORES)))
+        self._dir = sample_dir
+        self._store = store
+        self._queue = Queue(maxsize=max(1, int(max_queue)))
+        self._pack_max_bytes = max(1024, int(pack_max_bytes))
+        self._on_stat = on_stat
+        self._seen = None  # sha1 set, loaded by the writer thread
+        self._seq = 0
+        self._files_meta = {}  # sha1 -> (meta path, meta), files store only
+        self._pack_no = None
+        self._pack_fp = None
+        self._idx_fp = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = False
+
+    @property
+    def dir(self):
+        return self._dir
+
+    @property
+    def store(self):
+        return self._store
+
+    def _stat(self, key):
+        if self._on_stat is not None:
+            try:
+                self._on_stat(key)
+            except Exception:
+                pass
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop = False
+                self._thread = threading.Thread(target=self._run, name="CaptchaSampleWriter", daemon=True)
+                self._thread.start()
+
+    def submit(self, raw, meta=None):
+        """
+        Non-blocking; returns False if the queue is full (sample dropped).
+        """
+        if not raw:
+            return False
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((self._write, bytes(raw), dict(meta or {}), time.time()))
+            return True
+        except Full:
+            self._stat("captcha_sample_dropped")
+            return False
+
+    def annotate(self, raw, fields):
+        """
+        Non-blocking; merge `fields` into the meta of the sample with these bytes.
+        Ignored when that image was not stored by this writer.
+        """
+        if not raw or not fields:
+            return False
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((self._annotate, bytes(raw), dict(fields), time.time()))
+            return True
+        except Full:
+            self._stat("captcha_sample_dropped")
+            return False
+
+    def flush(self, timeout=5.0):
+        """
+        Wait until every submitted sample is written. Returns False on timeout.
+        """
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout=5.0):
+        self.flush(timeout)
+        self._stop = True
+        t = self._thread
+        if t is not None:
+            t.join(timeout)
+        self._close_pack()
+
+    def _run(self):
+        while not self._stop:
+            try:
+                handler, raw, meta, submitted_at = self._queue.get(timeout=0.2)
+            except Empty:
+                continue
+            try:
+                handler(raw, meta, submitted_at)
+            except Exception:
+                self._stat("captcha_sample_error")
+            finally:
+                self._queue.task_done()
+
+    def _load_seen(self):
+        os.makedirs(self._dir, exist_ok=True)
+        seen = set()
+        if self._store == "pack":
+            for n in _pack_numbers(self._dir):
+                for rec in _iter_index(_pack_paths(self._dir, n)[1]):
+                    seen.add(rec.get("id"))
+        else:
+            # file names only carry a digest prefix: hash the images once per writer
+            for f in os.listdir(self._dir):
+                if f.endswith(".json") or _PACK_RE.match(f) or f.endswith(".idx"):
+                    continue
+                try:
+                    seen.add(hashlib.sha1(_read_file(os.path.join(self._dir, f))).hexdigest())
+                except OSError:
+                    continue
+        self._seen = seen
+
+    def _write(self, raw, meta, submitted_at):
+        if self._seen is None:
+            self._load_seen()
+        digest = hashlib.sha1(raw).hexdigest()
+        if digest in self._seen:
+            self._stat("captcha_sample_duplicate")
+            return
+        ext = guess_image_ext(raw)
+        meta.setdefault("ts", time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(submitted_at)))
+        meta.setdefault("size", len(raw))
+        if self._store == "pack":
+            self._write_pack(digest, ext, raw, meta)
+        else:
+            self._write_files(digest, ext, raw, meta)
+        self._seen.add(digest)
+        self._stat("captcha_sample_saved")
+
+    def _annotate(self, raw, fields, submitted_at):
+        if self._seen is None:
+            self._load_seen()
+        digest = hashlib.sha1(raw).hexdigest()
+        if self._store == "pack":
+            if digest not in self._seen:
+                return
+            self._open_pack()
+            rec = {"id": digest, "ann": fields}
+            self._idx_fp.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._idx_fp.flush()
+            return
+        entry = self._files_meta.get(digest)
+        if entry is None:
+            return
+        meta_path, meta = entry
+        meta.update(fields)
+        with open(meta_path, "w", encoding="utf-8") as fp:
+            fp.write(json.dumps(meta, ensure_ascii=False))
+
+    def _write_files(self, digest, ext, raw, meta):
+        self._seq += 1
+        base = "%s_%s_%d" % (meta["ts"], digest[:12], self._seq)
+        with open(os.path.join(self._dir, base + "." + ext), "wb") as fp:
+            fp.write(raw)
+        meta_path = os.path.join(self._dir, base + ".json")
+        with open(meta_path, "w", encoding="utf-8") as fp:
+            fp.write(json.dumps(meta, ensure_ascii=False))
+        self._files_meta[digest] = (meta_path, meta)
+
+    def _open_pack(self):
+        if self._pack_fp is not None and self._pack_fp.tell() < self._pack_max_bytes:
+            return
+        self._close_pack()
+        numbers = _pack_numbers(self._dir)
+        n = numbers[-1] if numbers else 1
+        pack_path, idx_path = _pack_paths(self._dir, n)
+        if os.path.exists(pack_path) and os.path.getsize(pack_path) >= self._pack_max_bytes:
+            n += 1
+            pack_path, idx_path = _pack_paths(self._dir, n)
+        self._pack_no = n
+        self._pack_fp = open(pack_path, "ab")
+        self._idx_fp = open(idx_path, "a", encoding="utf-8")
+
+    def _write_pack(self, digest, ext, raw, meta):
+        self._open_pack()
+        off = self._pack_fp.tell()
+        self._pack_fp.write(raw)
+        self._pack_fp.flush()
+        rec = {"id": digest, "off": off, "len": len(raw), "ext": ext, "meta": meta}
+        self._idx_fp.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._idx_fp.flush()
+
+    def _close_pack(self):
+        for fp in (self._pack_fp, self._idx_fp):
+            if fp is not None:
+                try:
+                    fp.close()
+                except Exception:
+                    pass
+        self._pack_fp = None
+        self._idx_fp = None
+
+
+class _PackView(object):
+    """
+    Read-only mmap of one pack file, kept open while samples from it are referenced.
+    """
+
+    def __init__(self, path):
+        self._fp = open(path, "rb")
+        size = os.fstat(self._fp.fileno()).st_size
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.size = size
+
+    def read(self, off, length):
+        if self._mm is None or off + length > self.size:
+            raise ValueError("sample out of pack bounds")
+        return self._mm[off:off + length]
+
+
+def list_samples(sample_dir):
+    """
+    [(sample_id, load, meta)] for every sample under `sample_dir`, packs first.
+    `load()` returns the image bytes.
+    """
+    if not os.path.isdir(sample_dir):
+        return []
+    samples = []
+    annotations = {}
+    for n in _pack_numbers(sample_dir):
+        pack_path, idx_path = _pack_paths(sample_dir, n)
+        try:
+            view = _PackView(pack_path)
+        except OSError:
+            continue
+        for rec in _iter_index(idx_path):
+            if "ann" in rec:
+                annotations.setdefault(rec.get("id"), {}).update(rec["ann"])
+                continue
+            if rec["off"] + rec["len"] > view.size:
+                continue
+            samples.append(
+                (rec.get("id"), (lambda v=view, o=rec["off"], l=rec["len"]: v.read(o, l)), rec.get("meta"))
+            )
+    if annotations:
+        for i, (sample_id, load, meta) in enumerate(samples):
+            ann = annotations.get(sample_id)
+            if ann:
+                meta = dict(meta or {})
+                meta.update(ann)
+                samples[i] = (sample_id, load, meta)
+
+    files = os.listdir(sample_dir)
+    metas = {f[:-5]: f for f in files if f.endswith(".json")}
+    for f in files:
+        if f.endswith(".json") or _PACK_RE.match(f) or f.endswith(".idx"):
+            continue
+        base = os.path.splitext(f)[0]
+        meta_file = metas.get(base)
+        meta = None
+        if meta_file:
+            try:
+                with open(os.path.join(sample_dir, meta_file), "r", encoding="utf-8") as fp:
+                    meta = json.load(fp)
+            except Exception:
+                meta = None
+        path = os.path.join(sample_dir, f)
+        samples.append((base, (lambda p=path: _read_file(p)), meta))
+    return samples
+
+
+def _read_file(path):
+    with open(path, "rb") as fp:
+        return fp.read()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: captcha/service.py
+
+"""
+Captcha recognition service shared by several elective processes on one host.
+
+`RecognitionService` owns one recognizer (and so one HTTP session / token) per
+target and a `CaptchaAdaptiveManager` fed by every client. Requests for a target
+run on that target's bounded worker pool; concurrent requests for the same image
+and target are coalesced into a single upstream call.
+
+It is served over localhost HTTP (`make_server`, `scripts/captcha_service.py`):
+
+  POST /recognize?target=provider[:model][&budget=seconds][&fail_fast=1]   body: image bytes
+       200 {"code", "latency", "coalesced"} | 4xx/5xx {"error", "type"}
+       Upstream errors keep their breaker kind: 400 when the provider answered,
+       429 (+ Retry-After) when rate limited, 504 on time out, 5xx otherwise.
+  POST /record    {"records": [[ts, provider, success, latency, h_latency], ...]}
+  GET  /adaptive  shared adaptive snapshot
+  GET  /stats     counters + adaptive snapshot
+  GET  /health
+
+Client side, `RemoteRecognizer` (registered as "remote") is what `get_recognizer`
+returns when `captcha.service_url` is set. Processes share one `ServiceClient` per
+URL, which also batches adaptive attempt reports in a background thread.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty, Full, Queue
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from .adaptive import CaptchaAdaptiveManager
+from .breaker import FAILURE_RATE_LIMIT, classify_failure
+from .budget import BudgetDeadlineError, current_budget, recognize_budget
+from .captcha import Captcha
+from .registry import CaptchaRecognizer, get_local_recognizer, register_recognizer
+from .targets import parse_target_token
+from ..config import AutoElectiveConfig
+from ..exceptions import OperationFailedError, OperationTimeoutError, RecognizerError
+
+_ERRORS = {
+    cls.__name__: cls
+    for cls in (RecognizerError, OperationTimeoutError, BudgetDeadlineError, OperationFailedError)
+}
+_CODE_PREFIX = re.compile(r"^\[-?\d+\] ")
+
+
+def _error_payload(e):
+    return {"error": _CODE_PREFIX.sub("", str(e)), "type": type(e).__name__}
+
+
+def _error_status(e):
+    # status that makes `classify_failure` on the client agree with the upstream error
+    if isinstance(e, OperationTimeoutError):
+        return 504
+    kind = classify_failure(e)
+    if kind is None:
+        return 400
+    if kind == FAILURE_RATE_LIMIT:
+        return 429
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    return status if isinstance(status, int) and status >= 500 else 502
+
+
+def _retry_after_header(e):
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        v = headers.get("Retry-After")
+    except Exception:
+        return None
+    return str(v) if v else None
+
+
+def _build_local(target):
+    provider, model_name = parse_target_token(target)
+    return get_local_recognizer(provider, model_name=model_name)
+
+
+class RecognitionService(object):
+
+    def __init__(self, builder=_build_local, workers=4, adaptive=None, request_timeout=30.0):
+        self._builder = builder
+        self._workers = max(1, int(workers))
+        self._lock = threading.RLock()
+        self._recognizers = {}
+        self._pools = {}
+        self._inflight = {}
+        self._counters = {}
+        self.request_timeout = float(request_timeout)
+        self.adaptive = adaptive if adaptive is not None else CaptchaAdaptiveManager([], enabled=True)
+
+    def _inc(self, key, delta=1):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + delta
+
+    def _target(self, target):
+        with self._lock:
+            recognizer = self._recognizers.get(target)
+            if recognizer is None:
+                recognizer = self._builder(target)
+                self._recognizers[target] = recognizer
+                self._pools[target] = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix="captcha-service"
+                )
+            return recognizer, self._pools[target]
+
+    @staticmethod
+    def _call(recognizer, raw, deadline, fail_fast):
+        t0 = time.time()
+        with recognize_budget(deadline=deadline, fail_fast=fail_fast):
+            cap = recognizer.recognize(raw)
+        return cap.code, time.time() - t0
+
+    def recognize(self, target, raw, timeout=None, budget=None, fail_fast=False):
+        """
+        (code, latency_seconds, coalesced); raises what the recognizer raised.
+        `budget` (seconds) and `fail_fast` are the client's retry budget; coalesced
+        requests share the first request's budget.
+        """
+        deadline = None if budget is None else time.time() + budget
+        recognizer, pool = self._target(target)
+        key = (target, hashlib.sha1(raw).hexdigest())
+        with self._lock:
+            fut = self._inflight.get(key)
+            coalesced = fut is not None
+            if fut is None:
+                fut = pool.submit(self._call, recognizer, raw, deadline, fail_fast)
+                self._inflight[key] = fut
+                fut.add_done_callback(lambda _f, k=key: self._forget(k))
+        self._inc("coalesced" if coalesced else "upstream:%s" % target)
+        try:
+            code, latency = fut.result(timeout)
+        except Exception:
+            self._inc("error:%s" % target)
+            raise
+        return code, latency, coalesced
+
+    def _forget(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def record(self, records):
+        """
+        Apply client-reported attempts [(ts, provider, success, latency, h_latency)].
+        """
+        rows = []
+        for rec in records:
+            try:
+                ts, provider, success, latency, h_latency = rec
+                rows.append((float(ts), str(provider), bool(success), latency, h_latency))
+            except (TypeError, ValueError):
+                continue
+        n = self.adaptive.replay(rows)
+        self._inc("records", n)
+        return n
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            targets = list(self._recognizers)
+        return {"targets": targets, "counters": counters, "adaptive": self.adaptive.snapshot()}
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.shutdown(wait=False)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients reuse pooled connections
+    server_version = "AutoElectiveCaptchaService/1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service = self.server.service
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send(200, {"ok": True})
+        elif path == "/adaptive":
+            self._send(200, service.adaptive.snapshot())
+        elif path == "/stats":
+            self._send(200, service.stats())
+        else:
+            self._send(404, {"error": "not found", "type": "OperationFailedError"})
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if url.path == "/recognize":
+            query = parse_qs(url.query)
+            target = (query.get("target") or [""])[0]
+            try:
+                budget = float(query["budget"][0]) if "budget" in query else None
+                code, latency, coalesced = service.recognize(
+                    target,
+                    body,
+                    timeout=service.request_timeout,
+                    budget=budget,
+                    fail_fast=(query.get("fail_fast") or ["0"])[0] == "1",
+                )
+            except ValueError as e:
+                self._send(400, {"error": str(e), "type": "RecognizerError"})
+            except FutureTimeoutError:
+                self._send(504, {"error": "Captcha service time out", "type": "OperationTimeoutError"})
+            except tuple(_ERRORS.values()) as e:
+                retry_after = _retry_after_header(e)
+                self._send(
+                    _error_status(e),
+                    _error_payload(e),
+                    headers={"Retry-After": retry_after} if retry_after else None,
+                )
+            except Exception as e:
+                self._send(500, {"error": "%s: %s" % (type(e).__name__, e), "type": "OperationFailedError"})
+            else:
+                self._send(200, {"code": code, "latency": latency, "coalesced": coalesced})
+        elif url.path == "/record":
+            try:
+                records = json.loads(body.decode("utf-8")).get("records") or []
+            except Exception:
+                self._send(400, {"error": "invalid json", "type": "OperationFailedError"})
+                return
+            self._send(200, {"applied": service.record(records)})
+        else:
+            self._send(404, {"error": "not found", "type": "OperationFailedError"})
+
+
+def make_server(service, host="127.0.0.1", port=8731):
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+class ServiceClient(object):
+    """
+    One per service URL and process: a pooled requests.Session plus a background
+    thread that sends adaptive attempt reports in batches (`append` matches the
+    `AttemptJournal` interface, so it can be an adaptive listener).
+    """
+
+    def __init__(self, url, timeout=20.0, flush_interval=1.0, max_pending=10000):
+        self._url = url.rstrip("/")
+        self._timeout = float(timeout)
+        self._flush_interval = max(0.05, float(flush_interval))
+        self._session = requests.Session()
+        self._pending = Queue(maxsize=max(1, int(max_pending)))
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return self._url
+
+    def recognize(self, target, raw):
+        # Forward the caller's retry budget so the service never retries past it.
+        budget = current_budget()
+        params = {"target": target}
+        left = budget.remaining()
+        if left is not None:
+            params["budget"] = "%.3f" % max(0.0, left)
+        if budget.fail_fast:
+            params["fail_fast"] = "1"
+        try:
+            resp = self._session.post(
+                self._url + "/recognize",
+                params=params,
+                data=raw,
+                headers={"Content-Type": "application/octet-stream"},
+                timeout=budget.timeout(self._timeout),
+            )
+        except requests.Timeout:
+            raise budget.timeout_error("Captcha service time out")
+        except requests.RequestException as e:
+            raise OperationFailedError(msg="Captcha service request failed: %s" % e)
+        try:
+            data = resp.json()
+        except ValueError:
+            raise OperationFailedError(msg="Captcha service: invalid response (HTTP %d)" % resp.status_code)
+        if resp.status_code == 200:
+            return data.get("code")
+        cls = _ERRORS.get(data.get("type"), RecognizerError)
+        raise cls(msg=str(data.get("error") or "HTTP %d" % resp.status_code), response=resp)
+
+    def health(self):
+        try:
+            return self._session.get(self._url + "/health", timeout=self._timeout).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def adaptive_snapshot(self):
+        try:
+            resp = self._session.get(self._url + "/adaptive", timeout=self._timeout)
+            if resp.status_code == 200:
+                return resp.json()
+        except (requests.RequestException, ValueError):
+            pass
+        return None
+
+    def append(self, ts, provider, success, latency=None, h_latency=None):
+        """
+        Queue one attempt report; never blocks (reports are dropped when the queue is full).
+        """
+        try:
+            self._pending.put_nowait([ts, provider, bool(success), latency, h_latency])
+        except Full:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="CaptchaServiceReporter", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """
+        Send everything queued so far; returns the number of records sent.
+        """
+        batch = []
+        while True:
+            try:
+                batch.append(self._pending.get_nowait())
+            except Empty:
+                break
+        if not batch:
+            return 0
+        try:
+            self._session.post(self._url + "/record", json={"records": batch}, timeout=self._timeout)
+        except requests.RequestException:
+            return 0
+        return len(batch)
+
+    def _run(self):
+        while True:
+            time.sleep(self._flush_interval)
+            self.flush()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_service_client(url, timeout=20.0):
+    url = url.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = ServiceClient(url, timeout=timeout)
+        return client
+
+
+@register_recognizer
+class RemoteRecognizer(CaptchaRecognizer):
+    name = "remote"
+
+    def __init__(self, target=None, url=None, timeout=None):
+        config = AutoElectiveConfig()
+        self.target = target or get_local_recognizer(None, build=False)
+        url = url or config.captcha_service_url
+        if not url:
+            raise RecognizerError(msg="captcha.service_url is not configured")
+        self._client = get_service_client(url, timeout or config.captcha_service_timeout)
+
+    @property
+    def client(self):
+        return self._client
+
+    def recognize(self, raw):
+        return Captcha(self._client.recognize(self.target, raw), None, None, None, None)
+
+    def warmup(self):
+        self._client.health()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: captcha/speculative.py
+
+"""
+Speculative captcha: Draw + recognize ahead of need on one elective session.
+
+The elective server binds a captcha to the session that drew it, so a prepared
+captcha is stored on the client object and is only valid until that session
+draws another one. When a seat shows up, the main loop takes the prepared code
+and only Validate + elect remain on the critical path. For the same reason a
+speculation that is dropped must not leave its DrawServlet request in flight
+while the session draws again: `cancel(wait=...)` blocks until it has returned.
+"""
+
+import threading
+import time
+
+_ATTR = "_speculative_captcha"
+
+
+class SpeculativeCaptcha(object):
+
+    def __init__(self, provider, generation=None):
+        self.provider = provider
+        self.generation = generation
+        self.started_at = time.time()
+        self.ready_at = None
+        self.captcha = None
+        self.error = None
+        self.draw_dt = 0.0
+        self.recog_dt = 0.0
+        self.waited = 0.0  # critical-path wait for an in-flight speculation
+        self._cancelled = False
+        self._done = threading.Event()
+        self._draw_settled = threading.Event()  # no DrawServlet in flight any more
+        self._thread = None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def ok(self):
+        return self.done and self.captcha is not None and not self._cancelled
+
+    def saved_seconds(self):
+        """
+        Draw + recognize time taken off the critical path.
+        """
+        return max(0.0, self.draw_dt + self.recog_dt - self.waited)
+
+    def age(self, now=None):
+        if self.ready_at is None:
+            return 0.0
+        return (time.time() if now is None else now) - self.ready_at
+
+    def cancel(self, wait=0.0):
+        """
+        Drop this speculation. With `wait`, block up to that many seconds until an
+        in-flight DrawServlet has returned; True once no draw is in flight.
+        """
+        self._cancelled = True
+        if self._thread is None:
+            return True
+        if wait:
+            return self._draw_settled.wait(wait)
+        return self._draw_settled.is_set()
+
+    def start(self, draw, recognize):
+        """
+        draw() -> raw image bytes (on the owning session); recognize(raw) -> Captcha.
+        Runs in a daemon thread.
+        """
+
+        def _run():
+            try:
+                if self._cancelled:
+                    return
+                t0 = time.time()
+                try:
+                    raw = draw()
+                finally:
+                    self._draw_settled.set()
+                self.draw_dt = time.time() - t0
+                if self._cancelled:
+                    return
+                t1 = time.time()
+                self.captcha = recognize(raw)
+                self.recog_dt = time.time() - t1
+                self.ready_at = time.time()
+            except Exception as e:
+                self.error = e
+            finally:
+                self._draw_settled.set()
+                self._done.set()
+
+        self._thread = threading.Thread(target=_run, name="SpeculativeCaptcha", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+def get_speculative(client):
+    return getattr(client, _ATTR, None)
+
+
+def attach_speculative(client, spec):
+    setattr(client, _ATTR, spec)
+    return spec
+
+
+def pop_speculative(client):
+    """
+    Detach and return the client's speculative captcha. Whatever the caller does
+    next (use it or draw a new one) invalidates it, so it is never reused.
+    """
+    spec = getattr(client, _ATTR, None)
+    if spec is not None:
+        setattr(client, _ATTR, None)
+    return spec
+
+
+def discard_speculative(client, wait=0.0):
+    spec = pop_speculative(client)
+    if spec is not None:
+        spec.cancel(wait=wait)
+    return spec
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: captcha/warmup.py
+
+"""
+Concurrent construction and warm-up of the configured recognizer chain.
+
+Each target is built in its own daemon thread. Targets that are not ready within
+`timeout` (or fail with a network error) are replaced by a `PendingRecognizer`,
+which keeps initializing in the background and delegates once ready, so one
+unreachable provider cannot hold up startup of the elective loop.
+Other errors (e.g. `RecognizerError` for bad configuration) are still raised.
+"""
+
+import threading
+import time
+
+from .registry import CaptchaRecognizer
+from ..exceptions import OperationFailedError, OperationTimeoutError
+
+_RETRYABLE_ERRORS = (OperationFailedError, OperationTimeoutError)
+
+
+def warm_http_session(session, url, timeout):
+    """
+    Open the TCP/TLS connection of `session` to the host of `url` with a cheap HEAD.
+    The response status does not matter; network errors are ignored.
+    """
+    try:
+        resp = session.head(url, timeout=timeout, allow_redirects=False)
+        resp.close()
+        return True
+    except Exception:
+        return False
+
+
+class _InitTask(object):
+
+    def __init__(self, name, builder, warmup=False, on_ready=None):
+        self.name = name
+        self._builder = builder
+        self._warmup = warmup
+        self._on_ready = on_ready
+        self.recognizer = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.init_s = None
+        self.warmup_s = None
+        self.attempts = 0
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def ok(self):
+        return self.recognizer is not None
+
+    @property
+    def time_to_ready(self):
+        if not self.ok or self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._done.clear()
+            self.error = None
+            self.attempts += 1
+            if self.started_at is None:
+                self.started_at = time.time()
+            self._thread = threading.Thread(
+                target=self._run, name="CaptchaInit-%s" % self.name, daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _run(self):
+        t0 = time.time()
+        try:
+            recognizer = self._builder(self.name)
+            self.init_s = time.time() - t0
+            if self._warmup:
+                t1 = time.time()
+                try:
+                    recognizer.warmup()
+                except Exception:
+                    pass
+                self.warmup_s = time.time() - t1
+            self.recognizer = recognizer
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+        if self.recognizer is not None and self._on_ready is not None:
+            try:
+                self._on_ready(self)
+            except Exception:
+                pass
+
+
+class PendingRecognizer(CaptchaRecognizer):
+    """
+    Stand-in for a target whose initialization has not finished. Raises
+    `OperationFailedError` until the background build succeeds, then delegates.
+    Failed network builds are retried at most every `retry_interval` seconds.
+    """
+
+    def __init__(self, task, retry_interval=30.0):
+        self.name = task.name
+        self._task = task
+        self._retry_interval = max(0.0, float(retry_interval))
+
+    @property
+    def ready(self):
+        return self._task.ok
+
+    @property
+    def task(self):
+        return self._task
+
+    def resolve(self):
+        task = self._task
+        if task.ok:
+            return task.recognizer
+        if (
+            task.done
+            and isinstance(task.error, _RETRYABLE_ERRORS)
+            and time.time() - (task.finished_at or 0) >= self._retry_interval
+        ):
+            task.start()
+        return None
+
+    def recognize(self, raw):
+        r = self.resolve()
+        if r is None:
+            raise OperationFailedError(msg="Recognizer %r is not ready yet" % self.name)
+        return r.recognize(raw)
+
+    def warmup(self):
+        r = self.resolve()
+        if r is not None:
+            r.warmup()
+
+
+def build_recognizers(names, builder, timeout=None, warmup=False, on_ready=None,
+                      retry_interval=30.0):
+    """
+    Build every target in `names` concurrently.
+
+    Returns ``(recognizer_map, report)`` where `report` is a list of dicts in `names`
+    order: name / ready / init_s / warmup_s / error. `timeout` <= 0 or None waits
+    for all targets. `on_ready(task)` is called from the init thread of targets that
+    finish after the deadline.
+    """
+    tasks = []
+    late = set()
+    notified = set()
+    lock = threading.Lock()
+
+    def _late_ready(task):
+        with lock:
+            if task.name not in late or task.name in notified:
+                return
+            notified.add(task.name)
+        if on_ready is not None:
+            on_ready(task)
+
+    for name in names:
+        task = _InitTask(name, builder, warmup=warmup, on_ready=_late_ready)
+        task.start()
+        tasks.append(task)
+
+    deadline = None
+    if timeout is not None and timeout > 0:
+        deadline = time.time() + timeout
+    for task in tasks:
+        if deadline is None:
+            task.wait()
+        else:
+            task.wait(max(0.0, deadline - time.time()))
+
+    recognizer_map = {}
+    report = []
+    for task in tasks:
+        if task.error is not None and not isinstance(task.error, _RETRYABLE_ERRORS):
+            raise task.error
+        if task.ok:
+            recognizer_map[task.name] = task.recognizer
+        else:
+            with lock:
+                late.add(task.name)
+            # The task may have finished between the wait and the check above.
+            if task.ok:
+                _late_ready(task)
+            recognizer_map[task.name] = PendingRecognizer(task, retry_interval=retry_interval)
+        report.append(
+            {
+                "name": task.name,
+                "ready": task.ok,
+                "init_s": task.init_s,
+                "warmup_s": task.warmup_s,
+                "error": None if task.error is None else str(task.error),
+            }
+        )
+    return recognizer_map, report
@@ -49,6 +49,41 @@ def create_default_parser():
         help='run static config preflight checks before starting loops (no network)',
     )
 
+    ## fleet (supervisor) mode
+
+    parser.add_option(
+        '--fleet',
+        dest='fleet',
+        action='store_true',
+        default=False,
+        help='supervise one worker process per config given as arguments (e.g. --fleet configs/*.ini)',
+    )
+
+    parser.add_option(
+        '--fleet-pin',
+        dest='fleet_pin',
+        metavar="MODE",
+        default="none",
+        help='worker CPU affinity: none, auto (one core each) or groups like "0-1;2-3"',
+    )
+
+    parser.add_option(
+        '--fleet-monitor-host',
+        dest='fleet_monitor_host',
+        metavar="HOST",
+        default="127.0.0.1",
+        help='fleet monitor host (default: 127.0.0.1)',
+    )
+
+    parser.add_option(
+        '--fleet-monitor-port',
+        dest='fleet_monitor_port',
+        metavar="PORT",
+        type="int",
+        default=7070,
+        help='fleet monitor port, 0 to disable (default: 7070)',
+    )
+
     return parser
 
 
@@ -91,6 +126,19 @@ def run():
     parser = create_default_parser()
     options, args = parser.parse_args()
 
+    if options.fleet:
+        # The supervisor only spawns `main.py -c <config> -m` workers; it loads no config itself.
+        from .fleet import run_fleet
+
+        raise SystemExit(
+            run_fleet(
+                args,
+                pin=options.fleet_pin,
+                monitor_host=options.fleet_monitor_host,
+                monitor_port=options.fleet_monitor_port,
+            )
+        )
+
     setup_default_environ(options, args, environ)
 
     # Import logger only after config path is set by `-c/--config`.
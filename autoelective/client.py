@@ -19,6 +19,11 @@ class BaseClient(object):
         self._timeout = kwargs.get("timeout", self.__class__.default_client_timeout)
         self._session = Session()
         self._session.headers.update(self.__class__.default_headers)
+        adapter = kwargs.get("adapter")
+        if adapter is not None:
+            # connection pools shared with other clients (cookies stay per session)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
 
     @property
     def user_agent(self):
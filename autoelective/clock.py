@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: clock.py
+
+"""
+Server clock offset from the `Date` headers of elective responses.
+
+A `Date` header has one-second resolution and was generated somewhere between
+sending the request and receiving the response, so every response bounds the
+offset (server - local):
+
+    D - t_recv  <=  offset  <  D + 1 - t_send
+
+Intersecting the bounds of recent responses tightens the estimate (second
+boundaries fall at different points of different requests), the same way NTP
+keeps the sample with the least dispersion. The estimate is the middle of the
+intersection and `error` is its half-width; the smallest recent RTT is kept for
+the one-way delay (rtt / 2).
+"""
+
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+
+class ClockSync(object):
+
+    def __init__(self, window=32, max_age=3600.0, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=max(1, int(window)))  # (t_recv, lo, hi, rtt)
+        self._max_age = max_age
+        self.resets = 0
+
+    def observe(self, t_send, t_recv, server_ts, resolution=1.0):
+        """
+        Add one response: sent at local `t_send`, received at `t_recv`, with a server
+        timestamp `server_ts` truncated to `resolution` seconds.
+        """
+        if t_recv < t_send:
+            t_send, t_recv = t_recv, t_send
+        lo = server_ts - t_recv
+        hi = server_ts + resolution - t_send
+        with self._lock:
+            while self._samples and t_recv - self._samples[0][0] > self._max_age:
+                self._samples.popleft()
+            self._samples.append((t_recv, lo, hi, t_recv - t_send))
+            if self._bounds() is None:
+                # inconsistent with older samples (local clock stepped?): start over
+                self.resets += 1
+                self._samples.clear()
+                self._samples.append((t_recv, lo, hi, t_recv - t_send))
+
+    def observe_response(self, r):
+        """
+        Response hook: feed `r`'s `Date` header (send time from `r.elapsed`).
+        """
+        date = r.headers.get("Date") if r is not None else None
+        if not date:
+            return
+        try:
+            server_ts = parsedate_to_datetime(date).timestamp()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return
+        t_recv = self._clock()
+        elapsed = getattr(r, "elapsed", None)
+        rtt = elapsed.total_seconds() if elapsed is not None else 0.0
+        self.observe(t_recv - max(0.0, rtt), t_recv, server_ts)
+
+    def _bounds(self):
+        lo = max(s[1] for s in self._samples)
+        hi = min(s[2] for s in self._samples)
+        if lo > hi:
+            return None
+        return lo, hi
+
+    def estimate(self, now=None):
+        """
+        {"offset", "error", "rtt", "samples", "age"} in seconds, or None before the first
+        response (or, with `now`, when the newest response is older than `max_age`).
+        """
+        with self._lock:
+            if not self._samples:
+                return None
+            age = (self._clock() if now is None else now) - self._samples[-1][0]
+            if now is not None and not (-1.0 <= age <= self._max_age):
+                return None
+            lo, hi = self._bounds()
+            return {
+                "offset": (lo + hi) / 2.0,
+                "error": (hi - lo) / 2.0,
+                "rtt": min(s[3] for s in self._samples),
+                "samples": len(self._samples),
+                "age": age,
+            }
+
+    def local_time(self, server_ts):
+        """
+        Local timestamp at which the server clock reads `server_ts` (None when unsynced).
+        """
+        est = self.estimate()
+        if est is None:
+            return None
+        return server_ts - est["offset"]
+
+    def send_time(self, server_ts, now=None):
+        """
+        Local time to send a request so that it reaches the server at `server_ts`.
+        """
+        est = self.estimate(now)
+        if est is None:
+            return None
+        return server_ts - est["offset"] - est["rtt"] / 2.0
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+server_clock = ClockSync()
+
+
+def observe_server_date(r, **kwargs):
+    """
+    `requests` response hook feeding `server_clock`; never raises.
+    """
+    try:
+        server_clock.observe_response(r)
+    except Exception:
+        pass
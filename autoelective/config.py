@@ -103,6 +103,16 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
         env_ini = os.getenv("AUTOELECTIVE_CONFIG_INI")
         super().__init__(environ.config_ini or env_ini or DEFAULT_CONFIG_INI)
 
+    @classmethod
+    def from_file(cls, config_file):
+        """
+        A standalone (non-singleton) config read from `config_file`, e.g. one per
+        account of an `ElectiveEngine`.
+        """
+        obj = cls.__new__(cls)
+        BaseConfig.__init__(obj, config_file)
+        return obj
+
     ## Constraints
 
     ALLOWED_IDENTIFY = ("bzx", "bfx")
@@ -145,6 +155,10 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
     def refresh_backoff_enable(self):
         return self.get_optional_bool("client", "refresh_backoff_enable", True)
 
+    @property
+    def refresh_fixed_cadence(self):
+        return self.get_optional_bool("client", "refresh_fixed_cadence", False)
+
     @property
     def refresh_backoff_factor(self):
         v = self.get_optional("client", "refresh_backoff_factor")
@@ -212,6 +226,10 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
             raise UserInputException("Invalid client_pool_reset_cooldown: %r" % v)
         return max(0.0, v)
 
+    @property
+    def client_pool_targeted_recovery(self):
+        return self.get_optional_bool("client", "client_pool_targeted_recovery", True)
+
     @property
     def elective_client_max_life(self):
         return self.getint("client", "elective_client_max_life")
@@ -220,6 +238,69 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
     def login_loop_interval(self):
         return self.getfloat("client", "login_loop_interval")
 
+    @property
+    def login_concurrency(self):
+        v = self.get_optional("client", "login_concurrency")
+        if v is None or v == "":
+            return 1
+        try:
+            v = int(v)
+        except ValueError:
+            raise UserInputException("Invalid login_concurrency: %r" % v)
+        return max(1, v)
+
+    @property
+    def session_refresh_enable(self):
+        return self.get_optional_bool("client", "session_refresh_enable", False)
+
+    @property
+    def session_refresh_lead_seconds(self):
+        v = self.get_optional("client", "session_refresh_lead_seconds")
+        if v is None or v == "":
+            return 60.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid session_refresh_lead_seconds: %r" % v)
+        return max(0.0, v)
+
+    @property
+    def session_refresh_interval(self):
+        v = self.get_optional("client", "session_refresh_interval")
+        if v is None or v == "":
+            return 5.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid session_refresh_interval: %r" % v)
+        return max(0.5, v)
+
+    @property
+    def session_cache_enable(self):
+        return self.get_optional_bool("client", "session_cache_enable", False)
+
+    @property
+    def session_cache_key(self):
+        v = self.get_optional("client", "session_cache_key")
+        if v is None or v.strip() == "":
+            return None
+        return v.strip()
+
+    @property
+    def pool_health_enable(self):
+        return self.get_optional_bool("client", "pool_health_enable", False)
+
+    @property
+    def pool_quarantine_threshold(self):
+        v = self.get_optional("client", "pool_quarantine_threshold")
+        if v is None or v == "":
+            return 3
+        try:
+            v = int(v)
+        except ValueError:
+            raise UserInputException("Invalid pool_quarantine_threshold: %r" % v)
+        return max(1, v)
+
     @property
     def iaaa_backoff_enable(self):
         return self.get_optional_bool("client", "iaaa_backoff_enable", True)
@@ -351,6 +432,29 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
             raise UserInputException("Invalid captcha.max_output_tokens: %r" % v)
         return max(1, v)
 
+    @property
+    def captcha_init_timeout(self):
+        v = self.get_optional("captcha", "init_timeout")
+        if v is None or v == "":
+            return 15.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid captcha.init_timeout: %r" % v)
+        return max(0.0, v)
+
+    @property
+    def captcha_warmup_enable(self):
+        return self.get_optional_bool("captcha", "warmup_enable", False)
+
+    @property
+    def captcha_stream(self):
+        return self.get_optional_bool("captcha", "stream", False)
+
+    @property
+    def captcha_image_transform(self):
+        return (self.get_optional("captcha", "image_transform") or "").strip()
+
     @property
     def baidu_api_key(self):
         return self.get_optional("captcha", "baidu_api_key")
@@ -369,6 +473,20 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
         except ValueError:
             raise UserInputException("Invalid baidu_timeout: %r" % v)
 
+    @property
+    def baidu_token_cache(self):
+        # cwd-relative unless absolute; empty disables the cache
+        v = (self.get_optional("captcha", "baidu_token_cache") or "").strip()
+        if not v:
+            return ""
+        if os.path.isabs(v):
+            return v
+        return os.path.normpath(os.path.abspath(v))
+
+    @property
+    def baidu_image_transform(self):
+        return (self.get_optional("captcha", "baidu_image_transform") or "").strip()
+
     @property
     def captcha_code_length_min(self):
         v_min = self.get_optional("captcha", "code_length_min")
@@ -430,6 +548,10 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
             raise UserInputException("Invalid gemini_max_output_tokens: %r" % v)
         return max(1, v)
 
+    @property
+    def gemini_image_transform(self):
+        return (self.get_optional("captcha", "gemini_image_transform") or "").strip()
+
     @property
     def captcha_validate_round_timeout(self):
         v = self.get_optional("captcha", "validate_round_timeout")
@@ -441,6 +563,86 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
             raise UserInputException("Invalid validate_round_timeout: %r" % v)
         return max(1.0, v)
 
+    @property
+    def captcha_recognizer_fail_fast(self):
+        return self.get_optional_bool("captcha", "recognizer_fail_fast", False)
+
+    @property
+    def captcha_speculative_enable(self):
+        return self.get_optional_bool("captcha", "speculative_enable", False)
+
+    @property
+    def captcha_speculative_on_full(self):
+        return self.get_optional_bool("captcha", "speculative_on_full", True)
+
+    @property
+    def captcha_speculative_delay_margin(self):
+        v = self.get_optional("captcha", "speculative_delay_margin")
+        if v is None or v == "":
+            return 1
+        try:
+            v = int(v)
+        except ValueError:
+            raise UserInputException("Invalid speculative_delay_margin: %r" % v)
+        return max(0, v)
+
+    @property
+    def captcha_speculative_max_age(self):
+        v = self.get_optional("captcha", "speculative_max_age")
+        if v is None or v == "":
+            return 60.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid speculative_max_age: %r" % v)
+        return max(1.0, v)
+
+    @property
+    def captcha_service_url(self):
+        v = self.get_optional("captcha", "service_url")
+        return (v or "").strip().rstrip("/")
+
+    @property
+    def captcha_service_timeout(self):
+        v = self.get_optional("captcha", "service_timeout")
+        if v is None or v == "":
+            return 20.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid service_timeout: %r" % v)
+        return max(1.0, v)
+
+    @property
+    def captcha_service_share_adaptive(self):
+        return self.get_optional_bool("captcha", "service_share_adaptive", True)
+
+    @property
+    def captcha_validation_reuse(self):
+        return self.get_optional_bool("captcha", "validation_reuse", False)
+
+    @property
+    def captcha_validation_reuse_min_samples(self):
+        v = self.get_optional("captcha", "validation_reuse_min_samples")
+        if v is None or v == "":
+            return 4
+        try:
+            v = int(v)
+        except ValueError:
+            raise UserInputException("Invalid validation_reuse_min_samples: %r" % v)
+        return max(1, v)
+
+    @property
+    def captcha_validation_reuse_min_success_rate(self):
+        v = self.get_optional("captcha", "validation_reuse_min_success_rate")
+        if v is None or v == "":
+            return 0.5
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid validation_reuse_min_success_rate: %r" % v)
+        return min(1.0, max(0.0, v))
+
     @property
     def captcha_degrade_failures(self):
         v = self.get_optional("captcha", "degrade_failures")
@@ -482,6 +684,76 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
             raise UserInputException("Invalid degrade_notify_interval: %r" % v)
         return max(1.0, v)
 
+    @property
+    def captcha_breaker_enable(self):
+        return self.get_optional_bool("captcha", "breaker_enable", False)
+
+    @property
+    def captcha_breaker_timeout_threshold(self):
+        v = self.get_optional("captcha", "breaker_timeout_threshold")
+        if v is None or v == "":
+            return 2
+        try:
+            v = int(v)
+        except ValueError:
+            raise UserInputException("Invalid captcha.breaker_timeout_threshold: %r" % v)
+        return max(1, v)
+
+    @property
+    def captcha_breaker_rate_limit_threshold(self):
+        v = self.get_optional("captcha", "breaker_rate_limit_threshold")
+        if v is None or v == "":
+            return 1
+        try:
+            v = int(v)
+        except ValueError:
+            raise UserInputException("Invalid captcha.breaker_rate_limit_threshold: %r" % v)
+        return max(1, v)
+
+    @property
+    def captcha_breaker_server_threshold(self):
+        v = self.get_optional("captcha", "breaker_server_threshold")
+        if v is None or v == "":
+            return 3
+        try:
+            v = int(v)
+        except ValueError:
+            raise UserInputException("Invalid captcha.breaker_server_threshold: %r" % v)
+        return max(1, v)
+
+    @property
+    def captcha_breaker_open_seconds(self):
+        v = self.get_optional("captcha", "breaker_open_seconds")
+        if v is None or v == "":
+            return 30.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid captcha.breaker_open_seconds: %r" % v)
+        return max(1.0, v)
+
+    @property
+    def captcha_breaker_max_open_seconds(self):
+        v = self.get_optional("captcha", "breaker_max_open_seconds")
+        if v is None or v == "":
+            return 600.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid captcha.breaker_max_open_seconds: %r" % v)
+        return max(1.0, v)
+
+    @property
+    def captcha_breaker_half_open_calls(self):
+        v = self.get_optional("captcha", "breaker_half_open_calls")
+        if v is None or v == "":
+            return 1
+        try:
+            v = int(v)
+        except ValueError:
+            raise UserInputException("Invalid captcha.breaker_half_open_calls: %r" % v)
+        return max(1, v)
+
     @property
     def captcha_switch_on_degrade(self):
         return self.get_optional_bool("captcha", "switch_on_degrade", True)
@@ -596,6 +868,32 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
             raise UserInputException("Invalid not_in_operation_schedule_ttl_seconds: %r" % v)
         return max(0.0, v)
 
+    @property
+    def not_in_operation_precise_wake(self):
+        return self.get_optional_bool("resilience", "not_in_operation_precise_wake", True)
+
+    @property
+    def not_in_operation_precise_wake_window(self):
+        v = self.get_optional("resilience", "not_in_operation_precise_wake_window")
+        if v is None or v == "":
+            return 300.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid not_in_operation_precise_wake_window: %r" % v)
+        return max(0.0, v)
+
+    @property
+    def not_in_operation_precise_wake_max_error(self):
+        v = self.get_optional("resilience", "not_in_operation_precise_wake_max_error")
+        if v is None or v == "":
+            return 1.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid not_in_operation_precise_wake_max_error: %r" % v)
+        return max(0.0, v)
+
     @property
     def not_in_operation_dynamic_long_sleep_max(self):
         v = self.get_optional("resilience", "not_in_operation_dynamic_long_sleep_max")
@@ -611,6 +909,32 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
     def warmup_after_login_enable(self):
         return self.get_optional_bool("resilience", "warmup_after_login_enable", False)
 
+    @property
+    def preopen_warmup_enable(self):
+        return self.get_optional_bool("resilience", "preopen_warmup_enable", False)
+
+    @property
+    def preopen_warmup_lead_seconds(self):
+        v = self.get_optional("resilience", "preopen_warmup_lead_seconds")
+        if v is None or v == "":
+            return 60.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid preopen_warmup_lead_seconds: %r" % v)
+        return max(1.0, v)
+
+    @property
+    def preopen_warmup_hold_seconds(self):
+        v = self.get_optional("resilience", "preopen_warmup_hold_seconds")
+        if v is None or v == "":
+            return 300.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid preopen_warmup_hold_seconds: %r" % v)
+        return max(0.0, v)
+
     @property
     def html_parse_error_threshold(self):
         v = self.get_optional("resilience", "html_parse_error_threshold")
@@ -766,6 +1090,41 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
             raise UserInputException("Invalid adaptive_score_beta: %r" % v)
         return max(0.0, v)
 
+    @property
+    def captcha_adaptive_policy(self):
+        # imported here: the captcha package imports this module
+        from .captcha.adaptive import ADAPTIVE_POLICIES
+        v = (self.get_optional("captcha", "adaptive_policy") or "").strip().lower()
+        if not v:
+            return "score"
+        if v not in ADAPTIVE_POLICIES:
+            raise UserInputException(
+                "Invalid adaptive_policy: %r. Allowed: %s" % (v, ", ".join(ADAPTIVE_POLICIES))
+            )
+        return v
+
+    @property
+    def captcha_adaptive_decay_half_life(self):
+        v = self.get_optional("captcha", "adaptive_decay_half_life")
+        if v is None or v == "":
+            return 0.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid adaptive_decay_half_life: %r" % v)
+        return max(0.0, v)
+
+    @property
+    def captcha_adaptive_ucb_c(self):
+        v = self.get_optional("captcha", "adaptive_ucb_c")
+        if v is None or v == "":
+            return 1.0
+        try:
+            v = float(v)
+        except ValueError:
+            raise UserInputException("Invalid adaptive_ucb_c: %r" % v)
+        return max(0.0, v)
+
     @property
     def captcha_sample_enable(self):
         return self.get_optional_bool("captcha", "sample_enable", False)
@@ -788,6 +1147,27 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
             return "cache/captcha_samples"
         return v
 
+    @property
+    def captcha_sample_store(self):
+        v = self.get_optional("captcha", "sample_store")
+        if v is None or v == "":
+            return "files"
+        v = v.strip().lower()
+        if v not in ("pack", "files"):
+            raise UserInputException("Invalid sample_store: %r (allowed: pack, files)" % v)
+        return v
+
+    @property
+    def captcha_sample_queue_size(self):
+        v = self.get_optional("captcha", "sample_queue_size")
+        if v is None or v == "":
+            return 256
+        try:
+            v = int(v)
+        except ValueError:
+            raise UserInputException("Invalid sample_queue_size: %r" % v)
+        return max(1, v)
+
     @property
     def captcha_probe_enabled(self):
         return self.get_optional_bool("captcha", "probe_enabled", False)
@@ -858,6 +1238,28 @@ class AutoElectiveConfig(BaseConfig, metaclass=Singleton):
             raise UserInputException("Invalid adaptive_persist_interval_seconds: %r" % v)
         return max(0.0, v)
 
+    @property
+    def captcha_adaptive_journal_enable(self):
+        return self.get_optional_bool("captcha", "adaptive_journal_enable", False)
+
+    @property
+    def captcha_adaptive_journal_path(self):
+        v = self.get_optional("captcha", "adaptive_journal_path")
+        if v is None or v == "":
+            return "cache/captcha_adaptive_journal.jsonl"
+        return v
+
+    @property
+    def captcha_adaptive_journal_compact_bytes(self):
+        v = self.get_optional("captcha", "adaptive_journal_compact_bytes")
+        if v is None or v == "":
+            return 1048576
+        try:
+            v = int(v)
+        except ValueError:
+            raise UserInputException("Invalid adaptive_journal_compact_bytes: %r" % v)
+        return max(0, v)
+
     @property
     def runtime_stat_report_interval(self):
         v = self.get_optional("runtime", "report_interval")
@@ -8,6 +8,7 @@ from ._internal import mkdir, get_abs_path, read_list
 
 CACHE_DIR = get_abs_path("../cache/")
 CAPTCHA_CACHE_DIR = get_abs_path("../cache/captcha/")
+SESSION_CACHE_DIR = get_abs_path("../cache/sessions/")
 LOG_DIR = get_abs_path("../log/")
 ERROR_LOG_DIR = get_abs_path("../log/error")
 REQUEST_LOG_DIR = get_abs_path("../log/request/")
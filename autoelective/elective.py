@@ -11,20 +11,24 @@ from .client import BaseClient
 from .hook import get_hooks, debug_dump_request, debug_print_request, check_status_code, with_etree,\
     check_elective_title, check_elective_tips, check_drawservlet_image_or_system_page
 from .const import ElectiveURL
+from .clock import observe_server_date
 
 _hooks_check_status_code = get_hooks(
+    observe_server_date,
     # debug_dump_request,
     debug_print_request,
     check_status_code,
 )
 
 _hooks_check_drawservlet = get_hooks(
+    observe_server_date,
     debug_print_request,
     check_status_code,
     check_drawservlet_image_or_system_page,
 )
 
 _hooks_check_title = get_hooks(
+    observe_server_date,
     debug_dump_request,
     debug_print_request,
     check_status_code,
@@ -33,6 +37,7 @@ _hooks_check_title = get_hooks(
 )
 
 _hooks_check_tips = get_hooks(
+    observe_server_date,
     debug_dump_request,
     debug_print_request,
     check_status_code,
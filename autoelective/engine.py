@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: engine.py
+
+"""
+Run several accounts in one process.
+
+`loop.py` keeps its runtime state (client pools, goals, ignored courses, the
+recognizer order, counters, config-derived constants) in module globals. An
+`ElectiveEngine` gives every account its own copy of that module, imported
+against the account's own `AutoElectiveConfig` (`AutoElectiveConfig.from_file`)
+and `Environ`, so accounts never see each other's state while the loop code
+stays the one the single-account CLI runs.
+
+What the engines of one process share (`EngineShared`):
+  - recognizers, one per target (built once, then reused by every account),
+    always against the process config even when the first use comes from an
+    account's import;
+  - one `requests` HTTPAdapter, i.e. the urllib3 connection pools to
+    elective/IAAA (cookies stay per client session);
+  - everything that is process-wide anyway: the process config (`-c`) for
+    recognizer credentials / logging / debug hooks, `rate_limit` buckets.
+
+Each account keeps its own Bark `Notify` (tokens differ per account).
+"""
+
+import importlib.util
+import os
+import threading
+import time
+from itertools import count
+
+from requests.adapters import HTTPAdapter
+
+from .config import AutoElectiveConfig
+from .environ import Environ
+from .utils import singleton_scope
+
+# Import everything `loop.py` pulls in up front, so that modules with
+# import-time config (logger, hook) bind to the process config rather than to
+# whichever account happens to load first.
+from . import client, elective, iaaa, hook, logger, parser, rate_limit  # noqa: F401
+from . import captcha  # noqa: F401
+
+_LOOP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loop.py")
+_scope = threading.local()
+_seq = count(1)
+_code_lock = threading.Lock()
+_loop_code = None
+
+
+def _get_loop_code():
+    # Compiled once per process: every engine's copy runs the same code objects.
+    global _loop_code
+    with _code_lock:
+        if _loop_code is None:
+            spec = importlib.util.spec_from_file_location("autoelective._engine_loop", _LOOP_PATH)
+            _loop_code = spec.loader.get_code(spec.name)
+        return _loop_code
+
+
+class EngineShared(object):
+    """
+    Resources shared by all engines of a process.
+    """
+
+    def __init__(self, pool_connections=4, pool_maxsize=64, share_connections=True):
+        self._lock = threading.Lock()
+        self._recognizers = {}
+        self._building = {}
+        self.adapter = None
+        if share_connections:
+            self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+
+    def recognizer(self, target_name, builder):
+        """
+        The recognizer for `target_name`, built by `builder(target_name)` on first use.
+        Concurrent first uses wait for a single build; a failed build is not cached.
+        """
+        with self._lock:
+            rec = self._recognizers.get(target_name)
+            if rec is not None:
+                return rec
+            event = self._building.get(target_name)
+            owner = event is None
+            if owner:
+                event = self._building[target_name] = threading.Event()
+        if not owner:
+            event.wait()
+            return self.recognizer(target_name, builder)
+        try:
+            # shared by every account: build against the process config, not the
+            # account whose loop copy happens to be importing
+            with singleton_scope(None):
+                rec = builder(target_name)
+            with self._lock:
+                self._recognizers[target_name] = rec
+            return rec
+        finally:
+            with self._lock:
+                self._building.pop(target_name, None)
+            event.set()
+
+    def recognizer_names(self):
+        with self._lock:
+            return list(self._recognizers)
+
+
+class _EngineScope(object):
+
+    def __init__(self, name, shared):
+        self.name = name
+        self.shared = shared
+
+    def logger_name(self, base):
+        return "%s[%s]" % (base, self.name)
+
+
+def current_scope():
+    """
+    The engine whose `loop` copy is being imported on this thread (None otherwise).
+    """
+    return getattr(_scope, "engine", None)
+
+
+class ElectiveEngine(object):
+
+    def __init__(self, config_file, name=None, shared=None):
+        self.config = AutoElectiveConfig.from_file(config_file)
+        self.name = name or self.config.iaaa_id
+        self.shared = shared if shared is not None else EngineShared()
+        self.environ = Environ.__new__(Environ)
+        self.environ.__init__()
+        self.environ.config_ini = config_file
+        self._threads = []
+        self.loop = self._load_loop()
+
+    def _load_loop(self):
+        spec = importlib.util.spec_from_file_location("autoelective._engine_loop_%d" % next(_seq), _LOOP_PATH)
+        module = importlib.util.module_from_spec(spec)
+        prev = getattr(_scope, "engine", None)
+        _scope.engine = _EngineScope(self.name, self.shared)
+        try:
+            with singleton_scope({AutoElectiveConfig: self.config, Environ: self.environ}):
+                exec(_get_loop_code(), module.__dict__)
+        finally:
+            _scope.engine = prev
+        return module
+
+    def start(self):
+        """
+        Start the IAAA and elective loop threads of this account.
+        """
+        for name, target in (("IAAA", self.loop.run_iaaa_loop), ("Elective", self.loop.run_elective_loop)):
+            t = threading.Thread(target=target, name="%s[%s]" % (name, self.name), daemon=True)
+            t.start()
+            self._threads.append(t)
+        self.environ.iaaa_loop_thread, self.environ.elective_loop_thread = self._threads[-2:]
+        return self
+
+    def stop(self, timeout=5.0):
+        """
+        Ask the loops to quit (no goals left) and wait up to `timeout` seconds.
+        :return: True when every loop thread has exited
+        """
+        del self.loop.goals[:]
+        deadline = time.time() + max(0.0, timeout)
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.time()))
+        return not any(t.is_alive() for t in self._threads)
+
+    def is_alive(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "elective_loop": self.environ.elective_loop,
+            "iaaa_loop": self.environ.iaaa_loop,
+            "runtime_stats": dict(self.environ.runtime_stats),
+        }
@@ -21,5 +21,6 @@ class Environ(object, metaclass=Singleton):
         self.iaaa_loop_thread = None
         self.elective_loop_thread = None
         self.monitor_thread = None
+        self.client_pool = None
         self.goals = []  # [Course]
         self.ignored = {}  # {Course, reason}
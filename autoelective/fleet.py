@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: fleet.py
+
+"""
+Fleet supervisor: one worker process per config (`main.py --fleet configs/*.ini`).
+
+Each worker is a normal `main.py -c <config> -m` process, so its monitor serves
+`/stat/runtime` on the `[monitor]` host/port of its own config (ports must differ
+between configs). The supervisor
+
+  - optionally pins workers to CPUs (`--fleet-pin auto` round-robins the cores
+    this process may use; Linux `sched_setaffinity` only),
+  - restarts dead workers with a per-worker exponential backoff that resets
+    once a worker has stayed up for `stable_seconds`,
+  - serves a fleet monitor (`--fleet-monitor-port`): `/stat/fleet` lists the
+    workers, `/stat/runtime` sums every worker's runtime counters,
+  - on SIGINT/SIGTERM sends SIGTERM to every worker (which shut down
+    gracefully like a single `main.py`), waits `grace` seconds, then kills
+    what is left. Workers run in their own session, so signals for the
+    terminal's process group reach only the supervisor.
+"""
+
+import glob
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import requests
+
+from .config import AutoElectiveConfig
+
+_MAIN_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+# `logger.py` needs the process config at import time; the supervisor has none.
+cout = logging.getLogger("fleet")
+if not cout.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("[%(levelname)s] %(name)s, %(asctime)s, %(message)s", "%H:%M:%S"))
+    cout.addHandler(_handler)
+    cout.setLevel(logging.INFO)
+
+
+def expand_configs(patterns):
+    """
+    Config paths from args that may still hold (quoted) glob patterns; order kept, no duplicates.
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            path = os.path.abspath(path)
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def plan_cpu_affinity(n, mode, available=None):
+    """
+    [set(cpus) or None] for `n` workers. `mode`: "none", "auto" (one core each,
+    round-robin) or explicit groups like "0-1;2-3" (one group per worker, cycled).
+    """
+    mode = (mode or "none").strip().lower()
+    if mode == "none" or n <= 0:
+        return [None] * n
+    if mode == "auto":
+        cpus = sorted(available if available is not None else _available_cpus())
+        if not cpus:
+            return [None] * n
+        return [{cpus[i % len(cpus)]} for i in range(n)]
+    groups = []
+    for part in mode.split(";"):
+        group = set()
+        for item in part.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            if "-" in item:
+                lo, hi = item.split("-", 1)
+                group.update(range(int(lo), int(hi) + 1))
+            else:
+                group.add(int(item))
+        if group:
+            groups.append(group)
+    if not groups:
+        raise ValueError("Invalid CPU affinity spec: %r" % mode)
+    return [groups[i % len(groups)] for i in range(n)]
+
+
+def _available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return os.sched_getaffinity(0)
+    return set(range(os.cpu_count() or 1))
+
+
+def aggregate_runtime(snapshots):
+    """
+    Sum `stats` over workers' `/stat/runtime` payloads; gauges are not additive and stay per worker.
+    """
+    total = {}
+    for snap in snapshots:
+        for k, v in ((snap or {}).get("stats") or {}).items():
+            if isinstance(v, (int, float)):
+                total[k] = total.get(k, 0) + v
+    return total
+
+
+class FleetWorker(object):
+
+    def __init__(self, config_path, index, cpus=None, monitor_url=None):
+        self.config_path = config_path
+        self.index = index
+        self.name = os.path.splitext(os.path.basename(config_path))[0]
+        self.cpus = cpus
+        self.monitor_url = monitor_url
+        self.proc = None
+        self.started_at = None
+        self.restarts = 0
+        self.backoff = 0.0
+        self.next_start_at = 0.0
+        self.last_exit = None
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            "config": self.config_path,
+            "pid": self.proc.pid if self.proc is not None else None,
+            "alive": self.is_alive(),
+            "cpus": sorted(self.cpus) if self.cpus else None,
+            "restarts": self.restarts,
+            "last_exit": self.last_exit,
+            "next_start_in": max(0.0, self.next_start_at - time.time()) if not self.is_alive() else 0.0,
+            "monitor": self.monitor_url,
+        }
+
+
+class FleetSupervisor(object):
+
+    def __init__(
+        self,
+        config_paths,
+        pin="none",
+        backoff_initial=1.0,
+        backoff_max=60.0,
+        stable_seconds=60.0,
+        grace=10.0,
+        command=None,
+        fetch_timeout=1.0,
+    ):
+        self._command = command or (lambda worker: [sys.executable, _MAIN_PY, "-c", worker.config_path, "-m"])
+        self.backoff_initial = max(0.0, float(backoff_initial))
+        self.backoff_max = max(self.backoff_initial, float(backoff_max))
+        self.stable_seconds = max(0.0, float(stable_seconds))
+        self.grace = max(0.0, float(grace))
+        self.fetch_timeout = fetch_timeout
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._session = requests.Session()
+        affinity = plan_cpu_affinity(len(config_paths), pin)
+        self.workers = [
+            FleetWorker(path, i, cpus=affinity[i], monitor_url=self._monitor_url(path))
+            for i, path in enumerate(config_paths)
+        ]
+        self._check_monitor_ports()
+
+    @staticmethod
+    def _monitor_url(config_path):
+        try:
+            cfg = AutoElectiveConfig.from_file(config_path)
+            return "http://%s:%d" % (cfg.monitor_host, cfg.monitor_port)
+        except Exception:
+            return None
+
+    def _check_monitor_ports(self):
+        seen = {}
+        for w in self.workers:
+            if w.monitor_url is None:
+                continue
+            if w.monitor_url in seen:
+                cout.warning(
+                    "%s and %s share monitor %s; only one of them can serve /stat"
+                    % (seen[w.monitor_url], w.name, w.monitor_url)
+                )
+            seen.setdefault(w.monitor_url, w.name)
+
+    ## processes
+
+    def _spawn(self, worker):
+        # own session: a terminal Ctrl-C reaches only the supervisor, which then sends
+        # the one SIGTERM (a second signal makes main.py force-exit without cleanup)
+        worker.proc = subprocess.Popen(self._command(worker), start_new_session=True)
+        worker.started_at = time.time()
+        if worker.cpus and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(worker.proc.pid, worker.cpus)
+            except OSError as e:
+                cout.warning("Pin %s to CPUs %s failed: %s" % (worker.name, sorted(worker.cpus), e))
+        cout.info("Worker %s started (pid %d)" % (worker.name, worker.proc.pid))
+
+    def start(self):
+        for w in self.workers:
+            self._spawn(w)
+        return self
+
+    def poll(self, now=None):
+        """
+        One supervision pass: schedule restarts of dead workers and start those due.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._stopping.is_set():
+                return
+            for w in self.workers:
+                if w.is_alive():
+                    continue
+                if w.proc is not None and w.last_exit is None:
+                    # just died: schedule the restart
+                    w.last_exit = w.proc.returncode
+                    if w.started_at is not None and now - w.started_at >= self.stable_seconds:
+                        w.backoff = 0.0
+                    w.backoff = self.backoff_initial if w.backoff <= 0 else min(self.backoff_max, w.backoff * 2)
+                    w.next_start_at = now + w.backoff
+                    cout.warning(
+                        "Worker %s exited (%s), restart in %.1fs" % (w.name, w.last_exit, w.backoff)
+                    )
+                if now >= w.next_start_at:
+                    w.restarts += 1
+                    w.last_exit = None
+                    self._spawn(w)
+
+    def shutdown(self):
+        """
+        SIGTERM every worker, wait up to `grace` seconds, then SIGKILL the rest.
+        :return: names of workers that had to be killed
+        """
+        with self._lock:
+            self._stopping.set()
+            alive = [w for w in self.workers if w.is_alive()]
+        for w in alive:
+            try:
+                w.proc.send_signal(signal.SIGTERM)
+            except OSError:
+                pass
+        deadline = time.time() + self.grace
+        for w in alive:
+            try:
+                w.proc.wait(max(0.0, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                pass
+        killed = []
+        for w in alive:
+            if w.proc.poll() is None:
+                w.proc.kill()
+                w.proc.wait()
+                killed.append(w.name)
+        return killed
+
+    ## monitor
+
+    def fetch_runtime(self, worker):
+        if not worker.monitor_url or not worker.is_alive():
+            return None
+        try:
+            resp = self._session.get(worker.monitor_url + "/stat/runtime", timeout=self.fetch_timeout)
+            if resp.status_code == 200:
+                return resp.json()
+        except (requests.RequestException, ValueError):
+            pass
+        return None
+
+    def runtime(self):
+        per_worker = {}
+        for w in self.workers:
+            per_worker[w.name] = self.fetch_runtime(w)
+        return {
+            "stats": aggregate_runtime(per_worker.values()),
+            "workers": per_worker,
+        }
+
+    def fleet(self):
+        with self._lock:
+            return {"workers": [w.snapshot() for w in self.workers]}
+
+
+class _FleetHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        sup = self.server.supervisor
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/stat/fleet":
+            payload, status = sup.fleet(), 200
+        elif path == "/stat/runtime":
+            payload, status = sup.runtime(), 200
+        elif path in ("", "/stat"):
+            payload, status = {"rules": ["GET  /stat/fleet", "GET  /stat/runtime"]}, 200
+        else:
+            payload, status = {"error": "not found"}, 404
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_fleet_monitor(supervisor, host="127.0.0.1", port=7070):
+    server = ThreadingHTTPServer((host, port), _FleetHandler)
+    server.daemon_threads = True
+    server.supervisor = supervisor
+    return server
+
+
+def run_fleet(patterns, pin="none", monitor_host="127.0.0.1", monitor_port=7070, grace=None):
+    paths = expand_configs(patterns)
+    if not paths:
+        cout.error("No config files for --fleet")
+        return 2
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        cout.error("Config file was not found: %s" % ", ".join(missing))
+        return 2
+    if grace is None:
+        try:
+            grace = float(os.getenv("AUTOELECTIVE_SHUTDOWN_GRACE_SECONDS") or 2.0) + 3.0
+        except ValueError:
+            grace = 5.0
+
+    sup = FleetSupervisor(paths, pin=pin, grace=grace)
+    server = None
+    if monitor_port:
+        server = make_fleet_monitor(sup, host=monitor_host, port=monitor_port)
+        threading.Thread(target=server.serve_forever, name="FleetMonitor", daemon=True).start()
+        cout.info("Fleet monitor on http://%s:%d/stat/fleet" % (monitor_host, server.server_address[1]))
+
+    def _on_signal(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGINT, _on_signal)
+    signal.signal(signal.SIGTERM, _on_signal)
+
+    sup.start()
+    try:
+        while True:
+            time.sleep(1.0)
+            sup.poll()
+    except KeyboardInterrupt:
+        cout.warning("Shutting down %d workers" % len(sup.workers))
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        killed = sup.shutdown()
+        if killed:
+            cout.warning("Killed after %.0fs grace: %s" % (sup.grace, ", ".join(killed)))
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    return 0
@@ -4,10 +4,10 @@
 
 import os
 import time
+import hashlib
 import random
 import threading
 import socket
-import hashlib
 import json as stdjson
 import re
 from datetime import datetime
@@ -25,13 +25,33 @@ from .course import Course
 from .captcha import get_recognizer
 from .captcha.targets import default_targets_from_config, format_target, parse_target_token
 from .captcha.adaptive import CaptchaAdaptiveManager
+from .captcha.journal import AttemptJournal
+from .captcha.warmup import build_recognizers, warm_http_session
+from .captcha.breaker import CaptchaBreakerRegistry
+from .captcha.budget import recognize_budget
+from .captcha.reuse import ValidationReuseTracker
+from .captcha.samples import SampleWriter
+from .captcha.service import get_service_client
+from .captcha.speculative import (
+    SpeculativeCaptcha,
+    attach_speculative,
+    discard_speculative,
+    get_speculative,
+    pop_speculative,
+)
 from . import rate_limit
+from .clock import server_clock
+from .scheduler import Cadence, PauseGate, Scheduler
+from .pool import HealthScoredPool
+from .session_cache import SessionCache, export_client, import_client
 from .parser import get_tables, get_courses, get_courses_with_detail, get_sida
 from .hook import _dump_request
 from .iaaa import IAAAClient
 from .elective import ElectiveClient
 from .const import (
     CAPTCHA_CACHE_DIR,
+    SESSION_CACHE_DIR,
+    ElectiveURL,
     USER_AGENT_LIST,
     WEB_LOG_DIR,
     WECHAT_MSG,
@@ -40,11 +60,16 @@ from .const import (
 from .exceptions import *
 from ._internal import mkdir
 from .notification.bark_push import Notify
+from .engine import current_scope
 
+_engine_scope = current_scope()  # set when an ElectiveEngine imports its own copy of this module
 environ = Environ()
 config = AutoElectiveConfig()
-cout = ConsoleLogger("loop")
-ferr = FileLogger("loop.error")  # loop 的子日志，同步输出到 console
+cout = ConsoleLogger("loop" if _engine_scope is None else _engine_scope.logger_name("loop"))
+ferr = FileLogger(  # loop 的子日志，同步输出到 console
+    "loop.error" if _engine_scope is None else _engine_scope.logger_name("loop.error")
+)
+_shared_adapter = None if _engine_scope is None else _engine_scope.shared.adapter
 
 username = config.iaaa_id
 password = config.iaaa_password
@@ -56,10 +81,15 @@ supply_cancel_page = config.supply_cancel_page
 iaaa_client_timeout = config.iaaa_client_timeout
 elective_client_timeout = config.elective_client_timeout
 login_loop_interval = config.login_loop_interval
+LOGIN_CONCURRENCY = config.login_concurrency
+SESSION_REFRESH_ENABLE = config.session_refresh_enable
+SESSION_REFRESH_LEAD_SECONDS = config.session_refresh_lead_seconds
+SESSION_REFRESH_INTERVAL = config.session_refresh_interval
 elective_client_pool_size = config.elective_client_pool_size
 elective_client_max_life = config.elective_client_max_life
 is_print_mutex_rules = config.is_print_mutex_rules
 REFRESH_BACKOFF_ENABLE = config.refresh_backoff_enable
+REFRESH_FIXED_CADENCE = config.refresh_fixed_cadence
 REFRESH_BACKOFF_FACTOR = config.refresh_backoff_factor
 REFRESH_BACKOFF_MAX = config.refresh_backoff_max
 REFRESH_BACKOFF_THRESHOLD = config.refresh_backoff_threshold
@@ -69,6 +99,11 @@ IAAA_BACKOFF_MAX = config.iaaa_backoff_max
 IAAA_BACKOFF_THRESHOLD = config.iaaa_backoff_threshold
 CLIENT_POOL_RESET_THRESHOLD = config.client_pool_reset_threshold
 CLIENT_POOL_RESET_COOLDOWN = config.client_pool_reset_cooldown
+CLIENT_POOL_TARGETED_RECOVERY = config.client_pool_targeted_recovery
+POOL_HEALTH_ENABLE = config.pool_health_enable
+SESSION_CACHE_ENABLE = config.session_cache_enable
+SESSION_CACHE_KEY = config.session_cache_key
+POOL_QUARANTINE_THRESHOLD = config.pool_quarantine_threshold
 notify = Notify(
     _disable_push=config.disable_push,
     _token=config.wechat_token,
@@ -100,6 +135,12 @@ if not _recognizer_names:
 
 
 def _build_recognizer(target_name):
+    if _engine_scope is not None:
+        return _engine_scope.shared.recognizer(target_name, _new_recognizer)
+    return _new_recognizer(target_name)
+
+
+def _new_recognizer(target_name):
     try:
         provider, model_name = parse_target_token(target_name)
     except Exception:
@@ -110,10 +151,46 @@ def _build_recognizer(target_name):
     return get_recognizer(provider, model_name=model_name)
 
 
-_recognizer_map = {n: _build_recognizer(n) for n in _recognizer_names}
+def _on_recognizer_late_ready(task):
+    cout.info(
+        "Recognizer %s ready after %.2fs (background init)"
+        % (task.name, task.time_to_ready or 0.0)
+    )
+
+
+CAPTCHA_INIT_TIMEOUT = config.captcha_init_timeout
+CAPTCHA_WARMUP_ENABLE = config.captcha_warmup_enable
+_recognizer_map, _recognizer_init_report = build_recognizers(
+    _recognizer_names,
+    _build_recognizer,
+    timeout=CAPTCHA_INIT_TIMEOUT,
+    warmup=CAPTCHA_WARMUP_ENABLE,
+    on_ready=_on_recognizer_late_ready,
+)
+for _item in _recognizer_init_report:
+    if _item["ready"]:
+        cout.info(
+            "Recognizer %s ready: init=%.3fs%s"
+            % (
+                _item["name"],
+                _item["init_s"] or 0.0,
+                "" if _item["warmup_s"] is None else " warmup=%.3fs" % _item["warmup_s"],
+            )
+        )
+    else:
+        cout.warning(
+            "Recognizer %s not ready at startup (%s), continuing in background"
+            % (_item["name"], _item["error"] or "timeout %ss" % CAPTCHA_INIT_TIMEOUT)
+        )
 recognizers = [_recognizer_map[n] for n in _recognizer_names]
-recognizer_index = 0
-recognizer = recognizers[0]
+# Keep the configured chain order; start on the first provider that is initialized.
+# Until every provider is ready, selection goes back to the head of the chain as
+# soon as an earlier one finishes initializing.
+_recognizer_wait_ready = not all(getattr(r, "ready", True) for r in recognizers)
+recognizer_index = next(
+    (ix for ix, r in enumerate(recognizers) if getattr(r, "ready", True)), 0
+)
+recognizer = recognizers[recognizer_index]
 RECOGNIZER_MAX_ATTEMPT = 15
 MIN_REFRESH_INTERVAL = 0.1
 CAPTCHA_DEGRADE_FAILURES = config.captcha_degrade_failures
@@ -123,6 +200,11 @@ CAPTCHA_DEGRADE_NOTIFY = config.captcha_degrade_notify
 CAPTCHA_DEGRADE_NOTIFY_INTERVAL = config.captcha_degrade_notify_interval
 CAPTCHA_SWITCH_ON_DEGRADE = config.captcha_switch_on_degrade
 CAPTCHA_VALIDATE_ROUND_TIMEOUT = config.captcha_validate_round_timeout
+CAPTCHA_RECOGNIZER_FAIL_FAST = config.captcha_recognizer_fail_fast
+CAPTCHA_SPECULATIVE_ENABLE = config.captcha_speculative_enable
+CAPTCHA_SPECULATIVE_ON_FULL = config.captcha_speculative_on_full
+CAPTCHA_SPECULATIVE_DELAY_MARGIN = config.captcha_speculative_delay_margin
+CAPTCHA_SPECULATIVE_MAX_AGE = config.captcha_speculative_max_age
 
 CAPTCHA_PROBE_ENABLED = config.captcha_probe_enabled
 CAPTCHA_PROBE_INTERVAL = config.captcha_probe_interval
@@ -134,6 +216,8 @@ CAPTCHA_PROBE_SHARE_POOL = config.captcha_probe_share_pool
 CAPTCHA_SAMPLE_ENABLE = config.captcha_sample_enable
 CAPTCHA_SAMPLE_RATE = config.captcha_sample_rate
 CAPTCHA_SAMPLE_DIR = config.captcha_sample_dir
+CAPTCHA_SAMPLE_STORE = config.captcha_sample_store
+CAPTCHA_SAMPLE_QUEUE_SIZE = config.captcha_sample_queue_size
 CAPTCHA_ADAPTIVE_UPDATE_INTERVAL = config.captcha_adaptive_update_interval
 CAPTCHA_ADAPTIVE_FAIL_STREAK = config.captcha_adaptive_fail_streak_degrade
 CAPTCHA_ADAPTIVE_SCORE_ALPHA = config.captcha_adaptive_score_alpha
@@ -154,6 +238,25 @@ adaptive = CaptchaAdaptiveManager(
     fail_streak_degrade=CAPTCHA_ADAPTIVE_FAIL_STREAK,
     score_alpha=CAPTCHA_ADAPTIVE_SCORE_ALPHA,
     score_beta=CAPTCHA_ADAPTIVE_SCORE_BETA,
+    policy=config.captcha_adaptive_policy,
+    decay_half_life=config.captcha_adaptive_decay_half_life,
+    ucb_c=config.captcha_adaptive_ucb_c,
+)
+
+captcha_breakers = CaptchaBreakerRegistry(
+    enabled=config.captcha_breaker_enable,
+    timeout_threshold=config.captcha_breaker_timeout_threshold,
+    rate_limit_threshold=config.captcha_breaker_rate_limit_threshold,
+    server_threshold=config.captcha_breaker_server_threshold,
+    open_seconds=config.captcha_breaker_open_seconds,
+    max_open_seconds=config.captcha_breaker_max_open_seconds,
+    half_open_max_calls=config.captcha_breaker_half_open_calls,
+)
+
+validation_reuse = ValidationReuseTracker(
+    enabled=config.captcha_validation_reuse,
+    min_samples=config.captcha_validation_reuse_min_samples,
+    min_success_rate=config.captcha_validation_reuse_min_success_rate,
 )
 
 OFFLINE_ENABLED = config.offline_enabled
@@ -173,6 +276,9 @@ NOT_IN_OPERATION_SCHEDULE_TTL_SECONDS = getattr(
 NOT_IN_OPERATION_DYNAMIC_LONG_SLEEP_MAX = getattr(
     config, "not_in_operation_dynamic_long_sleep_max", 3600.0
 )
+NOT_IN_OPERATION_PRECISE_WAKE = config.not_in_operation_precise_wake
+NOT_IN_OPERATION_PRECISE_WAKE_WINDOW = config.not_in_operation_precise_wake_window
+NOT_IN_OPERATION_PRECISE_WAKE_MAX_ERROR = config.not_in_operation_precise_wake_max_error
 HTML_PARSE_ERROR_THRESHOLD = config.html_parse_error_threshold
 HTML_PARSE_COOLDOWN_SECONDS = config.html_parse_cooldown_seconds
 HTML_PARSE_RESET_SESSIONS = config.html_parse_reset_sessions
@@ -187,11 +293,25 @@ CAPTCHA_ADAPTIVE_PERSIST_PATH = getattr(
 CAPTCHA_ADAPTIVE_PERSIST_INTERVAL_SECONDS = getattr(
     config, "captcha_adaptive_persist_interval_seconds", 60.0
 )
+CAPTCHA_ADAPTIVE_JOURNAL_ENABLE = config.captcha_adaptive_journal_enable
+CAPTCHA_ADAPTIVE_JOURNAL_PATH = config.captcha_adaptive_journal_path
+CAPTCHA_ADAPTIVE_JOURNAL_COMPACT_BYTES = config.captcha_adaptive_journal_compact_bytes
 
 WARMUP_AFTER_LOGIN_ENABLE = getattr(config, "warmup_after_login_enable", False)
+PREOPEN_WARMUP_ENABLE = config.preopen_warmup_enable
+PREOPEN_WARMUP_LEAD_SECONDS = config.preopen_warmup_lead_seconds
+PREOPEN_WARMUP_HOLD_SECONDS = config.preopen_warmup_hold_seconds
 
 RUNTIME_STAT_REPORT_INTERVAL = getattr(config, "runtime_stat_report_interval", 0)
-electivePool = Queue(maxsize=elective_client_pool_size)
+if POOL_HEALTH_ENABLE:
+    electivePool = HealthScoredPool(
+        maxsize=elective_client_pool_size,
+        quarantine_threshold=POOL_QUARANTINE_THRESHOLD,
+        life_margin=SESSION_REFRESH_LEAD_SECONDS,
+    )
+else:
+    electivePool = Queue(maxsize=elective_client_pool_size)
+environ.client_pool = electivePool
 probePool = None
 _probe_pool_shared = False
 if CAPTCHA_PROBE_ENABLED:
@@ -218,6 +338,13 @@ _elective_consecutive_errors = 0
 _last_pool_reset_at = 0.0
 _client_generation = 0
 _critical_cooldown_until = 0.0
+_critical_cooldown_reason = ""
+_login_backoff_until = 0.0
+_login_lock = threading.Lock()
+_iaaa_workers = {}  # login worker id -> thread, see run_iaaa_loop
+_iaaa_workers_lock = threading.Lock()
+_pool_fill = {"reason": None, "started_at": 0.0, "logins": 0, "target": 0}
+_recovery = {"path": None, "reason": None, "started_at": 0.0, "logins": 0}
 _last_critical_notify_at = 0.0
 _offline_active = False
 _offline_next_probe_at = 0.0
@@ -227,9 +354,11 @@ _not_in_operation_streak = 0
 _last_not_in_operation_at = 0.0
 _html_parse_streak = 0
 _auth_error_streak = 0
-_sample_seq = 0
-_sample_dir_ready = False
+_sample_writer = None
 _pool_reset_lock = threading.Lock()
+_session_cache = None
+_session_cache_clients = {}  # {(pool_kind, id): client}
+_session_cache_lock = threading.Lock()
 _stats_lock = threading.Lock()
 _rate_lock = threading.Lock()
 _error_agg_lock = threading.Lock()
@@ -239,13 +368,26 @@ _sample_lock = threading.Lock()
 _adaptive_persist_lock = threading.Lock()
 _adaptive_persist_last_at = 0.0
 _adaptive_snapshot_loaded = False
+_adaptive_journal = None
+_speculative_recognizers = {}
+_speculative_recognizer_lock = threading.Lock()
 _help_schedule_lock = threading.Lock()
 _help_schedule_fetched_at = 0.0
 _help_schedule_items = None
 _not_in_operation_min_refresh_dynamic = NOT_IN_OPERATION_MIN_REFRESH
 _not_in_operation_backoff_reason = ""
+_not_in_operation_wake_at = 0.0
+_preopen_start_ts = None
+_preopen_jobs = []
+_preopen_warm_report = {}
 _error_agg_last = 0.0
 _error_agg_counts = defaultdict(int)
+_periodic_jobs = []
+scheduler = Scheduler(
+    "Scheduler" if _engine_scope is None else "Scheduler[%s]" % _engine_scope.name,
+    on_error=lambda name, e: ferr.error("%s: %s" % (name, e)),
+)
+SCHEDULER_STAT_INTERVAL = 5.0
 _RATE_KEYS = {
     "probe_attempt",
     "probe_success",
@@ -306,6 +448,10 @@ def _compute_backoff(base, errors, threshold, factor, max_extra):
 def _apply_not_in_operation_backoff(base_sleep, had_not_in_operation):
     if not had_not_in_operation:
         return base_sleep
+    if _not_in_operation_wake_at > 0:
+        left = _not_in_operation_wake_at - time.time()
+        if left > 0:
+            return left  # precise wake-up at the operation start overrides refresh/backoff
     mr = _not_in_operation_min_refresh_dynamic
     if mr is None:
         mr = NOT_IN_OPERATION_MIN_REFRESH
@@ -314,6 +460,21 @@ def _apply_not_in_operation_backoff(base_sleep, had_not_in_operation):
     return max(base_sleep, mr)
 
 
+def _round_sleep(base_sleep, had_not_in_operation, cadence):
+    """
+    Sleep before the next main loop round. With `refresh_fixed_cadence` the round
+    itself (SupplyCancel RTT, elect attempts) counts towards the interval, except
+    for a precise not-in-operation wake, which is already the exact time left.
+    """
+    precise_wake = had_not_in_operation and _not_in_operation_wake_at > time.time()
+    t = _apply_not_in_operation_backoff(base_sleep, had_not_in_operation)
+    if REFRESH_FIXED_CADENCE:
+        _stat_set_gauge("refresh_round_ms", int(cadence.elapsed() * 1000))
+        if not precise_wake:
+            t = cadence.remaining(t, MIN_REFRESH_INTERVAL)
+    return t
+
+
 _re_cn_datetime = re.compile(
     r"(?:(?P<y>\d{4})年)?(?P<m>\d{1,2})月(?P<d>\d{1,2})日"
     r"(?:(?P<ap>上午|下午|晚上|中午))?(?P<h>\d{1,2}):(?P<min>\d{2})"
@@ -464,16 +625,224 @@ def _find_next_operation_start(now_ts, schedule_items):
     return min(candidates, key=lambda x: x.get("start_ts", float("inf")))
 
 
+def _precise_wake_in(start_ts, now):
+    """
+    Seconds until the request should be sent to reach the server at `start_ts`
+    (server clock), and a short description of the clock sync; (None, None) when
+    the clock is not synced well enough or the moment has passed.
+    """
+    if not NOT_IN_OPERATION_PRECISE_WAKE:
+        return None, None
+    est = server_clock.estimate(now)
+    if est is None or est["error"] > NOT_IN_OPERATION_PRECISE_WAKE_MAX_ERROR:
+        return None, None
+    wake_in = start_ts - est["offset"] - est["rtt"] / 2.0 - now
+    if wake_in <= 0:
+        return None, None
+    sync = "offset=%+.3fs±%.3f, rtt=%.3fs" % (est["offset"], est["error"], est["rtt"])
+    return wake_in, sync
+
+
+def _publish_clock_stats():
+    est = server_clock.estimate()
+    if est is None:
+        return
+    _stat_set_gauge("clock_offset_ms", round(est["offset"] * 1000.0, 1))
+    _stat_set_gauge("clock_error_ms", round(est["error"] * 1000.0, 1))
+    _stat_set_gauge("clock_rtt_ms", round(est["rtt"] * 1000.0, 1))
+    _stat_set_gauge("clock_samples", est["samples"])
+
+
+def _plan_preopen_warmup(start_ts, now=None):
+    """
+    Schedule the pre-open warm-up `PREOPEN_WARMUP_LEAD_SECONDS` before the operation
+    starting at `start_ts` (server time) and the readiness report at T-0. Planning
+    the same start again is a no-op; a new start replaces the old plan.
+    """
+    global _preopen_start_ts
+    if not PREOPEN_WARMUP_ENABLE:
+        return False
+    if _preopen_start_ts == start_ts:
+        return False
+    now = time.time() if now is None else now
+    est = server_clock.estimate(now)
+    start_local = start_ts - (est["offset"] if est is not None else 0.0)
+    if start_local <= now:
+        return False
+    for job in _preopen_jobs:
+        job.cancel()
+    del _preopen_jobs[:]
+    _preopen_start_ts = start_ts
+    base = time.monotonic() - now  # local wall time -> scheduler (monotonic) time
+    warm_at = max(now, start_local - PREOPEN_WARMUP_LEAD_SECONDS)
+    _preopen_jobs.append(
+        scheduler.call_at(base + warm_at, lambda: _run_preopen_warmup(start_local), "preopen_warmup")
+    )
+    _preopen_jobs.append(
+        scheduler.call_at(base + start_local, lambda: _report_preopen_readiness(start_local), "preopen_ready")
+    )
+    cout.info(
+        "Pre-open warm-up planned at %s (T-%ds)"
+        % (_format_timestamp(warm_at), int(start_local - warm_at))
+    )
+    return True
+
+
+def _preopen_relogin_expiring(start_local):
+    """
+    Move pooled clients that are logged out or expire before `start_local + hold`
+    to the relogin pool, so the IAAA loop logs them in before the window opens.
+    """
+    limit = start_local + PREOPEN_WARMUP_HOLD_SECONDS
+    moved = 0
+    pools = [(electivePool, "electivePool")]
+    if probePool is not None and not _probe_pool_shared:
+        pools.append((probePool, "probePool"))
+    for pool, name in pools:
+        for _ in range(pool.qsize()):
+            try:
+                c = pool.get_nowait()
+            except Empty:
+                break
+            if c is killedElective or _is_stale_client(c):
+                _return_client(pool, c, name)
+                continue
+            if not c.has_logined or (c.expired_time != -1 and c.expired_time < limit):
+                _return_client(reloginPool, c, "reloginPool")
+                moved += 1
+            else:
+                _return_client(pool, c, name)
+    return moved
+
+
+def _preopen_warm_connections():
+    """
+    Open TCP/TLS to elective from pooled clients and to the OCR providers, only while
+    the rate-limit budget has room (warm-up never delays the critical path).
+    """
+    url = ElectiveURL.HelpController
+    warmed = skipped = 0
+    for _ in range(electivePool.qsize()):
+        try:
+            c = electivePool.get_nowait()
+        except Empty:
+            break
+        try:
+            if c is killedElective or not rate_limit.has_budget(url):
+                skipped += 1
+                continue
+            rate_limit.throttle(url)
+            if warm_http_session(c._session, url, timeout=min(5.0, elective_client_timeout)):
+                warmed += 1
+        finally:
+            _return_client(electivePool, c, "electivePool")
+    ocr = 0
+    for rec in recognizers:
+        try:
+            rec.warmup()
+            ocr += 1
+        except Exception as e:
+            ferr.error(e)
+    return {"elective": warmed, "elective_skipped": skipped, "ocr": ocr}
+
+
+def _preopen_clear_degrade():
+    global _captcha_failure_count, _captcha_degrade_until, _critical_cooldown_until
+    cleared = _captcha_is_degraded() or _captcha_failure_count > 0
+    _captcha_failure_count = 0
+    _captcha_degrade_until = 0.0
+    adaptive.set_frozen(False)
+    if _critical_cooldown_reason == "not_in_operation" and _critical_cooldown_until > time.time():
+        _critical_cooldown_until = 0.0  # must not outlast T-0; other cooldowns are kept
+        cleared = True
+    return cleared
+
+
+def _run_preopen_warmup(start_local):
+    global _preopen_warm_report
+    cout.info("Pre-open warm-up: T-%.0fs" % max(0.0, start_local - time.time()))
+    report = {"relogin": _preopen_relogin_expiring(start_local)}
+    report.update(_preopen_warm_connections())
+    client = None
+    try:
+        client = electivePool.get_nowait()
+    except Empty:
+        pass
+    try:
+        if client is not None and client is not killedElective and client.has_logined:
+            if rate_limit.has_budget(ElectiveURL.HelpController):
+                report["schedule"] = bool(_get_help_schedule(elective=client, force_refresh=True))
+    except Exception as e:
+        ferr.error(e)
+        report["schedule"] = False
+    finally:
+        _return_client(electivePool, client, "electivePool")
+    report["degrade_cleared"] = _preopen_clear_degrade()
+    _preopen_warm_report = report
+    _stat_inc("preopen_warmup")
+    cout.info(
+        "Pre-open warm-up done: %s" % ", ".join("%s=%s" % kv for kv in sorted(report.items()))
+    )
+    return report
+
+
+def _preopen_readiness():
+    ready = expiring = 0
+    limit = time.time() + PREOPEN_WARMUP_HOLD_SECONDS
+    for c in list(electivePool.queue):
+        if c is killedElective:
+            continue
+        if c.has_logined and (c.expired_time == -1 or c.expired_time >= limit):
+            ready += 1
+        else:
+            expiring += 1
+    return {
+        "clients_ready": ready,
+        "clients_expiring": expiring,
+        "relogin_pending": reloginPool.qsize(),
+        "recognizers_ready": sum(1 for r in recognizers if getattr(r, "ready", True)),
+        "recognizers": len(recognizers),
+        "captcha_degraded": _captcha_is_degraded(),
+        "warmup": dict(_preopen_warm_report),
+    }
+
+
+def _report_preopen_readiness(start_local):
+    global _preopen_start_ts
+    r = _preopen_readiness()
+    _preopen_start_ts = None
+    _stat_set_gauge("preopen_clients_ready", r["clients_ready"])
+    _stat_set_gauge("preopen_recognizers_ready", r["recognizers_ready"])
+    est = server_clock.estimate()
+    cout.info(
+        "Readiness at T-0 (%s): clients ready=%d expiring=%d relogin_pending=%d, "
+        "recognizers ready=%d/%d, captcha_degraded=%s, clock=%s"
+        % (
+            _format_timestamp(start_local),
+            r["clients_ready"],
+            r["clients_expiring"],
+            r["relogin_pending"],
+            r["recognizers_ready"],
+            r["recognizers"],
+            r["captcha_degraded"],
+            "unsynced" if est is None else "%+.3fs±%.3f" % (est["offset"], est["error"]),
+        )
+    )
+    return r
+
+
 def _update_not_in_operation_backoff(elective=None):
     """
     Update dynamic backoff when we hit NotInOperationTimeError.
     Only increases sleep to reduce useless traffic before operation begins.
     """
     global _not_in_operation_min_refresh_dynamic, _not_in_operation_backoff_reason
+    global _not_in_operation_wake_at
     now = time.time()
     mr = NOT_IN_OPERATION_MIN_REFRESH
     cooldown = NOT_IN_OPERATION_COOLDOWN_SECONDS
     reason = "static"
+    wake_at = 0.0
 
     if NOT_IN_OPERATION_DYNAMIC_ENABLE:
         sched = _get_help_schedule(elective=elective)
@@ -494,14 +863,28 @@ def _update_not_in_operation_backoff(elective=None):
                 computed = 10.0
             else:
                 computed = mr
-            mr = max(mr, computed)
-            cooldown = min(max(0.0, cooldown), mr)
+            wake_in, sync = _precise_wake_in(start_ts, now)
+            if wake_in is not None and wake_in <= NOT_IN_OPERATION_PRECISE_WAKE_WINDOW:
+                # one sleep straight to the (server-clock) start; no cooldown on top
+                wake_at = now + wake_in
+                mr = wake_in
+                cooldown = 0.0
+            else:
+                if wake_in is not None:
+                    # coarse steps, but never past the start of the precise window
+                    computed = min(computed, max(mr, wake_in - NOT_IN_OPERATION_PRECISE_WAKE_WINDOW))
+                mr = max(mr, computed)
+                cooldown = min(max(0.0, cooldown), mr)
             try:
                 start_str = datetime.fromtimestamp(start_ts).strftime("%Y-%m-%d %H:%M:%S")
             except Exception:
                 start_str = str(start_ts)
             reason = "next=%s@%s, delta=%ss" % (nxt.get("name"), start_str, int(delta))
+            _plan_preopen_warmup(start_ts, now)
+            if wake_at > 0:
+                reason += ", wake in %.3fs (%s)" % (wake_in, sync)
 
+    _not_in_operation_wake_at = wake_at
     _not_in_operation_min_refresh_dynamic = mr
     _not_in_operation_backoff_reason = reason
     _stat_set_gauge("not_in_operation_min_refresh", mr)
@@ -510,8 +893,8 @@ def _update_not_in_operation_backoff(elective=None):
     return mr, reason
 
 
-def _adaptive_persist_path_abs():
-    path = (CAPTCHA_ADAPTIVE_PERSIST_PATH or "").strip()
+def _abs_cache_path(path):
+    path = (path or "").strip()
     if not path:
         return None
     # Use cwd-relative path by default (repo root).
@@ -520,50 +903,115 @@ def _adaptive_persist_path_abs():
     return os.path.normpath(os.path.abspath(path))
 
 
+def _adaptive_persist_path_abs():
+    return _abs_cache_path(CAPTCHA_ADAPTIVE_PERSIST_PATH)
+
+
+def _get_adaptive_journal():
+    """
+    Lazily open the attempt journal and attach it to `adaptive` (None when disabled).
+    """
+    global _adaptive_journal
+    if not CAPTCHA_ADAPTIVE_JOURNAL_ENABLE:
+        return None
+    path = _abs_cache_path(CAPTCHA_ADAPTIVE_JOURNAL_PATH)
+    if not path:
+        return None
+    if _adaptive_journal is None or _adaptive_journal.path != path:
+        _adaptive_journal = AttemptJournal(path)
+    adaptive.set_journal(_adaptive_journal)
+    return _adaptive_journal
+
+
+def _attach_captcha_service():
+    """
+    With a shared recognition service, report attempts there and start from its
+    adaptive stats (the whole fleet's view). Returns True when stats were loaded.
+    """
+    if not config.captcha_service_url or not config.captcha_service_share_adaptive:
+        return False
+    client = get_service_client(config.captcha_service_url, config.captcha_service_timeout)
+    adaptive.add_listener(client)
+    snap = client.adaptive_snapshot()
+    if snap and adaptive.load_snapshot(snap):
+        _stat_inc("adaptive_service_load")
+        cout.info("Adaptive snapshot loaded from captcha service: %s" % client.url)
+        return True
+    return False
+
+
 def _load_adaptive_snapshot_once():
     global _adaptive_snapshot_loaded
     if _adaptive_snapshot_loaded:
         return False
     _adaptive_snapshot_loaded = True
-    if not CAPTCHA_ADAPTIVE_PERSIST_ENABLE:
-        return False
+    journal = _get_adaptive_journal()
+    if not CAPTCHA_ADAPTIVE_PERSIST_ENABLE and journal is None:
+        return _attach_captcha_service()
     path = _adaptive_persist_path_abs()
-    if not path:
-        return False
-    try:
-        with open(path, "r", encoding="utf-8") as fp:
-            data = stdjson.load(fp)
-        snap = data.get("snapshot") if isinstance(data, dict) else None
-        if snap is None and isinstance(data, dict):
-            snap = data
-        ok = adaptive.load_snapshot(snap)
-        if ok:
-            _stat_inc("adaptive_persist_load")
-            cout.info("Adaptive snapshot loaded: %s" % path)
-        return ok
-    except FileNotFoundError:
-        return False
-    except Exception as e:
-        ferr.error(e)
-        return False
+    ok = False
+    saved_at = None
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as fp:
+                data = stdjson.load(fp)
+            snap = data.get("snapshot") if isinstance(data, dict) else None
+            if snap is None and isinstance(data, dict):
+                snap = data
+            ok = adaptive.load_snapshot(snap)
+            if ok:
+                if isinstance(data, dict) and isinstance(data.get("saved_at"), (int, float)):
+                    saved_at = float(data["saved_at"])
+                _stat_inc("adaptive_persist_load")
+                cout.info("Adaptive snapshot loaded: %s" % path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            ferr.error(e)
+    if journal is not None:
+        try:
+            n = journal.replay(adaptive, since=saved_at)
+            if n:
+                _stat_inc("adaptive_journal_replay", n)
+                cout.info("Adaptive journal replayed: %d attempts from %s" % (n, journal.path))
+            ok = ok or n > 0
+        except Exception as e:
+            ferr.error(e)
+    return _attach_captcha_service() or ok
 
 
-def _maybe_persist_adaptive(force=False):
+def _maybe_persist_adaptive(force=False, scheduled=False):
+    """
+    Without a journal: rewrite the snapshot every persist interval.
+    With a journal: attempts are already durable, so the snapshot is only written as a
+    compaction checkpoint when the journal outgrows `adaptive_journal_compact_bytes`.
+    `scheduled`: the scheduler owns the cadence, so the wall-clock interval check is
+    skipped (a slightly early tick would otherwise skip a whole period).
+    """
     global _adaptive_persist_last_at
-    if not CAPTCHA_ADAPTIVE_PERSIST_ENABLE:
+    journal = _get_adaptive_journal()
+    if not CAPTCHA_ADAPTIVE_PERSIST_ENABLE and journal is None:
         return False
-    interval = float(CAPTCHA_ADAPTIVE_PERSIST_INTERVAL_SECONDS or 0.0)
     now = time.time()
-    if not force and interval > 0 and (now - _adaptive_persist_last_at) < interval:
-        return False
+    if journal is not None:
+        limit = int(CAPTCHA_ADAPTIVE_JOURNAL_COMPACT_BYTES or 0)
+        if not force and (limit <= 0 or journal.size() < limit):
+            return False
+    else:
+        interval = float(CAPTCHA_ADAPTIVE_PERSIST_INTERVAL_SECONDS or 0.0)
+        if not (force or scheduled) and interval > 0 and (now - _adaptive_persist_last_at) < interval:
+            return False
     if not _adaptive_persist_lock.acquire(blocking=False):
         return False
     try:
-        if not force and interval > 0 and (now - _adaptive_persist_last_at) < interval:
+        if journal is None and not (force or scheduled) and interval > 0 and (now - _adaptive_persist_last_at) < interval:
             return False
         _adaptive_persist_last_at = now
         snap = adaptive.snapshot()
-        payload = {"saved_at": now, "snapshot": snap}
+        # the checkpoint covers exactly what the snapshot saw: journal lines appended
+        # after it was taken stay for replay
+        covered = snap.get("taken_at", now)
+        payload = {"saved_at": covered, "snapshot": snap}
         path = _adaptive_persist_path_abs()
         if not path:
             return False
@@ -576,6 +1024,11 @@ def _maybe_persist_adaptive(force=False):
         os.replace(tmp, path)
         _stat_inc("adaptive_persist_write")
         _stat_set_gauge("adaptive_persist_last_at", int(now))
+        if journal is not None:
+            kept = journal.compact(covered)
+            _stat_inc("adaptive_journal_compact")
+            _stat_set_gauge("adaptive_journal_bytes", journal.size())
+            cout.info("Adaptive journal compacted (%d attempts kept)" % kept)
         return True
     except Exception as e:
         ferr.error(e)
@@ -584,6 +1037,43 @@ def _maybe_persist_adaptive(force=False):
         _adaptive_persist_lock.release()
 
 
+def _publish_scheduler_stats():
+    st = scheduler.stats()
+    for k in ("jobs", "runs", "errors", "skipped", "lag_last_ms", "lag_max_ms", "lag_avg_ms"):
+        _stat_set_gauge("scheduler_%s" % k, st[k])
+
+
+def _start_periodic_jobs():
+    """
+    Register the periodic work of this loop with `scheduler` (replacing any earlier
+    registration, e.g. after the thread guard restarted the elective loop).
+    """
+    _stop_periodic_jobs()
+    jobs = [
+        scheduler.call_every(SCHEDULER_STAT_INTERVAL, _publish_scheduler_stats, "scheduler_stats"),
+        scheduler.call_every(SCHEDULER_STAT_INTERVAL, _publish_clock_stats, "clock_stats"),
+    ]
+    if RUNTIME_ERROR_AGG_INTERVAL > 0:
+        jobs.append(scheduler.call_every(
+            RUNTIME_ERROR_AGG_INTERVAL, lambda: _maybe_report_error_agg(scheduled=True), "error_agg"
+        ))
+    if SESSION_REFRESH_ENABLE:
+        jobs.append(scheduler.call_every(SESSION_REFRESH_INTERVAL, _refresh_sessions, "session_refresh"))
+    if CAPTCHA_ADAPTIVE_PERSIST_ENABLE or _get_adaptive_journal() is not None:
+        interval = float(CAPTCHA_ADAPTIVE_PERSIST_INTERVAL_SECONDS or 0.0)
+        jobs.append(scheduler.call_every(
+            max(1.0, interval), lambda: _maybe_persist_adaptive(scheduled=True), "adaptive_persist"
+        ))
+    _periodic_jobs.extend(jobs)
+    return jobs
+
+
+def _stop_periodic_jobs():
+    for job in _periodic_jobs:
+        job.cancel()
+    del _periodic_jobs[:]
+
+
 def _is_stale_client(client):
     gen = getattr(client, "_gen", None)
     if gen is None:
@@ -592,7 +1082,7 @@ def _is_stale_client(client):
 
 
 def _make_client(id, pool_kind="elective"):
-    c = ElectiveClient(id=id, timeout=elective_client_timeout)
+    c = ElectiveClient(id=id, timeout=elective_client_timeout, adapter=_shared_adapter)
     c.set_user_agent(random.choice(USER_AGENT_LIST))
     c._gen = _client_generation
     c._pool_kind = pool_kind
@@ -627,6 +1117,277 @@ def _return_client(queue, client, name):
     _safe_put(queue, client, name)
 
 
+def _finish_client_round(client, failed, latency=None):
+    """
+    Give the client back after a loop round. With a health-scored elective pool the
+    round is recorded first, and a client whose error streak reached the threshold
+    is quarantined alone (sent to re-login) instead of going back to the pool.
+    """
+    if client is not killedElective:
+        # per-client error attribution for targeted recovery
+        client._err_streak = getattr(client, "_err_streak", 0) + 1 if failed else 0
+    record = getattr(electivePool, "record", None)
+    if record is not None and client is not killedElective and record(client, not failed, latency):
+        _stat_inc("client_quarantine")
+        cout.warning("client: %s quarantined after repeated errors, relogin" % client.id)
+        _return_client(reloginPool, client, "reloginPool")
+        return True
+    _return_client(electivePool, client, "electivePool")
+    return False
+
+
+def _pool_has_healthy_client():
+    healthy_count = getattr(electivePool, "healthy_count", None)
+    return healthy_count is not None and healthy_count() > 0
+
+
+def _seed_client_pools(skip=()):
+    """
+    Fresh clients for the elective (and separate probe) pool. With several login
+    workers they go straight to the relogin pool instead of waiting for the elective
+    / probe loop to find them logged out one by one. `skip` holds the
+    (pool_kind, id) slots already filled, e.g. by restored sessions.
+    """
+    direct = LOGIN_CONCURRENCY > 1
+    for ix in range(1, elective_client_pool_size + 1):
+        if ("elective", ix) in skip:
+            continue
+        if direct:
+            _safe_put(reloginPool, _make_client(ix), "reloginPool")
+        else:
+            _safe_put(electivePool, _make_client(ix), "electivePool")
+    if probePool is not None and not _probe_pool_shared:
+        for ix in range(1, CAPTCHA_PROBE_POOL_SIZE + 1):
+            if ("probe", ix) in skip:
+                continue
+            if direct:
+                _safe_put(reloginPool, _make_probe_client(ix), "reloginPool")
+            else:
+                _safe_put(probePool, _make_probe_client(ix), "probePool")
+
+
+def _begin_pool_fill(reason, restored=0):
+    with _login_lock:
+        _pool_fill["target"] = elective_client_pool_size + probe_pool_extra - restored
+        _pool_fill["reason"] = reason if _pool_fill["target"] > 0 else None
+        _pool_fill["started_at"] = time.time()
+        _pool_fill["logins"] = 0
+
+
+def _record_pool_login():
+    """
+    Count a successful login towards the current pool fill; report time-to-full-pool.
+    """
+    with _login_lock:
+        if _recovery["path"] is not None:
+            _recovery["logins"] += 1
+        if _pool_fill["reason"] is None:
+            return None
+        _pool_fill["logins"] += 1
+        if _pool_fill["logins"] < _pool_fill["target"]:
+            return None
+        dt = time.time() - _pool_fill["started_at"]
+        reason = _pool_fill["reason"]
+        _pool_fill["reason"] = None
+    _stat_inc("pool_fill_complete")
+    _stat_set_gauge("pool_fill_seconds", round(dt, 3))
+    cout.info("Client pool full in %.1fs (%s, login_concurrency=%d)" % (dt, reason, LOGIN_CONCURRENCY))
+    return dt
+
+
+def _begin_recovery(path, reason):
+    with _login_lock:
+        _recovery["path"] = path
+        _recovery["reason"] = reason
+        _recovery["started_at"] = time.time()
+        _recovery["logins"] = 0
+
+
+def _finish_recovery():
+    """
+    First successful elective round after a recovery: report its time and logins spent.
+    """
+    with _login_lock:
+        path = _recovery["path"]
+        if path is None:
+            return None
+        dt = time.time() - _recovery["started_at"]
+        logins = _recovery["logins"]
+        reason = _recovery["reason"]
+        _recovery["path"] = None
+    _stat_inc("recovery_%s_done" % path)
+    _stat_set_gauge("recovery_%s_seconds" % path, round(dt, 3))
+    _stat_set_gauge("recovery_%s_logins" % path, logins)
+    cout.info("Recovered in %.1fs with %d login(s) (%s, %s)" % (dt, logins, path, reason))
+    return dt, logins
+
+
+def _get_session_cache():
+    global _session_cache
+    if not SESSION_CACHE_ENABLE:
+        return None
+    if _session_cache is None:
+        # file name does not reveal the student id
+        name = "%s.bin" % hashlib.sha256(str(username).encode("utf-8")).hexdigest()[:16]
+        _session_cache = SessionCache(
+            os.path.join(SESSION_CACHE_DIR, name),
+            SESSION_CACHE_KEY or password,
+            str(username),
+        )
+    return _session_cache
+
+
+def _cache_session(client):
+    """
+    Remember a freshly logged-in client and rewrite the session cache with every
+    live session.
+    """
+    cache = _get_session_cache()
+    if cache is None:
+        return
+    with _session_cache_lock:
+        _session_cache_clients[(_client_pool_kind(client), client.id)] = client
+        live = [
+            c for c in _session_cache_clients.values()
+            if not _is_stale_client(c) and c.has_logined and not c.is_expired
+        ]
+    try:
+        cache.save(export_client(c) for c in live)
+        _stat_inc("session_cache_save")
+    except Exception as e:
+        ferr.error(e)
+        _stat_inc("session_cache_save_error")
+
+
+def _validate_cached_session(client):
+    try:
+        client.get_ShowResults()
+        return True
+    except NotInOperationTimeError:
+        return True  # a reply from the logged-in system; the session is fine
+    except Exception as e:
+        cout.info("Cached session of client %s rejected (%s)" % (client.id, e.__class__.__name__))
+        return False
+
+
+def _restore_cached_sessions():
+    """
+    Warm start: put cached sessions that pass one cheap logged-in request back into
+    their pools. Returns the restored (pool_kind, id) slots; the others are seeded
+    and logged in as usual.
+    """
+    cache = _get_session_cache()
+    if cache is None:
+        return set()
+    t0 = time.time()
+    try:
+        entries = cache.load()
+    except Exception as e:
+        ferr.error(e)
+        entries = []
+    restored = set()
+    for e in entries:
+        kind, ix = e.get("kind", "elective"), e.get("id")
+        if kind == "probe":
+            if probePool is None or _probe_pool_shared:
+                continue
+            size = CAPTCHA_PROBE_POOL_SIZE
+        else:
+            kind, size = "elective", elective_client_pool_size
+        if not isinstance(ix, int) or not 1 <= ix <= size or (kind, ix) in restored:
+            continue
+        client = import_client(_make_client(ix, kind), e)
+        if not _validate_cached_session(client):
+            _stat_inc("session_cache_rejected")
+            continue
+        restored.add((kind, ix))
+        with _session_cache_lock:
+            _session_cache_clients[(kind, ix)] = client
+        _return_client_home(client)
+    dt = time.time() - t0
+    _stat_inc("session_cache_restored", len(restored))
+    _stat_set_gauge("session_cache_restore_seconds", round(dt, 3))
+    if entries:
+        cout.info("Restored %d/%d cached session(s) in %.2fs" % (len(restored), len(entries), dt))
+    return restored
+
+
+def _enter_login_backoff(seconds):
+    global _login_backoff_until
+    if seconds <= 0:
+        return
+    with _login_lock:
+        _login_backoff_until = max(_login_backoff_until, time.time() + seconds)
+
+
+def _wait_login_backoff():
+    """
+    Block every login worker until the shared backoff (e.g. after IAAAForbidden) ends.
+    """
+    waited = 0.0
+    while True:
+        left = _login_backoff_until - time.time()
+        if left <= 0:
+            return waited
+        step = min(5.0, left)
+        time.sleep(step)
+        waited += step
+
+
+def _client_unusable(client, now):
+    return not client.has_logined or (client.expired_time != -1 and client.expired_time <= now)
+
+
+def _refresh_sessions(now=None):
+    """
+    Rotate pooled clients out for re-login before they expire: logged-out / expired
+    ones at once, those expiring within `SESSION_REFRESH_LEAD_SECONDS` (earliest
+    first) only while another usable client stays in the pool as a warm spare.
+    Publishes the number of healthy ready clients.
+    """
+    now = time.time() if now is None else now
+    pools = [(electivePool, "electivePool")]
+    if probePool is not None and not _probe_pool_shared:
+        pools.append((probePool, "probePool"))
+    rotated = healthy = 0
+    for pool, name in pools:
+        keep, soon = [], []
+        for _ in range(pool.qsize()):
+            try:
+                c = pool.get_nowait()
+            except Empty:
+                break
+            if c is killedElective or _is_stale_client(c):
+                _return_client(pool, c, name)
+            elif _client_unusable(c, now):
+                _return_client(reloginPool, c, "reloginPool")
+                _stat_inc("session_rotate_expired")
+                rotated += 1
+            elif c.expired_time != -1 and c.expired_time - now <= SESSION_REFRESH_LEAD_SECONDS:
+                soon.append(c)
+            else:
+                keep.append(c)
+        soon.sort(key=lambda c: c.expired_time)
+        usable = len(keep) + len(soon)
+        for c in soon:
+            if usable > 1:
+                _return_client(reloginPool, c, "reloginPool")
+                _stat_inc("session_rotate")
+                rotated += 1
+                usable -= 1
+            else:
+                keep.append(c)  # last usable client: keep serving until it expires
+        for c in keep:
+            _return_client(pool, c, name)
+        if pool is electivePool:
+            healthy = sum(
+                1 for c in keep
+                if c.expired_time == -1 or c.expired_time - now > SESSION_REFRESH_LEAD_SECONDS
+            )
+    _stat_set_gauge("session_healthy_ready", healthy)
+    return rotated
+
+
 def _reset_client_pool(reason, force=False):
     global _client_generation, _last_pool_reset_at
     if not _pool_reset_lock.acquire(blocking=False):
@@ -661,11 +1422,9 @@ def _reset_client_pool(reason, force=False):
             except Empty:
                 break
 
-        for ix in range(1, elective_client_pool_size + 1):
-            _safe_put(electivePool, _make_client(ix), "electivePool")
-        if probePool is not None and not _probe_pool_shared:
-            for ix in range(1, CAPTCHA_PROBE_POOL_SIZE + 1):
-                _safe_put(probePool, _make_probe_client(ix), "probePool")
+        _seed_client_pools()
+        _begin_pool_fill(reason)
+        _begin_recovery("full", reason)
         _stat_set_gauge("elective_pool_qsize", electivePool.qsize())
         if probePool is not None:
             _stat_set_gauge("probe_pool_qsize", probePool.qsize())
@@ -675,6 +1434,62 @@ def _reset_client_pool(reason, force=False):
         _pool_reset_lock.release()
 
 
+def _recover_faulty_clients(reason):
+    """
+    Targeted recovery: recycle (fresh session, re-login) only the pooled elective
+    clients whose own last round failed, keeping the warm ones. False leaves it to
+    the full `_reset_client_pool`: nothing attributable, or a targeted recovery
+    already ran and the errors went on.
+    """
+    if not CLIENT_POOL_TARGETED_RECOVERY:
+        return False
+    with _login_lock:
+        escalate = _recovery["path"] == "targeted"
+    if escalate:
+        _stat_inc("recovery_targeted_escalate")
+        return False
+    if not _pool_reset_lock.acquire(blocking=False):
+        _stat_inc("pool_reset_skipped_lock")
+        return False
+    try:
+        drained = []
+        while True:
+            try:
+                drained.append(electivePool.get_nowait())
+            except Empty:
+                break
+        faulty = [
+            c for c in drained
+            if c is not killedElective and getattr(c, "_err_streak", 0) > 0
+        ]
+        if not faulty:
+            for c in drained:
+                _safe_put(electivePool, c, "electivePool")
+            return False
+        faulty_ids = set(id(c) for c in faulty)
+        for c in drained:
+            if id(c) not in faulty_ids:
+                _safe_put(electivePool, c, "electivePool")
+        for c in faulty:
+            fresh = _make_client(c.id, _client_pool_kind(c))
+            if LOGIN_CONCURRENCY > 1:
+                _safe_put(reloginPool, fresh, "reloginPool")
+            else:
+                _safe_put(electivePool, fresh, "electivePool")
+        _stat_inc("recovery_targeted_count")
+        _stat_inc("recovery_targeted_clients", len(faulty))
+        _begin_recovery("targeted", reason)
+        cout.warning(
+            "Recycle %d/%d faulty client(s) (%s): %s"
+            % (len(faulty), len(drained), reason, ", ".join(str(c.id) for c in faulty))
+        )
+        _stat_set_gauge("elective_pool_qsize", electivePool.qsize())
+        _stat_set_gauge("relogin_pool_qsize", reloginPool.qsize())
+        return True
+    finally:
+        _pool_reset_lock.release()
+
+
 def _ignore_course(course, reason):
     ignored[course.to_simplified()] = reason
 
@@ -748,12 +1563,13 @@ def _error_agg_record(key):
         pass
 
 
-def _maybe_report_error_agg():
+def _maybe_report_error_agg(scheduled=False):
     global _error_agg_last
     if RUNTIME_ERROR_AGG_INTERVAL <= 0:
         return
     now = time.time()
-    if now - _error_agg_last < RUNTIME_ERROR_AGG_INTERVAL:
+    # when scheduled, the scheduler's fixed-rate ticks are the interval
+    if not scheduled and now - _error_agg_last < RUNTIME_ERROR_AGG_INTERVAL:
         return
     try:
         with _error_agg_lock:
@@ -873,67 +1689,291 @@ def _record_captcha_failure():
             _notify_degraded("Captcha degraded")
 
 
-def _ensure_sample_dir():
-    global _sample_dir_ready
-    if _sample_dir_ready:
-        return True
-    try:
-        mkdir(CAPTCHA_SAMPLE_DIR)
-        _sample_dir_ready = True
-    except Exception:
-        _sample_dir_ready = False
-    return _sample_dir_ready
+def _get_sample_writer():
+    global _sample_writer
+    with _sample_lock:
+        w = _sample_writer
+        if w is None or w.dir != CAPTCHA_SAMPLE_DIR or w.store != CAPTCHA_SAMPLE_STORE:
+            if w is not None:
+                w.close(timeout=1.0)
+            w = SampleWriter(
+                CAPTCHA_SAMPLE_DIR,
+                store=CAPTCHA_SAMPLE_STORE,
+                max_queue=CAPTCHA_SAMPLE_QUEUE_SIZE,
+                on_stat=_stat_inc,
+            )
+            _sample_writer = w
+        return w
 
 
-def _guess_image_ext(raw):
-    if not raw:
-        return "bin"
-    if raw.startswith(b"\x89PNG\r\n\x1a\n"):
-        return "png"
-    if raw.startswith(b"\xff\xd8"):
-        return "jpg"
-    if raw.startswith((b"GIF87a", b"GIF89a")):
-        return "gif"
-    if raw.startswith(b"BM"):
-        return "bmp"
-    return "bin"
+def _flush_captcha_samples(timeout=5.0):
+    w = _sample_writer
+    if w is None:
+        return True
+    return w.flush(timeout)
 
 
 def _maybe_sample_captcha(raw, provider=None, context=None, draw_dt=None):
+    # Hot path: only a sampling decision and a queue put; hashing and I/O happen in the writer thread.
+    # Returns the submitted bytes (for _annotate_captcha_sample) or None.
     if not CAPTCHA_SAMPLE_ENABLE:
-        return
+        return None
     if raw is None:
-        return
+        return None
     if CAPTCHA_SAMPLE_RATE < 1.0 and random.random() > CAPTCHA_SAMPLE_RATE:
-        return
-    if not _ensure_sample_dir():
-        return
+        return None
     try:
-        ext = _guess_image_ext(raw)
-        ts = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
-        h = hashlib.sha1(raw).hexdigest()[:12]
-        with _sample_lock:
-            global _sample_seq
-            _sample_seq += 1
-            seq = _sample_seq
-        base = "%s_%s_%d" % (ts, h, seq)
-        img_path = os.path.join(CAPTCHA_SAMPLE_DIR, base + "." + ext)
-        meta_path = os.path.join(CAPTCHA_SAMPLE_DIR, base + ".json")
-        with open(img_path, "wb") as fp:
-            fp.write(raw)
         meta = {
-            "ts": ts,
             "provider": provider,
             "context": context,
             "loop": environ.elective_loop,
             "draw_dt": draw_dt,
-            "size": len(raw),
         }
-        with open(meta_path, "w", encoding="utf-8") as fp:
-            fp.write(stdjson.dumps(meta, ensure_ascii=False))
-        _stat_inc("captcha_sample_saved")
+        if _get_sample_writer().submit(raw, meta):
+            return raw
     except Exception:
         _stat_inc("captcha_sample_error")
+    return None
+
+
+def _annotate_captcha_sample(sampled, code, valid, recog_dt=None, val_dt=None):
+    # Attach the recognized code and Validate outcome to a sampled image (evaluation DB input).
+    if sampled is None:
+        return
+    try:
+        _get_sample_writer().annotate(
+            sampled, {"pred": code, "valid": valid, "recog_dt": recog_dt, "val_dt": val_dt}
+        )
+    except Exception:
+        _stat_inc("captcha_sample_error")
+
+
+_recognizer_ready_reported = None
+
+
+def _report_recognizer_readiness():
+    global _recognizer_ready_reported
+    ready = []
+    for name in list(_recognizer_names):
+        r = _recognizer_map.get(name)
+        if r is not None and getattr(r, "ready", True):
+            ready.append(name)
+    if ready == _recognizer_ready_reported:
+        return
+    _recognizer_ready_reported = ready
+    _stat_set_gauge("captcha_recognizers_ready", len(ready))
+    _stat_set_gauge("captcha_recognizers_total", len(_recognizer_names))
+    for item in _recognizer_init_report:
+        r = _recognizer_map.get(item["name"])
+        task = getattr(r, "task", None)
+        ttr = task.time_to_ready if task is not None else item["init_s"]
+        if ttr is not None and item["name"] in ready:
+            _stat_set_gauge("captcha_time_to_ready_ms:%s" % item["name"], int(ttr * 1000))
+
+
+def _select_usable_recognizer():
+    """
+    Keep the current recognizer if it is initialized and its breaker lets a call
+    through, otherwise move to the first one in chain order that does.
+    Returns False only when every initialized provider is blocked by its breaker.
+    """
+    global recognizer_index, recognizer, _recognizer_wait_ready
+    _report_recognizer_readiness()
+    n = len(recognizers)
+    if n == 0:
+        return True
+    if _recognizer_wait_ready:
+        order = list(range(n))  # chain order: pick up providers that just became ready
+        if all(getattr(r, "ready", True) for r in recognizers):
+            _recognizer_wait_ready = False
+    else:
+        order = [recognizer_index] + [i for i in range(n) if i != recognizer_index]
+    blocked = False
+    for ix in order:
+        r = recognizers[ix]
+        if not getattr(r, "ready", True):
+            continue
+        if not captcha_breakers.allow(_recognizer_names[ix]):
+            blocked = True
+            continue
+        if ix != recognizer_index:
+            _stat_inc("captcha_breaker_skip" if blocked else "captcha_skip_not_ready")
+            recognizer_index = ix
+            recognizer = r
+        return True
+    return not blocked
+
+
+def _hedge_recognizer_index():
+    """
+    Next initialized recognizer after the current one (chain order) whose breaker
+    is not open, i.e. where a fail-fast attempt can hedge to. None if there is none.
+    """
+    n = len(recognizers)
+    for step in range(1, n):
+        ix = (recognizer_index + step) % n
+        if getattr(recognizers[ix], "ready", True) and not captcha_breakers.is_open(_recognizer_names[ix]):
+            return ix
+    return None
+
+
+def _hedge_recognizer(ix):
+    global recognizer_index, recognizer
+    recognizer_index = ix
+    recognizer = recognizers[ix]
+    _stat_inc("captcha_recognizer_hedge")
+    cout.info("Hedge to %s for the next attempt" % _recognizer_names[ix])
+
+
+def _record_retry_budget(provider_name, budget):
+    """
+    Per-provider cost of recognizer-internal retries in one recognize call.
+    """
+    if budget.retries:
+        _stat_inc("captcha_recognizer_retry:%s" % provider_name, budget.retries)
+        _stat_inc("captcha_recognizer_retry_lost_ms:%s" % provider_name, int(budget.lost * 1000))
+    if budget.denied:
+        _stat_inc("captcha_recognizer_retry_denied:%s" % provider_name, budget.denied)
+
+
+def _record_breaker(provider_name, exc=None):
+    change = captcha_breakers.record(provider_name, exc)
+    if change is None:
+        return
+    snap = captcha_breakers.get(provider_name).snapshot()
+    _stat_set_gauge("captcha_breaker_state:%s" % provider_name, captcha_breakers.state_gauges().get(provider_name))
+    if change == "opened":
+        _stat_inc("captcha_breaker_open")
+        cout.warning(
+            "Captcha breaker opened for %s (%s, cool-down %.0fs)"
+            % (provider_name, snap.get("last_failure"), snap.get("cooldown") or 0.0)
+        )
+        usable, opened = captcha_breakers.partition(_recognizer_names)
+        _apply_recognizer_order(
+            usable + opened,
+            reason="breaker open: %s" % provider_name,
+            switch_primary=provider_name == _recognizer_names[recognizer_index],
+        )
+    else:
+        _stat_inc("captcha_breaker_close")
+        cout.info("Captcha breaker closed for %s" % provider_name)
+
+
+def _speculation_imminent(plan_map):
+    """
+    First goal course that may become electable soon: full (a seat frees when someone
+    drops) or within CAPTCHA_SPECULATIVE_DELAY_MARGIN seats of its delay threshold.
+    """
+    for ix, c in enumerate(goals):
+        if c in ignored:
+            continue
+        c0 = plan_map.get(c)
+        if c0 is None or c0.status is None:
+            continue
+        if not c0.is_available():
+            if CAPTCHA_SPECULATIVE_ON_FULL:
+                return c0
+        else:
+            delay = delays[ix]
+            if delay != NO_DELAY and c0.remaining_quota - delay <= CAPTCHA_SPECULATIVE_DELAY_MARGIN:
+                return c0
+    return None
+
+
+def _speculative_recognizer(provider):
+    # Separate instances (like the probe) so the worker never shares one with the main loop.
+    with _speculative_recognizer_lock:
+        r = _speculative_recognizers.get(provider)
+        if r is None:
+            r = _build_recognizer(provider)
+            _speculative_recognizers[provider] = r
+        return r
+
+
+def _maybe_start_speculative(elective, plan_map):
+    """
+    Prepare a recognized captcha on `elective`'s session in the background when a seat
+    looks imminent and the rate-limit budget has room. Keeps an in-flight or still-fresh one.
+    """
+    if not CAPTCHA_SPECULATIVE_ENABLE or elective is None:
+        return None
+    spec = get_speculative(elective)
+    if spec is not None and not spec.cancelled:
+        if not spec.done or (spec.ok and spec.age() < CAPTCHA_SPECULATIVE_MAX_AGE):
+            return spec
+    course = _speculation_imminent(plan_map)
+    if course is None:
+        return None
+    if not rate_limit.has_budget(ElectiveURL.DrawServlet):
+        _stat_inc("captcha_speculative_skip_budget")
+        return None
+    if not _select_usable_recognizer():
+        return None
+    provider = _recognizer_names[recognizer_index]
+    spec = attach_speculative(elective, SpeculativeCaptcha(provider, generation=getattr(elective, "_gen", None)))
+    spec.start(
+        lambda: elective.get_DrawServlet().content,
+        lambda raw: _speculative_recognizer(provider).recognize(raw),
+    )
+    _stat_inc("captcha_speculative_start")
+    cout.info("Speculative captcha with %s (%s looks imminent)" % (provider, course))
+    return spec
+
+
+def _settle_speculative(spec):
+    """
+    Cancel `spec` and wait for its in-flight DrawServlet (bounded by the request
+    timeout): landing after the caller's own Draw on the same session, it would
+    replace that captcha and fail its validation.
+    """
+    if not spec.cancel(wait=elective_client_timeout):
+        _stat_inc("captcha_speculative_draw_unsettled")
+
+
+def _take_speculative_captcha(elective, wait_budget):
+    """
+    Detach `elective`'s prepared captcha and return it if usable, else None.
+    An in-flight one is awaited up to `wait_budget` seconds: it is already ahead of a fresh Draw.
+    """
+    spec = pop_speculative(elective)
+    if spec is None:
+        return None
+    if spec.cancelled or spec.generation != getattr(elective, "_gen", None):
+        _settle_speculative(spec)
+        return None
+    t0 = time.time()
+    if not spec.done and not spec.wait(max(0.0, wait_budget)):
+        _stat_inc("captcha_speculative_late")
+        _settle_speculative(spec)
+        return None
+    spec.waited = time.time() - t0
+    if spec.error is not None:
+        ferr.error(spec.error)
+        _stat_inc("captcha_speculative_error")
+        _record_breaker(spec.provider, spec.error)
+        return None
+    if not spec.ok:
+        return None
+    _record_breaker(spec.provider)
+    if spec.age() > CAPTCHA_SPECULATIVE_MAX_AGE:
+        _stat_inc("captcha_speculative_expired")
+        return None
+    return spec
+
+
+def _record_validation_reuse(ok):
+    was_paused = validation_reuse.paused()
+    validation_reuse.record(ok)
+    _stat_inc("captcha_reuse_ok" if ok else "captcha_reuse_rejected")
+    rate = validation_reuse.success_rate()
+    if rate is not None:
+        _stat_set_gauge("captcha_reuse_success_rate", round(rate, 3))
+    paused = validation_reuse.paused()
+    if paused != was_paused:
+        cout.warning(
+            "Validation reuse %s (recent success rate %.0f%%)"
+            % ("paused" if paused else "resumed", 100.0 * (rate or 0.0))
+        )
 
 
 def _apply_recognizer_order(new_order, reason=None, switch_primary=False):
@@ -948,7 +1988,7 @@ def _apply_recognizer_order(new_order, reason=None, switch_primary=False):
             order.append(name)
     if not order:
         return False
-    if order == _recognizer_names:
+    if order == _recognizer_names and (not switch_primary or recognizer_index == 0):
         return False
     old_names = list(_recognizer_names)
     old_current = _recognizer_names[recognizer_index]
@@ -977,10 +2017,13 @@ def _apply_recognizer_order(new_order, reason=None, switch_primary=False):
 def _maybe_adaptive_reorder(reason):
     try:
         new_order, switch_primary, changed = adaptive.maybe_reorder(
-            _recognizer_names, loop_count=environ.elective_loop
+            _recognizer_names,
+            loop_count=environ.elective_loop,
+            current=_recognizer_names[recognizer_index] if _recognizer_names else None,
         )
-        if changed:
-            _apply_recognizer_order(new_order, reason=reason, switch_primary=switch_primary)
+        if changed or switch_primary:
+            usable, opened = captcha_breakers.partition(new_order)
+            _apply_recognizer_order(usable + opened, reason=reason, switch_primary=switch_primary)
         return changed
     except Exception as e:
         ferr.error(e)
@@ -1039,12 +2082,16 @@ def _report_adaptive_state():
             best = ranked[0][0] if ranked else None
             cur_score = dict(ranked).get(cur)
             best_score = dict(ranked).get(best)
-            reason = "score desc (score=p_hat-%.2f*t-%.2f*h)" % (
-                CAPTCHA_ADAPTIVE_SCORE_ALPHA,
-                CAPTCHA_ADAPTIVE_SCORE_BETA,
-            )
+            policy = snap.get("policy") or "score"
+            if policy == "score":
+                reason = "score desc (score=p_hat-%.2f*t-%.2f*h)" % (
+                    CAPTCHA_ADAPTIVE_SCORE_ALPHA,
+                    CAPTCHA_ADAPTIVE_SCORE_BETA,
+                )
+            else:
+                reason = "%s: expected time-to-validated asc (ttv=(t+h)/p)" % policy
             if cur and best and cur_score is not None and best_score is not None:
-                if best != cur and best_score >= cur_score * (1.0 + config.captcha_adaptive_epsilon):
+                if best != cur and adaptive.better_enough(best_score, cur_score):
                     reason += "; recommend switch %s->%s (%.3f -> %.3f, eps=%.2f)" % (
                         cur,
                         best,
@@ -1110,10 +2157,11 @@ def _maybe_failure_notify(count, title):
 
 
 def _enter_cooldown(reason, seconds):
-    global _critical_cooldown_until
+    global _critical_cooldown_until, _critical_cooldown_reason
     if seconds <= 0:
         return
     _critical_cooldown_until = time.time() + seconds
+    _critical_cooldown_reason = reason
     cout.warning("Enter cooldown for %s s (%s)" % (int(seconds), reason))
 
 
@@ -1393,6 +2441,14 @@ def _notify_degraded_available(tasks):
     _notify_degraded("Available (degraded): %s" % courses)
 
 
+def _wait_probe_resume(stop_event, pause_event, timeout=0.5):
+    wait_clear = getattr(pause_event, "wait_clear", None)
+    if wait_clear is not None:
+        wait_clear(timeout)  # returns as soon as the pause is lifted
+    else:
+        stop_event.wait(timeout)
+
+
 def _run_captcha_probe_loop(stop_event, pause_event):
     if not CAPTCHA_PROBE_ENABLED:
         return
@@ -1403,13 +2459,17 @@ def _run_captcha_probe_loop(stop_event, pause_event):
     next_probe_at = time.time() + (_get_probe_interval() or CAPTCHA_PROBE_INTERVAL)
 
     while not stop_event.is_set():
-        if pause_event.is_set() or _captcha_is_degraded():
-            time.sleep(0.5)
+        if pause_event.is_set():
+            _wait_probe_resume(stop_event, pause_event)
+            continue
+        if _captcha_is_degraded():
+            stop_event.wait(max(0.05, min(5.0, _captcha_degrade_until - time.time())))
             continue
 
         now = time.time()
         if now < next_probe_at:
-            time.sleep(min(0.5, next_probe_at - now))
+            # wakes at the probe deadline, or at once on stop
+            stop_event.wait(next_probe_at - now)
             continue
 
         provider_order = adaptive.get_order()
@@ -1423,6 +2483,8 @@ def _run_captcha_probe_loop(stop_event, pause_event):
         except Empty:
             next_probe_at = time.time() + (_get_probe_interval() or CAPTCHA_PROBE_INTERVAL)
             continue
+        # the probe's own Draw invalidates it anyway; just let an in-flight one land first
+        discard_speculative(client, wait=elective_client_timeout)
         if _is_stale_client(client):
             _stat_inc("client_stale_drop")
             next_probe_at = time.time() + (_get_probe_interval() or CAPTCHA_PROBE_INTERVAL)
@@ -1475,7 +2537,7 @@ def _run_captcha_probe_loop(stop_event, pause_event):
                 next_probe_at = time.time() + max(CAPTCHA_PROBE_BACKOFF, mr)
                 continue
             draw_dt = time.time() - t0
-            _maybe_sample_captcha(r.content, provider=provider, context="probe", draw_dt=draw_dt)
+            sampled = _maybe_sample_captcha(r.content, provider=provider, context="probe", draw_dt=draw_dt)
 
             t1 = time.time()
             try:
@@ -1500,6 +2562,7 @@ def _run_captcha_probe_loop(stop_event, pause_event):
                 _stat_inc("probe_validate_parse_error")
                 next_probe_at = time.time() + CAPTCHA_PROBE_BACKOFF
                 continue
+            _annotate_captcha_sample(sampled, captcha.code, res, recog_dt, val_dt)
 
             if res == "2":
                 _stat_inc("probe_success")
@@ -1578,6 +2641,39 @@ def _safe_put(queue, item, name):
 
 
 def run_iaaa_loop():
+    """
+    Run `LOGIN_CONCURRENCY` login workers on the relogin pool; this thread is worker 0.
+    When the thread guard restarts worker 0, helpers that are still alive are kept
+    and only the missing ones are started.
+    """
+    base = threading.current_thread().name
+    with _iaaa_workers_lock:
+        _iaaa_workers[0] = threading.current_thread()
+        for k in range(1, LOGIN_CONCURRENCY):
+            t = _iaaa_workers.get(k)
+            if t is not None and t.is_alive():
+                continue
+            t = threading.Thread(target=_run_iaaa_worker, args=(k,), name="%s-%d" % (base, k))
+            t.daemon = True
+            _iaaa_workers[k] = t
+            t.start()
+    _run_iaaa_worker(0)
+
+
+def _retire_iaaa_worker(worker_id):
+    """
+    Unregister a worker that got the kill signal and pass the signal on while other
+    login workers are alive; the last one consumes it, so a restarted IAAA loop does
+    not find a stale kill signal in the relogin pool.
+    """
+    with _iaaa_workers_lock:
+        if _iaaa_workers.get(worker_id) is threading.current_thread():
+            del _iaaa_workers[worker_id]
+        if any(t.is_alive() for t in _iaaa_workers.values()):
+            _safe_put(reloginPool, killedElective, "reloginPool")
+
+
+def _run_iaaa_worker(worker_id=0):
     global _iaaa_consecutive_errors
     elective = None
 
@@ -1594,20 +2690,21 @@ def run_iaaa_loop():
                 elective = None
                 continue
             if elective is killedElective:
-                cout.info("Quit IAAA loop")
+                _retire_iaaa_worker(worker_id)
+                cout.info("Quit IAAA loop" if worker_id == 0 else "Quit IAAA worker %d" % worker_id)
                 return
+        _wait_login_backoff()  # also holds workers that were blocked on the relogin pool
         _stat_set_gauge("relogin_pool_qsize", reloginPool.qsize())
         _stat_set_gauge("iaaa_consecutive_errors", _iaaa_consecutive_errors)
 
         environ.iaaa_loop += 1
-        _maybe_report_error_agg()
         user_agent = random.choice(USER_AGENT_LIST)
 
         cout.info("Try to login IAAA (client: %s)" % elective.id)
         cout.info("User-Agent: %s" % user_agent)
 
         try:
-            iaaa = IAAAClient(timeout=iaaa_client_timeout)  # not reusable
+            iaaa = IAAAClient(timeout=iaaa_client_timeout, adapter=_shared_adapter)  # not reusable
             iaaa.set_user_agent(user_agent)
 
             # request elective's home page to get cookies
@@ -1650,9 +2747,11 @@ def run_iaaa_loop():
                 except Exception as e:
                     ferr.error(e)
 
+            _cache_session(elective)
             _return_client_home(elective)
             elective = None
             iaaa_error = False
+            _record_pool_login()
 
         except (ServerError, StatusCodeError) as e:
             ferr.error(e)
@@ -1692,6 +2791,7 @@ def run_iaaa_loop():
             iaaa_error = True
             _reset_runtime_state("iaaa_forbidden")
             _enter_cooldown("iaaa_forbidden", CRITICAL_COOLDOWN_SECONDS)
+            _enter_login_backoff(CRITICAL_COOLDOWN_SECONDS)  # all login workers back off together
             _maybe_failure_notify(
                 _iaaa_consecutive_errors,
                 "IAAAForbidden (cooldown %ss)" % int(CRITICAL_COOLDOWN_SECONDS),
@@ -1762,10 +2862,14 @@ def run_iaaa_loop():
 def run_elective_loop():
     global _elective_consecutive_errors, _not_in_operation_streak, _last_not_in_operation_at
     global _not_in_operation_min_refresh_dynamic, _not_in_operation_backoff_reason
+    global _not_in_operation_wake_at
     elective = None
     noWait = False
 
     _load_adaptive_snapshot_once()
+    _report_recognizer_readiness()
+    _start_periodic_jobs()
+    cadence = Cadence()
 
     ## load courses
 
@@ -1814,14 +2918,12 @@ def run_elective_loop():
 
     ## setup elective pool
 
-    for ix in range(1, elective_client_pool_size + 1):
-        _safe_put(electivePool, _make_client(ix), "electivePool")
-    if probePool is not None and not _probe_pool_shared:
-        for ix in range(1, CAPTCHA_PROBE_POOL_SIZE + 1):
-            _safe_put(probePool, _make_probe_client(ix), "probePool")
+    restored = _restore_cached_sessions()
+    _seed_client_pools(skip=restored)
+    _begin_pool_fill("startup", restored=len(restored))
 
     probe_stop = threading.Event()
-    probe_pause = threading.Event()
+    probe_pause = PauseGate()
     probe_thread = None
     if CAPTCHA_PROBE_ENABLED and probePool is not None:
         probe_thread = threading.Thread(
@@ -1859,6 +2961,7 @@ def run_elective_loop():
     cout.info("iaaa_client_timeout: %s" % iaaa_client_timeout)
     cout.info("elective_client_timeout: %s" % elective_client_timeout)
     cout.info("login_loop_interval: %s" % login_loop_interval)
+    cout.info("login_concurrency: %s" % LOGIN_CONCURRENCY)
     cout.info("elective_client_pool_size: %s" % elective_client_pool_size)
     cout.info("elective_client_max_life: %s" % elective_client_max_life)
     cout.info("is_print_mutex_rules: %s" % is_print_mutex_rules)
@@ -1884,12 +2987,14 @@ def run_elective_loop():
         noWait = False
         loop_error = False
         loop_error_reason = None
+        page_r = None
         network_error = False
         not_in_operation = False
         auth_error = False
         _maybe_cooldown_sleep()
         if _offline_tick(probe_pause):
             continue
+        cadence.mark()
 
         if elective is None:
             while True:
@@ -1898,6 +3003,12 @@ def run_elective_loop():
                     _stat_inc("client_stale_drop")
                     elective = None
                     continue
+                if SESSION_REFRESH_ENABLE and elective is not killedElective and _client_unusable(elective, time.time()):
+                    # the refresher missed it: re-login without spending a loop round on it
+                    _stat_inc("session_rotate_on_dequeue")
+                    _return_client(reloginPool, elective, "reloginPool")
+                    elective = None
+                    continue
                 break
 
         _stat_set_gauge("elective_pool_qsize", electivePool.qsize() + 1)
@@ -1907,7 +3018,6 @@ def run_elective_loop():
         _stat_set_gauge("elective_consecutive_errors", _elective_consecutive_errors)
 
         environ.elective_loop += 1
-        _maybe_report_error_agg()
 
         cout.info("")
         cout.info("======== Loop %d ========" % environ.elective_loop)
@@ -1985,6 +3095,7 @@ def run_elective_loop():
                 probe_stop.set()
             except Exception:
                 pass
+            _stop_periodic_jobs()
             _safe_put(reloginPool, killedElective, "reloginPool")  # kill signal
             return
 
@@ -2114,6 +3225,7 @@ def run_elective_loop():
             if len(tasks) == 0:
                 cout.info("No course available")
                 _maybe_adaptive_reorder("idle")
+                _maybe_start_speculative(elective, plan_map)
                 continue
 
             if _captcha_is_degraded() and CAPTCHA_DEGRADE_MONITOR_ONLY:
@@ -2127,6 +3239,7 @@ def run_elective_loop():
             probe_pause.set()
 
             elected = []  # cache elected courses dynamically from `get_ElectSupplement`
+            session_validated = False  # a Validate passed on this session in this round
 
             while len(tasks) > 0:
                 ix, course = tasks.popleft()
@@ -2157,11 +3270,15 @@ def run_elective_loop():
                     _notify_degraded_available([(ix, course)])
                     break
 
-                ## validate captcha first
+                ## validate captcha first (or reuse this round's validation)
 
-                validated = False
+                reusing = session_validated and validation_reuse.should_reuse()
+                if reusing:
+                    cout.info("Reuse this round's captcha validation")
+                    _stat_inc("captcha_reuse_try")
+                validated = reusing
                 round_begin = time.time()
-                for _ in range(RECOGNIZER_MAX_ATTEMPT):
+                for attempt in range(0 if reusing else RECOGNIZER_MAX_ATTEMPT):
                     if time.time() - round_begin >= CAPTCHA_VALIDATE_ROUND_TIMEOUT:
                         cout.warning(
                             "Captcha round timeout (>%ss), stop retrying and refresh"
@@ -2170,33 +3287,62 @@ def run_elective_loop():
                         _stat_inc("captcha_round_timeout")
                         _record_captcha_failure()
                         break
+                    if not _select_usable_recognizer():
+                        cout.warning("All captcha providers are circuit-broken, skip %s for now" % course)
+                        _stat_inc("captcha_breaker_all_open")
+                        break
                     provider_name = _recognizer_names[recognizer_index]
-                    cout.info("Fetch a captcha")
-                    t_draw = time.time()
-                    r = elective.get_DrawServlet()
-                    draw_dt = time.time() - t_draw
-                    _maybe_sample_captcha(
-                        r.content,
-                        provider=provider_name,
-                        context="main",
-                        draw_dt=draw_dt,
-                    )
-                    try:
-                        t_recog = time.time()
-                        _stat_inc("captcha_attempt")
-                        captcha = recognizer.recognize(r.content)
-                        recog_dt = time.time() - t_recog
-                        _stat_inc("captcha_recognize_ok")
-                    except (RecognizerError, OperationTimeoutError, OperationFailedError) as e:
-                        ferr.error(e)
-                        _stat_inc("captcha_recognize_error")
-                        adaptive.record_attempt(provider_name, False, latency=time.time() - t_recog, h_latency=None)
-                        _add_error(e)
-                        _record_captcha_failure()
-                        if _captcha_is_degraded():
-                            break
-                        cout.info("Captcha recognize failed, try again")
-                        continue
+                    spec = None
+                    if CAPTCHA_SPECULATIVE_ENABLE and attempt == 0:
+                        spec = _take_speculative_captcha(
+                            elective, CAPTCHA_VALIDATE_ROUND_TIMEOUT - (time.time() - round_begin)
+                        )
+                    if spec is not None:
+                        provider_name = spec.provider
+                        captcha = spec.captcha
+                        draw_dt, recog_dt = spec.draw_dt, spec.recog_dt
+                        cout.info("Use speculative captcha from %s (age %.1fs)" % (provider_name, spec.age()))
+                        sampled = None
+                    else:
+                        cout.info("Fetch a captcha")
+                        t_draw = time.time()
+                        r = elective.get_DrawServlet()
+                        draw_dt = time.time() - t_draw
+                        sampled = _maybe_sample_captcha(
+                            r.content,
+                            provider=provider_name,
+                            context="main",
+                            draw_dt=draw_dt,
+                        )
+                        hedge_ix = _hedge_recognizer_index() if CAPTCHA_RECOGNIZER_FAIL_FAST else None
+                        budget = None
+                        try:
+                            t_recog = time.time()
+                            _stat_inc("captcha_attempt")
+                            with recognize_budget(
+                                deadline=round_begin + CAPTCHA_VALIDATE_ROUND_TIMEOUT,
+                                fail_fast=hedge_ix is not None,
+                            ) as budget:
+                                captcha = recognizer.recognize(r.content)
+                            recog_dt = time.time() - t_recog
+                            _stat_inc("captcha_recognize_ok")
+                            _record_breaker(provider_name)
+                        except (RecognizerError, OperationTimeoutError, OperationFailedError) as e:
+                            ferr.error(e)
+                            _stat_inc("captcha_recognize_error")
+                            _record_breaker(provider_name, e)
+                            adaptive.record_attempt(provider_name, False, latency=time.time() - t_recog, h_latency=None)
+                            _add_error(e)
+                            _record_captcha_failure()
+                            if _captcha_is_degraded():
+                                break
+                            if hedge_ix is not None:
+                                _hedge_recognizer(hedge_ix)
+                            cout.info("Captcha recognize failed, try again")
+                            continue
+                        finally:
+                            if budget is not None:
+                                _record_retry_budget(provider_name, budget)
                     cout.info("Recognition result: %s" % captcha.code)
 
                     t_val = time.time()
@@ -2212,6 +3358,24 @@ def run_elective_loop():
                             break
                         cout.info("Captcha validate parse failed, try again")
                         continue
+                    _annotate_captcha_sample(sampled, captcha.code, res, recog_dt, val_dt)
+
+                    if spec is not None:
+                        # Outcome of a prepared captcha says as much about its age as about the
+                        # provider, so it is reported separately and kept out of adaptive stats.
+                        if res == "2":
+                            saved_ms = int(spec.saved_seconds() * 1000)
+                            cout.info("Validation passed (speculative captcha saved %d ms)" % saved_ms)
+                            _stat_inc("captcha_validate_pass")
+                            _stat_inc("captcha_speculative_hit")
+                            _stat_inc("captcha_speculative_saved_ms", saved_ms)
+                            _stat_set_gauge("captcha_speculative_last_saved_ms", saved_ms)
+                            _record_captcha_success()
+                            validated = True
+                            break
+                        cout.info("Speculative captcha rejected (%s), fetch a fresh one" % res)
+                        _stat_inc("captcha_speculative_miss")
+                        continue
 
                     if res == "2":
                         cout.info("Validation passed")
@@ -2241,6 +3405,7 @@ def run_elective_loop():
                     _stat_inc("captcha_round_failed")
                     # Force a refresh round quickly instead of staying in long per-course captcha loops.
                     break
+                session_validated = True
 
                 ## try to elect
 
@@ -2363,6 +3528,16 @@ def run_elective_loop():
                     )
                     continue
 
+                except CaptchaError as e:
+                    if not reusing:
+                        raise e
+                    # The reused validation was not accepted: validate again and retry this course.
+                    cout.info("Validation not reusable, re-validate for %s" % course)
+                    _record_validation_reuse(False)
+                    session_validated = False
+                    tasks.appendleft((ix, course))
+                    continue
+
                 except (RequestException, AutoElectiveException) as e:
                     # Let outer loop classify and recover (offline/auth/html/etc).
                     raise e
@@ -2375,6 +3550,9 @@ def run_elective_loop():
                     ferr.exception(e)
                     continue  # don't increase error count here
 
+                if reusing:
+                    _record_validation_reuse(True)  # the server took the submission without a new captcha
+
         except UserInputException as e:
             cout.error(e)
             _add_error(e)
@@ -2530,7 +3708,12 @@ def run_elective_loop():
             if not _offline_is_active():
                 probe_pause.clear()
             if elective is not None:  # change elective client
-                _return_client(electivePool, elective, "electivePool")
+                page_elapsed = getattr(page_r, "elapsed", None)
+                _finish_client_round(
+                    elective,
+                    loop_error,
+                    page_elapsed.total_seconds() if page_elapsed is not None else None,
+                )
                 elective = None
 
             if loop_error:
@@ -2540,10 +3723,17 @@ def run_elective_loop():
                 if CLIENT_POOL_RESET_THRESHOLD > 0 and _elective_consecutive_errors >= CLIENT_POOL_RESET_THRESHOLD:
                     if not_in_operation and NOT_IN_OPERATION_SKIP_POOL_RESET:
                         _stat_inc("pool_reset_skipped_not_in_operation")
+                    elif _pool_has_healthy_client():
+                        # failing clients are quarantined one by one; others still work
+                        _stat_inc("pool_reset_skipped_healthy")
+                    elif _recover_faulty_clients(loop_error_reason or "errors"):
+                        _elective_consecutive_errors = 0
                     elif _reset_client_pool(loop_error_reason or "errors"):
                         _elective_consecutive_errors = 0
             else:
                 _elective_consecutive_errors = 0
+                if not not_in_operation and not noWait:
+                    _finish_recovery()
 
             if network_error:
                 pass
@@ -2562,14 +3752,13 @@ def run_elective_loop():
                     _not_in_operation_min_refresh_dynamic = NOT_IN_OPERATION_MIN_REFRESH
                     _not_in_operation_backoff_reason = ""
                     _stat_set_gauge("not_in_operation_min_refresh", NOT_IN_OPERATION_MIN_REFRESH)
+                _not_in_operation_wake_at = 0.0
 
             if auth_error:
                 pass
             else:
                 _record_auth_success()
 
-            _maybe_persist_adaptive()
-
             if noWait:
                 cout.info("")
                 cout.info("======== END Loop %d ========" % environ.elective_loop)
@@ -2585,7 +3774,7 @@ def run_elective_loop():
                         REFRESH_BACKOFF_MAX,
                     )
                 t = _apply_offline_observe_delay(t)
-                t = _apply_not_in_operation_backoff(t, not_in_operation)
+                t = _round_sleep(t, not_in_operation, cadence)
                 cout.info("")
                 cout.info("======== END Loop %d ========" % environ.elective_loop)
                 cout.info("Main loop sleep %s s" % t)
@@ -84,6 +84,19 @@ def _stat_runtime():
         "gauges": dict(environ.runtime_gauges),
     })
 
+@monitor.route("/stat/pool", methods=["GET"])
+def _stat_pool():
+    pool = environ.client_pool
+    if pool is None:
+        return jsonify({})
+    snapshot = getattr(pool, "snapshot", None)
+    if snapshot is not None:
+        return jsonify(snapshot())
+    return jsonify({
+        "size": pool.qsize(),
+        "maxsize": pool.maxsize,
+    })
+
 
 def run_monitor():
     monitor.run(
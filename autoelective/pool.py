@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: pool.py
+
+"""
+Elective client pool that hands out the healthiest client instead of FIFO.
+
+`HealthScoredPool` is a `queue.Queue` (same blocking get/put, maxsize, `Full` /
+`Empty` semantics), so it drops in for `electivePool`. Per-client health lives on
+the client (`client._health`) so it follows the client between pools:
+
+  - EWMA of the SupplyCancel RTT,
+  - EWMA of the round error rate and the current error streak,
+  - time since login (a new `expired_time` on put means a fresh login, which
+    also clears the error history) and remaining life.
+
+`get()` picks the lowest score (least recently used first among equals, where
+use is a round fed to `record()`); logged-out / expired clients come first so the
+loop hands them to re-login without waiting for them to come round. `record()`
+returns True once a client's error streak reaches `quarantine_threshold`: the
+caller re-logs that one client in, and it is deprioritized for
+`quarantine_seconds` when it comes back.
+"""
+
+import math
+import time
+from queue import Queue
+
+
+class ClientHealth(object):
+
+    __slots__ = (
+        "latency",
+        "error_rate",
+        "streak",
+        "rounds",
+        "errors",
+        "last_used",
+        "login_at",
+        "login_expiry",
+        "quarantines",
+        "quarantined_until",
+    )
+
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.streak = 0
+        self.rounds = 0
+        self.errors = 0
+        self.last_used = 0.0
+        self.login_at = None
+        self.login_expiry = None
+        self.quarantines = 0
+        self.quarantined_until = 0.0
+
+    def reset_session(self, now, expiry):
+        self.latency = None
+        self.error_rate = 0.0
+        self.streak = 0
+        self.login_at = now
+        self.login_expiry = expiry
+
+
+class HealthScoredPool(Queue):
+
+    def __init__(
+        self,
+        maxsize=0,
+        latency_alpha=0.3,
+        error_alpha=0.3,
+        quarantine_threshold=3,
+        quarantine_seconds=60.0,
+        life_margin=60.0,
+        clock=time.time,
+    ):
+        self.latency_alpha = latency_alpha
+        self.error_alpha = error_alpha
+        self.quarantine_threshold = max(1, int(quarantine_threshold))
+        self.quarantine_seconds = quarantine_seconds
+        self.life_margin = life_margin
+        self._clock = clock
+        self.quarantined_total = 0
+        super().__init__(maxsize)
+
+    @staticmethod
+    def health(client):
+        h = getattr(client, "_health", None)
+        if h is None:
+            h = ClientHealth()
+            try:
+                client._health = h
+            except AttributeError:
+                pass
+        return h
+
+    ## Queue hooks (called with self.mutex held)
+
+    def _init(self, maxsize):
+        self.queue = []
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, client):
+        expiry = getattr(client, "expired_time", None)
+        if getattr(client, "has_logined", False):
+            h = self.health(client)
+            if h.login_at is None:
+                h.login_at, h.login_expiry = self._clock(), expiry
+            elif h.login_expiry != expiry:
+                h.reset_session(self._clock(), expiry)
+        self.queue.append(client)
+
+    def _get(self):
+        now = self._clock()
+        ix = min(range(len(self.queue)), key=lambda i: self._score(self.queue[i], now))
+        return self.queue.pop(ix)
+
+    ## scoring
+
+    def _remaining(self, client, now):
+        expiry = getattr(client, "expired_time", -1)
+        if expiry is None or expiry == -1:
+            return None
+        return expiry - now
+
+    def _score(self, client, now):
+        """
+        Lower is better.
+        """
+        remaining = self._remaining(client, now)
+        if not getattr(client, "has_logined", True) or (remaining is not None and remaining <= 0):
+            return float("-inf")
+        h = self.health(client)
+        score = h.latency or 0.0
+        score += 2.0 * h.error_rate + 1.0 * h.streak
+        if remaining is not None and remaining < self.life_margin:
+            score += 1.0
+        if h.quarantined_until > now:
+            score += 10.0
+        # least recently used first among equals
+        score -= min(30.0, now - h.last_used) * 1e-3
+        return score
+
+    ## health updates
+
+    def record(self, client, ok, latency=None):
+        """
+        Feed one round of `client`; True when it should be quarantined (re-logged in).
+        """
+        with self.mutex:
+            h = self.health(client)
+            h.rounds += 1
+            # only real rounds count as use: get/put sweeps over the whole pool
+            # (session refresh, pre-open warm-up, recovery) leave the LRU order alone
+            h.last_used = self._clock()
+            if latency is not None:
+                h.latency = latency if h.latency is None else (
+                    self.latency_alpha * latency + (1.0 - self.latency_alpha) * h.latency
+                )
+            h.error_rate = self.error_alpha * (0.0 if ok else 1.0) + (1.0 - self.error_alpha) * h.error_rate
+            if ok:
+                h.streak = 0
+                return False
+            h.errors += 1
+            h.streak += 1
+            if h.streak < self.quarantine_threshold:
+                return False
+            h.streak = 0
+            h.quarantines += 1
+            h.quarantined_until = self._clock() + self.quarantine_seconds
+            self.quarantined_total += 1
+            return True
+
+    def healthy_count(self):
+        """
+        Pooled clients that are logged in, not expiring and without a current error streak.
+        """
+        with self.mutex:
+            now = self._clock()
+            return sum(1 for c in self.queue if self._is_healthy(c, now))
+
+    def _is_healthy(self, client, now):
+        if not getattr(client, "has_logined", False):
+            return False
+        remaining = self._remaining(client, now)
+        if remaining is not None and remaining < self.life_margin:
+            return False
+        h = self.health(client)
+        return h.streak == 0 and h.quarantined_until <= now
+
+    def snapshot(self):
+        with self.mutex:
+            now = self._clock()
+            clients = []
+            for c in sorted(self.queue, key=lambda c: self._score(c, now)):
+                h = self.health(c)
+                remaining = self._remaining(c, now)
+                score = self._score(c, now)
+                clients.append({
+                    "id": getattr(c, "id", None),
+                    "kind": getattr(c, "_pool_kind", "elective"),
+                    "logined": bool(getattr(c, "has_logined", False)),
+                    "healthy": self._is_healthy(c, now),
+                    # logged-out / expired clients score -inf, which is not valid JSON
+                    "score": round(score, 4) if math.isfinite(score) else None,
+                    "latency_ms": None if h.latency is None else round(h.latency * 1000.0, 1),
+                    "error_rate": round(h.error_rate, 3),
+                    "streak": h.streak,
+                    "rounds": h.rounds,
+                    "errors": h.errors,
+                    "since_login": None if h.login_at is None else round(now - h.login_at, 1),
+                    "remaining_life": None if remaining is None else round(remaining, 1),
+                    "quarantines": h.quarantines,
+                    "quarantined_for": round(max(0.0, h.quarantined_until - now), 1),
+                })
+            return {
+                "size": len(self.queue),
+                "maxsize": self.maxsize,
+                "healthy": sum(1 for c in clients if c["healthy"]),
+                "quarantined_total": self.quarantined_total,
+                "clients": clients,
+            }
@@ -7,6 +7,7 @@ from dataclasses import dataclass
 from typing import Optional
 
 from .captcha.targets import ALLOWED_CAPTCHA_PROVIDERS
+from .captcha.preprocess import parse_transform_spec
 
 _LEGACY_KEY_MIGRATIONS = {
     "openai_model": "model_name",
@@ -166,6 +167,20 @@ def run_preflight(config) -> list[PreflightIssue]:
     except Exception as e:
         _add("ERROR", "captcha_code_length_range_read_failed", f"Unable to read captcha code length range: {e}")
 
+    # [captcha] upload preprocessing specs
+    for key, attr, allowed in (
+        ("image_transform", "captcha_image_transform", None),
+        ("gemini_image_transform", "gemini_image_transform", None),
+        ("baidu_image_transform", "baidu_image_transform", ("jpeg", "png")),
+    ):
+        try:
+            spec = getattr(config, attr, None)
+            parse_transform_spec(spec if isinstance(spec, str) else "", allowed_formats=allowed)
+        except ValueError as e:
+            _add("ERROR", "captcha_image_transform_invalid", f"Invalid captcha.{key}: {e}", f"captcha.{key}")
+        except Exception as e:
+            _add("ERROR", "captcha_image_transform_read_failed", f"Unable to read captcha.{key}: {e}", f"captcha.{key}")
+
     # [client] refresh / deviation / pool size
     try:
         refresh = config.refresh_interval
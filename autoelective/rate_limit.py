@@ -39,6 +39,16 @@ class TokenBucket:
                 time.sleep(wait)
                 waited += wait
 
+    def available(self, tokens=1.0):
+        """
+        Whether `tokens` could be consumed right now without sleeping (does not consume).
+        """
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            elapsed = max(0.0, time.monotonic() - self.last)
+            return min(self.capacity, self.tokens + elapsed * self.rate) >= float(tokens)
+
 
 _enabled = False
 _global_bucket = None
@@ -125,3 +135,19 @@ def throttle(url):
             _stat_inc_call("rate_limit_sleep")
             _stat_set_call("rate_limit_last_sleep", round(wait_total, 4))
     return wait_total
+
+
+def has_budget(url, tokens=1.0):
+    """
+    Whether a request to `url` would go through without a rate-limit sleep right now.
+    Used by optional background work so it never eats into the critical path's budget.
+    """
+    if not _enabled:
+        return True
+    if _global_bucket is not None and not _global_bucket.available(tokens):
+        return False
+    host = urlparse(url).hostname or ""
+    bucket = _host_buckets.get(host)
+    if bucket is not None and not bucket.available(tokens):
+        return False
+    return True
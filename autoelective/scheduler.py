@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: scheduler.py
+
+"""
+One monotonic-clock scheduler for periodic and deferred work.
+
+`Scheduler` keeps its timers in a heap and runs them on one daemon thread that
+sleeps until the earliest deadline (or until a new, earlier timer is added), so
+nothing is polled. Periodic timers are fixed-rate: the next deadline is the
+previous *scheduled* time plus the interval, so a slow run does not push every
+later run back; periods missed entirely are skipped, not replayed.
+
+Lag (how late a timer fired compared to its deadline) is tracked per
+scheduler and exposed by `stats()`.
+
+`Cadence` gives the same drift compensation to a loop that sleeps itself (the
+elective main loop): the time already spent in the round, SupplyCancel RTT
+included, is taken off the next sleep.
+
+`PauseGate` is a `threading.Event` that can also be waited on for being
+*cleared*, so a paused worker resumes as soon as the pause is lifted.
+"""
+
+import heapq
+import threading
+import time
+from itertools import count
+
+
+class _Timer(object):
+
+    __slots__ = ("when", "seq", "fn", "interval", "name", "cancelled")
+
+    def __init__(self, when, seq, fn, interval, name):
+        self.when = when
+        self.seq = seq
+        self.fn = fn
+        self.interval = interval
+        self.name = name
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.when, self.seq) < (other.when, other.seq)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler(object):
+
+    def __init__(self, name="Scheduler", clock=time.monotonic, on_error=None):
+        self.name = name
+        self._clock = clock
+        self._on_error = on_error
+        self._cond = threading.Condition(threading.Lock())
+        self._heap = []
+        self._seq = count()
+        self._thread = None
+        self._stopped = False
+        self._runs = 0
+        self._errors = 0
+        self._skipped = 0
+        self._lag_last = 0.0
+        self._lag_max = 0.0
+        self._lag_sum = 0.0
+
+    ## registration
+
+    def call_at(self, when, fn, name=None):
+        """
+        Run `fn()` once at monotonic time `when`. Returns a handle with `.cancel()`.
+        """
+        return self._push(when, fn, None, name)
+
+    def call_later(self, delay, fn, name=None):
+        return self._push(self._clock() + max(0.0, delay), fn, None, name)
+
+    def call_every(self, interval, fn, name=None, initial_delay=None):
+        """
+        Run `fn()` every `interval` seconds at a fixed rate; the first run is after
+        `initial_delay` (default: one interval).
+        """
+        if interval <= 0:
+            raise ValueError("interval must be > 0: %r" % interval)
+        delay = interval if initial_delay is None else max(0.0, initial_delay)
+        return self._push(self._clock() + delay, fn, float(interval), name)
+
+    def _push(self, when, fn, interval, name):
+        with self._cond:
+            timer = _Timer(when, next(self._seq), fn, interval, name or getattr(fn, "__name__", "job"))
+            heapq.heappush(self._heap, timer)
+            self._stopped = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            elif self._heap[0] is timer:
+                self._cond.notify()
+        return timer
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopped = True
+            del self._heap[:]
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    ## execution
+
+    def _next_due(self):
+        """
+        Block until a timer is due; returns (timer, lag) or None once stopped.
+        """
+        with self._cond:
+            while True:
+                if self._stopped:
+                    return None
+                while self._heap and self._heap[0].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                now = self._clock()
+                timer = self._heap[0]
+                if timer.when > now:
+                    self._cond.wait(timer.when - now)
+                    continue
+                heapq.heappop(self._heap)
+                return timer, now - timer.when
+
+    def _run(self):
+        while True:
+            item = self._next_due()
+            if item is None:
+                return
+            timer, lag = item
+            try:
+                timer.fn()
+            except Exception as e:
+                self._errors += 1
+                if self._on_error is not None:
+                    try:
+                        self._on_error(timer.name, e)
+                    except Exception:
+                        pass
+            with self._cond:
+                self._runs += 1
+                self._lag_last = lag
+                self._lag_sum += lag
+                self._lag_max = max(self._lag_max, lag)
+                if timer.interval is not None and not timer.cancelled and not self._stopped:
+                    when = timer.when + timer.interval
+                    now = self._clock()
+                    if when <= now:
+                        missed = int((now - when) // timer.interval) + 1
+                        self._skipped += missed
+                        when += missed * timer.interval
+                    timer.when = when
+                    timer.seq = next(self._seq)
+                    heapq.heappush(self._heap, timer)
+
+    def stats(self):
+        with self._cond:
+            pending = sum(1 for t in self._heap if not t.cancelled)
+            return {
+                "jobs": pending,
+                "runs": self._runs,
+                "errors": self._errors,
+                "skipped": self._skipped,
+                "lag_last_ms": round(self._lag_last * 1000.0, 3),
+                "lag_max_ms": round(self._lag_max * 1000.0, 3),
+                "lag_avg_ms": round(self._lag_sum * 1000.0 / self._runs, 3) if self._runs else 0.0,
+            }
+
+
+class Cadence(object):
+    """
+    Fixed-cadence pacing for a loop that does its own sleeping.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._begin = clock()
+
+    def mark(self):
+        self._begin = self._clock()
+
+    def elapsed(self):
+        return max(0.0, self._clock() - self._begin)
+
+    def remaining(self, interval, minimum=0.0):
+        """
+        Sleep left until `interval` seconds after the last `mark()`, at least `minimum`.
+        """
+        return max(minimum, interval - self.elapsed())
+
+
+class PauseGate(object):
+    """
+    `threading.Event` look-alike whose clearing can be waited for too.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._flag = False
+
+    def is_set(self):
+        return self._flag
+
+    def set(self):
+        with self._cond:
+            self._flag = True
+            self._cond.notify_all()
+
+    def clear(self):
+        with self._cond:
+            self._flag = False
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: self._flag, timeout)
+
+    def wait_clear(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._flag, timeout)
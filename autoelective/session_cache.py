@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# filename: session_cache.py
+
+"""
+Encrypted on-disk cache of logged-in elective sessions (cookie jar, User-Agent,
+`expired_time`), so a restarted process can skip IAAA + SSO login.
+
+Only the standard library is used: the key is PBKDF2-HMAC-SHA256 of a secret (the
+IAAA password unless `session_cache_key` is set) with a per-file random salt, and
+the payload is encrypted with an HMAC-SHA256 keystream (CTR construction) and then
+authenticated with HMAC-SHA256 over header + ciphertext (encrypt-then-MAC). A file
+that is missing, truncated, tampered with, written for another account or with
+another secret loads as empty, and the caller falls back to normal login.
+
+File layout: MAGIC | salt (16) | nonce (16) | ciphertext | tag (32)
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+from requests.cookies import create_cookie
+
+MAGIC = b"AESC1"
+_SALT_SIZE = 16
+_NONCE_SIZE = 16
+_TAG_SIZE = 32
+_VERSION = 1
+
+
+def _derive_keys(secret, salt, iterations):
+    material = hashlib.pbkdf2_hmac("sha256", secret.encode("utf-8"), salt, iterations, dklen=64)
+    return material[:32], material[32:]
+
+
+def _keystream_xor(key, nonce, data):
+    out = bytearray(len(data))
+    for block in range(0, len(data), 32):
+        pad = hmac.new(key, nonce + (block // 32).to_bytes(8, "big"), hashlib.sha256).digest()
+        chunk = data[block:block + 32]
+        out[block:block + len(chunk)] = bytes(a ^ b for a, b in zip(chunk, pad))
+    return bytes(out)
+
+
+def export_client(client):
+    """
+    Serializable state of a logged-in client.
+    """
+    cookies = []
+    for c in client._session.cookies:
+        cookies.append({
+            "name": c.name,
+            "value": c.value,
+            "domain": c.domain,
+            "path": c.path,
+            "secure": c.secure,
+            "expires": c.expires,
+        })
+    return {
+        "id": client.id,
+        "kind": getattr(client, "_pool_kind", "elective"),
+        "user_agent": client.user_agent,
+        "expired_time": client.expired_time,
+        "cookies": cookies,
+    }
+
+
+def import_client(client, entry):
+    """
+    Load cookies, User-Agent and expired_time from `entry` into a fresh client.
+    """
+    for c in entry.get("cookies", []):
+        client._session.cookies.set_cookie(create_cookie(
+            name=c["name"],
+            value=c["value"],
+            domain=c.get("domain", ""),
+            path=c.get("path", "/"),
+            secure=bool(c.get("secure", False)),
+            expires=c.get("expires"),
+        ))
+    if entry.get("user_agent"):
+        client.set_user_agent(entry["user_agent"])
+    client.set_expired_time(entry.get("expired_time", -1))
+    return client
+
+
+class SessionCache(object):
+
+    def __init__(self, path, secret, account, iterations=100000, clock=time.time):
+        if not secret:
+            raise ValueError("session cache needs a non-empty secret")
+        self.path = path
+        self.account = account
+        self._secret = secret
+        self._iterations = iterations
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._salt = None
+        self._keys = None
+
+    def _keys_for(self, salt):
+        # PBKDF2 is slow on purpose: derive once per salt, reuse for every save
+        if self._keys is None or self._salt != salt:
+            self._keys = _derive_keys(self._secret, salt, self._iterations)
+            self._salt = salt
+        return self._keys
+
+    def save(self, entries):
+        """
+        Write `entries` (see `export_client`) atomically; returns the number saved.
+        """
+        entries = list(entries)
+        payload = json.dumps({
+            "version": _VERSION,
+            "account": self.account,
+            "saved_at": self._clock(),
+            "clients": entries,
+        }, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            salt = self._salt or os.urandom(_SALT_SIZE)
+            enc_key, mac_key = self._keys_for(salt)
+            nonce = os.urandom(_NONCE_SIZE)
+            header = MAGIC + salt + nonce
+            body = header + _keystream_xor(enc_key, nonce, payload)
+            blob = body + hmac.new(mac_key, body, hashlib.sha256).digest()
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = "%s.%d.tmp" % (self.path, os.getpid())
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(blob)
+            os.replace(tmp, self.path)
+        return len(entries)
+
+    def load(self, now=None):
+        """
+        Cached client entries that have not expired yet; [] when there is nothing usable.
+        """
+        try:
+            with open(self.path, "rb") as fp:
+                blob = fp.read()
+        except OSError:
+            return []
+        head = len(MAGIC) + _SALT_SIZE + _NONCE_SIZE
+        if len(blob) < head + _TAG_SIZE or not blob.startswith(MAGIC):
+            return []
+        body, tag = blob[:-_TAG_SIZE], blob[-_TAG_SIZE:]
+        salt = body[len(MAGIC):len(MAGIC) + _SALT_SIZE]
+        nonce = body[len(MAGIC) + _SALT_SIZE:head]
+        with self._lock:
+            enc_key, mac_key = self._keys_for(salt)
+        if not hmac.compare_digest(hmac.new(mac_key, body, hashlib.sha256).digest(), tag):
+            return []
+        try:
+            data = json.loads(_keystream_xor(enc_key, nonce, body[head:]).decode("utf-8"))
+        except ValueError:
+            return []
+        if data.get("version") != _VERSION or data.get("account") != self.account:
+            return []
+        now = self._clock() if now is None else now
+        return [
+            e for e in data.get("clients", [])
+            if e.get("cookies") and (e.get("expired_time", -1) == -1 or e["expired_time"] > now)
+        ]
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -7,6 +7,8 @@ import os
 import pickle
 import gzip
 import hashlib
+import threading
+from contextlib import contextmanager
 from requests.compat import json
 
 
@@ -67,8 +69,32 @@ class Singleton(type):
     @link https://github.com/jhao104/proxy_pool/blob/428359c8dada998481f038dbdc8d3923e5850c0e/Util/utilClass.py
     """
     _inst = {}
+    _scope = threading.local()
 
     def __call__(cls, *args, **kwargs):
+        scoped = getattr(Singleton._scope, "inst", None)
+        if scoped is not None and cls in scoped:
+            return scoped[cls]
         if cls not in cls._inst:
             cls._inst[cls] = super(Singleton, cls).__call__(*args, **kwargs)
         return cls._inst[cls]
+
+
+@contextmanager
+def singleton_scope(instances):
+    """
+    While active on this thread, `Cls()` returns `instances[Cls]` instead of the
+    process-wide singleton (used to import a module copy against other instances).
+    `instances=None` switches back to the process-wide singletons for the block.
+    """
+    prev = getattr(Singleton._scope, "inst", None)
+    if instances is None:
+        merged = None
+    else:
+        merged = dict(prev or {})
+        merged.update(instances)
+    Singleton._scope.inst = merged
+    try:
+        yield
+    finally:
+        Singleton._scope.inst = prev
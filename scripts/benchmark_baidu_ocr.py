@@ -4,12 +4,25 @@
 import argparse
 import base64
 import os
-import statistics
-import time
+import sys
 from configparser import RawConfigParser
 
 import requests
 
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from autoelective.captcha.benchmark import (
+    BenchmarkEngine,
+    BenchTask,
+    format_summary,
+    list_images,
+    parse_label_from_filename,
+    read_file,
+    summarize,
+)
+
 
 def load_keys():
     repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -43,18 +56,6 @@ def get_token(api_key, secret_key, timeout=10):
     return data["access_token"]
 
 
-def list_images(images_dir, max_images=None):
-    exts = {".png", ".jpg", ".jpeg", ".bmp"}
-    files = []
-    for name in sorted(os.listdir(images_dir)):
-        path = os.path.join(images_dir, name)
-        if os.path.isfile(path) and os.path.splitext(name)[1].lower() in exts:
-            files.append(path)
-    if max_images:
-        files = files[:max_images]
-    return files
-
-
 def call_ocr(token, mode, image_bytes, timeout=10):
     url = f"https://aip.baidubce.com/rest/2.0/ocr/v1/{mode}?access_token={token}"
     payload = {
@@ -64,69 +65,28 @@ def call_ocr(token, mode, image_bytes, timeout=10):
         "probability": "false",
         "multidirectional_recognize": "true",
     }
-    t0 = time.time()
     resp = requests.post(url, data=payload, timeout=timeout)
-    dt = time.time() - t0
     resp.raise_for_status()
     data = resp.json()
-    return dt, data
-
-
-def summarize(latencies):
-    if not latencies:
-        return {}
-    return {
-        "count": len(latencies),
-        "avg": statistics.mean(latencies),
-        "median": statistics.median(latencies),
-        "p90": statistics.quantiles(latencies, n=10)[8] if len(latencies) >= 10 else max(latencies),
-        "min": min(latencies),
-        "max": max(latencies),
-    }
-
-
-def parse_label_from_filename(path):
-    name = os.path.basename(path)
-    stem, _ = os.path.splitext(name)
-    if "_" not in stem:
-        return None
-    # take last underscore segment as label
-    label = stem.split("_")[-1]
-    return label or None
-
-
-def normalize(text):
-    if text is None:
-        return ""
-    # keep alnum only, uppercase
-    return "".join(ch for ch in text if ch.isalnum()).upper()
-
-
-def char_accuracy(gt, pred):
-    gt = normalize(gt)
-    pred = normalize(pred)
-    if not gt and not pred:
-        return 1.0
-    if not gt:
-        return 0.0
-    # align by position; penalize length mismatch
-    max_len = max(len(gt), len(pred))
-    if max_len == 0:
-        return 1.0
-    correct = 0
-    for i in range(max_len):
-        g = gt[i] if i < len(gt) else None
-        p = pred[i] if i < len(pred) else None
-        if g is not None and p is not None and g == p:
-            correct += 1
-    return correct / max_len
+    if "error_code" in data:
+        raise RuntimeError("ocr error: %s %s" % (data.get("error_code"), data.get("error_msg")))
+    return data
 
 
 def main():
     parser = argparse.ArgumentParser(description="Benchmark Baidu OCR speed/accuracy on a folder of captcha images")
     parser.add_argument("--images-dir", required=True, help="folder with captcha images")
     parser.add_argument("--max", type=int, default=None, help="max images to test")
-    parser.add_argument("--sleep", type=float, default=0.1, help="sleep between requests")
+    parser.add_argument(
+        "--sleep",
+        type=float,
+        default=0.1,
+        help="pause between requests; ignored when --rps is set",
+    )
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel requests")
+    parser.add_argument("--rps", type=float, default=None, help="requests per second, both modes together")
+    parser.add_argument("--out", default=None, help="stream per-image results to this JSONL file")
+    parser.add_argument("--resume", action="store_true", help="with --out: skip images already done in that file")
     parser.add_argument("--timeout", type=float, default=10.0)
     parser.add_argument("--labels-from-filename", action="store_true", default=True)
     args = parser.parse_args()
@@ -142,63 +102,38 @@ def main():
         return 3
 
     modes = ["general_basic", "accurate_basic"]
+    tokens = {mode: get_token(api_key, secret_key, timeout=args.timeout) for mode in modes}
+    words_by_key = {}
 
+    tasks = []
     for mode in modes:
-        token = get_token(api_key, secret_key, timeout=args.timeout)
-        ok = 0
-        fail = 0
-        latencies = []
-        results = []
-        exact_hits = 0
-        char_scores = []
-        labeled = 0
-
         for path in images:
-            with open(path, "rb") as f:
-                img = f.read()
-            try:
-                dt, data = call_ocr(token, mode, img, timeout=args.timeout)
-                if "error_code" in data:
-                    fail += 1
-                else:
-                    ok += 1
-                    latencies.append(dt)
-                    words = data.get("words_result", [])
-                    pred = words[0]["words"] if words else ""
-                    results.append((os.path.basename(path), words))
-                    if args.labels_from_filename:
-                        gt = parse_label_from_filename(path)
-                        if gt:
-                            labeled += 1
-                            if normalize(pred) == normalize(gt):
-                                exact_hits += 1
-                            char_scores.append(char_accuracy(gt, pred))
-            except Exception:
-                fail += 1
-            time.sleep(args.sleep)
-
-        stats = summarize(latencies)
-        print("\n=== MODE:", mode, "===")
-        print("ok:", ok, "fail:", fail)
-        if stats:
-            print(
-                "latency(s): avg={avg:.3f} median={median:.3f} p90={p90:.3f} min={min:.3f} max={max:.3f}".format(
-                    **stats
-                )
+            label = parse_label_from_filename(path) if args.labels_from_filename else None
+            # both modes share one API key, hence one rate/concurrency group
+            tasks.append(
+                BenchTask(mode, os.path.basename(path), (lambda p=path: read_file(p)), label=label, group="baidu")
             )
-        else:
-            print("latency(s): n/a")
 
-        if labeled > 0:
-            exact_rate = exact_hits / labeled
-            char_rate = statistics.mean(char_scores) if char_scores else 0.0
-            print(f"accuracy: exact={exact_rate:.3f} char={char_rate:.3f} (labeled={labeled})")
-        else:
-            print("accuracy: n/a (no labels)")
+    def _recognize(task, raw):
+        data = call_ocr(tokens[task.target], task.target, raw, timeout=args.timeout)
+        words = data.get("words_result", [])
+        words_by_key[task.key] = words
+        return words[0]["words"] if words else ""
 
+    rps = args.rps
+    if rps is None:
+        rps = (1.0 / args.sleep) if args.sleep and args.sleep > 0 else 0.0
+    engine = BenchmarkEngine(concurrency=args.concurrency, rps=rps, out_path=args.out, resume=args.resume)
+    records = engine.run(tasks, _recognize)
+
+    rows = {row["key"][0]: row for row in summarize(records, by=("target",))}
+    for mode in modes:
+        print("\n=== MODE:", mode, "===")
+        print(format_summary(rows[mode]))
         # show a few sample results
-        for name, words in results[:5]:
-            print("-", name, "->", words)
+        shown = sorted((r for r in records if r["target"] == mode and r["error"] is None), key=lambda r: r["image"])
+        for rec in shown[:5]:
+            print("-", rec["image"], "->", words_by_key.get(rec["key"], rec["pred"]))
 
     return 0
 
@@ -3,8 +3,6 @@
 
 import argparse
 import os
-import statistics
-import time
 import sys
 
 # Allow running this file directly: `python scripts/benchmark_captcha_recognizers.py ...`
@@ -13,69 +11,118 @@ if REPO_ROOT not in sys.path:
     sys.path.insert(0, REPO_ROOT)
 
 from autoelective.captcha import get_recognizer
+from autoelective.captcha.benchmark import (
+    BenchmarkEngine,
+    BenchTask,
+    format_summary,
+    list_images,
+    parse_label_from_filename,
+    read_file,
+    summarize,
+)
+from autoelective.captcha.evaldb import EvalDB
 from autoelective.captcha.targets import format_target, parse_targets_csv
-from autoelective.exceptions import OperationFailedError, OperationTimeoutError, RecognizerError
-
-
-def list_images(images_dir, max_images=None):
-    exts = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"}
-    files = []
-    for name in sorted(os.listdir(images_dir)):
-        path = os.path.join(images_dir, name)
-        if os.path.isfile(path) and os.path.splitext(name)[1].lower() in exts:
-            files.append(path)
-    if max_images:
-        files = files[:max_images]
-    return files
-
-
-def parse_label_from_filename(path):
-    name = os.path.basename(path)
-    stem, _ = os.path.splitext(name)
-    if "_" not in stem:
-        return None
-    return stem.split("_")[-1] or None
-
-
-def normalize(text):
-    if text is None:
-        return ""
-    return "".join(ch for ch in str(text) if ch.isalnum()).upper()
-
-
-def char_accuracy(gt, pred):
-    gt = normalize(gt)
-    pred = normalize(pred)
-    if not gt and not pred:
-        return 1.0
-    if not gt:
-        return 0.0
-    max_len = max(len(gt), len(pred))
-    if max_len == 0:
-        return 1.0
-    correct = 0
-    for i in range(max_len):
-        g = gt[i] if i < len(gt) else None
-        p = pred[i] if i < len(pred) else None
-        if g is not None and p is not None and g == p:
-            correct += 1
-    return correct / max_len
-
-
-def summarize(latencies):
-    if not latencies:
-        return {}
-    p90 = statistics.quantiles(latencies, n=10)[8] if len(latencies) >= 10 else max(latencies)
+from autoelective.exceptions import RecognizerError
+
+
+def parse_transforms_arg(text):
+    """
+    `--transforms` uses ';' between specs because a spec itself is comma-separated.
+    """
+    if not text:
+        return [""]
+    specs = []
+    for spec in str(text).split(";"):
+        spec = spec.strip()
+        if spec.lower() in ("none", "default"):
+            spec = ""
+        if spec not in specs:
+            specs.append(spec)
+    return specs or [""]
+
+
+def build_result(row, records, payload_avg=None):
+    """
+    Old per-target result dict (latency in seconds) from an engine summary row,
+    as consumed by print_transform_tradeoff / print_stream_savings.
+    """
+    latency = {}
+    if row["latency_avg"] is not None:
+        latency = {
+            "avg": row["latency_avg"] / 1000.0,
+            "median": row["latency_p50"] / 1000.0,
+            "p90": row["latency_p90"] / 1000.0,
+            "min": row["latency_min"] / 1000.0,
+            "max": row["latency_max"] / 1000.0,
+        }
+    samples = []
+    for rec in sorted(records, key=lambda r: r["image"])[:5]:
+        pred = rec["pred"] if rec["error"] is None else "ERROR: %s" % rec["error"]
+        samples.append((rec["image"], rec["label"], pred))
     return {
-        "count": len(latencies),
-        "avg": statistics.mean(latencies),
-        "median": statistics.median(latencies),
-        "p90": p90,
-        "min": min(latencies),
-        "max": max(latencies),
+        "row": row,
+        "latency": latency,
+        "payload_avg": payload_avg,
+        "exact": row["exact"],
+        "samples": samples,
     }
 
 
+def print_result(label, result):
+    print("\n=== TARGET:", label, "===")
+    print(format_summary(result["row"]))
+    if result["payload_avg"] is not None:
+        print("payload(bytes): avg=%.0f" % result["payload_avg"])
+    print("samples:")
+    for name, gt, pred in result["samples"]:
+        print("-", name, "gt=", gt, "pred=", pred)
+
+
+def print_transform_tradeoff(target_name, rows, max_accuracy_drop):
+    """
+    rows: [(spec, result)]; recommend the fastest spec whose exact accuracy stays
+    within `max_accuracy_drop` of the best one.
+    """
+    print("\n=== TRANSFORMS:", target_name, "===")
+    print("  %-40s | %8s | %8s | %8s | %6s" % ("transform", "bytes", "avg(s)", "p90(s)", "exact"))
+    for spec, res in rows:
+        lat = res["latency"]
+        print(
+            "  %-40s | %8s | %8s | %8s | %6s"
+            % (
+                spec or "(default jpeg)",
+                "%.0f" % res["payload_avg"] if res["payload_avg"] is not None else "--",
+                "%.3f" % lat["avg"] if lat else "--",
+                "%.3f" % lat["p90"] if lat else "--",
+                "%.3f" % res["exact"] if res["exact"] is not None else "--",
+            )
+        )
+    timed = [(spec, res) for spec, res in rows if res["latency"]]
+    if not timed:
+        print("recommend: n/a (no successful recognitions)")
+        return
+    accs = [res["exact"] for _, res in timed if res["exact"] is not None]
+    if accs:
+        floor = max(accs) - max_accuracy_drop
+        timed = [(spec, res) for spec, res in timed if res["exact"] is not None and res["exact"] >= floor]
+    spec, res = min(timed, key=lambda x: x[1]["latency"]["avg"])
+    print("recommend: %s (avg=%.3fs)" % (spec or "(default jpeg)", res["latency"]["avg"]))
+
+
+def print_stream_savings(target_name, rows):
+    print("\n=== STREAM:", target_name, "===")
+    for spec, off, on in rows:
+        if not off["latency"] or not on["latency"]:
+            print("  %-40s | n/a" % (spec or "(default jpeg)"))
+            continue
+        saved = off["latency"]["avg"] - on["latency"]["avg"]
+        pct = saved / off["latency"]["avg"] * 100.0 if off["latency"]["avg"] > 0 else 0.0
+        print(
+            "  %-40s | off=%.3fs on=%.3fs saved=%.3fs (%.1f%%)"
+            % (spec or "(default jpeg)", off["latency"]["avg"], on["latency"]["avg"], saved, pct)
+        )
+
+
 def main():
     parser = argparse.ArgumentParser(description="Benchmark captcha recognizers (speed + accuracy)")
     parser.add_argument("--images-dir", required=True, help="folder with captcha images")
@@ -85,7 +132,39 @@ def main():
         help="comma-separated targets: provider[:model],provider[:model]",
     )
     parser.add_argument("--max", type=int, default=None, help="max images to test")
-    parser.add_argument("--sleep", type=float, default=0.05, help="sleep between requests")
+    parser.add_argument(
+        "--sleep",
+        type=float,
+        default=0.05,
+        help="pause between requests to one provider; ignored when --rps is set",
+    )
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel requests per provider")
+    parser.add_argument("--rps", type=float, default=None, help="requests per second per provider")
+    parser.add_argument("--out", default=None, help="stream per-image results to this JSONL file")
+    parser.add_argument("--resume", action="store_true", help="with --out: skip images already done in that file")
+    parser.add_argument(
+        "--transforms",
+        default=None,
+        help="';'-separated upload transform specs to compare, e.g. 'none;gray,png;gray,crop:2,max_height:32,png'",
+    )
+    parser.add_argument(
+        "--max-accuracy-drop",
+        type=float,
+        default=0.0,
+        help="accepted exact-accuracy loss when recommending the fastest transform",
+    )
+    parser.add_argument(
+        "--stream",
+        choices=("config", "off", "on", "both"),
+        default="config",
+        help="SSE streaming for openai targets; 'both' reports the time saved by streaming",
+    )
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="sqlite evaluation db: reuse cached predictions per (image, target, transform, stream)",
+    )
+    parser.add_argument("--refresh", action="store_true", help="with --db: call recognizers even if cached")
     args = parser.parse_args()
 
     images = list_images(args.images_dir, args.max)
@@ -99,64 +178,141 @@ def main():
         print("Invalid --targets:", e)
         return 3
 
+    transforms = parse_transforms_arg(args.transforms)
+    compare = args.transforms is not None
+
+    if args.stream == "both":
+        stream_modes = [False, True]
+    elif args.stream in ("off", "on"):
+        stream_modes = [args.stream == "on"]
+    else:
+        stream_modes = [None]
+
+    # One recognizer instance per (target, transform, stream): variants run concurrently
+    # and the transform/stream settings live on the instance.
+    variants = []
     for provider, model_name in targets:
-        recognizer = get_recognizer(provider, model_name=model_name)
         target_name = format_target(provider, model_name)
-        ok = 0
-        fail = 0
-        latencies = []
-        exact_hits = 0
-        char_scores = []
-        labeled = 0
-        samples = []
+        for spec in transforms:
+            label = target_name
+            for stream in stream_modes:
+                recognizer = get_recognizer(provider, model_name=model_name)
+                if compare:
+                    try:
+                        recognizer.set_image_transform(spec)
+                    except RecognizerError as e:
+                        print("\nskip transform %r for %s: %s" % (spec, target_name, e))
+                        break
+                    label = "%s [%s]" % (target_name, spec or "default")
+                mode_label = label
+                variant = spec
+                if stream is not None:
+                    if not hasattr(recognizer, "set_stream"):
+                        if stream:
+                            continue
+                    else:
+                        recognizer.set_stream(stream)
+                        mode_label = "%s (stream=%s)" % (label, "on" if stream else "off")
+                        variant = "%s|stream=%s" % (spec, "on" if stream else "off")
+                variants.append(
+                    {
+                        "provider": provider,
+                        "target": target_name,
+                        "spec": spec,
+                        "stream": stream,
+                        "label": mode_label,
+                        "variant": variant,
+                        "recognizer": recognizer,
+                    }
+                )
 
+    db = EvalDB(args.db) if args.db else None
+    sha1s = {}
+    if db is not None:
         for path in images:
-            with open(path, "rb") as f:
-                raw = f.read()
-            t0 = time.time()
-            try:
-                cap = recognizer.recognize(raw)
-                dt = time.time() - t0
-                ok += 1
-                latencies.append(dt)
-                pred = cap.code
-                gt = parse_label_from_filename(path)
-                if gt:
-                    labeled += 1
-                    if normalize(pred) == normalize(gt):
-                        exact_hits += 1
-                    char_scores.append(char_accuracy(gt, pred))
-                if len(samples) < 5:
-                    samples.append((os.path.basename(path), gt, pred))
-            except (RecognizerError, OperationTimeoutError, OperationFailedError) as e:
-                dt = time.time() - t0
-                fail += 1
-                if len(samples) < 5:
-                    samples.append((os.path.basename(path), parse_label_from_filename(path), f"ERROR: {e}"))
-            time.sleep(args.sleep)
-
-        stats = summarize(latencies)
-        print("\n=== TARGET:", target_name, "===")
-        print("ok:", ok, "fail:", fail)
-        if stats:
-            print(
-                "latency(s): avg={avg:.3f} median={median:.3f} p90={p90:.3f} min={min:.3f} max={max:.3f}".format(
-                    **stats
+            sha1s[path] = db.add_sample(
+                read_file(path), sample_id=os.path.basename(path), label=parse_label_from_filename(path), context="file"
+            )[0]
+
+    tasks = []
+    by_variant = {}
+    for v in variants:
+        by_variant[(v["target"], v["variant"])] = v
+        for path in images:
+            cached = None
+            if db is not None and not args.refresh:
+                cached = db.cached_prediction(sha1s[path], v["target"], v["variant"])
+            tasks.append(
+                BenchTask(
+                    v["target"],
+                    os.path.basename(path),
+                    (lambda p=path: read_file(p)),
+                    label=parse_label_from_filename(path),
+                    variant=v["variant"],
+                    group=v["provider"],
+                    cached=cached,
+                    extra={"path": path},
                 )
             )
-        else:
-            print("latency(s): n/a")
-
-        if labeled > 0:
-            exact_rate = exact_hits / labeled
-            char_rate = statistics.mean(char_scores) if char_scores else 0.0
-            print(f"accuracy: exact={exact_rate:.3f} char={char_rate:.3f} (labeled={labeled})")
-        else:
-            print("accuracy: n/a (no labels)")
-
-        print("samples:")
-        for name, gt, pred in samples:
-            print("-", name, "gt=", gt, "pred=", pred)
+
+    def _recognize(task, raw):
+        return by_variant[(task.target, task.variant)]["recognizer"].recognize(raw).code
+
+    def _record(rec):
+        if db is not None and not rec["cached"]:
+            db.add_prediction(
+                sha1s[rec["path"]],
+                rec["target"],
+                pred=rec["pred"],
+                latency_ms=rec["latency_ms"],
+                error=rec["error"],
+                variant=rec["variant"],
+            )
+
+    rps = args.rps
+    if rps is None:
+        rps = (1.0 / args.sleep) if args.sleep and args.sleep > 0 else 0.0
+    engine = BenchmarkEngine(concurrency=args.concurrency, rps=rps, out_path=args.out, resume=args.resume)
+    records = engine.run(tasks, _recognize, on_result=_record)
+    if db is not None:
+        db.close()
+
+    rows = {row["key"]: row for row in summarize(records, by=("target", "variant"))}
+    per_target = {}
+    for v in variants:
+        key = (v["target"], v["variant"])
+        row = rows.get(key)
+        if row is None:
+            continue
+        payload_avg = None
+        transform = getattr(v["recognizer"], "image_transform", None)
+        if transform is not None:
+            sizes = []
+            for path in images:
+                try:
+                    sizes.append(len(transform.apply(read_file(path))[0]))
+                except Exception:
+                    pass
+            payload_avg = (sum(sizes) / len(sizes)) if sizes else None
+        result = build_result(row, [r for r in records if (r["target"], r["variant"]) == key], payload_avg)
+        print_result(v["label"], result)
+        if hasattr(v["recognizer"], "latency_stats"):
+            print("latency_stats:", v["recognizer"].latency_stats())
+        per_target.setdefault(v["target"], {}).setdefault(v["spec"], {})[v["stream"]] = result
+
+    for target_name, by_spec in per_target.items():
+        rows = []
+        stream_rows = []
+        for spec, by_mode in by_spec.items():
+            result = by_mode.get(True) or next(iter(by_mode.values()), None)
+            if result is not None:
+                rows.append((spec, result))
+            if False in by_mode and True in by_mode:
+                stream_rows.append((spec, by_mode[False], by_mode[True]))
+        if compare:
+            print_transform_tradeoff(target_name, rows, args.max_accuracy_drop)
+        if stream_rows:
+            print_stream_savings(target_name, stream_rows)
 
     return 0
 
@@ -101,6 +101,11 @@ def main():
     )
     parser.add_argument("--samples", type=int, default=20, help="samples per target")
     parser.add_argument("--sleep", type=float, default=0.5, help="sleep seconds between samples")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="sqlite evaluation db: record images, predictions and Validate outcomes (context 'bench')",
+    )
     args = parser.parse_args()
 
     if args.config:
@@ -110,6 +115,7 @@ def main():
 
     from autoelective.config import AutoElectiveConfig
     from autoelective.captcha import get_recognizer
+    from autoelective.captcha.evaldb import EvalDB
     from autoelective.captcha.targets import (
         default_targets_from_config,
         format_target,
@@ -137,6 +143,7 @@ def main():
         return 2
 
     elect = _login(cfg)
+    db = EvalDB(args.db) if args.db else None
 
     for provider, model_name in targets:
         recognizer = get_recognizer(provider, model_name=model_name)
@@ -176,6 +183,10 @@ def main():
                     valid = rr.json().get("valid")
                 except Exception:
                     valid = None
+                if db is not None:
+                    sha1, _ = db.add_sample(r.content, meta={"provider": target_name}, context="bench")
+                    db.add_prediction(sha1, target_name, pred=cap.code, latency_ms=recog_dt)
+                    db.add_validation(sha1, target_name, cap.code, valid, latency_ms=val_dt, context="bench")
                 if valid == "2":
                     ok += 1
                 elif valid == "0":
@@ -209,6 +220,8 @@ def main():
         _print_stats("recognize", _summarize_ms(recog_ms))
         _print_stats("validate", _summarize_ms(val_ms))
         _print_stats("total", _summarize_ms(total_ms))
+    if db is not None:
+        db.close()
 
     return 0
 
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Memory / startup cost of N simulated accounts in one process (ElectiveEngine)
+versus N separate processes.
+
+Account configs are generated from --config with distinct student ids, the
+captcha provider forced to `dummy` and no course sections, so nothing talks to
+the network. For each N the script reports the engines' init time, Python heap
+growth (tracemalloc) and RSS growth, next to N x the RSS of a one-account process.
+"""
+
+import argparse
+import configparser
+import gc
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def write_account_configs(base_config, out_dir, n, offset=0):
+    paths = []
+    for i in range(offset, offset + n):
+        cp = configparser.RawConfigParser()
+        cp.read(base_config, encoding="utf-8-sig")
+        cp.set("user", "student_id", "bench%05d" % i)
+        if not cp.has_section("captcha"):
+            cp.add_section("captcha")
+        cp.set("captcha", "provider", "dummy")
+        for section in cp.sections():
+            if section.split(":")[0].strip() in ("course", "mutex", "delay"):
+                cp.remove_section(section)
+        path = os.path.join(out_dir, "account-%05d.ini" % i)
+        with open(path, "w", encoding="utf-8") as fp:
+            cp.write(fp)
+        paths.append(path)
+    return paths
+
+
+def _rss_kib():
+    # current RSS from /proc when available, else peak RSS
+    try:
+        with open("/proc/self/statm", "r") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def single_process_rss_kib(config_path):
+    code = (
+        "import os, sys; sys.path.insert(0, %r); import autoelective.loop; "
+        "statm = open('/proc/self/statm').read().split() if os.path.exists('/proc/self/statm') else None; "
+        "import resource; "
+        "print(int(statm[1]) * os.sysconf('SC_PAGE_SIZE') // 1024 if statm else "
+        "resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)" % REPO_ROOT
+    )
+    env = dict(os.environ, AUTOELECTIVE_CONFIG_INI=config_path)
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return int(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ElectiveEngine: N accounts in one process")
+    parser.add_argument("-c", "--config", default=os.path.join(REPO_ROOT, "config.sample.ini"))
+    parser.add_argument("--accounts", default="1,10,50", help="comma-separated account counts")
+    args = parser.parse_args()
+    counts = [int(x) for x in args.accounts.split(",") if x.strip()]
+
+    tmpdir = tempfile.mkdtemp(prefix="engine_bench_")
+    (host_config,) = write_account_configs(args.config, tmpdir, 1, offset=99999)
+    os.environ["AUTOELECTIVE_CONFIG_INI"] = host_config
+
+    from autoelective.engine import ElectiveEngine, EngineShared
+    import logging
+
+    logging.disable(logging.INFO)  # engine imports print the loop banner per account
+    per_process = single_process_rss_kib(host_config)
+    print("one-account process RSS: %.1f MiB" % (per_process / 1024.0))
+
+    offset = 0
+    for n in counts:
+        paths = write_account_configs(args.config, tmpdir, n, offset=offset)
+        offset += n
+        gc.collect()
+        shared = EngineShared()
+        rss0 = _rss_kib()
+        tracemalloc.start()
+        t0 = time.time()
+        engines = [ElectiveEngine(p, shared=shared) for p in paths]
+        dt = time.time() - t0
+        heap, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss = _rss_kib() - rss0
+        print(
+            "accounts=%-3d init=%.2fs (%.1f ms/account) heap=%.2f MiB (%.0f KiB/account) "
+            "rss=+%.1f MiB vs %d processes ~%.1f MiB"
+            % (
+                n,
+                dt,
+                dt * 1000.0 / n,
+                heap / 1048576.0,
+                heap / 1024.0 / n,
+                rss / 1024.0,
+                n,
+                n * per_process / 1024.0,
+            )
+        )
+        del engines
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,7 +5,6 @@ import argparse
 import os
 import statistics
 import sys
-import time
 
 # Allow running this file directly.
 REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -13,66 +12,58 @@ if REPO_ROOT not in sys.path:
     sys.path.insert(0, REPO_ROOT)
 
 from autoelective.captcha import get_recognizer
+from autoelective.captcha.benchmark import (
+    BenchmarkEngine,
+    BenchTask,
+    char_accuracy,
+    format_summary,
+    list_images,
+    parse_label_from_filename,
+    read_file,
+    summarize,
+    wilson_interval,
+)
+from autoelective.captcha.evaldb import EvalDB, normalize_code
 from autoelective.captcha.targets import format_target, parse_targets_csv
-from autoelective.exceptions import OperationFailedError, OperationTimeoutError, RecognizerError
-
-
-def list_images(images_dir, max_images=None):
-    exts = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"}
-    files = []
-    for name in sorted(os.listdir(images_dir)):
-        path = os.path.join(images_dir, name)
-        if os.path.isfile(path) and os.path.splitext(name)[1].lower() in exts:
-            files.append(path)
-    if max_images:
-        files = files[:max_images]
-    return files
-
-
-def parse_label_from_filename(path):
-    name = os.path.basename(path)
-    stem, _ = os.path.splitext(name)
-    if "_" not in stem:
-        return None
-    return stem.split("_")[-1] or None
-
-
-def normalize(text):
-    if text is None:
-        return ""
-    return "".join(ch for ch in str(text) if ch.isalnum()).upper()
-
-
-def char_accuracy(gt, pred):
-    gt = normalize(gt)
-    pred = normalize(pred)
-    if not gt and not pred:
-        return 1.0
-    if not gt:
-        return 0.0
-    max_len = max(len(gt), len(pred))
-    if max_len == 0:
-        return 1.0
-    correct = 0
-    for i in range(max_len):
-        g = gt[i] if i < len(gt) else None
-        p = pred[i] if i < len(pred) else None
-        if g is not None and p is not None and g == p:
-            correct += 1
-    return correct / max_len
-
-
-def summarize(latencies):
-    if not latencies:
-        return {}
-    p90 = statistics.quantiles(latencies, n=10)[8] if len(latencies) >= 10 else max(latencies)
+
+
+def repeat_stats(records):
+    """
+    First-attempt vs best-of-N accuracy over one target's records, per image.
+    """
+    by_image = {}
+    for rec in records:
+        by_image.setdefault(rec["image"], []).append(rec)
+    first_exact = []
+    best_exact = []
+    first_char = []
+    best_char = []
+    any_success = []
+    first_success_attempts = []
+    for recs in by_image.values():
+        recs.sort(key=lambda r: r["repeat"])
+        ok = [r for r in recs if r["error"] is None]
+        any_success.append(bool(ok))
+        if ok:
+            first_success_attempts.append(ok[0]["repeat"] + 1)
+        gt = recs[0]["label"]
+        if not gt:
+            continue
+        preds = [r["pred"] for r in ok]
+        first_pred = preds[0] if preds else ""
+        first_exact.append(normalize_code(first_pred) == normalize_code(gt))
+        first_char.append(char_accuracy(gt, first_pred))
+        best_exact.append(any(normalize_code(p) == normalize_code(gt) for p in preds))
+        best_char.append(max([char_accuracy(gt, p) for p in preds] or [0.0]))
     return {
-        "count": len(latencies),
-        "avg": statistics.mean(latencies),
-        "median": statistics.median(latencies),
-        "p90": p90,
-        "min": min(latencies),
-        "max": max(latencies),
+        "images": len(by_image),
+        "labeled": len(first_exact),
+        "first_exact": first_exact,
+        "best_exact": best_exact,
+        "first_char": first_char,
+        "best_char": best_char,
+        "any_success": any_success,
+        "first_success_attempts": first_success_attempts,
     }
 
 
@@ -88,8 +79,21 @@ def main():
     )
     parser.add_argument("--max", type=int, default=20, help="max images to test")
     parser.add_argument("--repeats", type=int, default=5, help="repeats per image")
-    parser.add_argument("--sleep", type=float, default=0.05, help="sleep between attempts")
-    parser.add_argument("--sleep-image", type=float, default=0.0, help="sleep between images")
+    parser.add_argument(
+        "--sleep",
+        type=float,
+        default=0.05,
+        help="pause between attempts on one provider; ignored when --rps is set",
+    )
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel requests per provider")
+    parser.add_argument("--rps", type=float, default=None, help="requests per second per provider")
+    parser.add_argument("--out", default=None, help="stream per-attempt results to this JSONL file")
+    parser.add_argument("--resume", action="store_true", help="with --out: skip attempts already done in that file")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="sqlite evaluation db: record every attempt (variant 'repeat'); nothing is reused",
+    )
     args = parser.parse_args()
 
     images = list_images(args.images_dir, args.max)
@@ -103,96 +107,80 @@ def main():
         print("Invalid --targets:", e)
         return 3
 
+    recognizers = {}
+    tasks = []
     for provider, model_name in targets:
-        recognizer = get_recognizer(provider, model_name=model_name)
         target_name = format_target(provider, model_name)
-        latencies = []
-        attempt_ok = 0
-        attempt_fail = 0
-
-        labeled = 0
-        first_exact = []
-        best_exact = []
-        first_char = []
-        best_char = []
-        any_success = []
-        first_success_attempts = []
-
+        recognizers[target_name] = get_recognizer(provider, model_name=model_name)
         for path in images:
-            with open(path, "rb") as f:
-                raw = f.read()
-            gt = parse_label_from_filename(path)
-            if gt:
-                labeled += 1
+            for i in range(args.repeats):
+                tasks.append(
+                    BenchTask(
+                        target_name,
+                        os.path.basename(path),
+                        (lambda p=path: read_file(p)),
+                        label=parse_label_from_filename(path),
+                        variant="repeat",
+                        repeat=i,
+                        group=provider,
+                        extra={"path": path},
+                    )
+                )
 
-            per_preds = []
-            per_chars = []
-            per_lat = []
-            success_attempt = None
+    db = EvalDB(args.db) if args.db else None
+    sha1s = {}
+    if db is not None:
+        for path in images:
+            sha1s[path] = db.add_sample(
+                read_file(path), sample_id=os.path.basename(path), label=parse_label_from_filename(path), context="file"
+            )[0]
+
+    def _recognize(task, raw):
+        return recognizers[task.target].recognize(raw).code
+
+    def _record(rec):
+        if db is not None:
+            db.add_prediction(
+                sha1s[rec["path"]],
+                rec["target"],
+                pred=rec["pred"],
+                latency_ms=rec["latency_ms"],
+                error=rec["error"],
+                variant="repeat",
+            )
 
-            for i in range(args.repeats):
-                t0 = time.time()
-                try:
-                    cap = recognizer.recognize(raw)
-                    dt = time.time() - t0
-                    attempt_ok += 1
-                    latencies.append(dt)
-                    per_lat.append(dt)
-                    pred = cap.code
-                    per_preds.append(pred)
-                    if gt:
-                        per_chars.append(char_accuracy(gt, pred))
-                    if success_attempt is None:
-                        success_attempt = i + 1
-                except (RecognizerError, OperationTimeoutError, OperationFailedError):
-                    dt = time.time() - t0
-                    attempt_fail += 1
-                    per_lat.append(dt)
-                time.sleep(args.sleep)
-
-            if gt:
-                first_pred = per_preds[0] if per_preds else ""
-                first_exact.append(normalize(first_pred) == normalize(gt))
-                first_char.append(char_accuracy(gt, first_pred))
-
-                best_hit = False
-                best_char_score = 0.0
-                for pred in per_preds:
-                    if normalize(pred) == normalize(gt):
-                        best_hit = True
-                    best_char_score = max(best_char_score, char_accuracy(gt, pred))
-                best_exact.append(best_hit)
-                best_char.append(best_char_score)
-
-            any_success.append(success_attempt is not None)
-            if success_attempt is not None:
-                first_success_attempts.append(success_attempt)
-
-            if args.sleep_image > 0:
-                time.sleep(args.sleep_image)
+    rps = args.rps
+    if rps is None:
+        rps = (1.0 / args.sleep) if args.sleep and args.sleep > 0 else 0.0
+    engine = BenchmarkEngine(concurrency=args.concurrency, rps=rps, out_path=args.out, resume=args.resume)
+    records = engine.run(tasks, _recognize, on_result=_record)
+    if db is not None:
+        db.close()
+
+    rows = {row["key"][0]: row for row in summarize(records, by=("target",))}
+    for target_name in recognizers:
+        row = rows.get(target_name)
+        if row is None:
+            continue
+        st = repeat_stats([r for r in records if r["target"] == target_name])
 
         print("\n=== TARGET:", target_name, "===")
-        print("attempts:", args.repeats * len(images), "ok:", attempt_ok, "fail:", attempt_fail)
-        stats = summarize(latencies)
-        if stats:
-            print(
-                "latency(s): avg={avg:.3f} median={median:.3f} p90={p90:.3f} min={min:.3f} max={max:.3f}".format(
-                    **stats
-                )
-            )
-        if labeled > 0:
-            first_exact_rate = statistics.mean(first_exact) if first_exact else 0.0
-            best_exact_rate = statistics.mean(best_exact) if best_exact else 0.0
-            first_char_rate = statistics.mean(first_char) if first_char else 0.0
-            best_char_rate = statistics.mean(best_char) if best_char else 0.0
+        print(format_summary(row))
+        if st["labeled"] > 0:
+            first_hits = sum(st["first_exact"])
+            best_hits = sum(st["best_exact"])
+            first_exact_rate = first_hits / st["labeled"]
+            best_exact_rate = best_hits / st["labeled"]
+            first_char_rate = statistics.mean(st["first_char"])
+            best_char_rate = statistics.mean(st["best_char"])
             print(
-                "accuracy (first): exact={:.3f} char={:.3f} (labeled={})".format(
-                    first_exact_rate, first_char_rate, labeled
+                "accuracy (first): exact={:.3f} [{:.3f}, {:.3f}] char={:.3f} (labeled={})".format(
+                    first_exact_rate, *wilson_interval(first_hits, st["labeled"]), first_char_rate, st["labeled"]
                 )
             )
             print(
-                "accuracy (best-of-{}): exact={:.3f} char={:.3f}".format(
-                    args.repeats, best_exact_rate, best_char_rate
+                "accuracy (best-of-{}): exact={:.3f} [{:.3f}, {:.3f}] char={:.3f}".format(
+                    args.repeats, best_exact_rate, *wilson_interval(best_hits, st["labeled"]), best_char_rate
                 )
             )
             print(
@@ -200,12 +188,13 @@ def main():
                     best_exact_rate - first_exact_rate, best_char_rate - first_char_rate
                 )
             )
-        success_rate = sum(1 for x in any_success if x) / len(any_success)
-        print("any-success rate: {:.3f}".format(success_rate))
-        if first_success_attempts:
+        if st["any_success"]:
+            success_rate = sum(1 for x in st["any_success"] if x) / len(st["any_success"])
+            print("any-success rate: {:.3f}".format(success_rate))
+        if st["first_success_attempts"]:
             print(
                 "avg attempts to first success: {:.2f}".format(
-                    statistics.mean(first_success_attempts)
+                    statistics.mean(st["first_success_attempts"])
                 )
             )
 
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Re-score an adaptive attempt journal (captcha.adaptive_journal_path) offline under
+one or more adaptive policies.
+
+Example:
+  python scripts/captcha_adaptive_replay.py --journal cache/captcha_adaptive_journal.jsonl \
+      --policies score,ttv,ucb,thompson --half-life 600
+"""
+
+import argparse
+import os
+import random
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from autoelective.captcha.adaptive import ADAPTIVE_POLICIES, CaptchaAdaptiveManager
+from autoelective.captcha.journal import iter_records
+
+
+def rescore(records, policy, half_life=0.0, min_samples=10, update_interval=20, epsilon=0.1, seed=0):
+    """
+    Feed journal records into a fresh manager in time order (the record timestamps
+    drive decay), applying maybe_reorder as the main loop would.
+    :return: (final order, final snapshot, {provider: fraction of records where it was primary})
+    """
+    providers = []
+    for r in records:
+        if r[1] not in providers:
+            providers.append(r[1])
+    now = [records[0][0] if records else 0.0]
+    mgr = CaptchaAdaptiveManager(
+        providers,
+        min_samples=min_samples,
+        update_interval=update_interval,
+        epsilon=epsilon,
+        policy=policy,
+        decay_half_life=half_life,
+        clock=lambda: now[0],
+        rng=random.Random(seed),
+    )
+    order = list(providers)
+    primary = {p: 0 for p in providers}
+    for i, rec in enumerate(records):
+        now[0] = rec[0]
+        mgr.replay([rec])
+        new_order, switch, changed = mgr.maybe_reorder(order, loop_count=i, current=order[0])
+        if changed or switch:
+            order = new_order
+        primary[order[0]] += 1
+    total = float(len(records) or 1)
+    return order, mgr.snapshot(), {p: c / total for p, c in primary.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score an adaptive captcha attempt journal offline.")
+    parser.add_argument("--journal", default="cache/captcha_adaptive_journal.jsonl")
+    parser.add_argument("--policies", default=",".join(ADAPTIVE_POLICIES))
+    parser.add_argument("--half-life", type=float, default=0.0)
+    parser.add_argument("--min-samples", type=int, default=10)
+    parser.add_argument("--update-interval", type=int, default=20)
+    parser.add_argument("--epsilon", type=float, default=0.1)
+    parser.add_argument("--since", type=float, default=None, help="only records after this unix time")
+    args = parser.parse_args()
+
+    records = sorted(iter_records(args.journal, since=args.since), key=lambda r: r[0])
+    if not records:
+        print("No records in %s" % args.journal)
+        return 1
+    print("records=%d span=%.0fs" % (len(records), records[-1][0] - records[0][0]))
+
+    for policy in [x.strip() for x in args.policies.split(",") if x.strip()]:
+        order, snap, primary = rescore(
+            records,
+            policy,
+            half_life=args.half_life,
+            min_samples=args.min_samples,
+            update_interval=args.update_interval,
+            epsilon=args.epsilon,
+        )
+        print("")
+        print("[%s] final order: %s" % (policy, " > ".join(order)))
+        for p, st in snap["stats"].items():
+            ttv = st.get("ttv")
+            print(
+                "  %-24s n=%-5d p_hat=%.3f t=%s ttv=%s primary=%.1f%%"
+                % (
+                    p,
+                    st["count"],
+                    st["p_hat"],
+                    "n/a" if st["latency"] is None else "%.3fs" % st["latency"],
+                    "n/a" if ttv is None else "%.3fs" % ttv,
+                    100.0 * primary.get(p, 0.0),
+                )
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
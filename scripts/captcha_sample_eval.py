@@ -5,7 +5,6 @@ import argparse
 import json
 import os
 import sys
-import time
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT not in sys.path:
@@ -13,6 +12,9 @@ if ROOT not in sys.path:
 
 from autoelective.config import AutoElectiveConfig
 from autoelective.captcha import get_recognizer
+from autoelective.captcha.benchmark import BenchmarkEngine, BenchTask, format_summary, summarize
+from autoelective.captcha.evaldb import GROUP_KEYS, EvalDB
+from autoelective.captcha.samples import list_samples
 from autoelective.captcha.targets import (
     default_targets_from_config,
     format_target,
@@ -31,49 +33,8 @@ def _load_labels(path):
 
 
 def _iter_samples(sample_dir):
-    if not os.path.isdir(sample_dir):
-        return []
-    files = os.listdir(sample_dir)
-    metas = {f[:-5]: f for f in files if f.endswith(".json")}
-    samples = []
-    for f in files:
-        if f.endswith(".json"):
-            continue
-        base = os.path.splitext(f)[0]
-        meta_file = metas.get(base)
-        meta = None
-        if meta_file:
-            try:
-                with open(os.path.join(sample_dir, meta_file), "r", encoding="utf-8") as fp:
-                    meta = json.load(fp)
-            except Exception:
-                meta = None
-        samples.append((base, os.path.join(sample_dir, f), meta))
-    return samples
-
-
-def _calc_char_stats(label, pred):
-    if label is None:
-        return 0, 0
-    label = str(label)
-    pred = "" if pred is None else str(pred)
-    if not label and not pred:
-        return 0, 0
-    n = max(len(label), len(pred), 1)
-    m = min(len(label), len(pred))
-    match = 0
-    for i in range(m):
-        if label[i] == pred[i]:
-            match += 1
-    return match, n
-
-
-def _percentile(values, p):
-    if not values:
-        return None
-    values = sorted(values)
-    k = int(round((p / 100.0) * (len(values) - 1)))
-    return values[max(0, min(k, len(values) - 1))]
+    # [(sample_id, load, meta)] from pack archives and legacy image + .json pairs.
+    return list_samples(sample_dir)
 
 
 def _format_ms(x):
@@ -82,6 +43,35 @@ def _format_ms(x):
     return "%.1f" % x
 
 
+def _print_db_report(db, group_by, target=None, context=None, since=None, until=None):
+    print("DB: %s (group by %s)" % (db.path, ",".join(group_by)))
+    print("")
+    print("== predictions ==")
+    for row in db.prediction_summary(group_by, target=target, context=context, since=since, until=until):
+        exact = "--" if row["exact"] is None else "%.3f" % row["exact"]
+        print(
+            "%s n=%d errors=%d labeled=%d exact=%s latency_ms: avg=%s p50=%s p90=%s"
+            % (
+                "/".join(str(k) for k in row["key"]),
+                row["n"],
+                row["errors"],
+                row["labeled"],
+                exact,
+                _format_ms(row["latency_avg"]),
+                _format_ms(row["latency_p50"]),
+                _format_ms(row["latency_p90"]),
+            )
+        )
+    print("")
+    print("== validations ==")
+    for row in db.validation_summary(group_by, target=target, context=context, since=since, until=until):
+        rate = "--" if row["pass_rate"] is None else "%.3f" % row["pass_rate"]
+        print(
+            "%s n=%d passed=%d failed=%d pass_rate=%s"
+            % ("/".join(str(k) for k in row["key"]), row["n"], row["passed"], row["failed"], rate)
+        )
+
+
 def main():
     parser = argparse.ArgumentParser(description="Evaluate captcha recognizers on sampled images")
     parser.add_argument("--sample-dir", default=None, help="sample directory")
@@ -93,8 +83,47 @@ def main():
     )
     parser.add_argument("--limit", type=int, default=0, help="limit number of samples")
     parser.add_argument("--shuffle", action="store_true", help="shuffle samples")
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel requests per provider")
+    parser.add_argument("--rps", type=float, default=0.0, help="requests per second per provider (0: unlimited)")
+    parser.add_argument("--out", default=None, help="stream per-image results to this JSONL file")
+    parser.add_argument("--resume", action="store_true", help="with --out: skip images already done in that file")
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="sqlite evaluation db: index samples, reuse cached predictions, record new ones",
+    )
+    parser.add_argument("--refresh", action="store_true", help="with --db: call recognizers even if cached")
+    parser.add_argument("--only-new", action="store_true", help="with --db: only evaluate samples not yet indexed")
+    parser.add_argument(
+        "--report",
+        default=None,
+        help="with --db: print stored results grouped by %s (comma-separated) and exit" % "/".join(GROUP_KEYS),
+    )
+    parser.add_argument("--context", default=None, help="--report filter: main/probe/...")
+    parser.add_argument("--since", default=None, help="--report filter: first day, YYYY-MM-DD")
+    parser.add_argument("--until", default=None, help="--report filter: last day, YYYY-MM-DD")
     args = parser.parse_args()
 
+    if (args.report or args.only_new or args.refresh) and not args.db:
+        print("[ERROR] --report/--only-new/--refresh require --db")
+        return 2
+    if args.report:
+        group_by = tuple(k.strip() for k in args.report.split(",") if k.strip())
+        try:
+            targets = [format_target(p, m) for p, m in parse_targets_csv(args.targets)] if args.targets else None
+        except ValueError as e:
+            print("[ERROR] invalid targets:", e)
+            return 2
+        with EvalDB(args.db) as db:
+            try:
+                _print_db_report(
+                    db, group_by, target=targets, context=args.context, since=args.since, until=args.until
+                )
+            except ValueError as e:
+                print("[ERROR]", e)
+                return 2
+        return 0
+
     config = AutoElectiveConfig()
     sample_dir = args.sample_dir or config.captcha_sample_dir
     labels = _load_labels(args.labels)
@@ -119,80 +148,70 @@ def main():
         print("No samples found in %s" % sample_dir)
         return 1
 
+    db = EvalDB(args.db) if args.db else None
     recognizers = {}
     for provider, model_name in targets:
         target_name = format_target(provider, model_name)
         recognizers[target_name] = get_recognizer(provider, model_name=model_name)
 
-    results = {}
-    for target_name in recognizers:
-        results[target_name] = {
-            "attempts": 0,
-            "errors": 0,
-            "labeled": 0,
-            "exact": 0,
-            "char_match": 0,
-            "char_total": 0,
-            "latencies": [],
-        }
-
-    for base, path, meta in samples:
-        try:
-            with open(path, "rb") as fp:
-                raw = fp.read()
-        except Exception:
+    tasks = []
+    sha1s = {}
+    evaluated = 0
+    for base, load, meta in samples:
+        if db is not None and args.only_new and db.known_sample(base) is not None:
             continue
         label = labels.get(base)
         if label is None and isinstance(meta, dict):
             label = meta.get("label") or meta.get("code")
-        for p, recog in recognizers.items():
-            st = results[p]
-            st["attempts"] += 1
-            t0 = time.time()
+        if db is not None:
             try:
-                cap = recog.recognize(raw)
-                pred = cap.code if hasattr(cap, "code") else str(cap)
-                dt = (time.time() - t0) * 1000.0
-                st["latencies"].append(dt)
-                if label is not None:
-                    st["labeled"] += 1
-                    if str(label) == str(pred):
-                        st["exact"] += 1
-                    m, n = _calc_char_stats(label, pred)
-                    st["char_match"] += m
-                    st["char_total"] += n
+                raw = load()
             except Exception:
-                st["errors"] += 1
+                continue
+            sha1, _ = db.add_sample(raw, sample_id=base, meta=meta, label=label)
+            sha1s[base] = sha1
+            if label is None:
+                label = db.label(sha1)
+        evaluated += 1
+        for target_name in recognizers:
+            cached = None
+            if db is not None and not args.refresh:
+                cached = db.cached_prediction(sha1s[base], target_name)
+            tasks.append(BenchTask(target_name, base, load, label=label, cached=cached))
+
+    def _recognize(task, raw):
+        cap = recognizers[task.target].recognize(raw)
+        return cap.code if hasattr(cap, "code") else str(cap)
+
+    def _record(rec):
+        if db is not None and not rec["cached"]:
+            db.add_prediction(
+                sha1s[rec["image"]], rec["target"], pred=rec["pred"], latency_ms=rec["latency_ms"], error=rec["error"]
+            )
+
+    engine = BenchmarkEngine(concurrency=args.concurrency, rps=args.rps, out_path=args.out, resume=args.resume)
+    records = engine.run(tasks, _recognize, on_result=_record)
+    if db is not None:
+        db.close()
 
     print("Sample dir: %s" % sample_dir)
     print("Targets: %s" % ", ".join(recognizers.keys()))
-    print("Samples: %d" % len(samples))
+    print("Samples: %d" % evaluated)
+    if db is not None:
+        print("DB: %s" % args.db)
+    if args.out:
+        print("Results: %s" % args.out)
     print("")
 
+    rows = {row["key"][0]: row for row in summarize(records, by=("target",))}
     for target_name in recognizers:
-        st = results[target_name]
-        lat = st["latencies"]
-        exact = st["exact"]
-        labeled = st["labeled"]
-        exact_rate = (exact / labeled) if labeled else None
-        char_rate = (st["char_match"] / st["char_total"]) if st["char_total"] else None
+        row = rows.get(target_name)
         print("== %s ==" % target_name)
-        print("attempts=%d errors=%d labeled=%d" % (st["attempts"], st["errors"], labeled))
-        if labeled:
-            print("exact=%.3f char=%.3f" % (exact_rate, char_rate))
-        else:
-            print("exact=-- char=-- (no labels)")
-        print(
-            "latency_ms: avg=%s p50=%s p90=%s p95=%s p99=%s max=%s"
-            % (
-                _format_ms(sum(lat) / len(lat) if lat else None),
-                _format_ms(_percentile(lat, 50)),
-                _format_ms(_percentile(lat, 90)),
-                _format_ms(_percentile(lat, 95)),
-                _format_ms(_percentile(lat, 99)),
-                _format_ms(max(lat) if lat else None),
-            )
-        )
+        if row is None:
+            print("attempts=0")
+            print("")
+            continue
+        print(format_summary(row))
         print("")
 
     return 0
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Run the shared captcha recognition service for elective processes on this host.
+
+Point them at it with `[captcha] service_url=http://127.0.0.1:8731`. Provider
+credentials and models come from this process's config (AUTOELECTIVE_CONFIG_INI).
+"""
+
+import argparse
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from autoelective.captcha.service import RecognitionService, make_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared captcha recognition service (localhost HTTP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8731)
+    parser.add_argument("--workers", type=int, default=4, help="concurrent upstream requests per target")
+    parser.add_argument("--timeout", type=float, default=30.0, help="max seconds per recognition request")
+    args = parser.parse_args()
+
+    service = RecognitionService(workers=args.workers, request_timeout=args.timeout)
+    server = make_server(service, host=args.host, port=args.port)
+    host, port = server.server_address[:2]
+    print("Captcha service listening on http://%s:%d (workers=%d)" % (host, port, args.workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
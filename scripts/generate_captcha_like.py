@@ -1,23 +1,48 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+"""
+Generate synthetic captcha-like images.
+
+Glyphs are rendered with PIL (cached per character); lines, pixel noise and the
+sinusoidal distortion work on NumPy arrays. Images are produced in chunks, each
+with its own seed, so `--workers N` spreads chunks over a process pool and
+`--seed` gives the same dataset for any worker count.
+
+Output formats:
+  - jpg: one `synth_NNNNNN_<LABEL>.jpg` per image (label in the file name, as
+         the benchmark scripts expect)
+  - npz: one `synth-NNNNN.npz` shard per chunk holding `images` (uint8 [N][H][W],
+         grayscale) and `labels` (str [N]); see `load_npz_dataset`
+"""
+
 import argparse
 import math
 import os
-import random
 import string
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
 
 DEFAULT_CHARS = string.ascii_uppercase + string.digits
 
+_font_cache = {}
+_glyph_cache = {}
+_grid_cache = {}
 
-def _random_text(length, chars=DEFAULT_CHARS):
-    return "".join(random.choice(chars) for _ in range(length))
+
+def _random_text(rng, length, chars=DEFAULT_CHARS):
+    return "".join(chars[i] for i in rng.integers(0, len(chars), size=length))
 
 
 def _load_font(size):
     # Try common fonts, fall back to default
+    font = _font_cache.get(size)
+    if font is not None:
+        return font
     candidates = [
         "/System/Library/Fonts/Supplemental/Arial.ttf",
         "/System/Library/Fonts/Supplemental/Times New Roman.ttf",
@@ -27,80 +52,146 @@ def _load_font(size):
     for path in candidates:
         if os.path.exists(path):
             try:
-                return ImageFont.truetype(path, size=size)
+                font = ImageFont.truetype(path, size=size)
+                break
             except Exception:
                 continue
-    return ImageFont.load_default()
+    if font is None:
+        font = ImageFont.load_default()
+    _font_cache[size] = font
+    return font
+
+
+def _glyph(ch, cell_w, h):
+    # Single-band coverage mask: rotating it costs a quarter of an RGBA glyph.
+    key = (ch, cell_w, h)
+    img = _glyph_cache.get(key)
+    if img is None:
+        img = Image.new("L", (cell_w, h), 0)
+        ImageDraw.Draw(img).text((0, 0), ch, font=_load_font(size=int(h * 0.65)), fill=255)
+        _glyph_cache[key] = img
+    return img
 
 
-def _draw_noise(draw, w, h, density=0.015):
-    n = int(w * h * density)
-    for _ in range(n):
-        x = random.randint(0, w - 1)
-        y = random.randint(0, h - 1)
-        c = random.randint(0, 255)
-        draw.point((x, y), fill=(c, c, c))
+def _grid(w, h):
+    grid = _grid_cache.get((w, h))
+    if grid is None:
+        ys, xs = np.mgrid[0:h, 0:w]
+        grid = _grid_cache[(w, h)] = (xs.astype(np.float64), ys.astype(np.float64))
+    return grid
 
 
-def _draw_lines(draw, w, h, count=3):
+def _draw_lines(draw, rng, w, h, count=3):
     for _ in range(count):
-        x1 = random.randint(0, w)
-        y1 = random.randint(0, h)
-        x2 = random.randint(0, w)
-        y2 = random.randint(0, h)
-        c = random.randint(60, 160)
-        draw.line((x1, y1, x2, y2), fill=(c, c, c), width=1)
-
-
-def _distort(img):
-    w, h = img.size
-    # sinusoidal horizontal distortion
-    dx = random.uniform(1.5, 3.5)
-    dy = random.uniform(1.0, 2.5)
-    x_period = random.uniform(80.0, 140.0)
-    y_period = random.uniform(80.0, 140.0)
-    x_phase = random.uniform(0, 2 * math.pi)
-    y_phase = random.uniform(0, 2 * math.pi)
-
-    def _shift(x, y):
-        return (
-            x + dx * math.sin(2 * math.pi * y / x_period + x_phase),
-            y + dy * math.sin(2 * math.pi * x / y_period + y_phase),
-        )
-
-    dst = Image.new("RGB", (w, h), "white")
-    for y in range(h):
-        for x in range(w):
-            sx, sy = _shift(x, y)
-            sx = int(min(max(sx, 0), w - 1))
-            sy = int(min(max(sy, 0), h - 1))
-            dst.putpixel((x, y), img.getpixel((sx, sy)))
-    return dst
-
-
-def generate_one(text, w, h):
-    img = Image.new("RGB", (w, h), "white")
-    draw = ImageDraw.Draw(img)
-    font = _load_font(size=int(h * 0.65))
-
-    # random placement per character
+        x1, x2 = rng.integers(0, w + 1, size=2)
+        y1, y2 = rng.integers(0, h + 1, size=2)
+        c = int(rng.integers(60, 161))
+        draw.line((int(x1), int(y1), int(x2), int(y2)), fill=c, width=1)
+
+
+def _add_noise(arr, rng, density=0.015):
+    h, w = arr.shape
+    n = int(w * h * density)
+    ys = rng.integers(0, h, size=n)
+    xs = rng.integers(0, w, size=n)
+    arr[ys, xs] = rng.integers(0, 256, size=n, dtype=np.uint8)
+    return arr
+
+
+def _distort(arr, rng):
+    h, w = arr.shape
+    xs, ys = _grid(w, h)
+    dx = rng.uniform(1.5, 3.5)
+    dy = rng.uniform(1.0, 2.5)
+    x_period = rng.uniform(80.0, 140.0)
+    y_period = rng.uniform(80.0, 140.0)
+    x_phase = rng.uniform(0, 2 * math.pi)
+    y_phase = rng.uniform(0, 2 * math.pi)
+    sx = xs + dx * np.sin(2 * math.pi * ys / x_period + x_phase)
+    sy = ys + dy * np.sin(2 * math.pi * xs / y_period + y_phase)
+    sx = np.clip(sx, 0, w - 1).astype(np.intp)
+    sy = np.clip(sy, 0, h - 1).astype(np.intp)
+    return arr[sy, sx]
+
+
+def generate_array(text, w, h, rng):
+    """
+    uint8 [h][w] grayscale captcha for `text`.
+    """
+    img = Image.new("L", (w, h), 255)
     spacing = w // (len(text) + 1)
     for i, ch in enumerate(text):
-        x = spacing * (i + 1) - random.randint(6, 12)
-        y = random.randint(0, max(0, h - int(h * 0.75)))
-        angle = random.uniform(-25, 25)
-        ch_img = Image.new("RGBA", (spacing, h), (255, 255, 255, 0))
-        ch_draw = ImageDraw.Draw(ch_img)
-        ch_draw.text((0, 0), ch, font=font, fill=(0, 0, 0))
-        ch_img = ch_img.rotate(angle, resample=Image.BICUBIC, expand=1)
-        img.paste(ch_img, (x, y), ch_img)
-
-    _draw_lines(draw, w, h, count=random.randint(2, 4))
-    _draw_noise(draw, w, h, density=random.uniform(0.01, 0.02))
-
-    img = _distort(img)
-    img = img.filter(ImageFilter.SMOOTH)
-    return img
+        x = spacing * (i + 1) - int(rng.integers(6, 13))
+        y = int(rng.integers(0, max(0, h - int(h * 0.75)) + 1))
+        mask = _glyph(ch, spacing, h).rotate(rng.uniform(-25, 25), resample=Image.BICUBIC, expand=1)
+        img.paste(0, (x, y), mask)
+
+    _draw_lines(ImageDraw.Draw(img), rng, w, h, count=int(rng.integers(2, 5)))
+    arr = np.array(img, dtype=np.uint8)
+    _add_noise(arr, rng, density=rng.uniform(0.01, 0.02))
+    arr = _distort(arr, rng)
+    return np.asarray(Image.fromarray(arr, "L").filter(ImageFilter.SMOOTH))
+
+
+def generate_one(text, w, h, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    return Image.fromarray(generate_array(text, w, h, rng), "L").convert("RGB")
+
+
+def _generate_chunk(job):
+    """
+    Worker entry: generate and write one chunk; returns the number of images.
+    """
+    chunk, start, count, seed, opts = job
+    rng = np.random.default_rng([seed, chunk])
+    w, h = opts["width"], opts["height"]
+    labels = [_random_text(rng, opts["length"]) for _ in range(count)]
+    if opts["format"] == "npz":
+        images = np.empty((count, h, w), dtype=np.uint8)
+        for i, text in enumerate(labels):
+            images[i] = generate_array(text, w, h, rng)
+        path = os.path.join(opts["out"], "synth-%05d.npz" % chunk)
+        np.savez(path, images=images, labels=np.array(labels))
+    else:
+        for i, text in enumerate(labels):
+            img = Image.fromarray(generate_array(text, w, h, rng), "L").convert("RGB")
+            img.save(os.path.join(opts["out"], "synth_%06d_%s.jpg" % (start + i, text)), quality=90)
+    return count
+
+
+def load_npz_dataset(out_dir):
+    """
+    (images uint8 [N][H][W], labels str [N]) from every npz shard under `out_dir`.
+    """
+    names = sorted(n for n in os.listdir(out_dir) if n.startswith("synth-") and n.endswith(".npz"))
+    images = []
+    labels = []
+    for name in names:
+        with np.load(os.path.join(out_dir, name)) as data:
+            images.append(data["images"])
+            labels.append(data["labels"])
+    if not images:
+        return np.zeros((0, 0, 0), dtype=np.uint8), np.array([], dtype=str)
+    return np.concatenate(images), np.concatenate(labels)
+
+
+def generate(count, out, width=140, height=48, length=4, fmt="jpg", workers=1, chunk_size=500, seed=None):
+    """
+    Returns the number of images written. Chunk `i` always covers images
+    [i * chunk_size, (i + 1) * chunk_size), seeded by (seed, i).
+    """
+    os.makedirs(out, exist_ok=True)
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+    opts = {"width": width, "height": height, "length": length, "format": fmt, "out": out}
+    chunk_size = max(1, int(chunk_size))
+    jobs = []
+    for chunk, start in enumerate(range(0, count, chunk_size)):
+        jobs.append((chunk, start, min(chunk_size, count - start), seed, opts))
+    if workers <= 1 or len(jobs) <= 1:
+        return sum(_generate_chunk(job) for job in jobs)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return sum(ex.map(_generate_chunk, jobs))
 
 
 def main():
@@ -110,17 +201,33 @@ def main():
     parser.add_argument("--width", type=int, default=140)
     parser.add_argument("--height", type=int, default=48)
     parser.add_argument("--length", type=int, default=4)
+    parser.add_argument("--format", choices=("jpg", "npz"), default="jpg", help="jpg files or npz array shards")
+    parser.add_argument("--workers", type=int, default=1, help="process pool size (0: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="images per chunk / npz shard")
+    parser.add_argument("--seed", type=int, default=None, help="fixed seed for a reproducible dataset")
     args = parser.parse_args()
 
-    os.makedirs(args.out, exist_ok=True)
-    for i in range(args.count):
-        text = _random_text(args.length)
-        img = generate_one(text, args.width, args.height)
-        path = os.path.join(args.out, f"synth_{i:04d}_{text}.jpg")
-        img.save(path, quality=90)
-
-    print(f"Saved {args.count} captcha-like images to {args.out}")
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    t0 = time.time()
+    n = generate(
+        args.count,
+        args.out,
+        width=args.width,
+        height=args.height,
+        length=args.length,
+        fmt=args.format,
+        workers=workers,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+    )
+    dt = time.time() - t0
+    rate = n / dt if dt > 0 else float("inf")
+    print(
+        "Saved %d captcha-like images to %s (%s, %d workers) in %.2fs: %.0f images/s"
+        % (n, args.out, args.format, workers, dt, rate)
+    )
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from autoelective.captcha.adaptive import CaptchaAdaptiveManager
+from autoelective.captcha.journal import AttemptJournal, iter_records
+import autoelective.loop as loop
+
+
+class AttemptJournalOfflineTest(unittest.TestCase):
+    def test_append_replay_and_torn_tail(self):
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "journal.jsonl")
+            journal = AttemptJournal(path)
+            mgr = CaptchaAdaptiveManager(["a", "b"], min_samples=1)
+            mgr.set_journal(journal)
+            mgr.record_attempt("a", True, latency=0.2, h_latency=0.5)
+            mgr.record_attempt("a", False, latency=0.3, h_latency=None)
+            mgr.record_attempt("b", None)  # no verdict: not journaled
+            journal.close()
+            with open(path, "a", encoding="utf-8") as fp:
+                fp.write('{"t": 1, "p": "b", "o')  # crash mid-write
+
+            records = list(iter_records(path))
+            self.assertEqual([(r[1], r[2], r[3], r[4]) for r in records], [("a", True, 0.2, 0.5), ("a", False, 0.3, None)])
+
+            mgr2 = CaptchaAdaptiveManager(["a", "b"], min_samples=1)
+            self.assertEqual(AttemptJournal(path).replay(mgr2), 2)
+            st = mgr2.snapshot()["stats"]["a"]
+            self.assertEqual((st["count"], st["success"], st["failure"]), (2, 1, 1))
+
+    def test_compact_keeps_records_after_checkpoint(self):
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "journal.jsonl")
+            journal = AttemptJournal(path)
+            for ts in (10.0, 20.0, 30.0):
+                journal.append(ts, "a", True, latency=0.1)
+            self.assertEqual(journal.compact(20.0), 1)
+            journal.append(40.0, "b", False)
+            journal.close()
+            self.assertEqual([(r[0], r[1]) for r in iter_records(path)], [(30.0, "a"), (40.0, "b")])
+
+
+class LoopAdaptiveJournalOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self._orig = {
+            k: getattr(loop, k)
+            for k in (
+                "CAPTCHA_ADAPTIVE_PERSIST_ENABLE",
+                "CAPTCHA_ADAPTIVE_PERSIST_PATH",
+                "CAPTCHA_ADAPTIVE_JOURNAL_ENABLE",
+                "CAPTCHA_ADAPTIVE_JOURNAL_PATH",
+                "CAPTCHA_ADAPTIVE_JOURNAL_COMPACT_BYTES",
+                "_adaptive_snapshot_loaded",
+                "_adaptive_persist_last_at",
+                "_adaptive_journal",
+            )
+        }
+        self._td = tempfile.TemporaryDirectory()
+        loop.CAPTCHA_ADAPTIVE_PERSIST_ENABLE = False
+        loop.CAPTCHA_ADAPTIVE_PERSIST_PATH = os.path.join(self._td.name, "snapshot.json")
+        loop.CAPTCHA_ADAPTIVE_JOURNAL_ENABLE = True
+        loop.CAPTCHA_ADAPTIVE_JOURNAL_PATH = os.path.join(self._td.name, "journal.jsonl")
+        loop.CAPTCHA_ADAPTIVE_JOURNAL_COMPACT_BYTES = 200
+        loop._adaptive_journal = None
+
+    def tearDown(self):
+        if loop._adaptive_journal is not None:
+            loop._adaptive_journal.close()
+        for k, v in self._orig.items():
+            setattr(loop, k, v)
+        self._td.cleanup()
+
+    def _restart(self):
+        if loop._adaptive_journal is not None:
+            loop._adaptive_journal.close()
+        loop._adaptive_journal = None
+        loop._adaptive_snapshot_loaded = False
+        return CaptchaAdaptiveManager(["a", "b"], min_samples=1)
+
+    def test_compaction_checkpoint_plus_journal_tail_restores_all_attempts(self):
+        mgr = self._restart()
+        with mock.patch.object(loop, "adaptive", new=mgr):
+            loop._load_adaptive_snapshot_once()
+            mgr.record_attempt("a", True, latency=0.2, h_latency=0.5)
+            self.assertFalse(loop._maybe_persist_adaptive())  # journal still small
+            for _ in range(4):
+                mgr.record_attempt("b", False, latency=0.4, h_latency=0.5)
+            self.assertTrue(loop._maybe_persist_adaptive())  # past 200 bytes: checkpoint + compact
+            self.assertTrue(os.path.exists(loop.CAPTCHA_ADAPTIVE_PERSIST_PATH))
+            self.assertEqual(os.path.getsize(loop.CAPTCHA_ADAPTIVE_JOURNAL_PATH), 0)
+            mgr.record_attempt("a", True, latency=0.2, h_latency=0.5)  # after the checkpoint
+
+        mgr2 = self._restart()
+        with mock.patch.object(loop, "adaptive", new=mgr2):
+            self.assertTrue(loop._load_adaptive_snapshot_once())
+        stats = mgr2.snapshot()["stats"]
+        self.assertEqual((stats["a"]["count"], stats["a"]["success"]), (2, 2))
+        self.assertEqual((stats["b"]["count"], stats["b"]["failure"]), (4, 4))
+
+    def test_attempt_between_snapshot_and_compact_is_kept(self):
+        mgr = self._restart()
+        clock = [100.0]
+        mgr._clock = lambda: clock[0]
+        take_snapshot = mgr.snapshot
+
+        def _snapshot_then_attempt():
+            snap = take_snapshot()
+            clock[0] += 1.0
+            mgr.record_attempt("a", False, latency=0.3)  # lands before compact()
+            return snap
+
+        with mock.patch.object(loop, "adaptive", new=mgr):
+            loop._load_adaptive_snapshot_once()
+            mgr.record_attempt("b", True, latency=0.2)
+            with mock.patch.object(mgr, "snapshot", new=_snapshot_then_attempt):
+                self.assertTrue(loop._maybe_persist_adaptive(force=True))
+
+        mgr2 = self._restart()
+        with mock.patch.object(loop, "adaptive", new=mgr2):
+            self.assertTrue(loop._load_adaptive_snapshot_once())
+        stats = mgr2.snapshot()["stats"]
+        self.assertEqual((stats["a"]["count"], stats["a"]["failure"]), (1, 1))
+        self.assertEqual(stats["b"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
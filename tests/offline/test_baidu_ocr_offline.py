@@ -0,0 +1,127 @@
+import os
+import tempfile
+import time
+import unittest
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+from autoelective.captcha import get_recognizer
+from autoelective.config import AutoElectiveConfig
+from autoelective.exceptions import RecognizerError
+from autoelective.utils import Singleton
+
+
+class _Resp:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+        self.headers = {}
+
+    def json(self):
+        return self._data
+
+
+def _image():
+    buf = BytesIO()
+    Image.new("RGB", (16, 16), (255, 255, 255)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class BaiduOCROfflineTest(unittest.TestCase):
+    def setUp(self):
+        self._cfg_old = os.environ.get("AUTOELECTIVE_CONFIG_INI")
+        cfg = Path(__file__).resolve().parents[2] / "config.sample.ini"
+        os.environ["AUTOELECTIVE_CONFIG_INI"] = str(cfg)
+        Singleton._inst.pop(AutoElectiveConfig, None)
+        self._recognizers = []
+
+    def tearDown(self):
+        for r in self._recognizers:
+            r.close()
+        if self._cfg_old is None:
+            os.environ.pop("AUTOELECTIVE_CONFIG_INI", None)
+        else:
+            os.environ["AUTOELECTIVE_CONFIG_INI"] = self._cfg_old
+        Singleton._inst.pop(AutoElectiveConfig, None)
+
+    def _build(self):
+        r = get_recognizer("baidu")
+        self._recognizers.append(r)
+        return r
+
+    @mock.patch("autoelective.captcha.online.get_access_token", return_value=("T1", 2592000))
+    def test_recognize_uses_pooled_session(self, _token):
+        posted = []
+
+        def _fake_post(self, url, **kwargs):
+            posted.append(url)
+            return _Resp(200, {"words_result": [{"words": "Ab12"}]})
+
+        r = self._build()
+        with mock.patch("requests.sessions.Session.post", new=_fake_post), mock.patch(
+            "requests.request", side_effect=AssertionError("module-level request used")
+        ):
+            cap = r.recognize(_image())
+        self.assertEqual(cap.code, "Ab12")
+        self.assertTrue(posted[0].endswith("access_token=T1"))
+        stats = r.latency_stats()
+        self.assertEqual(stats["token_refresh"]["count"], 1)
+        self.assertEqual(stats["ocr"]["count"], 1)
+        self.assertEqual(stats["token_source"], "network")
+
+    @mock.patch("autoelective.captcha.online.get_access_token", return_value=("T1", 2592000))
+    def test_token_cache_is_reused_across_instances(self, token):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "baidu_ocr_token.json")
+            with mock.patch.object(
+                AutoElectiveConfig, "baidu_token_cache", new_callable=mock.PropertyMock, return_value=path
+            ):
+                r1 = self._build()
+                self.assertTrue(os.path.exists(path))
+                r2 = self._build()
+        self.assertEqual(token.call_count, 1)
+        self.assertEqual(r2.latency_stats()["token_source"], "cache")
+        self.assertEqual(r2.url, r1.url)
+
+    def test_token_refreshes_in_background(self):
+        tokens = iter(["T%d" % i for i in range(1, 100)])
+        with mock.patch(
+            "autoelective.captcha.online.get_access_token",
+            side_effect=lambda *a, **k: (next(tokens), 2592000),
+        ) as token, mock.patch(
+            "autoelective.captcha.online.BaiduOCRRecognizer._refresh_margin",
+            side_effect=lambda lifetime: lifetime - 0.1,
+        ):
+            r = self._build()
+            deadline = time.time() + 2
+            while token.call_count < 2 and time.time() < deadline:
+                time.sleep(0.02)
+            r.close()
+        self.assertGreaterEqual(token.call_count, 2)
+        self.assertFalse(r.url.endswith("access_token=T1"))
+        self.assertGreaterEqual(r.latency_stats()["token_refresh"]["count"], 2)
+
+    @mock.patch("autoelective.captcha.online.get_access_token", return_value=("T1", 2592000))
+    def test_invalid_token_error_forces_refresh(self, token):
+        def _fake_post(self, url, **kwargs):
+            return _Resp(200, {"error_code": 110, "error_msg": "Access token invalid or no longer valid"})
+
+        r = self._build()
+        before = token.call_count
+        with mock.patch("requests.sessions.Session.post", new=_fake_post):
+            with self.assertRaises(RecognizerError):
+                r.recognize(_image())
+        self.assertEqual(r.latency_stats()["ocr"]["errors"], 1)
+        # the sleeping refresher is woken up instead of waiting for the old refresh time
+        deadline = time.time() + 2
+        while token.call_count == before and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(token.call_count, before + 1)
+        self.assertGreater(r._access_token_expire_at, time.time())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from autoelective.captcha.benchmark import (
+    BenchmarkEngine,
+    BenchTask,
+    format_summary,
+    summarize,
+    wilson_interval,
+)
+
+
+def _tasks(target, n, label="ABCD", group=None):
+    return [BenchTask(target, "img%02d" % i, (lambda: b"raw"), label=label, group=group) for i in range(n)]
+
+
+class CaptchaBenchmarkEngineOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="captcha_bench_")
+        self.out = os.path.join(self.tmpdir, "results.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_groups_run_concurrently_within_their_limits(self):
+        lock = threading.Lock()
+        inflight = {}
+        peak = {}
+
+        def _call(task, raw):
+            with lock:
+                inflight[task.group] = inflight.get(task.group, 0) + 1
+                peak[task.group] = max(peak.get(task.group, 0), inflight[task.group])
+            time.sleep(0.03)
+            with lock:
+                inflight[task.group] -= 1
+            return "ABCD"
+
+        engine = BenchmarkEngine(concurrency=2, limits={"baidu": (1, 0)})
+        t0 = time.time()
+        records = engine.run(_tasks("openai:a", 4) + _tasks("openai:b", 4) + _tasks("baidu", 4), _call)
+        elapsed = time.time() - t0
+        self.assertEqual(len(records), 12)
+        self.assertEqual(peak, {"openai": 2, "baidu": 1})  # two openai models share one group
+        self.assertLess(elapsed, 0.03 * 12 * 0.75)  # groups overlap instead of running back to back
+
+    def test_interrupt_cancels_queued_calls_and_checkpoints_in_flight_ones(self):
+        calls = []
+        lock = threading.Lock()
+
+        def _call(task, raw):
+            with lock:
+                calls.append(task.key)
+            time.sleep(0.05)
+            return "ABCD"
+
+        def _on_result(rec):
+            if len(calls) >= 5:
+                raise KeyboardInterrupt()
+
+        engine = BenchmarkEngine(concurrency=2, out_path=self.out)
+        t0 = time.time()
+        with self.assertRaises(KeyboardInterrupt):
+            engine.run(_tasks("dummy", 60), _call, on_result=_on_result)
+        self.assertLess(time.time() - t0, 1.0)
+        self.assertLessEqual(len(calls), 8)
+        with open(self.out, "r", encoding="utf-8") as fp:
+            written = [json.loads(line)["key"] for line in fp]
+        self.assertEqual(sorted(written), sorted(calls))  # every paid call is checkpointed
+
+    def test_rps_limit_paces_requests(self):
+        engine = BenchmarkEngine(concurrency=4, rps=50)
+        t0 = time.time()
+        engine.run(_tasks("dummy", 6), lambda task, raw: "ABCD")
+        self.assertGreaterEqual(time.time() - t0, 0.09)  # burst 1, then 5 more at 50/s
+
+    def test_streams_jsonl_and_resumes_from_checkpoint(self):
+        calls = []
+        fail_once = {"img01"}
+
+        def _call(task, raw):
+            calls.append(task.image)
+            if task.image in fail_once:
+                fail_once.discard(task.image)
+                raise RuntimeError("boom")
+            return "ABCD"
+
+        BenchmarkEngine(out_path=self.out).run(_tasks("dummy", 3), _call)
+        with open(self.out, "r", encoding="utf-8") as fp:
+            lines = [json.loads(line) for line in fp]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(sum(1 for r in lines if r["error"]), 1)
+
+        with open(self.out, "a", encoding="utf-8") as fp:
+            fp.write('{"key": "torn')  # interrupted mid-write
+        calls.clear()
+        records = BenchmarkEngine(out_path=self.out, resume=True).run(_tasks("dummy", 3), _call)
+        self.assertEqual(calls, ["img01"])  # only the failed task is retried
+        self.assertEqual(sum(1 for r in records if r.get("resumed")), 2)
+        (row,) = summarize(records, by=("target",))
+        self.assertEqual((row["n"], row["ok"], row["errors"]), (3, 3, 0))
+
+    def test_summary_reports_percentiles_and_intervals(self):
+        records = []
+        for i in range(100):
+            records.append(
+                {
+                    "target": "t",
+                    "variant": "",
+                    "label": "ABCD",
+                    "pred": "ABCD" if i < 90 else "ABCX",
+                    "latency_ms": float(i + 1),
+                    "error": None,
+                    "started_at": 1000.0 + i * 0.1,
+                    "finished_at": 1000.0 + i * 0.1 + 0.05,
+                }
+            )
+        (row,) = summarize(records)
+        self.assertEqual((row["latency_p50"], row["latency_p90"], row["latency_p99"]), (51.0, 90.0, 99.0))
+        self.assertAlmostEqual(row["exact"], 0.9)
+        lo, hi = row["exact_ci"]
+        self.assertAlmostEqual(lo, 0.8256, places=3)
+        self.assertAlmostEqual(hi, 0.9448, places=3)
+        self.assertAlmostEqual(row["throughput"], 100 / 9.95, places=3)
+        self.assertIn("exact=0.900 [0.826, 0.945]", format_summary(row))
+        self.assertIsNone(wilson_interval(0, 0))
+        self.assertEqual(wilson_interval(0, 10)[0], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from unittest import mock
+
+from autoelective.captcha.adaptive import CaptchaAdaptiveManager
+from autoelective.captcha.breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CaptchaBreakerRegistry,
+    CircuitBreaker,
+    classify_failure,
+)
+from autoelective.exceptions import OperationFailedError, OperationTimeoutError, RecognizerError
+import autoelective.loop as loop
+
+
+class _Resp:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _http_error(status, headers=None):
+    return RecognizerError(msg="Recognizer ERROR: http %d" % status, response=_Resp(status, headers))
+
+
+class CircuitBreakerOfflineTest(unittest.TestCase):
+    def test_classify_failure(self):
+        self.assertEqual(classify_failure(OperationTimeoutError(msg="t")), "timeout")
+        self.assertEqual(classify_failure(_http_error(429)), "rate_limit")
+        self.assertEqual(classify_failure(_http_error(503)), "server")
+        self.assertEqual(classify_failure(OperationFailedError(msg="conn")), "server")
+        self.assertIsNone(classify_failure(_http_error(400)))
+        self.assertIsNone(classify_failure(RecognizerError(msg="Empty result")))
+
+    def test_thresholds_are_per_failure_kind(self):
+        b = CircuitBreaker("p", timeout_threshold=2, server_threshold=3, open_seconds=10)
+        self.assertFalse(b.record_failure("server", now=100.0))
+        self.assertFalse(b.record_failure("timeout", now=100.0))
+        self.assertFalse(b.record_failure("server", now=100.0))
+        self.assertTrue(b.record_failure("timeout", now=100.0))
+        self.assertFalse(b.allow(now=105.0))
+
+    def test_rate_limit_opens_immediately_with_retry_after(self):
+        b = CircuitBreaker("p", rate_limit_threshold=1, open_seconds=5, max_open_seconds=100)
+        self.assertTrue(b.record_failure("rate_limit", retry_after=40, now=100.0))
+        self.assertFalse(b.allow(now=130.0))
+        self.assertTrue(b.allow(now=141.0))
+
+    def test_half_open_trial_limit_and_recovery(self):
+        b = CircuitBreaker("p", timeout_threshold=1, open_seconds=10, half_open_max_calls=1)
+        b.record_failure("timeout", now=100.0)
+        self.assertFalse(b.allow(now=109.0))
+        self.assertTrue(b.allow(now=111.0))
+        self.assertFalse(b.allow(now=111.5))  # trial slot taken
+        self.assertTrue(b.record_success())
+        self.assertEqual(b.state, CLOSED)
+        self.assertTrue(b.allow(now=112.0))
+
+    def test_half_open_failure_doubles_cooldown(self):
+        b = CircuitBreaker("p", timeout_threshold=1, open_seconds=10, max_open_seconds=15)
+        b.record_failure("timeout", now=100.0)
+        self.assertTrue(b.allow(now=111.0))
+        self.assertTrue(b.record_failure("timeout", now=111.0))
+        self.assertFalse(b.allow(now=125.0))
+        self.assertTrue(b.allow(now=126.5))  # 15s cap
+        self.assertEqual(b.snapshot()["state"], HALF_OPEN)
+
+    def test_answer_failures_do_not_trip(self):
+        reg = CaptchaBreakerRegistry(enabled=True, server_threshold=1)
+        for _ in range(5):
+            self.assertIsNone(reg.record("p", RecognizerError(msg="Unexpected code length")))
+        self.assertTrue(reg.allow("p"))
+
+    def test_disabled_registry_allows_everything(self):
+        reg = CaptchaBreakerRegistry(enabled=False, timeout_threshold=1)
+        for _ in range(3):
+            self.assertIsNone(reg.record("p", OperationTimeoutError(msg="t")))
+        self.assertTrue(reg.allow("p"))
+        self.assertEqual(reg.partition(["p", "q"]), (["p", "q"], []))
+
+
+class _Rec:
+    def recognize(self, _raw):
+        raise NotImplementedError
+
+
+class LoopBreakerOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self._orig = {
+            "recognizers": list(loop.recognizers),
+            "recognizer": loop.recognizer,
+            "recognizer_index": loop.recognizer_index,
+            "_recognizer_names": list(loop._recognizer_names),
+            "_recognizer_map": dict(loop._recognizer_map),
+            "_recognizer_wait_ready": loop._recognizer_wait_ready,
+        }
+        self.r1, self.r2 = _Rec(), _Rec()
+        loop.recognizers = [self.r1, self.r2]
+        loop._recognizer_names = ["r1", "r2"]
+        loop._recognizer_map = {"r1": self.r1, "r2": self.r2}
+        loop.recognizer_index = 0
+        loop.recognizer = self.r1
+
+    def tearDown(self):
+        for k, v in self._orig.items():
+            setattr(loop, k, v)
+
+    def test_open_breaker_moves_provider_to_end_and_skips_it(self):
+        breakers = CaptchaBreakerRegistry(enabled=True, timeout_threshold=1, open_seconds=60)
+        with mock.patch.object(loop, "captcha_breakers", breakers), mock.patch.object(
+            loop, "adaptive", CaptchaAdaptiveManager(["r1", "r2"], enabled=False)
+        ):
+            loop._record_breaker("r1", OperationTimeoutError(msg="t"))
+            self.assertEqual(loop._recognizer_names, ["r2", "r1"])
+            self.assertIs(loop.recognizer, self.r2)
+            self.assertEqual(breakers.get("r1").state, OPEN)
+
+            # even if something puts r1 back in front, the round skips it instantly
+            loop.recognizer_index = 1
+            loop.recognizer = self.r1
+            self.assertTrue(loop._select_usable_recognizer())
+            self.assertIs(loop.recognizer, self.r2)
+
+            loop._record_breaker("r2", OperationTimeoutError(msg="t"))
+            self.assertFalse(loop._select_usable_recognizer())
+
+    def test_chain_order_kept_while_head_initializes(self):
+        self.r1.ready = False
+        loop._recognizer_wait_ready = True
+        loop.recognizer_index = 1
+        loop.recognizer = self.r2
+        breakers = CaptchaBreakerRegistry(enabled=True)
+        with mock.patch.object(loop, "captcha_breakers", breakers):
+            self.assertTrue(loop._select_usable_recognizer())
+            self.assertIs(loop.recognizer, self.r2)
+            self.r1.ready = True
+            self.assertTrue(loop._select_usable_recognizer())
+        self.assertEqual(loop._recognizer_names, ["r1", "r2"])
+        self.assertIs(loop.recognizer, self.r1)
+        self.assertFalse(loop._recognizer_wait_ready)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from autoelective.captcha.captcha import Captcha
+from autoelective.captcha.evaldb import EvalDB
+from autoelective.captcha.samples import SampleWriter, list_samples
+
+_PNG = b"\x89PNG\r\n\x1a\n"
+
+
+class _CountingRecognizer:
+    def __init__(self, code):
+        self.code = code
+        self.calls = 0
+
+    def recognize(self, raw):
+        self.calls += 1
+        return Captcha(self.code, None, None, None, None)
+
+
+class CaptchaEvalDBOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="captcha_evaldb_")
+        self.db_path = os.path.join(self.tmpdir, "eval.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_annotated_samples_feed_validations_and_summaries(self):
+        sample_dir = os.path.join(self.tmpdir, "samples")
+        w = SampleWriter(sample_dir, store="pack")
+        w.submit(_PNG + b"main", {"provider": "baidu", "context": "main", "ts": "20260301T080000Z"})
+        w.submit(_PNG + b"probe", {"provider": "gemini", "context": "probe", "ts": "20260302T080000Z"})
+        w.annotate(_PNG + b"main", {"pred": "ABCD", "valid": "2", "recog_dt": 0.2, "val_dt": 0.05})
+        w.annotate(_PNG + b"probe", {"pred": "WXYZ", "valid": "0", "recog_dt": 0.4})
+        w.annotate(_PNG + b"never-sampled", {"pred": "QQQQ", "valid": "2"})
+        w.close()
+
+        samples = list_samples(sample_dir)
+        self.assertEqual(len(samples), 2)
+        with EvalDB(self.db_path) as db:
+            for sample_id, load, meta in samples:
+                self.assertIn("valid", meta)
+                _, is_new = db.add_sample(load(), sample_id=sample_id, meta=meta)
+                self.assertTrue(is_new)
+            # re-indexing is a no-op: no duplicated validations
+            for sample_id, load, meta in samples:
+                self.assertFalse(db.add_sample(load(), sample_id=sample_id, meta=meta)[1])
+            self.assertIsNotNone(db.known_sample(samples[0][0]))
+            # recognition time is a prediction latency; validations only hold Validate RTT
+            main_sha1 = db.known_sample(samples[0][0])
+            self.assertEqual(db.cached_prediction(main_sha1, "baidu"), ("ABCD", 200.0))
+            latencies = dict(db._conn.execute("SELECT target, latency_ms FROM validations").fetchall())
+            self.assertEqual(latencies, {"baidu": 50.0, "gemini": None})
+
+            rows = {r["key"]: r for r in db.validation_summary(("target", "context"))}
+            self.assertEqual(rows[("baidu", "main")]["pass_rate"], 1.0)
+            self.assertEqual(rows[("gemini", "probe")]["pass_rate"], 0.0)
+            days = [r["key"] for r in db.validation_summary("day")]
+            self.assertEqual(days, [("2026-03-01",), ("2026-03-02",)])
+            self.assertEqual(len(db.validation_summary("target", since="2026-03-02")), 1)
+            with self.assertRaises(ValueError):
+                db.validation_summary("provider")
+
+    def test_predictions_are_cached_and_summarized(self):
+        with EvalDB(self.db_path) as db:
+            a, _ = db.add_sample(_PNG + b"a", sample_id="a", label="abcd", context="main")
+            b, _ = db.add_sample(_PNG + b"b", sample_id="b", label="EFGH", context="probe")
+            db.add_prediction(a, "openai:m", error="timeout", latency_ms=3000.0)
+            self.assertIsNone(db.cached_prediction(a, "openai:m"))  # errors are retried
+            db.add_prediction(a, "openai:m", pred="ABCD", latency_ms=100.0)
+            db.add_prediction(b, "openai:m", pred="EFGX", latency_ms=300.0)
+            db.add_prediction(a, "openai:m", pred="ABCD", latency_ms=50.0, variant="gray,png")
+            self.assertEqual(db.cached_prediction(a, "openai:m"), ("ABCD", 100.0))
+            self.assertEqual(db.cached_prediction(a, "openai:m", "gray,png"), ("ABCD", 50.0))
+
+            (row,) = db.prediction_summary("target", variant="")
+            self.assertEqual((row["n"], row["errors"], row["labeled"]), (3, 1, 2))
+            self.assertEqual(row["exact"], 0.5)
+            self.assertEqual(row["latency_avg"], 200.0)
+            by_ctx = {r["key"]: r["exact"] for r in db.prediction_summary("context", variant="")}
+            self.assertEqual(by_ctx, {("main",): 1.0, ("probe",): 0.0})
+
+    def test_eval_script_reuses_cached_predictions(self):
+        import scripts.captcha_sample_eval as eval_script
+
+        sample_dir = os.path.join(self.tmpdir, "samples")
+        os.makedirs(sample_dir)
+        for name in ("s1", "s2"):
+            with open(os.path.join(sample_dir, name + ".png"), "wb") as fp:
+                fp.write(_PNG + name.encode())
+        rec = _CountingRecognizer("ABCD")
+
+        def _run(*extra):
+            argv = ["captcha_sample_eval.py", "--sample-dir", sample_dir, "--targets", "dummy", "--db", self.db_path]
+            out = io.StringIO()
+            with mock.patch.object(eval_script, "get_recognizer", new=lambda _p, model_name=None: rec), \
+                 mock.patch.object(eval_script, "AutoElectiveConfig", new=lambda: None), \
+                 mock.patch("sys.argv", new=argv + list(extra)), redirect_stdout(out):
+                rc = eval_script.main()
+            self.assertEqual(rc, 0)
+            return out.getvalue()
+
+        _run()
+        self.assertEqual(rec.calls, 2)
+        text = _run()
+        self.assertEqual(rec.calls, 2)
+        self.assertIn("cached=2", text)
+
+        with open(os.path.join(sample_dir, "s3.png"), "wb") as fp:
+            fp.write(_PNG + b"s3")
+        text = _run("--only-new")
+        self.assertEqual(rec.calls, 3)
+        self.assertIn("Samples: 1", text)
+        _run("--refresh")
+        self.assertEqual(rec.calls, 6)
+
+        text = _run("--report", "target")
+        self.assertIn("dummy n=6 errors=0", text)
+        self.assertIn("== validations ==", text)
+        text = _run("--report", "target", "--targets", "dummy, gemini")
+        self.assertIn("dummy n=6 errors=0", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
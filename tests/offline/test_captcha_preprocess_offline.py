@@ -0,0 +1,107 @@
+import os
+import unittest
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image, ImageDraw
+
+from autoelective.captcha import get_recognizer
+from autoelective.captcha.preprocess import parse_transform_spec
+from autoelective.config import AutoElectiveConfig
+from autoelective.exceptions import RecognizerError
+from autoelective.utils import Singleton
+
+
+def _captcha_bytes(fmt="GIF"):
+    im = Image.new("RGB", (120, 40), (255, 255, 255))
+    d = ImageDraw.Draw(im)
+    d.rectangle((40, 12, 70, 28), fill=(20, 20, 20))
+    buf = BytesIO()
+    im.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+class _Resp:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+        self.headers = {}
+
+    def json(self):
+        return self._data
+
+
+class CaptchaPreprocessOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self._cfg_old = os.environ.get("AUTOELECTIVE_CONFIG_INI")
+        cfg = Path(__file__).resolve().parents[2] / "config.sample.ini"
+        os.environ["AUTOELECTIVE_CONFIG_INI"] = str(cfg)
+        Singleton._inst.pop(AutoElectiveConfig, None)
+
+    def tearDown(self):
+        if self._cfg_old is None:
+            os.environ.pop("AUTOELECTIVE_CONFIG_INI", None)
+        else:
+            os.environ["AUTOELECTIVE_CONFIG_INI"] = self._cfg_old
+        Singleton._inst.pop(AutoElectiveConfig, None)
+
+    def test_default_spec_keeps_rgb_jpeg(self):
+        t = parse_transform_spec("")
+        self.assertTrue(t.is_default)
+        payload, mime = t.apply(_captcha_bytes())
+        self.assertEqual(mime, "image/jpeg")
+        im = Image.open(BytesIO(payload))
+        self.assertEqual(im.format, "JPEG")
+        self.assertEqual(im.mode, "RGB")
+        self.assertEqual(im.size, (120, 40))
+
+    def test_gray_crop_png(self):
+        t = parse_transform_spec("gray,crop:2,png")
+        payload, mime = t.apply(_captcha_bytes())
+        self.assertEqual(mime, "image/png")
+        im = Image.open(BytesIO(payload))
+        self.assertEqual(im.format, "PNG")
+        self.assertEqual(im.mode, "L")
+        self.assertEqual(im.size, (35, 21))
+
+    def test_max_height_keeps_aspect_ratio(self):
+        t = parse_transform_spec("max_height:20")
+        payload, _ = t.apply(_captcha_bytes())
+        self.assertEqual(Image.open(BytesIO(payload)).size, (60, 20))
+
+    def test_invalid_specs_raise(self):
+        for spec in ("rotate", "max_height", "scale:2", "png:50", "binarize:0", "jpeg:abc"):
+            with self.assertRaises(ValueError, msg=spec):
+                parse_transform_spec(spec)
+        with self.assertRaises(ValueError):
+            parse_transform_spec("gray,webp", allowed_formats=("jpeg", "png"))
+
+    @mock.patch("autoelective.captcha.online.get_access_token", return_value=("T", 3600))
+    def test_baidu_rejects_webp(self, _token):
+        r = get_recognizer("baidu")
+        with self.assertRaises(RecognizerError):
+            r.set_image_transform("gray,webp")
+        r.set_image_transform("gray,png")
+        self.assertEqual(r.image_transform.format, "png")
+
+    @mock.patch.dict(os.environ, {"OPENAI_API_KEY": "dummy"}, clear=False)
+    def test_openai_payload_uses_transform_mime(self):
+        sent = []
+
+        def _fake_post(self, url, **kwargs):
+            sent.append(kwargs.get("json") or {})
+            return _Resp(200, {"choices": [{"message": {"content": "{\"text\": \"Ab12\"}"}}]})
+
+        with mock.patch("requests.sessions.Session.post", new=_fake_post):
+            r = get_recognizer("openai", model_name="qwen3-vl-flash")
+            r.set_image_transform("gray,crop,png")
+            cap = r.recognize(_captcha_bytes())
+        self.assertEqual(cap.code, "AB12")
+        parts = sent[0]["messages"][-1]["content"]
+        urls = [p["image_url"]["url"] for p in parts if p.get("type") == "image_url"]
+        self.assertTrue(urls and urls[0].startswith("data:image/png;base64,"))
+
+
+if __name__ == "__main__":
+    unittest.main()
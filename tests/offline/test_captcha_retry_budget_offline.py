@@ -0,0 +1,132 @@
+import os
+import time
+import unittest
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+from autoelective.captcha import get_recognizer
+from autoelective.captcha.breaker import FAILURE_TIMEOUT, classify_failure
+from autoelective.captcha.budget import BudgetDeadlineError, RetryBudget, current_budget, recognize_budget
+from autoelective.config import AutoElectiveConfig
+from autoelective.exceptions import OperationTimeoutError, RecognizerError
+from autoelective.utils import Singleton
+
+
+class _Resp:
+    def __init__(self, status_code, data, headers=None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self._data
+
+
+def _jpeg():
+    buf = BytesIO()
+    Image.new("RGB", (16, 16), (255, 255, 255)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+_OK = {"choices": [{"message": {"content": "{\"text\": \"Ab12\"}"}}]}
+_BUSY = {"error": {"message": "rate limited"}}
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, s):
+        self.now += s
+
+
+class RetryBudgetOfflineTest(unittest.TestCase):
+    def test_retries_only_while_next_attempt_fits(self):
+        clock = _Clock()
+        budget = RetryBudget(deadline=clock.now + 5.0, min_attempt=1.0, clock=clock, sleep=clock.sleep)
+        self.assertEqual(budget.timeout(20.0), 5.0)
+        clock.now += 0.5  # failed attempt
+        self.assertTrue(budget.retry(2.0, t_attempt=1000.0))
+        self.assertEqual(clock.now, 1002.5)
+        self.assertFalse(budget.retry(2.0))  # 2.5s left, 2s sleep leaves < 1s
+        self.assertEqual((budget.retries, budget.denied), (1, 1))
+        self.assertAlmostEqual(budget.lost, 2.5)
+        clock.now = 1005.0
+        with self.assertRaises(OperationTimeoutError):
+            budget.timeout(20.0)
+
+    def test_own_deadline_is_not_a_provider_timeout(self):
+        clock = _Clock()
+        budget = RetryBudget(deadline=clock.now + 5.0, clock=clock)
+        # the provider timed out well before the deadline
+        self.assertEqual(classify_failure(budget.timeout_error("time out")), FAILURE_TIMEOUT)
+        clock.now += 5.0  # a request capped at the time left ran into the deadline
+        self.assertIsInstance(budget.timeout_error("time out"), BudgetDeadlineError)
+        with self.assertRaises(BudgetDeadlineError) as cm:
+            budget.timeout(20.0)
+        self.assertIsNone(classify_failure(cm.exception))
+
+    def test_fail_fast_never_retries_and_default_is_unbounded(self):
+        with recognize_budget(fail_fast=True) as budget:
+            self.assertIs(current_budget(), budget)
+            self.assertFalse(current_budget().retry(0.0))
+        self.assertIsNone(current_budget().remaining())
+        self.assertEqual(current_budget().timeout(7.0), 7.0)
+
+
+class OpenAIRetryBudgetOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self._cfg_old = os.environ.get("AUTOELECTIVE_CONFIG_INI")
+        os.environ["AUTOELECTIVE_CONFIG_INI"] = str(Path(__file__).resolve().parents[2] / "config.sample.ini")
+        Singleton._inst.pop(AutoElectiveConfig, None)
+        self.calls = []
+
+    def tearDown(self):
+        if self._cfg_old is None:
+            os.environ.pop("AUTOELECTIVE_CONFIG_INI", None)
+        else:
+            os.environ["AUTOELECTIVE_CONFIG_INI"] = self._cfg_old
+        Singleton._inst.pop(AutoElectiveConfig, None)
+
+    def _post(self, responses):
+        def _fake_post(session, url, **kwargs):
+            self.calls.append(kwargs.get("timeout"))
+            return responses.pop(0)
+
+        return _fake_post
+
+    @mock.patch.dict(os.environ, {"OPENAI_API_KEY": "dummy"}, clear=False)
+    def test_retry_after_beyond_deadline_is_not_slept(self):
+        r = get_recognizer("openai", model_name="qwen3-vl-flash")
+        responses = [_Resp(429, _BUSY, {"Retry-After": "8"}), _Resp(200, _OK)]
+        with mock.patch("requests.sessions.Session.post", new=self._post(responses)), \
+             mock.patch("time.sleep") as sleep:
+            with recognize_budget(deadline=time.time() + 3.0) as budget:
+                with self.assertRaises(RecognizerError):
+                    r.recognize(_jpeg())
+        sleep.assert_not_called()
+        self.assertEqual(len(self.calls), 1)
+        self.assertLessEqual(self.calls[0], 3.0)  # request timeout capped at the time left
+        self.assertEqual((budget.retries, budget.denied), (0, 1))
+
+    @mock.patch.dict(os.environ, {"OPENAI_API_KEY": "dummy"}, clear=False)
+    def test_short_retry_inside_budget_is_counted(self):
+        r = get_recognizer("openai", model_name="qwen3-vl-flash")
+        responses = [_Resp(503, _BUSY, {"Retry-After": "0.5"}), _Resp(200, _OK)]
+        with mock.patch("requests.sessions.Session.post", new=self._post(responses)), \
+             mock.patch("time.sleep") as sleep:
+            with recognize_budget(deadline=time.time() + 10.0) as budget:
+                self.assertEqual(r.recognize(_jpeg()).code, "AB12")
+        sleep.assert_called_once_with(0.5)
+        self.assertEqual(budget.retries, 1)
+        self.assertGreaterEqual(budget.lost, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
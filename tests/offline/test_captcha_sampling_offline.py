@@ -6,6 +6,7 @@ import shutil
 import tempfile
 import unittest
 
+from autoelective.captcha.samples import SampleWriter, list_samples
 import autoelective.loop as loop
 
 
@@ -16,17 +17,16 @@ class CaptchaSamplingOfflineTest(unittest.TestCase):
             "CAPTCHA_SAMPLE_ENABLE": loop.CAPTCHA_SAMPLE_ENABLE,
             "CAPTCHA_SAMPLE_RATE": loop.CAPTCHA_SAMPLE_RATE,
             "CAPTCHA_SAMPLE_DIR": loop.CAPTCHA_SAMPLE_DIR,
-            "_sample_dir_ready": loop._sample_dir_ready,
-            "_sample_seq": loop._sample_seq,
+            "CAPTCHA_SAMPLE_STORE": loop.CAPTCHA_SAMPLE_STORE,
         }
         try:
             loop.CAPTCHA_SAMPLE_ENABLE = True
             loop.CAPTCHA_SAMPLE_RATE = 1.0
             loop.CAPTCHA_SAMPLE_DIR = tmpdir
-            loop._sample_dir_ready = False
-            loop._sample_seq = 0
+            loop.CAPTCHA_SAMPLE_STORE = "files"
 
             loop._maybe_sample_captcha(b"fakeimagebytes", provider="unit", context="test", draw_dt=0.1)
+            self.assertTrue(loop._flush_captcha_samples())
 
             files = os.listdir(tmpdir)
             self.assertTrue(any(name.endswith(".json") for name in files))
@@ -35,8 +35,47 @@ class CaptchaSamplingOfflineTest(unittest.TestCase):
             loop.CAPTCHA_SAMPLE_ENABLE = orig["CAPTCHA_SAMPLE_ENABLE"]
             loop.CAPTCHA_SAMPLE_RATE = orig["CAPTCHA_SAMPLE_RATE"]
             loop.CAPTCHA_SAMPLE_DIR = orig["CAPTCHA_SAMPLE_DIR"]
-            loop._sample_dir_ready = orig["_sample_dir_ready"]
-            loop._sample_seq = orig["_sample_seq"]
+            loop.CAPTCHA_SAMPLE_STORE = orig["CAPTCHA_SAMPLE_STORE"]
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def test_pack_store_dedups_and_reads_back(self):
+        tmpdir = tempfile.mkdtemp(prefix="captcha_packs_")
+        try:
+            w = SampleWriter(tmpdir, store="pack", pack_max_bytes=1024)
+            jpg = b"\xff\xd8" + b"a" * 1100
+            png = b"\x89PNG\r\n\x1a\n" + b"b" * 1100
+            self.assertTrue(w.submit(jpg, {"provider": "p1"}))
+            self.assertTrue(w.submit(jpg, {"provider": "p2"}))  # duplicate image
+            self.assertTrue(w.submit(png, {"provider": "p3"}))
+            w.close()
+            self.assertEqual(sorted(f for f in os.listdir(tmpdir) if f.endswith(".pack")), ["pack-00001.pack", "pack-00002.pack"])
+            with open(os.path.join(tmpdir, "pack-00002.idx"), "a", encoding="utf-8") as fp:
+                fp.write('{"id": "torn", "off": 0')
+
+            samples = list_samples(tmpdir)
+            self.assertEqual([(meta["provider"], load()) for _, load, meta in samples], [("p1", jpg), ("p3", png)])
+
+            # a restarted writer still knows what is stored
+            w2 = SampleWriter(tmpdir, store="pack")
+            w2.submit(png, {"provider": "p4"})
+            w2.close()
+            self.assertEqual(len(list_samples(tmpdir)), 2)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def test_files_store_dedups_across_restarts(self):
+        tmpdir = tempfile.mkdtemp(prefix="captcha_files_")
+        try:
+            jpg = b"\xff\xd8" + b"a" * 64
+            w = SampleWriter(tmpdir)
+            self.assertEqual(w.store, "files")
+            w.submit(jpg, {"provider": "p1"})
+            w.close()
+            w2 = SampleWriter(tmpdir)
+            w2.submit(jpg, {"provider": "p2"})
+            w2.close()
+            self.assertEqual([meta["provider"] for _, _, meta in list_samples(tmpdir)], ["p1"])
+        finally:
             shutil.rmtree(tmpdir, ignore_errors=True)
 
 
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from autoelective.captcha import get_recognizer
+from autoelective.captcha.adaptive import CaptchaAdaptiveManager
+from autoelective.captcha.breaker import (
+    FAILURE_RATE_LIMIT,
+    FAILURE_SERVER,
+    _retry_after_seconds,
+    classify_failure,
+)
+from autoelective.captcha.captcha import Captcha
+from autoelective.captcha.service import (
+    RecognitionService,
+    RemoteRecognizer,
+    ServiceClient,
+    make_server,
+)
+from autoelective.config import AutoElectiveConfig
+from autoelective.exceptions import OperationFailedError, OperationTimeoutError, RecognizerError
+
+
+class _SlowRecognizer(object):
+    def __init__(self, target):
+        self.target = target
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def recognize(self, raw):
+        with self._lock:
+            self.calls.append(raw)
+        time.sleep(0.1)
+        if raw == b"bad":
+            raise RecognizerError(msg="provider said no")
+        if raw == b"slow":
+            raise OperationTimeoutError(msg="upstream time out")
+        if raw == b"busy":
+            raise RecognizerError(msg="slow down", response=mock.Mock(status_code=429, headers={"Retry-After": "7"}))
+        if raw == b"down":
+            raise OperationFailedError(msg="upstream down", response=mock.Mock(status_code=503, headers={}))
+        return Captcha("%s:%s" % (self.target, raw.decode()), None, None, None, None)
+
+
+class CaptchaServiceOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.recognizers = {}
+
+        def _builder(target):
+            if target == "nope":
+                raise ValueError("unknown target")
+            rec = self.recognizers[target] = _SlowRecognizer(target)
+            return rec
+
+        self.service = RecognitionService(builder=_builder, workers=2)
+        self.server = make_server(self.service, port=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.client = ServiceClient(self.url, timeout=5.0, flush_interval=60)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.close()
+
+    def test_concurrent_identical_images_share_one_upstream_call(self):
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            codes = list(ex.map(lambda raw: self.client.recognize("openai", raw), [b"AB", b"AB", b"AB", b"CD"]))
+        self.assertEqual(codes, ["openai:AB", "openai:AB", "openai:AB", "openai:CD"])
+        self.assertEqual(sorted(self.recognizers["openai"].calls), [b"AB", b"CD"])
+        stats = self.service.stats()["counters"]
+        self.assertEqual(stats["coalesced"], 2)
+        self.assertEqual(stats["upstream:openai"], 2)
+
+    def test_errors_keep_their_type_across_http(self):
+        with self.assertRaises(RecognizerError) as cm:
+            self.client.recognize("openai", b"bad")
+        self.assertIn("provider said no", str(cm.exception))
+        self.assertNotIn("] [", str(cm.exception))  # code prefix is not doubled
+        with self.assertRaises(OperationTimeoutError):
+            self.client.recognize("openai", b"slow")
+        with self.assertRaises(RecognizerError):
+            self.client.recognize("nope", b"AB")
+
+    def test_errors_keep_their_breaker_kind_across_http(self):
+        kinds = {}
+        for raw in (b"bad", b"busy", b"down", b"slow"):
+            try:
+                self.client.recognize("openai", raw)
+            except Exception as e:
+                kinds[raw] = (classify_failure(e), e.response.status_code)
+                if raw == b"busy":
+                    self.assertEqual(_retry_after_seconds(e), 7.0)
+        self.assertEqual(kinds[b"bad"], (None, 400))  # the provider answered
+        self.assertEqual(kinds[b"busy"], (FAILURE_RATE_LIMIT, 429))
+        self.assertEqual(kinds[b"down"], (FAILURE_SERVER, 503))
+        self.assertEqual(kinds[b"slow"][1], 504)
+
+    def test_attempts_reported_by_clients_feed_shared_adaptive(self):
+        local = CaptchaAdaptiveManager(["baidu", "openai"], enabled=True)
+        local.add_listener(self.client)
+        local.record_attempt("baidu", True, latency=0.5, h_latency=0.6)
+        local.record_attempt("openai", False, latency=2.0)
+        local.record_attempt("openai", None)  # not an attempt outcome, never reported
+        self.assertEqual(self.client.flush(), 2)
+
+        fresh = CaptchaAdaptiveManager(["baidu", "openai"], enabled=True)
+        self.assertTrue(fresh.load_snapshot(self.client.adaptive_snapshot()))
+        self.assertEqual(fresh.snapshot()["stats"], local.snapshot()["stats"])
+
+    def test_get_recognizer_routes_to_service_when_configured(self):
+        with mock.patch.object(
+            AutoElectiveConfig, "captcha_service_url", new_callable=mock.PropertyMock, return_value=self.url
+        ):
+            rec = get_recognizer("openai", model_name="m1")
+        self.assertIsInstance(rec, RemoteRecognizer)
+        self.assertEqual(rec.target, "openai:m1")
+        self.assertEqual(rec.recognize(b"XY").code, "openai:m1:XY")
+        with mock.patch.object(
+            AutoElectiveConfig, "captcha_service_url", new_callable=mock.PropertyMock, return_value=""
+        ):
+            with mock.patch("autoelective.captcha.registry.get_local_recognizer", return_value="local") as local:
+                self.assertEqual(get_recognizer("baidu"), "local")
+        local.assert_called_once_with("baidu", model_name=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+from collections import OrderedDict
+from queue import Queue
+from unittest import mock
+
+from autoelective import rate_limit
+from autoelective.course import Course
+from autoelective.captcha.captcha import Captcha
+from autoelective.captcha.speculative import SpeculativeCaptcha, attach_speculative
+from autoelective.exceptions import ElectionSuccess
+import autoelective.loop as loop
+
+
+class _DummyResp:
+    def __init__(self, payload=None):
+        self._payload = payload or {}
+        self._tree = None
+        self.content = b"fake"
+
+    def json(self):
+        return self._payload
+
+
+class _SlowRecognizer:
+    def __init__(self):
+        self.calls = 0
+
+    def recognize(self, raw):
+        self.calls += 1
+        time.sleep(0.05)
+        return Captcha("SPEC", None, None, None, None)
+
+
+class _Client:
+    _gen = 0
+
+
+class SpeculativeCaptchaOfflineTest(unittest.TestCase):
+    def test_take_rejects_stale_generation_and_expired(self):
+        with mock.patch.object(loop, "CAPTCHA_SPECULATIVE_MAX_AGE", 5.0), mock.patch.object(
+            loop, "_record_breaker"
+        ):
+            client = _Client()
+            spec = attach_speculative(client, SpeculativeCaptcha("p", generation=0))
+            spec.start(lambda: b"x", lambda raw: Captcha("ABCD", None, None, None, None))
+            self.assertIs(loop._take_speculative_captcha(client, 1.0), spec)
+            self.assertIsNone(loop._take_speculative_captcha(client, 1.0))  # popped, single use
+
+            spec = attach_speculative(client, SpeculativeCaptcha("p", generation=-1))
+            spec.start(lambda: b"x", lambda raw: Captcha("ABCD", None, None, None, None))
+            spec.wait(1)
+            self.assertIsNone(loop._take_speculative_captcha(client, 1.0))
+
+            spec = attach_speculative(client, SpeculativeCaptcha("p", generation=0))
+            spec.start(lambda: b"x", lambda raw: Captcha("ABCD", None, None, None, None))
+            spec.wait(1)
+            spec.ready_at -= 10
+            self.assertIsNone(loop._take_speculative_captcha(client, 1.0))
+
+    def test_late_speculation_lets_in_flight_draw_land_first(self):
+        drawn = threading.Event()
+
+        def _slow_draw():
+            time.sleep(0.3)
+            drawn.set()
+            return b"x"
+
+        client = _Client()
+        spec = attach_speculative(client, SpeculativeCaptcha("p", generation=0))
+        spec.start(_slow_draw, lambda raw: Captcha("ABCD", None, None, None, None))
+        with mock.patch.object(loop, "elective_client_timeout", 2.0):
+            self.assertIsNone(loop._take_speculative_captcha(client, 0.05))
+        # the main loop's own Draw only starts after the speculative one returned
+        self.assertTrue(drawn.is_set())
+        self.assertTrue(spec.cancelled)
+
+    def test_rate_limit_budget_is_peeked_not_consumed(self):
+        b = rate_limit.TokenBucket(rate=0.001, burst=1)
+        self.assertTrue(b.available())
+        self.assertTrue(b.available())
+        b.consume()
+        self.assertFalse(b.available())
+
+    def test_prepared_captcha_leaves_only_validate_on_critical_path(self):
+        orig = {
+            k: getattr(loop, k)
+            for k in (
+                "MIN_REFRESH_INTERVAL",
+                "refresh_interval",
+                "refresh_random_deviation",
+                "REFRESH_BACKOFF_ENABLE",
+                "CAPTCHA_PROBE_ENABLED",
+                "CAPTCHA_ADAPTIVE_REPORT_INTERVAL",
+                "CAPTCHA_SPECULATIVE_ENABLE",
+                "elective_client_pool_size",
+                "electivePool",
+                "reloginPool",
+                "get_tables",
+                "get_courses_with_detail",
+                "get_courses",
+                "recognizer",
+                "recognizers",
+                "recognizer_index",
+                "_recognizer_names",
+                "_recognizer_map",
+                "_speculative_recognizers",
+                "_make_client",
+            )
+        }
+        adaptive_enabled = loop.adaptive.enabled
+
+        loop.MIN_REFRESH_INTERVAL = 0.01
+        loop.refresh_interval = 0.2  # the speculation runs while the loop sleeps
+        loop.refresh_random_deviation = 0.0
+        loop.REFRESH_BACKOFF_ENABLE = False
+        loop.CAPTCHA_PROBE_ENABLED = False
+        loop.CAPTCHA_ADAPTIVE_REPORT_INTERVAL = 0
+        loop.CAPTCHA_SPECULATIVE_ENABLE = True
+        loop.adaptive.set_enabled(False)
+        loop.elective_client_pool_size = 1
+
+        loop.environ.runtime_stats.clear()
+        loop.environ.runtime_gauges.clear()
+        loop.environ.elective_loop = 0
+        loop.goals.clear()
+        loop.ignored.clear()
+
+        href = "/supplement/electSupplement.do?x=1"
+        full = Course("课程A", 1, "学院A", status=(1, 1), href=href)
+        free = Course("课程A", 1, "学院A", status=(1, 0), href=href)
+        courses = OrderedDict([("1", full.to_simplified())])
+        refreshes = {"n": 0}
+        calls = {"draw": 0, "codes": []}
+        success_event = threading.Event()
+
+        def _plans(_tbl):
+            refreshes["n"] += 1
+            return [full if refreshes["n"] == 1 else free]
+
+        def _draw(self, **kwargs):
+            calls["draw"] += 1
+            return _DummyResp()
+
+        def _validate(self, username, code, **kwargs):
+            calls["codes"].append(code)
+            return _DummyResp({"valid": "2"})
+
+        def _elect(self, href, **kwargs):
+            success_event.set()
+            raise ElectionSuccess(response=_DummyResp(), msg="ok")
+
+        def _make_client_logged(cid, *args, **kwargs):
+            c = orig["_make_client"](cid, *args, **kwargs)
+            c._session.cookies.set("a", "b")
+            c.set_expired_time(-1)
+            return c
+
+        main_rec = _SlowRecognizer()
+        spec_rec = _SlowRecognizer()
+        try:
+            with mock.patch.object(loop.config.__class__, "courses", new=property(lambda self: courses)), \
+                 mock.patch.object(loop.config.__class__, "mutexes", new=property(lambda self: OrderedDict())), \
+                 mock.patch.object(loop.config.__class__, "delays", new=property(lambda self: OrderedDict())), \
+                 mock.patch("autoelective.elective.ElectiveClient.get_SupplyCancel", new=lambda *a, **k: _DummyResp()), \
+                 mock.patch("autoelective.elective.ElectiveClient.get_DrawServlet", new=_draw), \
+                 mock.patch("autoelective.elective.ElectiveClient.get_Validate", new=_validate), \
+                 mock.patch("autoelective.elective.ElectiveClient.get_ElectSupplement", new=_elect), \
+                 mock.patch.object(loop.notify, "send_bark_push", new=lambda *a, **k: None):
+
+                loop.get_tables = lambda _tree: ["plans", "elected"]
+                loop.get_courses_with_detail = _plans
+                loop.get_courses = lambda _tbl: []
+
+                loop.recognizer = main_rec
+                loop._recognizer_names = ["dummy"]
+                loop._recognizer_map = {"dummy": main_rec}
+                loop.recognizers = [main_rec]
+                loop.recognizer_index = 0
+                loop._speculative_recognizers = {"dummy": spec_rec}
+
+                loop._make_client = _make_client_logged
+                loop.electivePool = Queue()  # run_elective_loop fills it with the single client
+                loop.reloginPool = Queue()
+
+                t = threading.Thread(target=loop.run_elective_loop)
+                t.daemon = True
+                t.start()
+
+                success_event.wait(timeout=3.0)
+                loop.goals.clear()
+                loop.ignored.clear()
+                t.join(timeout=5.0)
+
+                self.assertFalse(t.is_alive(), "run_elective_loop did not stop")
+                self.assertTrue(success_event.is_set())
+                self.assertEqual(calls["draw"], 1)  # only the speculative Draw
+                self.assertEqual(calls["codes"], ["SPEC"])
+                self.assertEqual(main_rec.calls, 0)
+                stats = loop.environ.runtime_stats
+                self.assertEqual(stats.get("captcha_speculative_hit"), 1)
+                self.assertGreaterEqual(stats.get("captcha_speculative_saved_ms", 0), 50)
+        finally:
+            for k, v in orig.items():
+                setattr(loop, k, v)
+            loop.adaptive.set_enabled(adaptive_enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
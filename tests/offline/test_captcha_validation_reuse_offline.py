@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+from collections import OrderedDict
+from queue import Queue
+from unittest import mock
+
+from autoelective.course import Course
+from autoelective.captcha.captcha import Captcha
+from autoelective.captcha.reuse import ValidationReuseTracker
+from autoelective.exceptions import CaptchaError, ElectionSuccess
+import autoelective.loop as loop
+
+
+class _DummyResp:
+    def __init__(self, payload=None):
+        self._payload = payload or {}
+        self._tree = None
+        self.content = b"fake"
+
+    def json(self):
+        return self._payload
+
+
+class _DummyRecognizer:
+    def recognize(self, raw):
+        return Captcha("ABCD", None, None, None, None)
+
+
+class ValidationReuseTrackerOfflineTest(unittest.TestCase):
+    def test_pauses_on_low_success_rate_and_retries(self):
+        t = ValidationReuseTracker(enabled=True, min_samples=2, min_success_rate=0.5, retry_every=3)
+        self.assertTrue(t.should_reuse())
+        t.record(False)
+        t.record(False)
+        self.assertTrue(t.paused())
+        self.assertEqual([t.should_reuse() for _ in range(6)], [False, False, True, False, False, True])
+        for _ in range(3):
+            t.record(True)
+        self.assertFalse(t.paused())
+        self.assertFalse(ValidationReuseTracker(enabled=False).should_reuse())
+
+
+class LoopValidationReuseOfflineTest(unittest.TestCase):
+    def _run_round(self, server_accepts_reuse):
+        orig = {
+            k: getattr(loop, k)
+            for k in (
+                "MIN_REFRESH_INTERVAL",
+                "refresh_interval",
+                "refresh_random_deviation",
+                "REFRESH_BACKOFF_ENABLE",
+                "CAPTCHA_PROBE_ENABLED",
+                "CAPTCHA_ADAPTIVE_REPORT_INTERVAL",
+                "elective_client_pool_size",
+                "electivePool",
+                "reloginPool",
+                "get_tables",
+                "get_courses_with_detail",
+                "get_courses",
+                "recognizer",
+                "recognizers",
+                "recognizer_index",
+                "_recognizer_names",
+                "_recognizer_map",
+                "validation_reuse",
+            )
+        }
+        adaptive_enabled = loop.adaptive.enabled
+
+        loop.MIN_REFRESH_INTERVAL = 0.01
+        loop.refresh_interval = 0.01
+        loop.refresh_random_deviation = 0.0
+        loop.REFRESH_BACKOFF_ENABLE = False
+        loop.CAPTCHA_PROBE_ENABLED = False
+        loop.CAPTCHA_ADAPTIVE_REPORT_INTERVAL = 0
+        loop.adaptive.set_enabled(False)
+        loop.elective_client_pool_size = 1
+        loop.validation_reuse = ValidationReuseTracker(enabled=True)
+
+        loop.environ.runtime_stats.clear()
+        loop.environ.runtime_gauges.clear()
+        loop.environ.elective_loop = 0
+        loop.goals.clear()
+        loop.ignored.clear()
+
+        a = Course("课程A", 1, "学院A", status=(1, 0), href="/supplement/electSupplement.do?x=1")
+        b = Course("课程B", 1, "学院B", status=(1, 0), href="/supplement/electSupplement.do?x=2")
+        courses = OrderedDict([("1", a.to_simplified()), ("2", b.to_simplified())])
+        calls = {"draw": 0, "validate": 0, "elect": []}
+        state = {"fresh": False}
+        done = threading.Event()
+
+        def _draw(self, **kwargs):
+            calls["draw"] += 1
+            return _DummyResp()
+
+        def _validate(self, username, code, **kwargs):
+            calls["validate"] += 1
+            state["fresh"] = True
+            return _DummyResp({"valid": "2"})
+
+        def _elect(self, href, **kwargs):
+            calls["elect"].append(href)
+            fresh, state["fresh"] = state["fresh"], False
+            if not fresh and not server_accepts_reuse:
+                raise CaptchaError(response=_DummyResp())
+            if len(set(calls["elect"])) == 2:
+                done.set()
+            raise ElectionSuccess(response=_DummyResp(), msg="ok")
+
+        def _make_client_logged(cid, *args, **kwargs):
+            c = orig_make_client(cid, *args, **kwargs)
+            c._session.cookies.set("a", "b")
+            c.set_expired_time(-1)
+            return c
+
+        orig_make_client = loop._make_client
+        rec = _DummyRecognizer()
+        try:
+            with mock.patch.object(loop.config.__class__, "courses", new=property(lambda self: courses)), \
+                 mock.patch.object(loop.config.__class__, "mutexes", new=property(lambda self: OrderedDict())), \
+                 mock.patch.object(loop.config.__class__, "delays", new=property(lambda self: OrderedDict())), \
+                 mock.patch("autoelective.elective.ElectiveClient.get_SupplyCancel", new=lambda *a, **k: _DummyResp()), \
+                 mock.patch("autoelective.elective.ElectiveClient.get_DrawServlet", new=_draw), \
+                 mock.patch("autoelective.elective.ElectiveClient.get_Validate", new=_validate), \
+                 mock.patch("autoelective.elective.ElectiveClient.get_ElectSupplement", new=_elect), \
+                 mock.patch.object(loop.notify, "send_bark_push", new=lambda *a, **k: None):
+
+                loop.get_tables = lambda _tree: ["plans", "elected"]
+                loop.get_courses_with_detail = lambda _tbl: [a, b]
+                loop.get_courses = lambda _tbl: []
+                loop.recognizer = rec
+                loop._recognizer_names = ["dummy"]
+                loop._recognizer_map = {"dummy": rec}
+                loop.recognizers = [rec]
+                loop.recognizer_index = 0
+                loop._make_client = _make_client_logged
+                loop.electivePool = Queue()
+                loop.reloginPool = Queue()
+
+                t = threading.Thread(target=loop.run_elective_loop)
+                t.daemon = True
+                t.start()
+                done.wait(timeout=3.0)
+                loop.goals.clear()
+                loop.ignored.clear()
+                t.join(timeout=5.0)
+                self.assertFalse(t.is_alive(), "run_elective_loop did not stop")
+                self.assertTrue(done.is_set())
+                return calls, dict(loop.environ.runtime_stats)
+        finally:
+            loop._make_client = orig_make_client
+            for k, v in orig.items():
+                setattr(loop, k, v)
+            loop.adaptive.set_enabled(adaptive_enabled)
+
+    def test_second_course_reuses_validation(self):
+        calls, stats = self._run_round(server_accepts_reuse=True)
+        self.assertEqual((calls["draw"], calls["validate"]), (1, 1))
+        self.assertEqual(len(calls["elect"]), 2)
+        self.assertEqual(stats.get("captcha_reuse_ok"), 1)
+
+    def test_captcha_error_triggers_revalidation_and_retry(self):
+        calls, stats = self._run_round(server_accepts_reuse=False)
+        self.assertEqual((calls["draw"], calls["validate"]), (2, 2))
+        self.assertEqual(calls["elect"], [calls["elect"][0], calls["elect"][1], calls["elect"][1]])
+        self.assertEqual(stats.get("captcha_reuse_rejected"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import threading
+import time
+import unittest
+
+from autoelective.captcha.captcha import Captcha
+from autoelective.captcha.registry import CaptchaRecognizer
+from autoelective.captcha.warmup import PendingRecognizer, build_recognizers
+from autoelective.exceptions import OperationFailedError, RecognizerError
+
+
+class _Rec(CaptchaRecognizer):
+    def __init__(self, name):
+        self.name = name
+        self.warmed = False
+
+    def warmup(self):
+        self.warmed = True
+
+    def recognize(self, raw):
+        return Captcha(self.name.upper()[:4], None, None, None, None)
+
+
+class CaptchaWarmupOfflineTest(unittest.TestCase):
+    def test_targets_are_built_concurrently_and_warmed(self):
+        def builder(name):
+            time.sleep(0.3)
+            return _Rec(name)
+
+        t0 = time.time()
+        rmap, report = build_recognizers(["aaaa", "bbbb", "cccc"], builder, timeout=5, warmup=True)
+        self.assertLess(time.time() - t0, 0.8)
+        self.assertEqual([x["name"] for x in report], ["aaaa", "bbbb", "cccc"])
+        self.assertTrue(all(x["ready"] for x in report))
+        self.assertTrue(all(r.warmed for r in rmap.values()))
+        self.assertIsNotNone(report[0]["warmup_s"])
+
+    def test_slow_target_becomes_pending_and_resolves(self):
+        release = threading.Event()
+        ready_names = []
+
+        def builder(name):
+            if name == "slow":
+                release.wait(5)
+            return _Rec(name)
+
+        t0 = time.time()
+        rmap, report = build_recognizers(
+            ["fast", "slow"], builder, timeout=0.2, on_ready=lambda t: ready_names.append(t.name)
+        )
+        self.assertLess(time.time() - t0, 1.0)
+        self.assertTrue(report[0]["ready"])
+        self.assertFalse(report[1]["ready"])
+        pending = rmap["slow"]
+        self.assertIsInstance(pending, PendingRecognizer)
+        self.assertFalse(pending.ready)
+        with self.assertRaises(OperationFailedError):
+            pending.recognize(b"x")
+
+        release.set()
+        pending.task.wait(2)
+        deadline = time.time() + 2
+        while not ready_names and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(pending.ready)
+        self.assertEqual(pending.recognize(b"x").code, "SLOW")
+        self.assertEqual(ready_names, ["slow"])
+
+    def test_network_failure_is_retried_in_background(self):
+        calls = []
+
+        def builder(name):
+            calls.append(name)
+            if len(calls) == 1:
+                raise OperationFailedError(msg="Unable to connect to the recognizer")
+            return _Rec(name)
+
+        rmap, report = build_recognizers(["flaky"], builder, timeout=1, retry_interval=0)
+        self.assertFalse(report[0]["ready"])
+        self.assertIn("Unable to connect", report[0]["error"])
+        pending = rmap["flaky"]
+        with self.assertRaises(OperationFailedError):
+            pending.recognize(b"x")  # kicks off the retry
+        pending.task.wait(2)
+        self.assertTrue(pending.ready)
+        self.assertEqual(len(calls), 2)
+
+    def test_config_error_is_raised(self):
+        def builder(name):
+            raise RecognizerError(msg="API key missing")
+
+        with self.assertRaises(RecognizerError):
+            build_recognizers(["openai"], builder, timeout=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
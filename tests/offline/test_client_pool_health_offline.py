@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+from queue import Empty, Queue
+from unittest import mock
+
+import autoelective.loop as loop
+from autoelective.monitor import environ as monitor_environ
+from autoelective.monitor import monitor
+from autoelective.pool import HealthScoredPool
+
+NOW = 1_000_000.0
+
+
+class _Client(object):
+    def __init__(self, id, logined=True, expires_in=600):
+        self.id = id
+        self.has_logined = logined
+        self.expired_time = -1 if expires_in is None else int(NOW + expires_in)
+
+
+class ClientPoolHealthOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.now = [NOW]
+        self.pool = HealthScoredPool(maxsize=4, quarantine_threshold=2, clock=lambda: self.now[0])
+
+    def test_checkout_prefers_healthiest_client(self):
+        fast, slow, flaky = _Client("fast"), _Client("slow"), _Client("flaky")
+        for c in (slow, flaky, fast):
+            self.pool.put(c)
+        self.pool.record(fast, True, 0.05)
+        self.pool.record(slow, True, 0.8)
+        self.pool.record(flaky, False, 0.05)
+        self.assertIs(self.pool.get_nowait(), fast)
+        self.pool.put(fast)
+        self.assertIs(self.pool.get_nowait(), fast)
+        self.assertIs(self.pool.get_nowait(), slow)
+        self.assertIs(self.pool.get_nowait(), flaky)
+        with self.assertRaises(Empty):
+            self.pool.get_nowait()
+
+    def test_pool_sweep_keeps_least_recently_used_order(self):
+        a, b = _Client("a"), _Client("b")
+        self.pool.put(b)
+        self.pool.put(a)
+        self.pool.record(a, True, 0.1)
+        self.now[0] += 5
+        self.pool.record(b, True, 0.1)
+        # e.g. session refresh takes every client out and puts it back
+        self.now[0] += 5
+        swept = []
+        while True:
+            try:
+                swept.append(self.pool.get_nowait())
+            except Empty:
+                break
+            self.now[0] += 1
+        for c in reversed(swept):
+            self.pool.put(c)
+        self.assertEqual((a._health.last_used, b._health.last_used), (NOW, NOW + 5))
+        self.assertIs(self.pool.get_nowait(), a)
+
+    def test_logged_out_and_expiring_clients(self):
+        ok, expiring, logged_out = _Client("ok"), _Client("expiring", expires_in=20), _Client("out", logined=False)
+        for c in (ok, expiring, logged_out):
+            self.pool.put(c)
+        # logged out goes first so the loop hands it to re-login right away
+        self.assertIs(self.pool.get_nowait(), logged_out)
+        self.assertEqual(self.pool.healthy_count(), 1)
+        self.assertIs(self.pool.get_nowait(), ok)
+
+    def test_quarantine_and_fresh_login_resets_health(self):
+        c = _Client("c")
+        self.pool.put(c)
+        self.assertIs(self.pool.get_nowait(), c)
+        self.assertFalse(self.pool.record(c, False, 0.1))
+        self.assertTrue(self.pool.record(c, False, 0.1))
+        # re-logged in: new expiry clears the history, but it stays deprioritized for a while
+        c.expired_time += 100
+        self.pool.put(c)
+        self.pool.put(_Client("other"))
+        snap = self.pool.snapshot()
+        self.assertEqual(snap["quarantined_total"], 1)
+        self.assertEqual([x["id"] for x in snap["clients"]], ["other", "c"])
+        quarantined = snap["clients"][1]
+        self.assertEqual((quarantined["streak"], quarantined["error_rate"], quarantined["since_login"]), (0, 0.0, 0.0))
+        self.assertFalse(quarantined["healthy"])
+        self.now[0] += 61
+        self.assertEqual(self.pool.healthy_count(), 2)
+
+    def test_pool_endpoint_is_strict_json(self):
+        for c in (_Client("ok"), _Client("expired", expires_in=-5), _Client("out", logined=False)):
+            self.pool.put(c)
+
+        def _reject(name):
+            raise ValueError("non-standard JSON constant %s" % name)
+
+        with mock.patch.object(monitor_environ, "client_pool", new=self.pool):
+            resp = monitor.test_client().get("/stat/pool")
+        data = json.loads(resp.get_data(as_text=True), parse_constant=_reject)
+        scores = {c["id"]: c["score"] for c in data["clients"]}
+        self.assertEqual((scores["expired"], scores["out"]), (None, None))
+        self.assertIsInstance(scores["ok"], float)
+
+
+class LoopPoolHealthOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = HealthScoredPool(maxsize=4, quarantine_threshold=2)
+        self.relogin = Queue()
+        patches = [
+            mock.patch.object(loop, "electivePool", new=self.pool),
+            mock.patch.object(loop, "reloginPool", new=self.relogin),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_failing_client_is_quarantined_alone(self):
+        good, bad = _Client("good", expires_in=None), _Client("bad", expires_in=None)
+        before = loop.environ.runtime_stats["client_quarantine"]
+        self.assertFalse(loop._finish_client_round(good, False, 0.1))
+        self.assertFalse(loop._finish_client_round(bad, True, 0.1))
+        self.assertTrue(loop._pool_has_healthy_client())
+        self.assertIs(self.pool.get_nowait(), good)  # healthiest first
+        self.assertIs(self.pool.get_nowait(), bad)
+        self.assertFalse(loop._finish_client_round(good, False, 0.1))
+        self.assertTrue(loop._finish_client_round(bad, True, 0.1))
+        self.assertEqual([c.id for c in self.relogin.queue], ["bad"])
+        self.assertEqual([c.id for c in self.pool.queue], ["good"])
+        self.assertEqual(loop.environ.runtime_stats["client_quarantine"], before + 1)
+
+    def test_plain_queue_pool_is_unchanged(self):
+        q = Queue()
+        with mock.patch.object(loop, "electivePool", new=q):
+            self.assertFalse(loop._finish_client_round(_Client("c"), True))
+            self.assertFalse(loop._pool_has_healthy_client())
+        self.assertEqual(q.qsize(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+import unittest
+from datetime import timedelta
+from email.utils import formatdate
+from unittest import mock
+
+import autoelective.loop as loop
+from autoelective.clock import ClockSync
+from autoelective.scheduler import Cadence
+
+
+class _Resp(object):
+    def __init__(self, date, elapsed):
+        self.headers = {"Date": date}
+        self.elapsed = timedelta(seconds=elapsed)
+
+
+def _synced_clock(offset, rtt, n=40, t0=1_000_000.0, seed=7):
+    """
+    A ClockSync fed `n` responses from a server `offset` seconds ahead, `rtt` apart.
+    """
+    rnd = random.Random(seed)
+    clock = ClockSync(window=64)
+    t = t0
+    for _ in range(n):
+        t += rnd.uniform(0.3, 2.7)  # requests at arbitrary sub-second phases
+        t_send, t_recv = t, t + rtt
+        server_at_handle = t_send + rtt / 2.0 + offset
+        clock.observe(t_send, t_recv, float(int(server_at_handle)))
+    return clock, t + rtt
+
+
+class ClockSyncOfflineTest(unittest.TestCase):
+    def test_date_headers_bound_offset_and_tighten(self):
+        clock, _ = _synced_clock(offset=3.42, rtt=0.08, n=1)
+        one = clock.estimate()
+        self.assertLessEqual(one["error"], 0.55)
+        clock, t_last = _synced_clock(offset=3.42, rtt=0.08, n=40)
+        est = clock.estimate()
+        self.assertEqual(est["samples"], 40)
+        self.assertLess(est["error"], 0.1)
+        self.assertAlmostEqual(est["offset"], 3.42, delta=est["error"] + 1e-9)
+        self.assertAlmostEqual(est["rtt"], 0.08, places=6)
+        # the server clock reads S at local S - offset; send rtt/2 earlier
+        self.assertAlmostEqual(clock.send_time(5000.0), 5000.0 - est["offset"] - 0.04, places=6)
+
+        # a local clock step makes the bounds disjoint: start over from the newest response
+        clock.observe(t_last + 10.0, t_last + 10.1, float(int(t_last + 10.0 + 100.0)))
+        self.assertEqual(clock.resets, 1)
+        self.assertEqual(clock.estimate()["samples"], 1)
+
+    def test_response_hook_and_staleness(self):
+        now = [1_700_000_000.4]
+        clock = ClockSync(clock=lambda: now[0], max_age=60.0)
+        clock.observe_response(_Resp(formatdate(1_700_000_002.0, usegmt=True), elapsed=0.2))
+        clock.observe_response(_Resp("not a date", elapsed=0.1))
+        clock.observe_response(_Resp(None, elapsed=0.1))
+        est = clock.estimate()
+        self.assertEqual(est["samples"], 1)
+        self.assertAlmostEqual(est["offset"], 1.5 + 0.1, delta=0.6)
+        self.assertIsNone(clock.estimate(now=now[0] + 3600.0))  # too old to trust
+
+    def test_loop_wakes_once_at_operation_start(self):
+        clock, now = _synced_clock(offset=-2.0, rtt=0.1)
+        est = clock.estimate()
+        start_ts = now + 120.0  # server time of the next 补退选 window
+        schedule = [{"name": "补退选第一阶段", "start_ts": start_ts, "end_ts": start_ts + 3600.0}]
+        cooldowns = []
+        with mock.patch.object(loop, "server_clock", new=clock), \
+             mock.patch.object(loop.time, "time", new=lambda: now), \
+             mock.patch.object(loop, "NOT_IN_OPERATION_DYNAMIC_ENABLE", new=True), \
+             mock.patch.object(loop, "NOT_IN_OPERATION_PRECISE_WAKE", new=True), \
+             mock.patch.object(loop, "NOT_IN_OPERATION_MIN_REFRESH", new=5.0), \
+             mock.patch.object(loop, "_get_help_schedule", new=lambda elective=None, force_refresh=False: schedule), \
+             mock.patch.object(loop, "_enter_cooldown", new=lambda reason, s: cooldowns.append(s)), \
+             mock.patch.object(loop, "_not_in_operation_wake_at", new=0.0), \
+             mock.patch.object(loop, "_not_in_operation_min_refresh_dynamic", new=5.0):
+            mr, reason = loop._update_not_in_operation_backoff()
+            expected = start_ts - est["offset"] - est["rtt"] / 2.0 - now
+            self.assertAlmostEqual(mr, expected, places=6)
+            self.assertAlmostEqual(mr, 122.0 - 0.05, delta=est["error"] + 1e-6)
+            self.assertIn("wake in", reason)
+            self.assertEqual(cooldowns, [])
+            # the refresh interval / error backoff do not push the wake-up back
+            self.assertAlmostEqual(loop._apply_not_in_operation_backoff(60.0, True), expected, places=6)
+            # nor does the fixed cadence take the round's time off a second time
+            mono = [0.0]
+            cadence = Cadence(clock=lambda: mono[0])
+            mono[0] += 1.5  # SupplyCancel + elect took 1.5s
+            with mock.patch.object(loop, "REFRESH_FIXED_CADENCE", new=True):
+                self.assertAlmostEqual(loop._round_sleep(60.0, True, cadence), expected, places=6)
+                self.assertEqual(loop._round_sleep(4.0, False, cadence), 2.5)
+
+            # farther away: coarse steps stop at the start of the precise window
+            schedule[0]["start_ts"] = now + 320.0
+            mr, _ = loop._update_not_in_operation_backoff()
+            self.assertLessEqual(mr, 320.0 - loop.NOT_IN_OPERATION_PRECISE_WAKE_WINDOW + 2.5)
+            self.assertEqual(loop._not_in_operation_wake_at, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import autoelective.loop as loop
+from autoelective.config import AutoElectiveConfig
+from autoelective.engine import ElectiveEngine, EngineShared
+from autoelective.environ import Environ
+from autoelective.utils import singleton_scope
+from scripts.benchmark_engine_accounts import write_account_configs
+
+_SAMPLE = str(Path(__file__).resolve().parents[2] / "config.sample.ini")
+
+
+class ElectiveEngineOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="engine_")
+        self.paths = write_account_configs(_SAMPLE, self.tmpdir, 2)
+        self.shared = EngineShared()
+        self.engines = [ElectiveEngine(p, shared=self.shared) for p in self.paths]
+
+    def tearDown(self):
+        for engine in self.engines:
+            engine.stop(timeout=2.0)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_accounts_have_private_state_and_share_recognizers(self):
+        a, b = self.engines
+        self.assertEqual((a.name, b.name), ("bench00000", "bench00001"))
+        self.assertIsNot(a.loop, b.loop)
+        self.assertEqual(a.loop.username, "bench00000")
+        self.assertIs(a.loop.config, a.config)
+        self.assertIs(a.loop.environ, a.environ)
+        self.assertIsNot(a.loop.electivePool, b.loop.electivePool)
+        self.assertIsNot(a.loop.adaptive, b.loop.adaptive)
+        # the process-wide singletons are untouched
+        self.assertIsNot(AutoElectiveConfig(), a.config)
+        self.assertIsNot(Environ(), a.environ)
+
+        self.assertEqual(self.shared.recognizer_names(), ["dummy"])
+        self.assertIs(a.loop.recognizers[0], b.loop.recognizers[0])
+        client_a = a.loop._make_client(1)
+        client_b = b.loop._make_client(1)
+        self.assertIs(client_a._session.get_adapter("https://x/"), self.shared.adapter)
+        self.assertIs(client_b._session.get_adapter("https://x/"), self.shared.adapter)
+        self.assertIsNot(client_a._session.cookies, client_b._session.cookies)
+
+    def test_shared_recognizers_are_built_against_the_process_config(self):
+        a = self.engines[0]
+        seen = []
+        with singleton_scope({AutoElectiveConfig: a.config}):
+            self.shared.recognizer("probe", lambda name: seen.append(AutoElectiveConfig()) or name)
+            self.assertIs(AutoElectiveConfig(), a.config)  # scope restored afterwards
+        self.assertIsNot(seen[0], a.config)
+        self.assertIs(seen[0], AutoElectiveConfig())
+
+    def test_loops_run_and_quit_per_account(self):
+        before = loop.environ.elective_loop
+        for engine in self.engines:
+            engine.start()
+        for engine in self.engines:
+            self.assertTrue(engine.stop(timeout=5.0))  # no courses: "No tasks" then quit
+            self.assertEqual(engine.stats()["elective_loop"], 1)
+        self.assertEqual(loop.environ.elective_loop, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
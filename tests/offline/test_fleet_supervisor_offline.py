@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from autoelective.fleet import (
+    FleetSupervisor,
+    aggregate_runtime,
+    expand_configs,
+    make_fleet_monitor,
+    plan_cpu_affinity,
+)
+
+_EXIT_NOW = "import sys; sys.exit(3)"
+_GRACEFUL = "import signal, sys, time; signal.signal(signal.SIGTERM, lambda *a: sys.exit(0)); time.sleep(30)"
+_STUBBORN = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(30)"
+
+
+def _python(code):
+    return lambda worker: [sys.executable, "-c", code]
+
+
+class FleetSupervisorOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="fleet_")
+        self.sup = None
+
+    def tearDown(self):
+        if self.sup is not None:
+            self.sup.grace = 0.0
+            self.sup.shutdown()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_cpu_plans_and_config_globs(self):
+        self.assertEqual(plan_cpu_affinity(3, "none"), [None, None, None])
+        self.assertEqual(plan_cpu_affinity(3, "auto", available={0, 1}), [{0}, {1}, {0}])
+        self.assertEqual(plan_cpu_affinity(3, "0-1;2,3"), [{0, 1}, {2, 3}, {0, 1}])
+        with self.assertRaises(ValueError):
+            plan_cpu_affinity(1, ";")
+        for name in ("b.ini", "a.ini", "notes.txt"):
+            open(os.path.join(self.tmpdir, name), "w").close()
+        paths = expand_configs([os.path.join(self.tmpdir, "*.ini"), os.path.join(self.tmpdir, "a.ini")])
+        self.assertEqual([os.path.basename(p) for p in paths], ["a.ini", "b.ini"])
+
+    def test_dead_worker_restarts_with_growing_backoff(self):
+        self.sup = FleetSupervisor(["w0.ini"], backoff_initial=1.0, backoff_max=3.0, command=_python(_EXIT_NOW))
+        w = self.sup.workers[0]
+        self.sup.start()
+        waits = []
+        now = time.time()
+        for _ in range(3):
+            w.proc.wait(10)
+            self.sup.poll(now)  # notices the exit, schedules the restart
+            waits.append(round(w.next_start_at - now, 3))
+            self.assertEqual(w.last_exit, 3)
+            self.sup.poll(w.next_start_at)  # due: restarted
+            now = w.next_start_at
+        self.assertEqual(waits, [1.0, 2.0, 3.0])
+        self.assertEqual(w.restarts, 3)
+
+    def test_shutdown_fans_out_and_kills_after_grace(self):
+        self.sup = FleetSupervisor(
+            ["good.ini", "stubborn.ini"],
+            grace=0.5,
+            command=lambda w: [sys.executable, "-c", _GRACEFUL if w.name == "good" else _STUBBORN],
+        )
+        self.sup.start()
+        if hasattr(os, "getpgid"):
+            # a terminal Ctrl-C must not reach the workers besides the supervisor's SIGTERM
+            for w in self.sup.workers:
+                self.assertNotEqual(os.getpgid(w.proc.pid), os.getpgid(0))
+        time.sleep(0.3)  # let the workers install their handlers
+        t0 = time.time()
+        self.assertEqual(self.sup.shutdown(), ["stubborn"])
+        self.assertLess(time.time() - t0, 5.0)
+        self.assertEqual(self.sup.workers[0].proc.returncode, 0)
+        self.sup.poll()  # no restarts once stopping
+        self.assertFalse(any(w.is_alive() for w in self.sup.workers))
+
+    def test_fleet_monitor_aggregates_worker_runtime(self):
+        self.assertEqual(
+            aggregate_runtime([{"stats": {"a": 1, "b": 2}}, None, {"stats": {"a": 4}, "gauges": {"g": 9}}]),
+            {"a": 5, "b": 2},
+        )
+        self.sup = FleetSupervisor(["w0.ini", "w1.ini"], command=_python(_GRACEFUL))
+        payloads = {"w0": {"stats": {"captcha_attempt": 3}}, "w1": {"stats": {"captcha_attempt": 4}}}
+        server = make_fleet_monitor(self.sup, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = "http://127.0.0.1:%d" % server.server_address[1]
+        try:
+            with mock.patch.object(self.sup, "fetch_runtime", new=lambda w: payloads[w.name]):
+                data = requests.get(base + "/stat/runtime", timeout=5).json()
+            fleet = requests.get(base + "/stat/fleet", timeout=5).json()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(data["stats"], {"captcha_attempt": 7})
+        self.assertEqual(sorted(data["workers"]), ["w0", "w1"])
+        self.assertEqual([w["name"] for w in fleet["workers"]], ["w0", "w1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
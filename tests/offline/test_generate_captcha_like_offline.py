@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import scripts.generate_captcha_like as gen
+from autoelective.captcha.benchmark import list_images, parse_label_from_filename
+
+
+class GenerateCaptchaLikeOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="captcha_synth_")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_npz_shards_round_trip_and_are_reproducible(self):
+        a = os.path.join(self.tmpdir, "a")
+        b = os.path.join(self.tmpdir, "b")
+        self.assertEqual(gen.generate(7, a, fmt="npz", chunk_size=3, seed=11), 7)
+        gen.generate(7, b, fmt="npz", chunk_size=3, seed=11)
+        self.assertEqual(len(os.listdir(a)), 3)
+
+        images, labels = gen.load_npz_dataset(a)
+        self.assertEqual(images.shape, (7, 48, 140))
+        self.assertEqual(images.dtype, np.uint8)
+        self.assertTrue(all(len(x) == 4 for x in labels))
+        self.assertLess(images.min(), 128)  # glyphs/noise drawn on the white background
+        images_b, labels_b = gen.load_npz_dataset(b)
+        self.assertTrue((images == images_b).all())
+        self.assertEqual(list(labels), list(labels_b))
+
+    def test_jpg_names_carry_labels_for_benchmarks(self):
+        gen.generate(3, self.tmpdir, fmt="jpg", seed=5)
+        paths = list_images(self.tmpdir)
+        self.assertEqual(len(paths), 3)
+        for path in paths:
+            label = parse_label_from_filename(path)
+            self.assertRegex(label, r"^[A-Z0-9]{4}$")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+from queue import Queue
+from unittest import mock
+
+import autoelective.loop as loop
+from autoelective.exceptions import IAAAForbiddenError
+
+_LOGIN_RTT = 0.1
+
+
+class _Resp(object):
+    def json(self):
+        return {"token": "t"}
+
+
+class _Client(object):
+    def __init__(self, id):
+        self.id = id
+        self.expired_time = -1
+        self.logins = 0
+
+    def clear_cookies(self):
+        pass
+
+    def set_user_agent(self, ua):
+        pass
+
+    def sso_login(self, token):
+        self.logins += 1
+
+    def set_expired_time(self, t):
+        self.expired_time = t
+
+
+class _FakeIAAA(object):
+    log = []
+    lock = threading.Lock()
+    forbid_next = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def set_user_agent(self, ua):
+        pass
+
+    def oauth_home(self):
+        with _FakeIAAA.lock:
+            _FakeIAAA.log.append(time.time())
+            forbid = _FakeIAAA.forbid_next > 0
+            if forbid:
+                _FakeIAAA.forbid_next -= 1
+        if forbid:
+            raise IAAAForbiddenError()
+        time.sleep(_LOGIN_RTT)
+
+    def oauth_login(self, username, password):
+        return _Resp()
+
+
+class LoginConcurrencyOfflineTest(unittest.TestCase):
+    def setUp(self):
+        _FakeIAAA.log = []
+        _FakeIAAA.forbid_next = 0
+        self.relogin = Queue()
+        self.home = Queue()
+        patches = [
+            mock.patch.object(loop, "IAAAClient", new=_FakeIAAA),
+            mock.patch.object(loop, "reloginPool", new=self.relogin),
+            mock.patch.object(loop, "_return_client_home", new=self.home.put),
+            mock.patch.object(loop, "login_loop_interval", new=0.3),
+            mock.patch.object(loop, "IAAA_BACKOFF_ENABLE", new=False),
+            mock.patch.object(loop, "elective_client_max_life", new=600),
+            mock.patch.object(loop, "is_dual_degree", new=False),
+            mock.patch.object(loop, "WARMUP_AFTER_LOGIN_ENABLE", new=False),
+            mock.patch.object(loop, "OFFLINE_ENABLED", new=False),
+            mock.patch.object(loop, "_critical_cooldown_until", new=0.0),
+            mock.patch.object(loop, "_login_backoff_until", new=0.0),
+            mock.patch.object(loop, "_iaaa_consecutive_errors", new=0),
+            mock.patch.object(loop, "_pool_fill", new={"reason": None, "started_at": 0.0, "logins": 0, "target": 0}),
+            mock.patch.object(loop, "_reset_runtime_state", new=lambda reason: None),
+            mock.patch.object(loop, "_enter_cooldown", new=lambda reason, s: None),
+            mock.patch.object(loop, "_maybe_failure_notify", new=lambda *a, **k: None),
+            mock.patch.object(loop, "CRITICAL_COOLDOWN_SECONDS", new=0.6),
+            mock.patch.object(loop, "_iaaa_workers", new={}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _run(self, concurrency):
+        with mock.patch.object(loop, "LOGIN_CONCURRENCY", new=concurrency):
+            t = threading.Thread(target=loop.run_iaaa_loop, name="IAAA", daemon=True)
+            t.start()
+        return t
+
+    def _stop(self, t):
+        self.relogin.put(loop.killedElective)
+        t.join(5.0)
+        self.assertFalse(t.is_alive())
+
+    def test_parallel_workers_fill_pool_and_report_time(self):
+        n = 6
+        with mock.patch.object(loop, "elective_client_pool_size", new=n), \
+             mock.patch.object(loop, "probe_pool_extra", new=0), \
+             mock.patch.object(loop, "LOGIN_CONCURRENCY", new=3):
+            loop._begin_pool_fill("startup")
+            for i in range(n):
+                self.relogin.put(_Client(i))
+            t0 = time.time()
+            t = self._run(3)
+            clients = [self.home.get(timeout=5.0) for _ in range(n)]
+            dt = time.time() - t0
+            self._stop(t)
+        # serial: n x (rtt + interval) ~ 2.4s; three workers: two rounds
+        self.assertLess(dt, 1.5)
+        self.assertEqual(sorted(c.id for c in clients), list(range(n)))
+        self.assertTrue(all(c.logins == 1 for c in clients))
+        self.assertIsNone(loop._pool_fill["reason"])
+        self.assertAlmostEqual(loop.environ.runtime_gauges["pool_fill_seconds"], dt, delta=0.1)
+
+    def test_forbidden_backs_off_all_workers(self):
+        _FakeIAAA.forbid_next = 1
+        self.relogin.put(_Client(0))
+        t = self._run(3)
+        deadline = time.time() + 2.0
+        while loop._login_backoff_until <= 0 and time.time() < deadline:
+            time.sleep(0.01)
+        forbidden_at = _FakeIAAA.log[0]
+        self.relogin.put(_Client(1))  # picked up by an idle worker during the backoff
+        got = [self.home.get(timeout=5.0) for _ in range(2)]
+        self._stop(t)
+        self.assertEqual(sorted(c.id for c in got), [0, 1])
+        later = _FakeIAAA.log[1:]
+        self.assertEqual(len(later), 2)
+        for ts in later:
+            self.assertGreaterEqual(ts - forbidden_at, 0.55)
+
+    def test_restart_keeps_live_helpers_and_last_worker_consumes_kill(self):
+        with mock.patch.object(loop, "LOGIN_CONCURRENCY", new=3):
+            first = self._run(3)
+            deadline = time.time() + 2.0
+            while len(loop._iaaa_workers) < 3 and time.time() < deadline:
+                time.sleep(0.01)
+            helpers = [loop._iaaa_workers[k] for k in (1, 2)]
+            # the thread guard restarts worker 0 while its helpers are still running
+            second = self._run(3)
+            deadline = time.time() + 2.0
+            while loop._iaaa_workers[0] is not second and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual([loop._iaaa_workers[k] for k in (1, 2)], helpers)
+
+            self.relogin.put(loop.killedElective)
+            for t in [first, second] + helpers:
+                t.join(5.0)
+                self.assertFalse(t.is_alive())
+            self.assertTrue(self.relogin.empty())  # a later restart does not quit right away
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+from autoelective.captcha import get_recognizer
+from autoelective.config import AutoElectiveConfig
+from autoelective.exceptions import RecognizerError
+from autoelective.utils import Singleton
+
+
+def _sse_event(text):
+    data = {"choices": [{"index": 0, "delta": {"content": text}}]}
+    return "data: %s\n\n" % json.dumps(data)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    requests_seen = []
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _write_chunk(self, text):
+        raw = text.encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(raw), raw))
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.requests_seen.append(body)
+        mode = self.server.mode
+        if mode == "json":
+            payload = json.dumps(
+                {"choices": [{"message": {"content": "{\"text\": \"Xy34\"}"}}]}
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        events, tail_delay, tail = self.server.script
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for text in events:
+                self._write_chunk(_sse_event(text))
+            time.sleep(tail_delay)
+            for text in tail:
+                self._write_chunk(_sse_event(text))
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class OpenAIStreamOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self._cfg_old = os.environ.get("AUTOELECTIVE_CONFIG_INI")
+        cfg = Path(__file__).resolve().parents[2] / "config.sample.ini"
+        os.environ["AUTOELECTIVE_CONFIG_INI"] = str(cfg)
+        Singleton._inst.pop(AutoElectiveConfig, None)
+
+        _StubHandler.requests_seen = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.mode = "stream"
+        # (events, delay before tail, tail events)
+        self._server.script = ([], 0.0, [])
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._cfg_old is None:
+            os.environ.pop("AUTOELECTIVE_CONFIG_INI", None)
+        else:
+            os.environ["AUTOELECTIVE_CONFIG_INI"] = self._cfg_old
+        Singleton._inst.pop(AutoElectiveConfig, None)
+
+    def _recognizer(self):
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "dummy"}, clear=False):
+            r = get_recognizer("openai", model_name="qwen3-vl-flash")
+        r._base_url = "http://127.0.0.1:%d/v1" % self._server.server_address[1]
+        r._session.trust_env = False
+        r.set_stream(True)
+        return r
+
+    def _image(self):
+        buf = BytesIO()
+        Image.new("RGB", (16, 16), (255, 255, 255)).save(buf, format="JPEG")
+        return buf.getvalue()
+
+    def test_stream_returns_before_tail(self):
+        self._server.script = (
+            ["Looking at the image", ", the code is ", "{\"text\": \"Ab", "12\"}"],
+            2.0,
+            [" and some trailing explanation."],
+        )
+        r = self._recognizer()
+        t0 = time.time()
+        cap = r.recognize(self._image())
+        elapsed = time.time() - t0
+        self.assertEqual(cap.code, "AB12")
+        self.assertLess(elapsed, 1.5)
+        self.assertTrue(_StubHandler.requests_seen[0].get("stream"))
+
+    def test_stream_plain_text_waits_for_done(self):
+        self._server.script = (["Ab", "12"], 0.0, [])
+        r = self._recognizer()
+        cap = r.recognize(self._image())
+        self.assertEqual(cap.code, "AB12")
+
+    def test_stream_wrong_length_defers_to_full_text_rules(self):
+        self._server.script = (["{\"text\": \"A\"}"], 0.5, [" ok"])
+        r = self._recognizer()
+        t0 = time.time()
+        with self.assertRaises(RecognizerError):
+            r.recognize(self._image())
+        self.assertGreaterEqual(time.time() - t0, 0.5)
+
+    def test_stream_empty_raises(self):
+        self._server.script = ([""], 0.0, [])
+        r = self._recognizer()
+        with self.assertRaises(RecognizerError):
+            r.recognize(self._image())
+
+    def test_stream_endpoint_without_sse_uses_json(self):
+        self._server.mode = "json"
+        r = self._recognizer()
+        cap = r.recognize(self._image())
+        self.assertEqual(cap.code, "XY34")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -192,5 +192,26 @@ openai_api_key=legacy
         self.assertTrue(any(i.code == "captcha_legacy_key_unsupported" and i.key_path == "captcha.openai_api_key" for i in errs))
 
 
+    def test_invalid_image_transform_error(self):
+        issues = _run_preflight_with_ini(
+            """
+[client]
+refresh_interval=4
+random_deviation=0.01
+elective_client_pool_size=2
+
+[captcha]
+provider=baidu
+baidu_api_key=K
+baidu_secret_key=S
+baidu_image_transform=gray,webp
+image_transform=gray,rotate:90
+"""
+        )
+        errs = [i for i in issues if i.level == "ERROR"]
+        keys = {i.key_path for i in errs if i.code == "captcha_image_transform_invalid"}
+        self.assertIn("captcha.baidu_image_transform", keys)
+        self.assertIn("captcha.image_transform", keys)
+
 if __name__ == "__main__":
     unittest.main()
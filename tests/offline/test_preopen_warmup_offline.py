@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+from queue import Queue
+from unittest import mock
+
+import autoelective.loop as loop
+from autoelective.scheduler import Scheduler
+
+
+class _Client(object):
+    def __init__(self, id, logined=True, expired_time=-1):
+        self.id = id
+        self.has_logined = logined
+        self.expired_time = expired_time
+        self._session = object()
+
+
+class _Recognizer(object):
+    def __init__(self, ready=True):
+        self.ready = ready
+        self.warmed = 0
+
+    def warmup(self):
+        self.warmed += 1
+
+
+class PreopenWarmupOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.sched = Scheduler("TestPreopen")
+        self.elective_pool = Queue()
+        self.relogin_pool = Queue()
+        self.recs = [_Recognizer(), _Recognizer(ready=False)]
+        self.warmed_sessions = []
+        self.done = threading.Event()
+        self.readiness = []
+        orig_report = loop._report_preopen_readiness
+
+        def _report(start_local):
+            self.readiness.append((time.time(), orig_report(start_local)))
+            self.done.set()
+
+        patches = [
+            mock.patch.object(loop, "scheduler", new=self.sched),
+            mock.patch.object(loop, "electivePool", new=self.elective_pool),
+            mock.patch.object(loop, "reloginPool", new=self.relogin_pool),
+            mock.patch.object(loop, "probePool", new=None),
+            mock.patch.object(loop, "recognizers", new=self.recs),
+            mock.patch.object(loop, "PREOPEN_WARMUP_ENABLE", new=True),
+            mock.patch.object(loop, "PREOPEN_WARMUP_LEAD_SECONDS", new=0.2),
+            mock.patch.object(loop, "PREOPEN_WARMUP_HOLD_SECONDS", new=300.0),
+            mock.patch.object(loop, "_preopen_start_ts", new=None),
+            mock.patch.object(loop, "_preopen_jobs", new=[]),
+            mock.patch.object(loop, "_captcha_failure_count", new=7),
+            mock.patch.object(loop, "_captcha_degrade_until", new=time.time() + 600),
+            mock.patch.object(loop, "_critical_cooldown_until", new=time.time() + 600),
+            mock.patch.object(loop, "_critical_cooldown_reason", new="not_in_operation"),
+            mock.patch.object(loop, "warm_http_session", new=lambda s, url, timeout: self.warmed_sessions.append(s) or True),
+            mock.patch.object(loop, "_get_help_schedule", new=lambda elective=None, force_refresh=False: [{"name": "x"}]),
+            mock.patch.object(loop, "_report_preopen_readiness", new=_report),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.addCleanup(self.sched.stop, 2.0)
+
+    def test_warmup_then_readiness_at_t0(self):
+        now = time.time()
+        fresh = _Client(1, expired_time=int(now) + 3600)
+        expiring = _Client(2, expired_time=int(now) + 100)  # would expire inside the window
+        logged_out = _Client(3, logined=False)
+        for c in (fresh, expiring, logged_out):
+            self.elective_pool.put(c)
+
+        start_ts = now + 0.5
+        with mock.patch.object(loop.rate_limit, "has_budget", new=lambda url, tokens=1.0: True):
+            self.assertTrue(loop._plan_preopen_warmup(start_ts, now))
+            self.assertFalse(loop._plan_preopen_warmup(start_ts, now))  # already planned
+            self.assertTrue(self.done.wait(3.0))
+
+        fired_at, ready = self.readiness[0]
+        self.assertAlmostEqual(fired_at, start_ts, delta=0.2)
+        self.assertEqual(sorted(c.id for c in self.relogin_pool.queue), [2, 3])
+        self.assertEqual([c.id for c in self.elective_pool.queue], [1])
+        self.assertEqual(self.warmed_sessions, [fresh._session])
+        self.assertEqual([r.warmed for r in self.recs], [1, 1])
+        self.assertFalse(loop._captcha_is_degraded())
+        self.assertEqual(loop._critical_cooldown_until, 0.0)
+        self.assertEqual(ready["clients_ready"], 1)
+        self.assertEqual(ready["relogin_pending"], 2)
+        self.assertEqual((ready["recognizers_ready"], ready["recognizers"]), (1, 2))
+        self.assertEqual(ready["warmup"]["relogin"], 2)
+        self.assertTrue(ready["warmup"]["schedule"])
+
+    def test_warmup_respects_rate_limit_budget(self):
+        self.elective_pool.put(_Client(1))
+        with mock.patch.object(loop.rate_limit, "has_budget", new=lambda url, tokens=1.0: False):
+            report = loop._run_preopen_warmup(time.time() + 60)
+        self.assertEqual(self.warmed_sessions, [])
+        self.assertEqual(report["elective_skipped"], 1)
+        self.assertNotIn("schedule", report)
+        self.assertEqual(self.elective_pool.qsize(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
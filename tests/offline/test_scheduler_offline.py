@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unittest
+from collections import defaultdict
+from unittest import mock
+
+import autoelective.loop as loop
+from autoelective.scheduler import Cadence, PauseGate, Scheduler
+
+
+class SchedulerOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.sched = Scheduler("TestScheduler")
+
+    def tearDown(self):
+        self.sched.stop(timeout=2.0)
+
+    def test_fixed_rate_does_not_drift_with_slow_runs(self):
+        runs = []
+        done = threading.Event()
+
+        def job():
+            runs.append(time.monotonic())
+            if len(runs) == 1:
+                time.sleep(0.06)  # slower than half a period
+            if len(runs) == 4:
+                done.set()
+
+        t0 = time.monotonic()
+        self.sched.call_every(0.1, job, initial_delay=0.1)
+        self.assertTrue(done.wait(3.0))
+        offsets = [r - t0 for r in runs]
+        # deadlines stay at t0 + k * 0.1 even though the first run took 60ms
+        for k, off in enumerate(offsets, start=1):
+            self.assertAlmostEqual(off, 0.1 * k, delta=0.05)
+        st = self.sched.stats()
+        self.assertGreaterEqual(st["runs"], 4)
+        self.assertEqual(st["errors"], 0)
+        self.assertLess(st["lag_max_ms"], 50.0)
+
+    def test_earlier_timer_wakes_scheduler_and_cancel_skips(self):
+        fired = []
+        late = self.sched.call_later(5.0, lambda: fired.append("late"))
+        cancelled = self.sched.call_later(0.02, lambda: fired.append("cancelled"))
+        cancelled.cancel()
+        early = threading.Event()
+        self.sched.call_later(0.05, early.set)
+        t0 = time.monotonic()
+        self.assertTrue(early.wait(2.0))
+        self.assertLess(time.monotonic() - t0, 1.0)
+        self.assertEqual(fired, [])
+        self.assertEqual(self.sched.stats()["jobs"], 1)
+        late.cancel()
+
+    def test_cadence_and_pause_gate(self):
+        now = [100.0]
+        cadence = Cadence(clock=lambda: now[0])
+        now[0] += 1.5  # SupplyCancel + elect took 1.5s
+        self.assertEqual(cadence.remaining(4.0), 2.5)
+        now[0] += 10.0
+        self.assertEqual(cadence.remaining(4.0, minimum=0.1), 0.1)
+        cadence.mark()
+        self.assertEqual(cadence.remaining(4.0), 4.0)
+
+        gate = PauseGate()
+        gate.set()
+        threading.Timer(0.05, gate.clear).start()
+        t0 = time.monotonic()
+        self.assertTrue(gate.wait_clear(2.0))
+        self.assertLess(time.monotonic() - t0, 1.0)
+        self.assertFalse(gate.is_set())
+
+    def test_loop_registers_periodic_jobs_once(self):
+        with mock.patch.object(loop, "scheduler", new=self.sched), \
+             mock.patch.object(loop, "RUNTIME_ERROR_AGG_INTERVAL", new=30.0), \
+             mock.patch.object(loop, "CAPTCHA_ADAPTIVE_PERSIST_ENABLE", new=False), \
+             mock.patch.object(loop, "_get_adaptive_journal", new=lambda: None), \
+             mock.patch.object(loop, "_periodic_jobs", new=[]):
+            loop._start_periodic_jobs()
+            jobs = loop._start_periodic_jobs()  # e.g. elective loop restarted by the guard
+            self.assertIn("error_agg", [j.name for j in jobs])
+            self.assertNotIn("adaptive_persist", [j.name for j in jobs])
+            self.assertEqual(self.sched.stats()["jobs"], len(jobs))
+            loop._stop_periodic_jobs()
+            self.assertEqual(self.sched.stats()["jobs"], 0)
+
+    def test_scheduled_tick_is_not_skipped_by_jitter(self):
+        counts = defaultdict(int)
+        with mock.patch.object(loop, "RUNTIME_ERROR_AGG_INTERVAL", new=30.0), \
+             mock.patch.object(loop, "_error_agg_counts", new=counts), \
+             mock.patch.object(loop, "_error_agg_last", new=time.time() - 29.9):
+            counts["timeout"] += 1
+            loop._maybe_report_error_agg()  # unscheduled: still inside the interval
+            self.assertEqual(dict(counts), {"timeout": 1})
+            loop._maybe_report_error_agg(scheduled=True)  # tick a little early
+            self.assertEqual(dict(counts), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import time
+import unittest
+from queue import Queue
+from unittest import mock
+
+import autoelective.loop as loop
+from autoelective.elective import ElectiveClient
+from autoelective.exceptions import SessionExpiredError
+from autoelective.session_cache import SessionCache, export_client, import_client
+
+
+def _logged_in(id, expired_time=-1, kind="elective"):
+    c = ElectiveClient(id)
+    c._pool_kind = kind
+    c.set_user_agent("UA-%s" % id)
+    c._session.cookies.set("JSESSIONID", "secret-session-%s" % id, domain="elective.pku.edu.cn", path="/")
+    c.set_expired_time(expired_time)
+    return c
+
+
+class SessionCacheOfflineTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "sessions", "acct.bin")
+        self.cache = SessionCache(self.path, "pw", "2100000000", iterations=1000)
+
+    def test_roundtrip_is_encrypted_and_authenticated(self):
+        now = time.time()
+        clients = [_logged_in(1, int(now) + 600), _logged_in(2, int(now) - 5)]
+        self.assertEqual(self.cache.save(export_client(c) for c in clients), 2)
+        with open(self.path, "rb") as fp:
+            blob = fp.read()
+        self.assertNotIn(b"secret-session", blob)
+        self.assertNotIn(b"2100000000", blob)
+
+        entries = SessionCache(self.path, "pw", "2100000000", iterations=1000).load(now=now)
+        self.assertEqual([e["id"] for e in entries], [1])  # the expired one is dropped
+        c = import_client(ElectiveClient(1), entries[0])
+        self.assertTrue(c.has_logined)
+        self.assertEqual(c._session.cookies.get("JSESSIONID"), "secret-session-1")
+        self.assertEqual((c.user_agent, c.expired_time), ("UA-1", clients[0].expired_time))
+
+        self.assertEqual(SessionCache(self.path, "other", "2100000000", iterations=1000).load(now=now), [])
+        self.assertEqual(SessionCache(self.path, "pw", "2200000000", iterations=1000).load(now=now), [])
+        tampered = bytearray(blob)
+        tampered[40] ^= 1
+        with open(self.path, "wb") as fp:
+            fp.write(bytes(tampered))
+        self.assertEqual(self.cache.load(now=now), [])
+        self.cache.clear()
+        self.assertEqual(self.cache.load(now=now), [])
+
+
+def _fresh(id, pool_kind="elective"):
+    c = ElectiveClient(id)
+    c._pool_kind = pool_kind
+    return c
+
+
+class SessionRestoreOfflineTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = SessionCache(os.path.join(tmp.name, "acct.bin"), "pw", "acct", iterations=1000)
+        self.elective_pool = Queue()
+        self.relogin_pool = Queue()
+        patches = [
+            mock.patch.object(loop, "SESSION_CACHE_ENABLE", new=True),
+            mock.patch.object(loop, "_session_cache", new=self.cache),
+            mock.patch.object(loop, "_session_cache_clients", new={}),
+            mock.patch.object(loop, "electivePool", new=self.elective_pool),
+            mock.patch.object(loop, "reloginPool", new=self.relogin_pool),
+            mock.patch.object(loop, "probePool", new=None),
+            mock.patch.object(loop, "elective_client_pool_size", new=3),
+            mock.patch.object(loop, "LOGIN_CONCURRENCY", new=1),
+            mock.patch.object(loop, "_make_client", new=_fresh),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_valid_sessions_restored_rest_seeded_for_login(self):
+        loop._cache_session(_logged_in(1))
+        loop._cache_session(_logged_in(2))
+        self.assertEqual(len(self.cache.load()), 2)
+
+        def _show_results(client, **kwargs):
+            if client.id == 2:
+                raise SessionExpiredError()
+            return None
+
+        with mock.patch.object(ElectiveClient, "get_ShowResults", new=_show_results):
+            restored = loop._restore_cached_sessions()
+        self.assertEqual(restored, {("elective", 1)})
+        warm = self.elective_pool.get_nowait()
+        self.assertEqual(warm.id, 1)
+        self.assertTrue(warm.has_logined)
+        self.assertEqual(warm.user_agent, "UA-1")
+
+        loop._seed_client_pools(skip=restored)
+        fresh = sorted(c.id for c in self.elective_pool.queue)
+        self.assertEqual(fresh, [2, 3])
+        self.assertFalse(any(c.has_logined for c in self.elective_pool.queue))
+
+    def test_disabled_cache_is_a_no_op(self):
+        with mock.patch.object(loop, "SESSION_CACHE_ENABLE", new=False):
+            loop._cache_session(_logged_in(1))
+            self.assertEqual(loop._restore_cached_sessions(), set())
+        self.assertEqual(self.cache.load(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
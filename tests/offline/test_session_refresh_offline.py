@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from queue import Queue
+from unittest import mock
+
+import autoelective.loop as loop
+from autoelective.scheduler import Scheduler
+
+NOW = 1_000_000.0
+
+
+class _Client(object):
+    def __init__(self, id, logined=True, expires_in=None):
+        self.id = id
+        self.has_logined = logined
+        self.expired_time = -1 if expires_in is None else int(NOW + expires_in)
+
+
+class SessionRefreshOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.elective_pool = Queue()
+        self.relogin_pool = Queue()
+        patches = [
+            mock.patch.object(loop, "electivePool", new=self.elective_pool),
+            mock.patch.object(loop, "reloginPool", new=self.relogin_pool),
+            mock.patch.object(loop, "probePool", new=None),
+            mock.patch.object(loop, "SESSION_REFRESH_LEAD_SECONDS", new=60.0),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _ids(self, pool):
+        return sorted(c.id for c in pool.queue)
+
+    def test_rotates_before_expiry_keeping_a_warm_spare(self):
+        for c in (
+            _Client("healthy", expires_in=500),
+            _Client("soon_a", expires_in=30),
+            _Client("soon_b", expires_in=10),
+            _Client("expired", expires_in=-5),
+            _Client("logged_out", logined=False),
+        ):
+            self.elective_pool.put(c)
+        rotated = loop._refresh_sessions(now=NOW)
+        self.assertEqual(rotated, 4)
+        self.assertEqual(self._ids(self.relogin_pool), ["expired", "logged_out", "soon_a", "soon_b"])
+        self.assertEqual(self._ids(self.elective_pool), ["healthy"])
+        self.assertEqual(loop.environ.runtime_gauges["session_healthy_ready"], 1)
+
+    def test_last_usable_client_is_kept_until_expiry(self):
+        self.elective_pool.put(_Client("soon_a", expires_in=30))
+        self.elective_pool.put(_Client("soon_b", expires_in=10))
+        self.assertEqual(loop._refresh_sessions(now=NOW), 1)
+        # the earliest one goes first; the other keeps serving
+        self.assertEqual(self._ids(self.relogin_pool), ["soon_b"])
+        self.assertEqual(self._ids(self.elective_pool), ["soon_a"])
+        self.assertEqual(loop.environ.runtime_gauges["session_healthy_ready"], 0)
+        self.assertEqual(loop._refresh_sessions(now=NOW), 0)
+        self.assertEqual(loop._refresh_sessions(now=NOW + 31), 1)  # expired now
+        self.assertEqual(self.elective_pool.qsize(), 0)
+
+    def test_refresher_registered_with_scheduler(self):
+        sched = Scheduler("TestRefresh")
+        self.addCleanup(sched.stop, 2.0)
+        with mock.patch.object(loop, "scheduler", new=sched), \
+             mock.patch.object(loop, "SESSION_REFRESH_ENABLE", new=True), \
+             mock.patch.object(loop, "_periodic_jobs", new=[]):
+            jobs = loop._start_periodic_jobs()
+            self.assertIn("session_refresh", [j.name for j in jobs])
+            loop._stop_periodic_jobs()
+
+
+if __name__ == "__main__":
+    unittest.main()
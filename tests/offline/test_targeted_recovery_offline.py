@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from queue import Queue
+from unittest import mock
+
+import autoelective.loop as loop
+
+
+class _Client(object):
+    def __init__(self, id, logined=True):
+        self.id = id
+        self.has_logined = logined
+        self.expired_time = -1
+        self._pool_kind = "elective"
+
+
+class TargetedRecoveryOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.elective_pool = Queue()
+        self.relogin_pool = Queue()
+        self.resets = []
+        self.made = []
+
+        def _make_client(id, pool_kind="elective"):
+            c = _Client(id, logined=False)
+            self.made.append(c)
+            return c
+
+        patches = [
+            mock.patch.object(loop, "electivePool", new=self.elective_pool),
+            mock.patch.object(loop, "reloginPool", new=self.relogin_pool),
+            mock.patch.object(loop, "_make_client", new=_make_client),
+            mock.patch.object(loop, "CLIENT_POOL_TARGETED_RECOVERY", new=True),
+            mock.patch.object(loop, "LOGIN_CONCURRENCY", new=2),
+            mock.patch.object(loop, "_recovery", new={"path": None, "reason": None, "started_at": 0.0, "logins": 0}),
+            mock.patch.object(loop, "_pool_fill", new={"reason": None, "started_at": 0.0, "logins": 0, "target": 0}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _round(self, client, failed):
+        self.elective_pool.get_nowait()
+        loop._finish_client_round(client, failed)
+
+    def test_recycles_only_faulty_clients_then_escalates(self):
+        good, bad = _Client(1), _Client(2)
+        for c in (good, bad):
+            self.elective_pool.put(c)
+        self._round(good, False)
+        self._round(bad, True)
+
+        self.assertTrue(loop._recover_faulty_clients("errors"))
+        self.assertEqual([c.id for c in self.elective_pool.queue], [1])
+        self.assertIs(self.elective_pool.queue[0], good)  # warm session kept
+        self.assertEqual([c.id for c in self.relogin_pool.queue], [2])
+        self.assertIsNot(self.relogin_pool.queue[0], bad)  # recycled, not reused
+        self.assertEqual(loop._recovery["path"], "targeted")
+
+        # errors went on before any successful round: leave it to the full reset
+        self.assertFalse(loop._recover_faulty_clients("errors"))
+        self.assertGreater(loop.environ.runtime_stats["recovery_targeted_escalate"], 0)
+
+    def test_nothing_attributable_falls_back(self):
+        self.elective_pool.put(_Client(1))
+        self.assertFalse(loop._recover_faulty_clients("errors"))
+        self.assertEqual(self.elective_pool.qsize(), 1)
+        self.assertIsNone(loop._recovery["path"])
+        with mock.patch.object(loop, "CLIENT_POOL_TARGETED_RECOVERY", new=False):
+            self.elective_pool.queue[0]._err_streak = 3
+            self.assertFalse(loop._recover_faulty_clients("errors"))
+
+    def test_recovery_time_and_logins_per_path(self):
+        loop._begin_recovery("targeted", "errors")
+        loop._record_pool_login()
+        loop._record_pool_login()
+        dt, logins = loop._finish_recovery()
+        self.assertEqual(logins, 2)
+        self.assertEqual(loop.environ.runtime_gauges["recovery_targeted_logins"], 2)
+        self.assertAlmostEqual(loop.environ.runtime_gauges["recovery_targeted_seconds"], dt, delta=0.01)
+        self.assertIsNone(loop._finish_recovery())
+        loop._record_pool_login()  # outside a recovery: not counted
+        self.assertEqual(loop._recovery["logins"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()